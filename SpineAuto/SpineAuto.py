@@ -1,70 +1,81 @@
-import base64
+import argparse
+import binascii
 import codecs
-import re
-import subprocess
 from collections import namedtuple
-from typing import Any, List
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import List, Optional, TYPE_CHECKING
+from urllib.parse import urljoin
 
-from bs4 import BeautifulSoup
-from requests import get
 import os
+import shutil
 from shutil import rmtree
-from rich.progress import Progress, ProgressColumn, TextColumn, BarColumn, TaskProgressColumn, TimeRemainingColumn
-from hashlib import md5
-import json
+from hashlib import md5, sha256
+import threading
+import time
+
+from archive_output import ARCHIVE_FORMATS, OUTPUT_FORMATS, ArchiveWriter, archive_path, member_path
+from atlas import AtlasContent, parse_atlas
+from asset_cache import (AssetStore, CACHE_DIR, DEFAULT_MAX_AGE, DEFAULT_MAX_SIZE, prepare_dir, spine_key,
+                         write_if_changed)
+from catalog import Catalog, default_catalog_path
+from downloader import DEFAULT_WORKERS, DOWNLOAD_STATE_NAME, Downloader, DownloadJob, embedded_hash
+from html_head import scan_head
+from http_cache import CachedResponse, HttpCache, read_body
+from literal_slice import decode_base64_batch, iter_data_uris, map_file
+from metrics import Metrics
+from page_alpha import PAGE_ALPHA_AVAILABLE, check_atlas, straight_atlas
+from pipeline import PipelineStage, abort_stages
+from preflight import PreflightReport, save_preflight_report, validate_project
+from skeleton_binary import SkeletonBinaryError, export_skeleton
+from skeleton_json import NormalizedSkeleton, normalize_skeleton, skeleton_attachments
+from spine_assets import SpineAssetResolver
+from spine_runner import SpineProject, SpineReport, SpineWorkerPool, save_report
+from vendors_scanner import (VendorsEvent, VendorsScanner, VendorsEventType, IMAGE_REF_RE, data_uri_content,
+                             dump_events, load_events)
+from webpack_modules import chunk_script_paths
+
+if TYPE_CHECKING:
+    # rich只在创建进度条时导入，缩短启动时间
+    from rich.progress import Progress
 
 UA = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 "
       "Safari/537.36 Edg/119.0.0.0")
 headers = {"user-agent": UA}
 SPINE_COM_FILE = r"D:\Program Files\Spine\spine.com"  # Spine软件的路径
 PROXY_HOST_PORT = ("127.0.0.1", 7890)  # 代理服务器的主机和端口配置
+SPINE_WORKERS = 4  # 同时运行的Spine进程数
+NATIVE_UNPACK = True  # 安装了Pillow时直接解开图片，不再启动Spine
+SKELETON_MINIFY = False  # 骨骼JSON是否保存为紧凑格式
+EXPORT_SKEL = False  # 是否同时导出Spine 4.1的二进制骨骼（.skel.bytes），Unity中加载更快
+VERIFY_DOWNLOADS = True  # 下载的图片用文件名中的hash校验，只重新下载缺失或损坏的文件
+LOW_MEMORY = False  # 低内存模式：内联图片边扫描边解码保存，不在内存中保留，适合很大的vendors.js
+STRAIGHT_ALPHA = True  # 安装了NumPy时检查页面图片，预乘透明度的页面转换为Unity材质使用的非预乘（_StraightAlphaInput）
+OUTPUT_FORMAT = "dir"  # 输出格式：dir为每个活动一个文件夹；zip、tar、tar.zst为每个活动一个归档，边生成边写入
+
+VENDORS_CHUNK_SIZE = 1 << 16  # 流式下载vendors.js时每块的大小
+
+# 提取的设置。作为库使用时传入，不需要修改上面的全局变量；默认值就是上面的全局变量
+SpineAutoConfig = namedtuple("SpineAutoConfig", [
+    "output_root",  # 输出目录，活动的文件夹会创建在这里
+    "spine_com_file", "proxy", "spine_workers", "native_unpack",
+    "skeleton_minify", "export_skel", "verify_downloads", "low_memory",
+    "headers", "download_workers",  # 每个请求都带上的请求头，同时下载的文件数
+    "cache_dir", "cache_max_size", "cache_max_age",
+    "parsed_memory_entries",  # 在内存中保留多少个脚本的解析结果，常驻服务中再次提取时不需要读取磁盘
+    "output_format",  # 输出格式，见OUTPUT_FORMAT
+    "straight_alpha",  # 见STRAIGHT_ALPHA
+], defaults=(".", SPINE_COM_FILE, PROXY_HOST_PORT, SPINE_WORKERS, NATIVE_UNPACK, SKELETON_MINIFY, EXPORT_SKEL,
+             VERIFY_DOWNLOADS, LOW_MEMORY, headers, DEFAULT_WORKERS, CACHE_DIR, DEFAULT_MAX_SIZE, DEFAULT_MAX_AGE, 0,
+             OUTPUT_FORMAT, STRAIGHT_ALPHA))
 
 URL = namedtuple("URL", ["protocol", "base", "href", "filename"])
+# 一个活动页面的处理结果
+EventResult = namedtuple("EventResult", ["url", "name", "projects", "download_failures", "spine_failures", "elapsed",
+                                         "error"])
 
 
-def list_to_str(input_list: list[Any]) -> str:
-    """
-    将列表转换为str
-    :param input_list: 输入列表
-    :return: 输出一个使用逗号分隔的字符串，如[XXX, XXX, XXX]
-    """
-    return '[' + ", ".join([str(item) for item in input_list]) + ']'
-
-
-class AtlasRegion:
-    def __init__(self, name: str):
-        self.name = name
-
-    def __str__(self):
-        return f"AtlasRegion({self.name})"
-
-
-class AtlasPage:
-    def __init__(self, name: str, regions: list[AtlasRegion]):
-        self.name = name
-        self.regions = regions
-        self.img = None
-
-    def __str__(self):
-        return f"AtlasPage(name = {self.name}, regions = {list_to_str(self.regions)}, img = {self.img})"
-
-
-class AtlasContent:
-    def __init__(self, pages: list[AtlasPage], original: str, original_json: dict[Any, Any], scale: float = 1.0):
-        self.pages = pages
-        self.scale = scale
-        self.original = original
-        self.original_json = original_json
-
-    def __str__(self):
-        return f"AtlasContent(pages = {list_to_str(self.pages)}, scale = {self.scale})"
-
-    def get_name(self) -> str:
-        """
-        返回项目名称
-        :return: 项目名称
-        """
-        return self.pages[0].name
+class SpineAutoError(Exception):
+    ...
 
 
 def url_parser(url_str: str) -> URL:
@@ -97,38 +108,15 @@ def abs_url(url: str, access_url: URL) -> str:
     return access_url.protocol + "://" + access_url.base + "/" + access_url.href + "/" + url
 
 
-def get_all_string(js_code: str) -> list[str]:
-    """
-    获取js中所有的字符串
-    :param js_code: js代码
-    :return: 一个有两个元素的元组，第一个元素是使用双引号的字符串，第二个是使用单引号的字符串
-    """
-    return re.findall(r'"(.*?)"', js_code)
-
-
-def get_all_image_base64(js_code: str) -> list[bytes]:
+def get_all_image_base64(js_code: str | bytes) -> list[bytes]:
     """
     获取js代码中所有的图片base64
     :param js_code: js代码
     :return: 一个包含图片二进制的列表
     """
-    code_length = len(js_code)
-    last_index = 0
-    images = []
-    while True:
-        index = js_code.find("data:image/png;base64,", last_index, code_length)
-        if index == -1:
-            break
-        symbol = js_code[index - 1]
-        b64_content = ""
-        for i in range(index, code_length):
-            s = js_code[i]
-            if s == symbol:
-                break
-            b64_content += s
-        images.append(base64.b64decode(b64_content.replace("data:image/png;base64,", "")))
-        last_index = index + 1
-    return images
+    if isinstance(js_code, str):
+        js_code = js_code.encode("utf-8")
+    return decode_base64_batch(iter_data_uris(js_code))
 
 
 def parser_atlas(content: str) -> AtlasContent:
@@ -138,39 +126,7 @@ def parser_atlas(content: str) -> AtlasContent:
     :return: atlas对象
     """
     atlas_content = str(codecs.escape_decode(content)[0], 'utf-8').replace("\t", "")
-    result = AtlasContent([], atlas_content, {})
-    now_page = None
-    for line in atlas_content.splitlines():
-        if line == "":
-            continue
-        if line.endswith(".png"):
-            # 页
-            if now_page is not None:
-                result.pages.append(now_page)
-            page_name = line.replace(".png", "")
-            now_page = AtlasPage(page_name, [])
-            continue
-        if ":" in line:
-            # 属性
-            if line.startswith("scale:"):
-                scale = float(line.replace(" ", "").replace("scale:", ""))
-                result.scale = scale
-            continue
-        # 区域
-        now_page.regions.append(AtlasRegion(line))
-    result.pages.append(now_page)
-    return result
-
-
-def parser_spine_version(version: str) -> str:
-    """
-    转换spine版本
-    :param version: 原始版本字符串
-    :return: 可用的一个版本（最新）
-    """
-    if "-from-" in version:
-        return version.split("-from-")[1]
-    return version
+    return parse_atlas(atlas_content)
 
 
 def rm_default_create(path: os.PathLike | str):
@@ -183,140 +139,698 @@ def rm_default_create(path: os.PathLike | str):
     os.mkdir(path)
 
 
-def parser_index_page(main_index_url: str):
+def create_progress(disable: bool = False) -> "Progress":
+    """
+    创建进度条
+    :param disable: 不显示进度条（作为库或常驻服务使用时）
+    :return: 进度条
+    """
+    from rich.progress import (Progress, ProgressColumn, TextColumn, BarColumn, TaskProgressColumn,
+                               TimeRemainingColumn)
     columns: List[ProgressColumn] = [TextColumn("{task.description}"),
                                      BarColumn(),
                                      TaskProgressColumn(show_speed=True),
                                      TimeRemainingColumn(elapsed_when_finished=True)
                                      ]
-    progress = Progress(*columns, refresh_per_second=60)
-    progress.start()
-    # 获取页面 -> 获取vendors.js -> 获取atlas 获取json 获取图片 -> 获取base64 -> 下载图片 -> 将base64保存为图片 -> 解开图片 -> 生成项目
-    main_progress_bar_task_id = progress.add_task("获取页面中...", total=7)
+    return Progress(*columns, refresh_per_second=60, disable=disable)
+
+
+def add_metrics_arguments(arg_parser: argparse.ArgumentParser):
+    """
+    添加性能数据相关的命令行参数
+    :param arg_parser: 命令行解析器
+    """
+    arg_parser.add_argument("--metrics", metavar="PATH", help="保存每个阶段的耗时等性能数据（JSON）")
+    arg_parser.add_argument("--prometheus", metavar="PATH", help="以Prometheus文本格式保存性能数据")
+    arg_parser.add_argument("--profile", metavar="PATH", help="使用cProfile分析每个阶段，结果保存到PATH")
+
+
+def parser_index_page(main_index_url: str, output_root: Optional[str] = None, force: bool = False,
+                      cache_dir: Optional[str] = None, cache_max_size: Optional[int] = None,
+                      cache_max_age: Optional[float] = None, downloader: Optional[Downloader] = None,
+                      spine_pool: Optional[SpineWorkerPool] = None, store: Optional[AssetStore] = None,
+                      http_cache: Optional[HttpCache] = None, progress: Optional["Progress"] = None,
+                      metrics: Optional[Metrics] = None, low_memory: Optional[bool] = None,
+                      catalog: Optional[Catalog] = None, config: Optional[SpineAutoConfig] = None,
+                      output_format: Optional[str] = None) -> EventResult:
+    """
+    提取先行展示页中的所有Spine项目
+    :param main_index_url: 页面URL
+    :param output_root: 输出目录，活动的文件夹会创建在这里，不传时使用config中的
+    :param force: 忽略缓存，清空已有的文件后重新生成
+    :param cache_dir: 缓存目录，不传时使用config中的
+    :param cache_max_size: 缓存的最大体积（字节），不传时使用config中的
+    :param cache_max_age: 多久没有用到的缓存会被清理（秒），不传时使用config中的
+    :param downloader: 共用的下载器，不传时自动创建
+    :param spine_pool: 共用的Spine进程池，不传时自动创建
+    :param store: 共用的缓存，传入时由调用者负责清理和保存
+    :param http_cache: 共用的HTTP缓存
+    :param progress: 共用的进度条，不传时自动创建
+    :param metrics: 记录每个阶段的耗时等性能数据，不传时使用下载器的
+    :param low_memory: 是否使用低内存模式，不传时使用config中的
+    :param catalog: 共用的资源目录，不传时使用缓存目录中的
+    :param config: 提取的设置，不传时使用全局变量
+    :param output_format: 输出格式（dir、zip、tar、tar.zst），不传时使用config中的
+    :return: 处理结果
+    """
+    start_time = time.perf_counter()
+    overrides = {"output_root": output_root, "cache_dir": cache_dir, "cache_max_size": cache_max_size,
+                 "cache_max_age": cache_max_age, "low_memory": low_memory, "output_format": output_format}
+    config = (config or SpineAutoConfig())._replace(**{name: value for name, value in overrides.items()
+                                                       if value is not None})
+    if config.output_format not in OUTPUT_FORMATS:
+        raise SpineAutoError(f"不支持的输出格式：{config.output_format}，支持{'、'.join(OUTPUT_FORMATS)}")
+    own_progress = progress is None
+    if own_progress:
+        progress = create_progress()
+        progress.start()
+    own_downloader = downloader is None
+    if own_downloader:
+        downloader = Downloader(headers=config.headers, workers=config.download_workers, metrics=metrics,
+                                state_path=os.path.join(config.cache_dir, DOWNLOAD_STATE_NAME))
+    if metrics is None:
+        metrics = downloader.metrics
+    if spine_pool is None:
+        spine_pool = SpineWorkerPool(config.spine_com_file, config.proxy, config.spine_workers, config.native_unpack,
+                                     metrics)
+    own_store = store is None
+    if own_store:
+        store = AssetStore(config.cache_dir)
+    if http_cache is None:
+        http_cache = HttpCache(config.cache_dir, config.parsed_memory_entries)
+    own_catalog = catalog is None
+    if own_catalog:
+        catalog = Catalog(default_catalog_path(config.cache_dir))
+    try:
+        return _parser_index_page(main_index_url, config, force, downloader, spine_pool, store, http_cache,
+                                  catalog, progress, metrics, start_time)
+    finally:
+        if own_catalog:
+            catalog.close()
+        if own_store:
+            store.evict(config.cache_max_size, config.cache_max_age)
+            store.save()
+        if own_downloader:
+            downloader.close()
+        if own_progress:
+            progress.stop()
+
+
+class SpineAutoSession:
+    """
+    作为库使用时的入口：按设置创建下载器、Spine进程池、缓存和资源目录，在多次提取之间一直保留，
+    连接、解析结果和进程池不需要每次重新建立。可以在多个线程中同时提取不同的活动
+    """
+
+    def __init__(self, config: Optional[SpineAutoConfig] = None, metrics: Optional[Metrics] = None,
+                 progress: Optional["Progress"] = None):
+        """
+        :param config: 提取的设置，不传时使用全局变量
+        :param metrics: 所有提取共用的性能数据，下载和Spine的数据总是记录在这里
+        :param progress: 共用的进度条，由调用者负责启动和停止，不传时不显示
+        """
+        self.config = config or SpineAutoConfig()
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.progress = progress if progress is not None else create_progress(disable=True)
+        self.downloader = Downloader(headers=self.config.headers, workers=self.config.download_workers,
+                                     metrics=self.metrics,
+                                     state_path=os.path.join(self.config.cache_dir, DOWNLOAD_STATE_NAME))
+        self.spine_pool = SpineWorkerPool(self.config.spine_com_file, self.config.proxy, self.config.spine_workers,
+                                          self.config.native_unpack, self.metrics)
+        self.store = AssetStore(self.config.cache_dir)
+        self.http_cache = HttpCache(self.config.cache_dir, self.config.parsed_memory_entries)
+        self.catalog = Catalog(default_catalog_path(self.config.cache_dir))
+
+    def extract(self, url: str, force: bool = False, metrics: Optional[Metrics] = None) -> EventResult:
+        """
+        提取一个先行展示页
+        :param url: 页面URL
+        :param force: 忽略缓存，清空已有的文件后重新生成
+        :param metrics: 这次提取的各阶段耗时，不传时记录在共用的性能数据中
+        :return: 处理结果
+        """
+        return parser_index_page(url, force=force, downloader=self.downloader, spine_pool=self.spine_pool,
+                                 store=self.store, http_cache=self.http_cache, progress=self.progress,
+                                 metrics=metrics if metrics is not None else self.metrics, catalog=self.catalog,
+                                 config=self.config)
+
+    def save(self):
+        """
+        清理过期的缓存并保存缓存的索引和下载的校验记录，长时间运行时可以定期调用
+        """
+        self.store.evict(self.config.cache_max_size, self.config.cache_max_age)
+        self.store.save()
+        self.downloader.state.save()
+
+    def close(self):
+        self.save()
+        self.catalog.close()
+        self.downloader.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def _parser_index_page(main_index_url: str, config: SpineAutoConfig, force: bool, downloader: Downloader,
+                       spine_pool: SpineWorkerPool, store: AssetStore, http_cache: HttpCache, catalog: Catalog,
+                       progress: "Progress", metrics: Metrics, start_time: float) -> EventResult:
+    # 获取页面 -> 边下载边解析vendors.js -> 保存base64图片
+    # 解析出的每个项目：写入atlas、json -> 下载图片 -> 解开图片 -> 生成项目，与上面的步骤同时进行
+    main_progress_bar_task_id = progress.add_task("获取页面中...", total=4)
     main_index_url_parser = url_parser(main_index_url)
 
-    bs = BeautifulSoup(get(main_index_url, headers=headers).content.decode('utf-8'), features='lxml')
-    index_head = bs.find("head")
-    main_name = index_head.find("title").text
-    vendors_js_url = None
-    rm_default_create(main_name)
-    os.chdir(main_name)
-    progress.update(main_progress_bar_task_id, completed=1, description="获取vendors.js中...")
-    for script_ele in bs.find_all("script"):
-        try:
-            src_url = script_ele['src']
-        except KeyError:
-            ...
-        else:
-            if "vendors" in src_url:
-                vendors_js_url = src_url
-                break
-    if vendors_js_url is None:
-        print("找不到vendors.js")
-        exit(-1)
-    with open("vendors.js", "wb") as vendors_js_fp:
-        vendors_js_binary = get(abs_url(vendors_js_url, main_index_url_parser), headers=headers).content
-        vendors_js_fp.write(vendors_js_binary)
-    vendors_js_content = vendors_js_binary.decode("utf-8")
-    vendors_js_lines = vendors_js_content.splitlines()
-    vendors_js_content = "".join(vendors_js_lines[1:len(vendors_js_lines)])
-    double = get_all_string(vendors_js_content)
-    vendors_js_length = len(vendors_js_content)
-    progress.update(main_progress_bar_task_id, completed=2, description="获取Atlas、JSON、图片中...")
-    parser_vendors_js_progress_task_id = progress.add_task(description="解析vendors.js...")
-    projects = []
-    # Atlas解析、JSON解析
-    for i in progress.track(double, task_id=parser_vendors_js_progress_task_id):
-        if ".png" in i and not i.startswith("http") and not i.startswith("images/"):
-            atlas = parser_atlas(i)
-            # 计算json所在位置
-            json_start_index = vendors_js_content.find(i) + len(i) + 37
-            json_content = ""
-            for json_index in range(json_start_index, vendors_js_length):
-                s = vendors_js_content[json_index]
-                if s == "'":
-                    break
-                json_content += s
-            atlas.original_json = json.loads(json_content)
-            atlas.original_json['skeleton']['images'] = "./images"
-            regions = []
-            for page in atlas.pages:
-                for region in page.regions:
-                    regions.append(region)
-                page_name = page.name
-                # 计算page图片所在位置
-                try:
-                    page_img_md5 = re.findall(f"images/{page_name}.(.*?)..png", vendors_js_content)[0]
-                except IndexError:
-                    print(f"{atlas.get_name()} 缺少 {page_name}.png")
+    with metrics.stage("index"):
+        index_html = read_body(http_cache.fetch(downloader, main_index_url, force=force))
+        # 只需要标题和script的地址，不建立文档树
+        index_head = scan_head(index_html)
+    main_name = index_head.title
+    if main_name is None:
+        progress.remove_task(main_progress_bar_task_id)
+        raise SpineAutoError("找不到页面标题")
+    progress.update(main_progress_bar_task_id, completed=1, description=f"{main_name}：获取vendors.js中...")
+    # Spine资源可能在vendors.js、入口脚本或按需加载的分块中，页面中的所有脚本都要扫描
+    script_urls = list(dict.fromkeys(urljoin(main_index_url, src_url) for src_url in index_head.scripts))
+    if not script_urls:
+        progress.remove_task(main_progress_bar_task_id)
+        raise SpineAutoError("找不到vendors.js")
+    archive: Optional[ArchiveWriter] = None
+    if config.output_format in ARCHIVE_FORMATS:
+        # 输出到归档：Spine只能处理磁盘上的文件，每个项目先在临时文件夹中生成，完成后写入归档并删除
+        event_dir = os.path.join(config.output_root, f".{main_name}.partial")
+        archive = ArchiveWriter(archive_path(config.output_root, main_name, config.output_format),
+                                config.output_format)
+    else:
+        event_dir = os.path.join(config.output_root, main_name)
+    prepare_dir(event_dir, force)
+    base64_images_dir = os.path.join(event_dir, "base64Images")
+    if archive is None:
+        prepare_dir(base64_images_dir, force)
+    projects: list[AtlasContent] = []
+    skeleton_contents: list[Optional[bytes]] = []
+    spine_versions: list[str] = []
+    attachment_names: list[set[str]] = []  # 每个项目的骨骼用到的区域
+    page_img_md5s: dict[str, str] = {}
+    unresolved: list[int] = []  # 还缺少页面图片地址的项目
+    pending_pages: dict[int, int] = {}  # 项目 -> 还没有下载完成的页面数
+    spine_reports: dict[int, SpineReport] = {}
+    preflight_reports: dict[int, PreflightReport] = {}
+    download_failures = 0
+    spine_failures = 0
+    state_lock = threading.Lock()
+    straight_alpha = config.straight_alpha and PAGE_ALPHA_AVAILABLE
+
+    def asset_path(path: str) -> str:
+        # 资源目录中记录的路径，输出到归档时为归档中的成员
+        if archive is None:
+            return path
+        return member_path(archive.path, os.path.relpath(path, event_dir).replace(os.sep, "/"))
+
+    def write_project(index: int):
+        # 写入atlas、JSON，页面图片命中缓存时直接恢复，否则交给下载阶段
+        project = projects[index]
+        project_name = project.get_name()
+        project_dir = os.path.join(event_dir, project_name)
+        download_jobs = []
+        with metrics.stage("write"):
+            prepare_dir(project_dir, force)
+            for page in project.pages:
+                if page.img is None:
+                    continue
+                page_path = os.path.join(project_dir, f"{page.name}.png")
+                # 图片url中带有内容hash，命中缓存时不需要再下载
+                page_digest = None if force else store.lookup_url(page.img)
+                if page_digest is None:
+                    # 已经存在且校验通过的图片不会重新下载，中断的下载从.part继续
+                    download_jobs.append(DownloadJob(page.img, page_path,
+                                                     embedded_hash(page.img) if config.verify_downloads else None))
                 else:
-                    page.img = abs_url(f"images/{page_name}.{page_img_md5}..png", main_index_url_parser)
-            projects.append(atlas)
-    progress.remove_task(parser_vendors_js_progress_task_id)
-    progress.update(main_progress_bar_task_id, completed=3, description="获取base64图片中...")
-    # base64解析
-    base64_images = get_all_image_base64(vendors_js_content)
-    progress.update(main_progress_bar_task_id, completed=4, description="下载图片中...")
-    download_image_progress_task_id = progress.add_task(description="下载...")
-    for project in progress.track(projects, task_id=download_image_progress_task_id):
+                    store.materialize(page_digest, page_path)
+                    metrics.count("page_cache_hits")
+                    catalog.add_asset(asset_path(page_path), page_digest, os.path.getsize(page_path), "page",
+                                      page.img, main_index_url, project_name)
+            files = [(f"{project_name}.atlas", project.original, "atlas"),
+                     (f"{project_name}.json", skeleton_contents[index], "json")]
+            if config.export_skel:
+                files.append((f"{project_name}.skel.bytes",
+                              _write_skel(metrics, project, os.path.join(project_dir, f"{project_name}.skel.bytes")),
+                              "skel"))
+            for file_name, content, kind in files:
+                if content is None:
+                    continue
+                if kind != "skel":
+                    _write_file(metrics, os.path.join(project_dir, file_name), content)
+                _catalog_content(catalog, asset_path(os.path.join(project_dir, file_name)), content, kind,
+                                 main_index_url, project_name)
+        catalog.add_skeleton(main_index_url, project_name, spine_versions[index], project.scale,
+                             [(page.name, region.name) for page in project.pages for region in page.regions])
+        skeleton_contents[index] = None
+        if not download_jobs:
+            spine_stage.put(index)
+            return
+        with state_lock:
+            pending_pages[index] = len(download_jobs)
+        for download_job in download_jobs:
+            download_stage.put((index, download_job))
+
+    def download_page(task: tuple[int, DownloadJob]):
+        # 一个项目的最后一页下载完成后，这个项目就可以开始解开图片
+        nonlocal download_failures
+        index, download_job = task
+        result = downloader.download(download_job)
+        if result.ok:
+            page_digest = store.add_file(result.job.path, result.job.url)
+            catalog.add_asset(asset_path(result.job.path), page_digest, os.path.getsize(result.job.path), "page",
+                              result.job.url, main_index_url, projects[index].get_name())
+        else:
+            print(f"下载失败 {result.job.url}：{result.error}")
+        with state_lock:
+            if not result.ok:
+                download_failures += 1
+            pending_pages[index] -= 1
+            ready = pending_pages[index] == 0
+        if ready:
+            spine_stage.put(index)
+
+    def run_spine(index: int):
+        try:
+            generate_project(index)
+        finally:
+            if archive is not None:
+                # 项目生成完成后写入归档，临时文件夹中同时只保留正在处理的项目
+                project_dir = os.path.join(event_dir, projects[index].get_name())
+                with metrics.stage("archive"):
+                    archive.write_tree(projects[index].get_name(), project_dir)
+                rmtree(project_dir, ignore_errors=True)
+
+    def straighten_pages(index: int, project_dir: str):
+        # 预乘透明度的页面转换为非预乘，atlas中的pma同时改为false，检查结果记录在资源目录中
+        project = projects[index]
         project_name = project.get_name()
-        progress.update(download_image_progress_task_id, description=f"正在下载{project_name}...")
-        download_page_image_task_id = progress.add_task(description="下载...")
-        rm_default_create(project_name)
-        for page in progress.track(project.pages, task_id=download_page_image_task_id):
-            if page.img is None:
-                continue
-            with open(os.path.join(project_name, f"{page.name}.png"), "wb") as fp:
-                fp.write(get(page.img).content)
-        progress.remove_task(download_page_image_task_id)
-        with open(os.path.join(project_name, f"{project_name}.atlas"), "w", encoding='utf-8') as fp:
-            fp.write(project.original)
-        with open(os.path.join(project_name, f"{project_name}.json"), "w", encoding='utf-8') as fp:
-            fp.write(json.dumps(project.original_json, ensure_ascii=False, indent=4))
-    progress.remove_task(download_image_progress_task_id)
-    progress.update(main_progress_bar_task_id, completed=5, description="保存base64图片中...")
-    rm_default_create("base64Images")
-    save_b64_image_progress_task_id = progress.add_task(description="保存...")
-    for img in progress.track(base64_images, task_id=save_b64_image_progress_task_id):
-        with open(os.path.join("base64Images", md5(img).hexdigest()[0:6] + ".png"), "wb") as fp:
-            fp.write(img)
-    progress.remove_task(save_b64_image_progress_task_id)
-    progress.update(main_progress_bar_task_id, completed=6, description="正在解开图片并生成项目...")
-    proxy_host, proxy_port = PROXY_HOST_PORT
-    unpack_create_project_progress_task_id = progress.add_task("解开图片并生成项目...")
-    for project in progress.track(projects, task_id=unpack_create_project_progress_task_id):
+        page_urls = {page.name: page.img for page in project.pages}
+        results = check_atlas(project, project_dir)
+        for result in results:
+            catalog.add_page(main_index_url, project_name, result.page, result.declared, result.premultiplied,
+                             result.converted)
+            if result.premultiplied is None:
+                metrics.count("pma_pages_inconclusive")
+            if result.converted:
+                metrics.count("pma_pages_converted")
+                page_path = os.path.join(project_dir, f"{result.page}.png")
+                catalog.add_asset(asset_path(page_path), store.digest(page_path), os.path.getsize(page_path), "page",
+                                  page_urls[result.page], main_index_url, project_name)
+        atlas_content = straight_atlas(project.original, results)
+        if atlas_content != project.original:
+            project.original = atlas_content
+            atlas_path = os.path.join(project_dir, f"{project_name}.atlas")
+            _write_file(metrics, atlas_path, atlas_content)
+            _catalog_content(catalog, asset_path(atlas_path), atlas_content, "atlas", main_index_url, project_name)
+
+    def generate_project(index: int):
+        nonlocal spine_failures
+        project = projects[index]
+        spine_version = spine_versions[index]
         project_name = project.get_name()
-        spine_version = parser_spine_version(project.original_json['skeleton']['spine'])
-        atlas_file = os.path.join(project_name, f"{project_name}.atlas")
-        json_file = os.path.join(project_name, f"{project_name}.json")
-        out_dir = os.path.join(project_name, "out")
-        rm_default_create(out_dir)
-        spine_project_file = os.path.join(out_dir, "project.spine")
-        images_path = os.path.join(out_dir, "images")
-        rm_default_create(images_path)
-        inner_task_id = progress.add_task(total=2, description="正在解开图片...")
-        subprocess.call(
-            [SPINE_COM_FILE, "-x", f"{proxy_host}:{proxy_port}", "-u", spine_version, "-i", project_name, '-o',
-             project_name,
-             '-c', atlas_file], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        project_dir = os.path.join(event_dir, project_name)
+        with metrics.stage("preflight"):
+            preflight = validate_project(project, attachment_names[index], project_dir)
+        with state_lock:
+            preflight_reports[index] = preflight
+        if not preflight.ok:
+            # 缺少页面或区域时生成的项目也不完整，不再调用Spine，下次运行时重新处理这个活动
+            print(f"{project_name} 预检失败，跳过生成：{preflight.summary()}，详见preflight_report.json")
+            catalog.set_spine_result(main_index_url, project_name, False)
+            metrics.count("preflight_failures")
+            with state_lock:
+                spine_failures += 1
+            return
+        if straight_alpha:
+            # 在计算Spine缓存的key之前，解开的区域图片也是非预乘的
+            with metrics.stage("page_alpha"):
+                straighten_pages(index, project_dir)
+        with metrics.stage("spine_cache"):
+            region_names = [region.name for page in project.pages for region in page.regions]
+            spine_project = SpineProject(project_name, project_dir, spine_version, project.scale, region_names,
+                                         project)
+            page_files = [os.path.join(project_dir, f"{page.name}.png") for page in project.pages]
+            # 两种解开图片的方式输出不完全相同，分开缓存
+            unpack_method = "native" if spine_pool.native_unpack else "spine"
+            key = spine_key(f"{spine_version}/{unpack_method}", project.scale,
+                            [spine_project.atlas_file, spine_project.json_file, *filter(os.path.isfile, page_files)],
+                            store.digest)
+            # 输入没有变化时直接从缓存恢复，不再调用Spine
+            outputs = None if force else store.lookup_spine(key)
+            if outputs is not None:
+                store.restore_spine(outputs, spine_project.out_dir)
+                metrics.count("spine_cache_hits")
+                catalog.set_spine_result(main_index_url, project_name, True)
+                return
+            rm_default_create(spine_project.out_dir)
+            rm_default_create(spine_project.images_path)
+        report = spine_pool.run_project(spine_project, progress)
+        catalog.set_spine_result(main_index_url, project_name, report.ok)
+        if report.ok:
+            store.add_spine(key, report.project.out_dir)
+        else:
+            print(f"{report.project.name} 生成失败，详见spine_report.json")
+        with state_lock:
+            spine_reports[index] = report
+            if not report.ok:
+                spine_failures += 1
+
+    # 写入 -> 下载 -> 解开图片并生成项目，每个项目的atlas、JSON和页面图片地址都找到后立即开始，各阶段同时进行
+    write_stage = PipelineStage("write_projects", write_project, progress=progress, description="写入项目...",
+                                metrics=metrics)
+    download_stage = PipelineStage("download", download_page, downloader.workers, progress=progress,
+                                   description="下载...", metrics=metrics)
+    spine_stage = PipelineStage("spine", run_spine, spine_pool.workers, progress=progress,
+                                description="解开图片并生成项目...", metrics=metrics)
+    pipeline_stages = (write_stage, download_stage, spine_stage)
+    # 这些设置会影响输出，变化后不能跳过已经处理过的活动
+    catalog_options = (f"minify={config.skeleton_minify},skel={config.export_skel},"
+                       f"unpack={'native' if spine_pool.native_unpack else 'spine'}")
+    if archive is not None:
+        catalog_options += f",output={config.output_format}"
+    if straight_alpha:
+        catalog_options += ",alpha=straight"
+    parser_vendors_js_progress_task_id = progress.add_task(description="解析vendors.js...", total=None)
+
+    def submit_project(index: int):
+        project = projects[index]
         for page in project.pages:
-            for region in page.regions:
+            # 计算page图片所在位置
+            try:
+                page_img_md5 = page_img_md5s[page.name]
+            except KeyError:
+                print(f"{project.get_name()} 缺少 {page.name}.png")
+            else:
+                page.img = abs_url(f"images/{page.name}.{page_img_md5}..png", main_index_url_parser)
+        write_stage.put(index)
+
+    def pages_known(index: int) -> bool:
+        return all(page.name in page_img_md5s for page in projects[index].pages)
+
+    def add_project(atlas: AtlasContent, skeleton: tuple[NormalizedSkeleton, set[str]]):
+        # atlas和骨骼JSON配对成功
+        atlas.original_json = skeleton[0].data
+        projects.append(atlas)
+        skeleton_contents.append(skeleton[0].content)
+        spine_versions.append(skeleton[0].spine_version)
+        attachment_names.append(skeleton[1])
+        progress.update(parser_vendors_js_progress_task_id, advance=1)
+        if pages_known(len(projects) - 1):
+            submit_project(len(projects) - 1)
+        else:
+            unresolved.append(len(projects) - 1)
+
+    # 按webpack模块配对atlas和骨骼JSON，骨骼用到的区域都要在atlas中
+    resolver = SpineAssetResolver(lambda atlas, skeleton: skeleton[1].issubset(atlas.regions), add_project)
+
+    def parse_event(script_url: str, event: VendorsEvent):
+        # Atlas解析、JSON解析，配对交给resolver
+        if event.type is VendorsEventType.MODULE:
+            resolver.add_module(script_url, event.module, event.value)
+        elif event.type is VendorsEventType.ATLAS:
+            resolver.add_atlas(script_url, event.module, parser_atlas(event.value))
+        elif event.type is VendorsEventType.SKELETON_JSON:
+            if '"bones"' not in event.value:
+                # 其他JSON.parse('...')，不是骨骼
+                return
+            with metrics.stage("skeleton_json"):
                 try:
-                    os.rename(os.path.join(project_name, f"{region.name}.png"), os.path.join(images_path, f"{region.name}.png"))
-                except FileNotFoundError:
-                    ...
-        progress.update(task_id=inner_task_id, completed=1, description="正在创建项目...")
-        subprocess.call(
-            [SPINE_COM_FILE, "-x", f"{proxy_host}:{proxy_port}", "-u", spine_version, "-i", project_name, '-o',
-             spine_project_file, '-s', str(project.scale), '-r', json_file], stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL)
-        progress.update(task_id=inner_task_id, completed=2, description="完成...")
-        progress.remove_task(inner_task_id)
-    progress.remove_task(unpack_create_project_progress_task_id)
-    progress.update(main_progress_bar_task_id, completed=7, description="完成...")
-    progress.stop()
+                    skeleton = normalize_skeleton(event.value, minify=config.skeleton_minify)
+                except ValueError:
+                    return
+            resolver.add_skeleton(script_url, event.module, (skeleton, skeleton_attachments(skeleton.data)))
+        elif event.type is VendorsEventType.IMAGE_REF:
+            page_name, page_img_md5 = IMAGE_REF_RE.match(event.value).groups()
+            if page_name in page_img_md5s:
+                return
+            page_img_md5s[page_name] = page_img_md5
+            for index in [index for index in unresolved if pages_known(index)]:
+                unresolved.remove(index)
+                submit_project(index)
+
+    base64_contents = []
+    base64_count = 0
+    # 多个分块同时下载和扫描，解析结果的处理需要加锁
+    parse_lock = threading.Lock()
+
+    def save_base64_image(img: bytes):
+        img_path = os.path.join(base64_images_dir, md5(img).hexdigest()[0:6] + ".png")
+        if archive is None:
+            _write_file(metrics, img_path, img)
+        else:
+            archive.write(f"base64Images/{os.path.basename(img_path)}", img)
+        _catalog_content(catalog, asset_path(img_path), img, "base64", main_index_url)
+
+    def on_data_uri(content: bytes):
+        nonlocal base64_count
+        base64_count += 1
+        if not config.low_memory:
+            base64_contents.append(content)
+            return
+        # 低内存模式：解码后立即保存，不保留base64和图片
+        with metrics.stage("base64"):
+            img = binascii.a2b_base64(content)
+        with metrics.stage("write"):
+            save_base64_image(img)
+
+    def on_events(script_url: str, events: list[VendorsEvent], script_events: list[VendorsEvent]):
+        with parse_lock:
+            for event in events:
+                if event.type is VendorsEventType.DATA_URI:
+                    on_data_uri(event.value)
+                    # 只保留位置和长度，内容已经交给on_data_uri
+                    event = event._replace(value=len(event.value))
+                else:
+                    with metrics.stage("parse"):
+                        parse_event(script_url, event)
+                script_events.append(event)
+
+    def scan_file(script_url: str, script: CachedResponse):
+        # 命中缓存的脚本：使用上次的解析结果，内联图片从映射的文件中按位置读取；没有解析结果时重新扫描
+        cached_events = http_cache.load_parsed(script.digest, "vendors")
+        if cached_events is None:
+            scanner = VendorsScanner(skip_first_line=_is_vendors(script_url))
+            script_events = []
+            with open(script.path, "rb") as script_fp:
+                for chunk in iter(lambda: script_fp.read(VENDORS_CHUNK_SIZE), b""):
+                    with metrics.stage("scan_vendors"):
+                        events = scanner.feed(chunk)
+                    on_events(script_url, events, script_events)
+            on_events(script_url, scanner.close(), script_events)
+            http_cache.save_parsed(script.digest, "vendors", dump_events(script_events))
+            return
+        script_buffer = map_file(script.path)
+        try:
+            with parse_lock:
+                for event in load_events(cached_events):
+                    if event.type is VendorsEventType.DATA_URI:
+                        on_data_uri(data_uri_content(script_buffer, event))
+                    else:
+                        with metrics.stage("parse"):
+                            parse_event(script_url, event)
+        finally:
+            if not isinstance(script_buffer, bytes):
+                script_buffer.close()
+
+    def fetch_script(script_url: str) -> tuple[CachedResponse, list[str]]:
+        # 边下载边扫描，每个脚本只遍历一次；命中缓存的脚本在全部获取完之后再处理
+        scanner = VendorsScanner(skip_first_line=_is_vendors(script_url))
+        script_events = []
+
+        def scan_chunk(chunk: bytes):
+            with metrics.stage("scan_vendors"):
+                events = scanner.feed(chunk)
+            on_events(script_url, events, script_events)
+
+        script = http_cache.fetch(downloader, script_url, on_chunk=scan_chunk, force=force)
+        if not script.from_cache:
+            on_events(script_url, scanner.close(), script_events)
+            http_cache.save_parsed(script.digest, "vendors", dump_events(script_events))
+        # webpack运行时中记录了按需加载的分块
+        script_buffer = map_file(script.path)
+        try:
+            chunk_paths = chunk_script_paths(script_buffer)
+        finally:
+            if not isinstance(script_buffer, bytes):
+                script_buffer.close()
+        return script, [urljoin(main_index_url, chunk_path) for chunk_path in chunk_paths]
+
+    try:
+        with metrics.stage("vendors"):
+            scripts: dict[str, CachedResponse] = {}
+            # 同时获取页面中的脚本和其中引用的分块，新发现的分块立即加入
+            with ThreadPoolExecutor(downloader.workers) as executor:
+                fetching = {executor.submit(fetch_script, script_url): script_url for script_url in script_urls}
+                seen = set(script_urls)
+                while fetching:
+                    done, _ = wait(fetching, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        script_url = fetching.pop(future)
+                        try:
+                            script, chunk_urls = future.result()
+                        except Exception as e:
+                            if _is_vendors(script_url):
+                                raise
+                            # 其他脚本（统计代码等）获取失败不影响提取
+                            print(f"获取脚本失败 {script_url}：{e}")
+                            continue
+                        scripts[script_url] = script
+                        for chunk_url in chunk_urls:
+                            if chunk_url not in seen:
+                                seen.add(chunk_url)
+                                fetching[executor.submit(fetch_script, chunk_url)] = chunk_url
+            scripts_digest = _scripts_digest(scripts)
+            if all(script.from_cache for script in scripts.values()) and \
+                    catalog.event_up_to_date(main_index_url, scripts_digest, catalog_options):
+                # 所有脚本和设置都没有变化，上次的输出完整，整个活动都不需要再处理
+                abort_stages(pipeline_stages)
+                # 扫描过程中已经缓存的记录与已有的记录相同，不再写入
+                catalog.discard_event(main_index_url)
+                if archive is not None:
+                    archive.abort()
+                    rmtree(event_dir, ignore_errors=True)
+                progress.remove_task(parser_vendors_js_progress_task_id)
+                progress.update(main_progress_bar_task_id, completed=4, description=f"{main_name}：已是最新...")
+                metrics.count("events_up_to_date")
+                return EventResult(main_index_url, main_name, catalog.event(main_index_url)[5], 0, 0,
+                                   time.perf_counter() - start_time, None)
+            catalog.reset_event(main_index_url)
+            # 重新下载的脚本已经边下载边解析过了
+            for script_url, script in sorted(scripts.items()):
+                if script.from_cache:
+                    scan_file(script_url, script)
+            metrics.count("scripts", len(scripts))
+            vendors_js_url = next((script_url for script_url in sorted(scripts) if _is_vendors(script_url)), None)
+            if vendors_js_url is not None:
+                vendors_js = scripts[vendors_js_url]
+                vendors_js_path = os.path.join(event_dir, "vendors.js")
+                if archive is not None:
+                    archive.write_file("vendors.js", vendors_js.path)
+                elif not os.path.isfile(vendors_js_path) or store.digest(vendors_js_path) != vendors_js.digest:
+                    shutil.copyfile(vendors_js.path, vendors_js_path)
+                catalog.add_asset(asset_path(vendors_js_path), vendors_js.digest, os.path.getsize(vendors_js.path),
+                                  "vendors", vendors_js.url, main_index_url)
+        # 按引用关系和内容配对剩下的atlas和骨骼JSON
+        atlases, _ = resolver.finish()
+        for atlas in atlases:
+            print(f"{atlas.get_name()} 找不到完整的json文本")
+        # 到最后也没有找到全部页面图片的项目，缺少的页面跳过
+        for index in unresolved:
+            submit_project(index)
+        unresolved.clear()
+        metrics.count("projects", len(projects))
+        progress.remove_task(parser_vendors_js_progress_task_id)
+        progress.update(main_progress_bar_task_id, completed=2, description=f"{main_name}：保存base64图片中...")
+        # base64解析，此时前面的项目已经在下载、生成中
+        with metrics.stage("base64"):
+            base64_images = decode_base64_batch(base64_contents)
+        base64_contents.clear()
+        metrics.count("base64_images", base64_count)
+        save_b64_image_progress_task_id = progress.add_task(description="保存...")
+        with metrics.stage("write"):
+            for img in progress.track(base64_images, task_id=save_b64_image_progress_task_id):
+                save_base64_image(img)
+        base64_images.clear()
+        progress.remove_task(save_b64_image_progress_task_id)
+        progress.update(main_progress_bar_task_id, completed=3, description=f"{main_name}：下载图片并生成项目中...")
+        # 上游的阶段结束后，下游不会再有新的任务
+        for stage in pipeline_stages:
+            stage.join()
+        report_path = os.path.join(event_dir, "spine_report.json")
+        save_report([spine_reports[index] for index in sorted(spine_reports)], report_path)
+        preflight_path = os.path.join(event_dir, "preflight_report.json")
+        save_preflight_report([preflight_reports[index] for index in sorted(preflight_reports)], preflight_path)
+        if archive is not None:
+            with metrics.stage("archive"):
+                archive.write_file("spine_report.json", report_path)
+                archive.write_file("preflight_report.json", preflight_path)
+                archive.close()
+            rmtree(event_dir, ignore_errors=True)
+    except BaseException:
+        # 等待工作线程退出后再中止归档，不会有线程在归档关闭之后继续写入
+        abort_stages(pipeline_stages)
+        # 没有完成的活动不写入记录，已有的记录保持不变，下次运行时重新处理
+        catalog.discard_event(main_index_url)
+        if archive is not None:
+            archive.abort()
+        raise
+    metrics.count("download_failures", download_failures)
+    metrics.count("spine_failures", spine_failures)
+    catalog.add_event(main_index_url, main_name, event_dir if archive is None else archive.path, scripts_digest,
+                      catalog_options, len(projects))
+    with metrics.stage("catalog"):
+        # 共用资源目录时只写入这个活动的记录，其他活动还在扫描中缓存的记录不受影响
+        catalog.flush(main_index_url)
+    progress.update(main_progress_bar_task_id, completed=4, description=f"{main_name}：完成...")
+    return EventResult(main_index_url, main_name, len(projects), download_failures, spine_failures,
+                       time.perf_counter() - start_time, None)
+
+
+def _is_vendors(script_url: str) -> bool:
+    return "vendors" in script_url.rsplit("/", 1)[-1]
+
+
+def _scripts_digest(scripts: dict[str, CachedResponse]) -> str:
+    # 只有一个脚本时与之前只记录vendors.js的目录兼容
+    if len(scripts) == 1:
+        return next(iter(scripts.values())).digest
+    return sha256("\n".join(f"{script_url} {scripts[script_url].digest}"
+                             for script_url in sorted(scripts)).encode("utf-8")).hexdigest()
+
+
+def _write_file(metrics: Metrics, path: str, content: bytes | str):
+    if write_if_changed(path, content):
+        metrics.count("files_written")
+        metrics.count("written_bytes", len(content.encode("utf-8") if isinstance(content, str) else content))
+
+
+def _write_skel(metrics: Metrics, project: AtlasContent, path: str) -> Optional[bytes]:
+    with metrics.stage("skeleton_binary"):
+        try:
+            content = export_skeleton(project.original_json)
+        except SkeletonBinaryError as e:
+            metrics.count("skel_failures")
+            print(f"{project.get_name()} 无法导出.skel：{e}")
+            return None
+    _write_file(metrics, path, content)
+    return content
+
+
+def _catalog_content(catalog: Catalog, path: str, content: bytes | str, kind: str, event_url: str,
+                     skeleton: Optional[str] = None):
+    # 内容已经在内存中，直接计算hash，不需要再读文件
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    catalog.add_asset(path, sha256(content).hexdigest(), len(content), kind, None, event_url, skeleton)
 
 
 if __name__ == "__main__":
     # parser_index_page("https://act.mihoyo.com/ys/event/e20230805preview/index.html")
-    parser_index_page(input("请输入页面URL："))
+    arg_parser = argparse.ArgumentParser(description="提取miHoYo先行展示页中的Spine项目")
+    arg_parser.add_argument("url", nargs="?", help="页面URL，不填时运行后输入")
+    arg_parser.add_argument("--force", action="store_true", help="忽略缓存，清空已有的文件后重新生成")
+    arg_parser.add_argument("--low-memory", action="store_true", default=LOW_MEMORY,
+                            help="低内存模式，内联图片边扫描边保存，适合很大的vendors.js")
+    arg_parser.add_argument("--cache-dir", default=CACHE_DIR, help="缓存目录")
+    arg_parser.add_argument("--cache-max-size", type=int, default=DEFAULT_MAX_SIZE >> 20, help="缓存的最大体积（MB）")
+    arg_parser.add_argument("--cache-max-age", type=float, default=DEFAULT_MAX_AGE / 86400,
+                            help="多久没有用到的缓存会被清理（天）")
+    arg_parser.add_argument("--output-format", choices=OUTPUT_FORMATS, default=OUTPUT_FORMAT,
+                            help="输出格式：dir为文件夹，zip、tar、tar.zst为每个活动一个归档")
+    add_metrics_arguments(arg_parser)
+    args = arg_parser.parse_args()
+    main_metrics = Metrics(profile=args.profile is not None)
+    try:
+        parser_index_page(args.url or input("请输入页面URL："), force=args.force, cache_dir=args.cache_dir,
+                          cache_max_size=args.cache_max_size << 20, cache_max_age=args.cache_max_age * 86400,
+                          metrics=main_metrics, low_memory=args.low_memory, output_format=args.output_format)
+    except SpineAutoError as e:
+        print(e)
+        exit(-1)
+    finally:
+        main_metrics.save(args.metrics, args.prometheus, args.profile)
@@ -4,9 +4,10 @@ import os  # 导入os模块，用于操作文件和目录
 import re  # 导入re模块，用于正则表达式匹配
 import shutil  # 导入shutil模块，用于文件操作
 import bs4  # 导入bs4库，用于HTML解析
-import requests  # 导入requests库，用于发送HTTP请求
 from rich.progress import track  # 导入rich库中的进度条组件
 import subprocess  # 导入subprocess模块，用于执行外部命令
+from atlas import parse_atlas  # 导入atlas解析
+from downloader import Downloader, DownloadJob  # 导入并发下载器
 
 SPINE_COM_FILE = r"D:\Program Files\Spine\spine.com"  # Spine软件的路径
 PROXY_HOST_PORT = ("127.0.0.1", 7890)  # 代理服务器的主机和端口配置
@@ -42,24 +43,12 @@ def generator_spine_project(project_dir: str):
     with open(atlas_file, "r", encoding="utf-8") as fp_atlas_file:
         content = fp_atlas_file.read()  # 读取.atlas文件的内容
 
-    part_name = ""  # 初始化部分名称变量
-    part = {}  # 初始化部分数据字典
-    scale = None  # 初始化缩放比例变量
-    content_split = content.split("\n")  # 按行分割内容
-    png_file_name = content_split[0].replace(".png", "")  # 获取图片文件名
-    for line in content_split:
-        if ":" in line:
-            line_sp = line.replace("\t", "").replace(": ", ":").split(":")  # 分割键值对
-            key, value = tuple(line_sp)
-            part[part_name][key] = value
-            if key == "scale":
-                scale = float(value)  # 如果键是"scale"，设置缩放比例
-        else:
-            part_name = line
-            part[part_name] = {}  # 以部分名称创建子字典
-    if scale is None:
+    atlas = parse_atlas(content)  # 解析atlas
+    region_names = set(atlas.regions)  # 所有区域的名称
+    png_file_name = atlas.get_name()  # 获取图片文件名
+    scale = atlas.scale  # 缩放比例
+    if all(page.scale is None for page in atlas.pages):
         print("\t找不到scale，使用默认值1.0")  # 如果缩放比例未找到，输出提示并使用默认值
-        scale = 1.0
 
     with open(json_file, "r", encoding='utf-8') as fp_atlas_file:
         json_content = json.loads(fp_atlas_file.read())  # 读取.json文件的内容并解析为JSON
@@ -77,7 +66,7 @@ def generator_spine_project(project_dir: str):
                     stderr=subprocess.DEVNULL)  # 调用Spine命令行工具生成Spine项目文件
 
     for file in os.listdir(project_dir):
-        if file.replace(".png", "") in part.keys():
+        if file.replace(".png", "") in region_names:
             os.rename(os.path.join(project_dir, file), os.path.join(images_dir, file))  # 移动图片文件到图片目录
 
 
@@ -91,13 +80,14 @@ UA = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like
       "Safari/537.36 Edg/119.0.0.0")  # 用户代理字符串
 
 default_headers = {"user-agent": UA}  # 默认HTTP请求头
+downloader = Downloader(headers=default_headers)  # 复用连接的下载器
 
 main_index_url = input("请输入页面URL：")
 
 # main_index_url = "https://act.mihoyo.com/ys/event/e20230624preview/index.html"  # 主页面的URL
 
 page_url = main_index_url.replace(BASE_URL, "").replace("index.html", "")  # 页面URL路径
-main_index_html = requests.get(main_index_url, headers=default_headers).content.decode(
+main_index_html = downloader.get(main_index_url).content.decode(
     "utf-8")  # 发送HTTP请求获取主页面内容并解码为UTF-8
 
 bs = bs4.BeautifulSoup(main_index_html, features='lxml')  # 使用BeautifulSoup解析HTML
@@ -129,7 +119,7 @@ if vendors_js_url is None:
 
 # 下载vendors.js文件并保存到本地
 with open(os.path.join(title, "vendors.js"), "wb") as fp:
-    vendors_js_content = requests.get(vendors_js_url).content
+    vendors_js_content = downloader.get(vendors_js_url).content
     fp.write(vendors_js_content)
 
 # 将vendors.js文件内容解码为UTF-8，并按行拆分
@@ -205,10 +195,9 @@ for k, v in track(datas.items(), description="下载中并处理中..."):
         data = json.loads(j)
         data['skeleton']['images'] = "./images/"
         fp.write(json.dumps(data, ensure_ascii=False, indent=4))
-    for name, url in i.items():
-        img_path = os.path.join(save_path, f"{name}.png")
-
-        # 下载并保存图片
-        with open(img_path, "wb") as fp:
-            fp.write(requests.get(url).content)
+    # 并发下载并保存图片
+    download_jobs = [DownloadJob(url, os.path.join(save_path, f"{name}.png")) for name, url in i.items()]
+    for result in downloader.download_all(download_jobs):
+        if not result.ok:
+            print(f"下载失败 {result.job.url}：{result.error}")
     generator_spine_project(save_path)
@@ -0,0 +1,321 @@
+import hashlib
+import json
+import os
+import struct
+import tarfile
+import threading
+import time
+import zipfile
+from typing import Optional
+
+try:
+    import zstandard
+except ImportError:  # 没有安装zstandard时不能输出tar.zst
+    zstandard = None
+
+# 输出格式 -> 归档的扩展名，dir为原来的文件夹结构
+ARCHIVE_FORMATS = {"zip": ".zip", "tar": ".tar", "tar.zst": ".tar.zst"}
+OUTPUT_FORMATS = ("dir", *ARCHIVE_FORMATS)
+INDEX_NAME = "index.json"  # 归档中的索引成员：成员名 -> 位置、大小和sha256
+INDEX_VERSION = 1
+LOCATOR_NAME = "index.offset"  # tar的最后一个成员，记录索引的位置，固定占用1024字节
+MEMBER_SEPARATOR = "::"  # 资源目录中归档成员的路径：归档路径::成员名
+ZSTD_LEVEL = 3
+ZSTD_SKIPPABLE_MAGIC = 0x184D2A50  # zstd的可跳过帧，解压时忽略，用来记录索引帧的位置
+STORED_EXTENSIONS = (".png", ".jpg", ".mp3", ".zip")  # 已经压缩过的文件在zip中不再压缩
+COPY_SIZE = 1 << 20
+
+_BLOCK = tarfile.BLOCKSIZE
+_SKIPPABLE = struct.Struct("<IIQQ")  # magic、帧内容长度、索引帧的偏移、索引帧的长度
+# ustar头：name、mode、uid、gid、size、mtime、chksum、typeflag、linkname、magic、version，其余字段为空
+_USTAR = struct.Struct("100s8s8s8s12s12s8sc100s6s2s247x")
+_USTAR_MAX_SIZE = 8 ** 11  # size字段为11位八进制数
+
+
+def archive_format(path: str) -> str:
+    """
+    根据扩展名判断归档格式
+    :param path: 归档路径
+    :return: zip/tar/tar.zst
+    """
+    for output_format, extension in sorted(ARCHIVE_FORMATS.items(), key=lambda item: -len(item[1])):
+        if path.endswith(extension):
+            return output_format
+    raise ValueError(f"无法识别的归档格式：{path}，支持{'、'.join(ARCHIVE_FORMATS.values())}")
+
+
+def archive_path(root: str, name: str, output_format: str) -> str:
+    """
+    :param root: 输出目录
+    :param name: 归档名称（不含扩展名）
+    :param output_format: 归档格式
+    :return: 归档路径
+    """
+    return os.path.join(root, name + ARCHIVE_FORMATS[output_format])
+
+
+def member_path(archive: str, member: str) -> str:
+    """
+    :param archive: 归档路径
+    :param member: 成员名
+    :return: 资源目录中记录的路径
+    """
+    return f"{os.path.abspath(archive)}{MEMBER_SEPARATOR}{member}"
+
+
+def split_member_path(path: str) -> Optional[tuple[str, str]]:
+    """
+    member_path的逆操作
+    :param path: 资源目录中记录的路径
+    :return: (归档路径, 成员名)，不是归档成员时返回None
+    """
+    archive, separator, member = path.partition(MEMBER_SEPARATOR)
+    return (archive, member) if separator else None
+
+
+class ArchiveWriter:
+    """
+    流式写入zip、tar或tar.zst归档，每个成员写入后立即落盘，不在内存中保留。
+    关闭时写入索引成员index.json（成员名 -> 数据的偏移、大小和sha256），读取单个成员时不需要扫描整个归档：
+    zip使用自身的中央目录；tar的最后一个成员index.offset记录索引的位置；
+    tar.zst中每个成员单独压缩为一个zstd帧，末尾的可跳过帧记录索引帧的位置，可以直接跳到某个成员的帧解压。
+    先写入.part文件，关闭时才替换为目标文件；可以在多个线程中同时写入
+    """
+
+    def __init__(self, path: str, output_format: Optional[str] = None, level: int = ZSTD_LEVEL):
+        """
+        :param path: 归档路径
+        :param output_format: 归档格式，不传时根据扩展名判断
+        :param level: tar.zst的压缩等级
+        """
+        self.path = path
+        self.format = output_format or archive_format(path)
+        if self.format not in ARCHIVE_FORMATS:
+            raise ValueError(f"不支持的归档格式：{self.format}")
+        if self.format == "tar.zst" and zstandard is None:
+            raise RuntimeError("输出tar.zst需要安装zstandard（pip install zstandard）")
+        self.members: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._fp = open(path + ".part", "wb")
+        self._zip = zipfile.ZipFile(self._fp, "w") if self.format == "zip" else None
+        self._compressor = zstandard.ZstdCompressor(level=level) if self.format == "tar.zst" else None
+        self._position = 0  # tar流（解压后）当前的偏移
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.members
+
+    def write(self, name: str, content: bytes | str):
+        """
+        写入一个成员，同名的成员只写入一次
+        :param name: 成员名，使用/分隔
+        :param content: 内容
+        """
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        self._write(name, len(content), lambda: iter((content,)), time.time())
+
+    def write_file(self, name: str, path: str):
+        """
+        把文件写入归档，按块复制
+        :param name: 成员名，使用/分隔
+        :param path: 文件路径
+        """
+        stat = os.stat(path)
+
+        def chunks():
+            with open(path, "rb") as fp:
+                yield from iter(lambda: fp.read(COPY_SIZE), b"")
+
+        self._write(name, stat.st_size, chunks, stat.st_mtime)
+
+    def write_tree(self, prefix: str, root: str):
+        """
+        把文件夹中的所有文件写入归档
+        :param prefix: 成员名的前缀，如项目名称
+        :param root: 文件夹路径
+        """
+        for dir_path, dir_names, file_names in os.walk(root):
+            dir_names.sort()
+            relative = os.path.relpath(dir_path, root).replace(os.sep, "/")
+            for file_name in sorted(file_names):
+                if file_name.endswith((".part", ".tmp")):
+                    continue
+                parts = [part for part in (prefix, relative, file_name) if part and part != "."]
+                self.write_file("/".join(parts), os.path.join(dir_path, file_name))
+
+    def _write(self, name: str, size: int, chunks, mtime: float):
+        with self._lock:
+            if self._fp is None:
+                raise ValueError("归档已经关闭")
+            if name in self.members:
+                return
+            sha = hashlib.sha256()
+            if self._zip is not None:
+                info = zipfile.ZipInfo(name, time.localtime(mtime)[:6])
+                info.compress_type = zipfile.ZIP_STORED if name.lower().endswith(STORED_EXTENSIONS) \
+                    else zipfile.ZIP_DEFLATED
+                info.file_size = size
+                with self._zip.open(info, "w", force_zip64=size >= zipfile.ZIP64_LIMIT) as member:
+                    for chunk in chunks():
+                        sha.update(chunk)
+                        member.write(chunk)
+                entry = {"offset": info.header_offset, "size": size}
+            else:
+                entry = self._write_tar(name, size, chunks, mtime, sha)
+            entry["sha256"] = sha.hexdigest()
+            self.members[name] = entry
+
+    def _write_tar(self, name: str, size: int, chunks, mtime: float, sha) -> dict:
+        header = _tar_header(name, size, int(mtime))
+        entry = {"offset": self._position + len(header), "size": size, "header": len(header)}
+        frame_start = self._fp.tell()
+        # tar.zst中每个成员是一个独立的帧
+        compressor = self._compressor.compressobj(size=len(header) + size + (-size) % _BLOCK) \
+            if self._compressor is not None else None
+        write = self._fp.write if compressor is None else lambda data: self._fp.write(compressor.compress(data))
+        write(header)
+        written = 0
+        for chunk in chunks():
+            sha.update(chunk)
+            write(chunk)
+            written += len(chunk)
+        if written != size:
+            raise ValueError(f"{name}的大小在写入时发生了变化")
+        write(b"\0" * ((-size) % _BLOCK))
+        if compressor is not None:
+            self._fp.write(compressor.flush())
+            entry["frame"] = [frame_start, self._fp.tell() - frame_start]
+        self._position += len(header) + size + (-size) % _BLOCK
+        return entry
+
+    def close(self):
+        """
+        写入索引，完成归档
+        """
+        with self._lock:
+            if self._fp is None:
+                return
+            index = json.dumps({"version": INDEX_VERSION, "format": self.format, "members": self.members},
+                               ensure_ascii=False).encode("utf-8")
+        self.write(INDEX_NAME, index)
+        with self._lock:
+            if self._zip is not None:
+                self._zip.close()
+            else:
+                index_entry = self.members[INDEX_NAME]
+                if self._compressor is None:
+                    # 固定大小的最后一个成员，从文件末尾往前2048字节处就能找到索引
+                    locator = f"{index_entry['offset']:020d} {index_entry['size']:020d}\n".encode("ascii")
+                    info = tarfile.TarInfo(LOCATOR_NAME)
+                    info.size = len(locator)
+                    info.mtime = int(time.time())
+                    self._fp.write(info.tobuf(tarfile.USTAR_FORMAT, "ascii", "strict"))
+                    self._fp.write(locator + b"\0" * ((-len(locator)) % _BLOCK))
+                    self._fp.write(b"\0" * (_BLOCK * 2))
+                else:
+                    self._fp.write(self._compressor.compress(b"\0" * (_BLOCK * 2)))
+                    self._fp.write(_SKIPPABLE.pack(ZSTD_SKIPPABLE_MAGIC, _SKIPPABLE.size - 8, *index_entry["frame"]))
+            self._fp.close()
+            self._fp = None
+        os.replace(self.path + ".part", self.path)
+
+    def abort(self):
+        """
+        放弃写入，删除未完成的归档
+        """
+        with self._lock:
+            if self._fp is None:
+                return
+            if self._zip is not None:
+                # 关闭ZipFile，否则回收时还会向已经关闭的文件写入中央目录
+                try:
+                    self._zip.close()
+                except (OSError, ValueError):
+                    ...
+            self._fp.close()
+            self._fp = None
+        try:
+            os.remove(self.path + ".part")
+        except FileNotFoundError:
+            ...
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def _tar_header(name: str, size: int, mtime: int) -> bytes:
+    # 小文件很多时tarfile生成头的耗时与写入内容相当，一般的成员直接拼出ustar头，名称过长或文件过大时交给tarfile
+    encoded = name.encode("utf-8")
+    if len(encoded) > 100 or size >= _USTAR_MAX_SIZE or not name.isascii():
+        info = tarfile.TarInfo(name)
+        info.size = size
+        info.mtime = mtime
+        info.mode = 0o644
+        return info.tobuf(tarfile.PAX_FORMAT, "utf-8", "surrogateescape")
+    header = bytearray(_USTAR.pack(encoded, b"0000644\0", b"0000000\0", b"0000000\0", b"%011o\0" % size,
+                                   b"%011o\0" % mtime, b" " * 8, tarfile.REGTYPE, b"", tarfile.POSIX_MAGIC[:6],
+                                   tarfile.POSIX_MAGIC[6:]))
+    header[148:156] = b"%06o\0 " % sum(header)
+    return bytes(header)
+
+
+def read_index(path: str) -> dict:
+    """
+    读取归档的索引，只读取索引本身，不扫描其他成员
+    :param path: 归档路径
+    :return: {"version", "format", "members": {成员名: {"offset", "size", "sha256", ...}}}
+    """
+    output_format = archive_format(path)
+    if output_format == "zip":
+        with zipfile.ZipFile(path) as archive:
+            return json.loads(archive.read(INDEX_NAME))
+    with open(path, "rb") as fp:
+        if output_format == "tar":
+            fp.seek(-_BLOCK * 4, os.SEEK_END)
+            info = tarfile.TarInfo.frombuf(fp.read(_BLOCK), "ascii", "strict")
+            if info.name != LOCATOR_NAME:
+                raise ValueError(f"{path}中没有索引")
+            offset, size = map(int, fp.read(info.size).split())
+            fp.seek(offset)
+            return json.loads(fp.read(size))
+        if zstandard is None:
+            raise RuntimeError("读取tar.zst需要安装zstandard（pip install zstandard）")
+        fp.seek(-_SKIPPABLE.size, os.SEEK_END)
+        magic, _, frame_offset, frame_size = _SKIPPABLE.unpack(fp.read(_SKIPPABLE.size))
+        if magic != ZSTD_SKIPPABLE_MAGIC:
+            raise ValueError(f"{path}中没有索引")
+        fp.seek(frame_offset)
+        member = zstandard.ZstdDecompressor().decompress(fp.read(frame_size))
+        info = tarfile.TarInfo.frombuf(member[:_BLOCK], "utf-8", "surrogateescape")
+        return json.loads(member[_BLOCK:_BLOCK + info.size])
+
+
+def read_member(path: str, name: str, index: Optional[dict] = None) -> bytes:
+    """
+    根据索引读取一个成员
+    :param path: 归档路径
+    :param name: 成员名
+    :param index: read_index的返回值，读取多个成员时传入，避免重复读取索引
+    :return: 成员的内容
+    """
+    output_format = archive_format(path)
+    if output_format == "zip":
+        with zipfile.ZipFile(path) as archive:
+            return archive.read(name)
+    entry = (index or read_index(path))["members"][name]
+    with open(path, "rb") as fp:
+        if output_format == "tar":
+            fp.seek(entry["offset"])
+            return fp.read(entry["size"])
+        frame_offset, frame_size = entry["frame"]
+        fp.seek(frame_offset)
+        member = zstandard.ZstdDecompressor().decompress(fp.read(frame_size))
+    return member[entry["header"]:entry["header"] + entry["size"]]
+
@@ -0,0 +1,247 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Callable, Iterable, Optional
+
+CACHE_DIR = ".spineauto_cache"  # 缓存目录，放在运行目录下，多个活动共用
+MANIFEST_NAME = "manifest.json"
+DEFAULT_MAX_SIZE = 2 << 30  # 缓存的最大体积（字节）
+DEFAULT_MAX_AGE = 30 * 24 * 3600  # 多久没有用到的对象会被清理（秒）
+
+
+def file_digest(path: str) -> str:
+    """
+    计算文件的sha256
+    :param path: 文件路径
+    :return: 十六进制的sha256
+    """
+    sha = hashlib.sha256()
+    with open(path, "rb") as fp:
+        for chunk in iter(lambda: fp.read(1 << 20), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def prepare_dir(path: os.PathLike | str, force: bool = False):
+    """
+    确保文件夹存在，force时先删除再重新创建
+    :param path: 文件夹路径
+    :param force: 是否清空原有内容
+    """
+    if force and os.path.isdir(path):
+        shutil.rmtree(path)
+    os.makedirs(path, exist_ok=True)
+
+
+def write_if_changed(path: str, content: bytes | str) -> bool:
+    """
+    内容有变化时才写入文件
+    :param path: 文件路径
+    :param content: 文件内容
+    :return: 是否写入了文件
+    """
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    try:
+        if os.path.getsize(path) == len(content):
+            with open(path, "rb") as fp:
+                if fp.read() == content:
+                    return False
+    except FileNotFoundError:
+        ...
+    with open(path, "wb") as fp:
+        fp.write(content)
+    return True
+
+
+class AssetStore:
+    """
+    以内容hash寻址的持久化缓存，manifest记录url到对象、Spine输入到输出文件的对应关系
+    """
+
+    def __init__(self, root: str = CACHE_DIR):
+        """
+        :param root: 缓存目录
+        """
+        self.root = os.path.abspath(root)
+        self.manifest_path = os.path.join(self.root, MANIFEST_NAME)
+        self._lock = threading.RLock()
+        os.makedirs(os.path.join(self.root, "objects"), exist_ok=True)
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as fp:
+                manifest = json.load(fp)
+        except (FileNotFoundError, json.JSONDecodeError):
+            manifest = {}
+        # objects: digest -> {"size", "last_used"}
+        self.objects: dict[str, dict] = manifest.get("objects", {})
+        # urls: url -> digest
+        self.urls: dict[str, str] = manifest.get("urls", {})
+        # spine: 输入的key -> {相对路径: digest}
+        self.spine: dict[str, dict[str, str]] = manifest.get("spine", {})
+        # files: 绝对路径 -> [digest, size, mtime_ns]，文件没有变化时不需要重新计算hash
+        self.files: dict[str, list] = manifest.get("files", {})
+
+    def object_path(self, digest: str) -> str:
+        return os.path.join(self.root, "objects", digest[:2], digest)
+
+    def has(self, digest: str) -> bool:
+        return digest in self.objects and os.path.isfile(self.object_path(digest))
+
+    def digest(self, path: str) -> str:
+        """
+        计算文件的sha256，文件的大小和修改时间没有变化时直接使用上次的结果
+        :param path: 文件路径
+        :return: 十六进制的sha256
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            known = self.files.get(path)
+        if known is not None and known[1] == stat.st_size and known[2] == stat.st_mtime_ns:
+            return known[0]
+        digest = file_digest(path)
+        self._remember(path, digest)
+        return digest
+
+    def _remember(self, path: str, digest: str):
+        stat = os.stat(path)
+        with self._lock:
+            self.files[os.path.abspath(path)] = [digest, stat.st_size, stat.st_mtime_ns]
+
+    def add_file(self, path: str, url: Optional[str] = None) -> str:
+        """
+        把文件加入缓存
+        :param path: 文件路径
+        :param url: 文件的来源url，url中带有内容hash时下次可以直接命中
+        :return: 文件的digest
+        """
+        digest = self.digest(path)
+        with self._lock:
+            if not self.has(digest):
+                object_path = self.object_path(digest)
+                os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                shutil.copyfile(path, object_path + ".tmp")
+                os.replace(object_path + ".tmp", object_path)
+            self.objects[digest] = {"size": os.path.getsize(path), "last_used": time.time()}
+            if url is not None:
+                self.urls[url] = digest
+        return digest
+
+    def lookup_url(self, url: str) -> Optional[str]:
+        """
+        :param url: 文件的来源url
+        :return: 已缓存的对象digest，没有则返回None
+        """
+        with self._lock:
+            digest = self.urls.get(url)
+            if digest is None or not self.has(digest):
+                return None
+            return digest
+
+    def materialize(self, digest: str, path: str):
+        """
+        把缓存中的对象复制到path，path的内容已经相同时跳过
+        :param digest: 对象digest
+        :param path: 目标路径
+        """
+        with self._lock:
+            self.objects[digest]["last_used"] = time.time()
+        if os.path.isfile(path) and os.path.getsize(path) == self.objects[digest]["size"] \
+                and self.digest(path) == digest:
+            return
+        shutil.copyfile(self.object_path(digest), path)
+        self._remember(path, digest)
+
+    def lookup_spine(self, key: str) -> Optional[dict[str, str]]:
+        """
+        :param key: Spine输入的key，见spine_key
+        :return: 已缓存的输出文件{相对路径: digest}，没有或不完整时返回None
+        """
+        with self._lock:
+            outputs = self.spine.get(key)
+            if not outputs or not all(self.has(digest) for digest in outputs.values()):
+                return None
+            return outputs
+
+    def add_spine(self, key: str, out_dir: str):
+        """
+        把Spine的输出目录加入缓存
+        :param key: Spine输入的key
+        :param out_dir: 输出目录
+        """
+        outputs = {}
+        for dir_path, _, file_names in os.walk(out_dir):
+            for file_name in file_names:
+                path = os.path.join(dir_path, file_name)
+                outputs[os.path.relpath(path, out_dir).replace(os.sep, "/")] = self.add_file(path)
+        with self._lock:
+            self.spine[key] = outputs
+
+    def restore_spine(self, outputs: dict[str, str], out_dir: str):
+        """
+        从缓存恢复Spine的输出目录
+        :param outputs: lookup_spine的返回值
+        :param out_dir: 输出目录
+        """
+        for relative_path, digest in outputs.items():
+            path = os.path.join(out_dir, *relative_path.split("/"))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.materialize(digest, path)
+
+    def evict(self, max_size: int = DEFAULT_MAX_SIZE, max_age: float = DEFAULT_MAX_AGE) -> int:
+        """
+        清理过期对象，总体积超过max_size时按最近使用时间从旧到新清理
+        :param max_size: 缓存的最大体积（字节）
+        :param max_age: 多久没有用到的对象会被清理（秒）
+        :return: 清理的对象数量
+        """
+        with self._lock:
+            now = time.time()
+            total = sum(info["size"] for info in self.objects.values())
+            evicted = set()
+            for digest, info in sorted(self.objects.items(), key=lambda item: item[1]["last_used"]):
+                if total <= max_size and now - info["last_used"] <= max_age:
+                    continue
+                evicted.add(digest)
+                total -= info["size"]
+                try:
+                    os.remove(self.object_path(digest))
+                except FileNotFoundError:
+                    ...
+            for digest in evicted:
+                del self.objects[digest]
+            self.urls = {url: digest for url, digest in self.urls.items() if digest not in evicted}
+            self.spine = {key: outputs for key, outputs in self.spine.items()
+                          if evicted.isdisjoint(outputs.values())}
+            self.files = {path: known for path, known in self.files.items() if os.path.isfile(path)}
+            return len(evicted)
+
+    def save(self):
+        """
+        保存manifest
+        """
+        with self._lock:
+            manifest = {"objects": self.objects, "urls": self.urls, "spine": self.spine, "files": self.files}
+            with open(self.manifest_path + ".tmp", "w", encoding="utf-8") as fp:
+                json.dump(manifest, fp, ensure_ascii=False)
+            os.replace(self.manifest_path + ".tmp", self.manifest_path)
+
+
+def spine_key(spine_version: str, scale: float, files: Iterable[str],
+              digest: Callable[[str], str] = file_digest) -> str:
+    """
+    根据Spine的所有输入计算key，任何一个输入变化都会导致key变化
+    :param spine_version: Spine版本
+    :param scale: 缩放
+    :param files: 输入文件（atlas、json、页面图片）
+    :param digest: 计算文件hash的函数，可以传入AssetStore.digest复用已知的结果
+    :return: key
+    """
+    sha = hashlib.sha256(f"{spine_version}\n{scale}\n".encode("utf-8"))
+    for path in sorted(files):
+        sha.update(os.path.basename(path).encode("utf-8"))
+        sha.update(digest(path).encode("ascii"))
+    return sha.hexdigest()
@@ -0,0 +1,211 @@
+from typing import Any, Iterator, Optional
+
+
+def list_to_str(input_list: list[Any]) -> str:
+    """
+    将列表转换为str
+    :param input_list: 输入列表
+    :return: 输出一个使用逗号分隔的字符串，如[XXX, XXX, XXX]
+    """
+    return '[' + ", ".join([str(item) for item in input_list]) + ']'
+
+
+class AtlasRegion:
+    __slots__ = ("name", "page", "x", "y", "width", "height", "original_width", "original_height", "offset_x",
+                 "offset_y", "degrees", "index", "splits", "pads")
+
+    def __init__(self, name: str, page: Optional["AtlasPage"] = None):
+        self.name = name
+        self.page = page
+        self.x = 0
+        self.y = 0
+        self.width = 0
+        self.height = 0
+        self.original_width = 0  # 裁剪透明边缘之前的大小
+        self.original_height = 0
+        self.offset_x = 0  # 裁剪后的图像在原图中的偏移（左下角为原点）
+        self.offset_y = 0
+        self.degrees = 0  # 在页面中旋转的角度，旧版本的rotate: true即90度
+        self.index = -1
+        self.splits: Optional[tuple[int, ...]] = None
+        self.pads: Optional[tuple[int, ...]] = None
+
+    @property
+    def rotate(self) -> bool:
+        return self.degrees != 0
+
+    @property
+    def packed_width(self) -> int:
+        """
+        :return: 在页面中实际占用的宽度（考虑旋转）
+        """
+        return self.height if self.degrees in (90, 270) else self.width
+
+    @property
+    def packed_height(self) -> int:
+        """
+        :return: 在页面中实际占用的高度（考虑旋转）
+        """
+        return self.width if self.degrees in (90, 270) else self.height
+
+    def __str__(self):
+        return f"AtlasRegion({self.name})"
+
+
+class AtlasPage:
+    __slots__ = ("name", "regions", "img", "width", "height", "format", "min_filter", "mag_filter", "repeat_x",
+                 "repeat_y", "pma", "scale")
+
+    def __init__(self, name: str, regions: list[AtlasRegion]):
+        self.name = name
+        self.regions = regions
+        self.img = None
+        self.width = 0
+        self.height = 0
+        self.format = "RGBA8888"
+        self.min_filter = "Nearest"
+        self.mag_filter = "Nearest"
+        self.repeat_x = False
+        self.repeat_y = False
+        self.pma = False  # 是否为预乘透明度
+        self.scale: Optional[float] = None
+
+    def __str__(self):
+        return f"AtlasPage(name = {self.name}, regions = {list_to_str(self.regions)}, img = {self.img})"
+
+
+class AtlasContent:
+    __slots__ = ("pages", "scale", "original", "original_json", "_regions")
+
+    def __init__(self, pages: list[AtlasPage], original: str, original_json: dict[Any, Any], scale: float = 1.0):
+        self.pages = pages
+        self.scale = scale
+        self.original = original
+        self.original_json = original_json
+        self._regions: Optional[dict[str, AtlasRegion]] = None
+
+    def __str__(self):
+        return f"AtlasContent(pages = {list_to_str(self.pages)}, scale = {self.scale})"
+
+    def get_name(self) -> str:
+        """
+        返回项目名称
+        :return: 项目名称
+        """
+        return self.pages[0].name
+
+    def iter_regions(self) -> Iterator[AtlasRegion]:
+        for page in self.pages:
+            yield from page.regions
+
+    @property
+    def regions(self) -> dict[str, AtlasRegion]:
+        """
+        :return: 区域名称 -> 区域，同名区域（序列帧）只保留第一个
+        """
+        if self._regions is None:
+            self._regions = {}
+            for region in self.iter_regions():
+                self._regions.setdefault(region.name, region)
+        return self._regions
+
+    def find_region(self, name: str) -> Optional[AtlasRegion]:
+        return self.regions.get(name)
+
+
+def _ints(value: str) -> tuple[int, ...]:
+    return tuple(int(item) for item in value.split(","))
+
+
+def _set_page_field(page: AtlasPage, key: str, value: str):
+    if key == "size":
+        page.width, page.height = _ints(value)
+    elif key == "format":
+        page.format = value
+    elif key == "filter":
+        page.min_filter, page.mag_filter = (item.strip() for item in value.split(","))
+    elif key == "repeat":
+        page.repeat_x = "x" in value
+        page.repeat_y = "y" in value
+    elif key == "pma":
+        page.pma = value == "true"
+    elif key == "scale":
+        page.scale = float(value)
+
+
+def _set_region_field(region: AtlasRegion, key: str, value: str):
+    if key == "xy":
+        region.x, region.y = _ints(value)
+    elif key == "size":
+        region.width, region.height = _ints(value)
+    elif key == "bounds":
+        region.x, region.y, region.width, region.height = _ints(value)
+    elif key == "orig":
+        region.original_width, region.original_height = _ints(value)
+    elif key == "offset":
+        region.offset_x, region.offset_y = _ints(value)
+    elif key == "offsets":
+        region.offset_x, region.offset_y, region.original_width, region.original_height = _ints(value)
+    elif key == "rotate":
+        if value == "true":
+            region.degrees = 90
+        elif value == "false":
+            region.degrees = 0
+        else:
+            region.degrees = int(value)
+    elif key == "index":
+        region.index = int(value)
+    elif key == "split":
+        region.splits = _ints(value)
+    elif key == "pad":
+        region.pads = _ints(value)
+
+
+def parse_atlas(atlas_content: str) -> AtlasContent:
+    """
+    解析atlas文本（同时支持3.x和4.x的格式）
+    :param atlas_content: 已经反转义的atlas文本
+    :return: atlas对象
+    """
+    result = AtlasContent([], atlas_content, {})
+    now_page = None
+    now_region = None
+    for line in atlas_content.splitlines():
+        line = line.strip()
+        if line == "":
+            # 3.x的页之间用空行分隔
+            now_region = None
+            continue
+        if line.endswith(".png"):
+            # 页
+            now_page = AtlasPage(line[:-4], [])
+            now_region = None
+            result.pages.append(now_page)
+            continue
+        if ":" in line:
+            # 属性
+            key, value = line.split(":", 1)
+            key = key.strip()
+            value = value.strip()
+            if now_region is not None:
+                _set_region_field(now_region, key, value)
+            elif now_page is not None:
+                _set_page_field(now_page, key, value)
+            continue
+        # 区域
+        now_region = AtlasRegion(line, now_page)
+        now_page.regions.append(now_region)
+    for region in result.iter_regions():
+        _finish_region(region)
+    for page in result.pages:
+        if page.scale is not None:
+            result.scale = page.scale
+            break
+    return result
+
+
+def _finish_region(region: AtlasRegion):
+    # 没有orig/offsets时原图大小就是区域大小
+    if region.original_width == 0 and region.original_height == 0:
+        region.original_width = region.width
+        region.original_height = region.height
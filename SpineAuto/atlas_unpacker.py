@@ -0,0 +1,93 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from atlas import AtlasContent, AtlasPage, AtlasRegion
+
+try:
+    from PIL import Image
+except ImportError:  # 没有安装Pillow时只能使用Spine解开图片
+    Image = None
+
+NATIVE_UNPACK_AVAILABLE = Image is not None
+DEFAULT_WORKERS = 4  # 同时处理的页数
+
+if Image is not None:
+    # 区域在页面中逆时针旋转了degrees度，解开时需要顺时针转回来
+    _UNROTATE = {90: Image.Transpose.ROTATE_270, 180: Image.Transpose.ROTATE_180, 270: Image.Transpose.ROTATE_90}
+
+
+def region_file_name(region: AtlasRegion) -> str:
+    """
+    解开后的文件名，与Spine的texture unpacker一致
+    :param region: 区域
+    :return: 文件名（可能包含子文件夹）
+    """
+    if region.index != -1:
+        return f"{region.name}_{region.index}.png"
+    return f"{region.name}.png"
+
+
+def extract_region(page_image: "Image.Image", region: AtlasRegion) -> "Image.Image":
+    """
+    从页面中裁出一个区域，还原旋转和被裁掉的透明边缘
+    :param page_image: 页面图片
+    :param region: 区域
+    :return: 区域图片，大小为orig
+    """
+    image = page_image.crop((region.x, region.y, region.x + region.packed_width, region.y + region.packed_height))
+    if region.degrees in _UNROTATE:
+        image = image.transpose(_UNROTATE[region.degrees])
+    elif region.degrees != 0:
+        image = image.rotate(-region.degrees, expand=True)
+    if (region.original_width, region.original_height) == (region.width, region.height):
+        return image
+    # offset的y轴以左下角为原点
+    canvas = Image.new("RGBA", (region.original_width, region.original_height))
+    canvas.paste(image, (region.offset_x, region.original_height - region.height - region.offset_y))
+    return canvas
+
+
+def unpack_page(page: AtlasPage, page_file: str, out_dir: str) -> list[str]:
+    """
+    解开一页中的所有区域
+    :param page: 页
+    :param page_file: 页面图片的路径
+    :param out_dir: 输出目录
+    :return: 无法解开的区域名称
+    """
+    try:
+        page_image = Image.open(page_file)
+        page_image.load()
+    except (FileNotFoundError, OSError):
+        return [region.name for region in page.regions]
+    if page_image.mode != "RGBA":
+        page_image = page_image.convert("RGBA")
+    failed = []
+    for region in page.regions:
+        path = os.path.join(out_dir, *region_file_name(region).split("/"))
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            extract_region(page_image, region).save(path)
+        except (OSError, ValueError):
+            failed.append(region.name)
+    return failed
+
+
+def unpack_atlas(atlas: AtlasContent, pages_dir: str, out_dir: str, workers: int = DEFAULT_WORKERS) -> list[str]:
+    """
+    不启动Spine，直接根据atlas从页面图片中裁出所有区域，多页时并行处理
+    :param atlas: atlas对象
+    :param pages_dir: 页面图片所在的目录，文件名为{page.name}.png
+    :param out_dir: 输出目录
+    :param workers: 同时处理的页数
+    :return: 无法解开的区域名称
+    """
+    if Image is None:
+        raise RuntimeError("没有安装Pillow，无法直接解开图片")
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = [(page, os.path.join(pages_dir, f"{page.name}.png"), out_dir) for page in atlas.pages]
+    if len(jobs) == 1:
+        return unpack_page(*jobs[0])
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(lambda job: unpack_page(*job), jobs))
+    return [name for failed in results for name in failed]
@@ -0,0 +1,135 @@
+import argparse
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, TYPE_CHECKING
+
+import SpineAuto
+from SpineAuto import (OUTPUT_FORMATS, EventResult, SpineAutoConfig, SpineAutoSession, add_metrics_arguments,
+                       create_progress)
+from asset_cache import CACHE_DIR, DEFAULT_MAX_AGE, DEFAULT_MAX_SIZE
+from downloader import DEFAULT_WORKERS
+from metrics import Metrics
+
+if TYPE_CHECKING:
+    from rich.console import Console
+
+DEFAULT_EVENT_WORKERS = 4  # 同时处理的活动页面数
+URL_RE = re.compile(r"https?://[^\s「」\"'<>]+")
+
+
+def read_url_list(path: str) -> list[str]:
+    """
+    从文件中读取所有URL，支持miHoYoTestUrl.md这种一行一个活动的格式
+    :param path: 文件路径
+    :return: 去重后的URL列表，保持原有顺序
+    """
+    with open(path, "r", encoding="utf-8") as fp:
+        return list(dict.fromkeys(URL_RE.findall(fp.read())))
+
+
+def run_batch(urls: list[str], output_root: str = ".", event_workers: int = DEFAULT_EVENT_WORKERS,
+              download_workers: int = DEFAULT_WORKERS, spine_workers: int = SpineAuto.SPINE_WORKERS,
+              force: bool = False, cache_dir: str = CACHE_DIR, cache_max_size: int = DEFAULT_MAX_SIZE,
+              cache_max_age: float = DEFAULT_MAX_AGE, metrics: Optional[Metrics] = None,
+              low_memory: Optional[bool] = None, output_format: str = SpineAuto.OUTPUT_FORMAT) -> list[EventResult]:
+    """
+    并行处理多个活动页面，所有页面共用同一个下载器、Spine进程池和缓存
+    :param urls: 页面URL
+    :param output_root: 输出目录
+    :param event_workers: 同时处理的页面数
+    :param download_workers: 所有页面加起来同时下载的文件数
+    :param spine_workers: 所有页面加起来同时运行的Spine进程数
+    :param force: 忽略缓存，清空已有的文件后重新生成
+    :param cache_dir: 缓存目录
+    :param cache_max_size: 缓存的最大体积（字节）
+    :param cache_max_age: 多久没有用到的缓存会被清理（秒）
+    :param metrics: 所有页面共用的性能数据
+    :param low_memory: 是否使用低内存模式，不传时使用SpineAuto.LOW_MEMORY
+    :param output_format: 输出格式（dir、zip、tar、tar.zst）
+    :return: 每个页面的处理结果，顺序与urls一致
+    """
+    os.makedirs(output_root, exist_ok=True)
+    config = SpineAutoConfig(output_root=output_root, spine_workers=spine_workers, download_workers=download_workers,
+                             cache_dir=cache_dir, cache_max_size=cache_max_size, cache_max_age=cache_max_age,
+                             output_format=output_format)
+    if low_memory is not None:
+        config = config._replace(low_memory=low_memory)
+    progress = create_progress()
+    progress.start()
+
+    def run_one(url: str) -> EventResult:
+        start_time = time.perf_counter()
+        try:
+            return session.extract(url, force)
+        except Exception as e:
+            return EventResult(url, None, 0, 0, 0, time.perf_counter() - start_time, f"{type(e).__name__}: {e}")
+
+    try:
+        with SpineAutoSession(config, metrics, progress) as session, \
+                ThreadPoolExecutor(max_workers=event_workers) as executor:
+            results = list(executor.map(run_one, urls))
+    finally:
+        progress.stop()
+    return results
+
+
+def print_summary(results: list[EventResult], console: "Console" = None):
+    """
+    打印每个页面的耗时和失败情况
+    :param results: run_batch的返回值
+    :param console: 输出的控制台
+    """
+    from rich.console import Console
+    from rich.table import Table
+    table = Table(title="批量处理结果")
+    table.add_column("活动")
+    table.add_column("项目数", justify="right")
+    table.add_column("下载失败", justify="right")
+    table.add_column("Spine失败", justify="right")
+    table.add_column("耗时", justify="right")
+    table.add_column("错误")
+    for result in results:
+        table.add_row(result.name or result.url, str(result.projects), str(result.download_failures),
+                      str(result.spine_failures), f"{result.elapsed:.1f}s", result.error or "")
+    (console or Console()).print(table)
+
+
+def save_summary(results: list[EventResult], path: str):
+    """
+    保存批量处理结果
+    :param results: run_batch的返回值
+    :param path: 保存路径
+    """
+    with open(path, "w", encoding="utf-8") as fp:
+        json.dump([result._asdict() for result in results], fp, ensure_ascii=False, indent=4)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="批量提取miHoYo先行展示页中的Spine项目")
+    arg_parser.add_argument("url_list", help="URL列表文件，如miHoYoTestUrl.md")
+    arg_parser.add_argument("-o", "--output", default=".", help="输出目录")
+    arg_parser.add_argument("--events", type=int, default=DEFAULT_EVENT_WORKERS, help="同时处理的页面数")
+    arg_parser.add_argument("--downloads", type=int, default=DEFAULT_WORKERS, help="同时下载的文件数")
+    arg_parser.add_argument("--spine-workers", type=int, default=SpineAuto.SPINE_WORKERS,
+                            help="同时运行的Spine进程数")
+    arg_parser.add_argument("--force", action="store_true", help="忽略缓存，清空已有的文件后重新生成")
+    arg_parser.add_argument("--low-memory", action="store_true", default=SpineAuto.LOW_MEMORY,
+                            help="低内存模式，内联图片边扫描边保存，适合很大的vendors.js")
+    arg_parser.add_argument("--cache-dir", default=CACHE_DIR, help="缓存目录")
+    arg_parser.add_argument("--cache-max-size", type=int, default=DEFAULT_MAX_SIZE >> 20, help="缓存的最大体积（MB）")
+    arg_parser.add_argument("--cache-max-age", type=float, default=DEFAULT_MAX_AGE / 86400,
+                            help="多久没有用到的缓存会被清理（天）")
+    arg_parser.add_argument("--output-format", choices=OUTPUT_FORMATS, default=SpineAuto.OUTPUT_FORMAT,
+                            help="输出格式：dir为文件夹，zip、tar、tar.zst为每个活动一个归档")
+    add_metrics_arguments(arg_parser)
+    args = arg_parser.parse_args()
+    batch_metrics = Metrics(profile=args.profile is not None)
+    batch_results = run_batch(read_url_list(args.url_list), args.output, args.events, args.downloads,
+                              args.spine_workers, args.force, args.cache_dir, args.cache_max_size << 20,
+                              args.cache_max_age * 86400, batch_metrics, args.low_memory, args.output_format)
+    batch_metrics.save(args.metrics, args.prometheus, args.profile)
+    print_summary(batch_results)
+    save_summary(batch_results, os.path.join(args.output, "batch_summary.json"))
@@ -0,0 +1,765 @@
+import argparse
+import base64
+import contextlib
+import datetime
+import io
+import json
+import os
+import re
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+import tracemalloc
+from typing import Callable
+
+from rich.progress import Progress
+
+try:
+    import numpy
+except ImportError:  # 没有安装NumPy时跳过预乘透明度测试
+    numpy = None
+
+from SpineAuto import SpineAutoConfig, SpineAutoSession, headers, parser_index_page
+from archive_output import ArchiveWriter, read_index, read_member
+from atlas import parse_atlas
+from downloader import Downloader
+from fixtures import fake_spine, generate_preview_site, serve_directory, synthetic_skeleton
+from html_head import scan_head
+from literal_slice import decode_base64_batch, iter_data_uris, slice_until
+from metrics import Metrics
+from page_alpha import PAGE_ALPHA_AVAILABLE, alpha_statistics, check_atlas, unpremultiply
+from preflight import validate_project
+from skeleton_binary import export_skeleton
+from skeleton_json import JSON_BACKEND, normalize_skeleton, skeleton_attachments
+from spine_runner import SpineWorkerPool
+from vendors_scanner import IMAGE_REF_RE, VendorsEventType, scan_vendors
+from watch import EventWatcher, expand_patterns, watch_once
+
+MB = 1 << 20
+DEFAULT_THRESHOLD = 0.25  # 比基准慢多少判定为性能回退
+MIN_REGRESSION = 0.005  # 耗时差小于这个值（秒）时视为误差
+# 旧实现只作为参照，不参与性能回退的判断
+REFERENCE_NAMES = frozenset(("base64 逐字符拼接", "JSON 逐字符拼接", "SpineAutoBackup", "json 解析+缩进输出",
+                             "BeautifulSoup"))
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def timer(func: Callable[[], object], repeat: int = 3) -> float:
+    """
+    多次运行取最短耗时
+    :param func: 被测函数
+    :param repeat: 运行次数
+    :return: 最短耗时（秒）
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def synthetic_bundle(size: int, image_size: int = 256 * 1024, json_size: int = 512 * 1024) -> str:
+    """
+    生成一个包含内联图片和骨骼JSON的假vendors.js
+    :param size: 目标大小（字节）
+    :param image_size: 每张内联图片的大小
+    :param json_size: 每个骨骼JSON的大小
+    :return: js代码
+    """
+    image = "data:image/png;base64," + base64.b64encode(os.urandom(image_size)).decode("ascii")
+    bones = [{"name": f"bone{i}", "parent": "root", "x": i * 0.5, "y": -i * 0.25}
+             for i in range(json_size // 64)]
+    skeleton = json.dumps({"skeleton": {"spine": "4.0-from-3.8.99", "images": "./images/"}, "bones": bones},
+                          separators=(",", ":"))
+    parts = ["/*! synthetic vendors */\n"]
+    length = 0
+    index = 0
+    while length < size:
+        part = (f'{index}:function(e,t){{e.exports="{image}"}},'
+                f"{index + 1}:function(e){{e.exports=JSON.parse('{skeleton}')}},")
+        parts.append(part)
+        length += len(part)
+        index += 2
+    return "".join(parts)
+
+
+def legacy_image_base64(js_code: str) -> list[bytes]:
+    # 原来逐字符拼接的实现
+    code_length = len(js_code)
+    last_index = 0
+    images = []
+    while True:
+        index = js_code.find("data:image/png;base64,", last_index, code_length)
+        if index == -1:
+            break
+        symbol = js_code[index - 1]
+        b64_content = ""
+        for i in range(index, code_length):
+            s = js_code[i]
+            if s == symbol:
+                break
+            b64_content += s
+        images.append(base64.b64decode(b64_content.replace("data:image/png;base64,", "")))
+        last_index = index + 1
+    return images
+
+
+def legacy_json_literals(js_code: str) -> list[str]:
+    # 原来逐字符拼接的实现
+    result = []
+    code_length = len(js_code)
+    index = js_code.find("JSON.parse('")
+    while index != -1:
+        json_content = ""
+        for json_index in range(index + 12, code_length):
+            s = js_code[json_index]
+            if s == "'":
+                break
+            json_content += s
+        result.append(json_content)
+        index = js_code.find("JSON.parse('", index + 12 + len(json_content))
+    return result
+
+
+def sliced_json_literals(js_code: bytes) -> list[memoryview]:
+    result = []
+    index = js_code.find(b"JSON.parse('")
+    while index != -1:
+        content = slice_until(js_code, index + 12, b"'")
+        result.append(content)
+        index = js_code.find(b"JSON.parse('", index + 12 + len(content))
+    return result
+
+
+def bench_literal_slicing(size: int) -> dict[str, float]:
+    """
+    对比逐字符拼接和切片两种方式提取base64图片、骨骼JSON的耗时
+    :param size: 假vendors.js的大小（字节）
+    :return: 各项耗时
+    """
+    js_code = synthetic_bundle(size)
+    js_bytes = js_code.encode("utf-8")
+    assert legacy_image_base64(js_code) == decode_base64_batch(iter_data_uris(js_bytes))
+    assert legacy_json_literals(js_code) == [bytes(i).decode("utf-8") for i in sliced_json_literals(js_bytes)]
+    return {
+        "base64 逐字符拼接": timer(lambda: legacy_image_base64(js_code), repeat=1),
+        "base64 切片+批量解码": timer(lambda: decode_base64_batch(iter_data_uris(js_bytes))),
+        "JSON 逐字符拼接": timer(lambda: legacy_json_literals(js_code), repeat=1),
+        "JSON 切片": timer(lambda: sliced_json_literals(js_bytes)),
+    }
+
+
+def synthetic_atlas(regions: int, pages: int = 4) -> str:
+    """
+    生成一个3.x格式的atlas
+    :param regions: 区域数量
+    :param pages: 页数
+    :return: atlas文本
+    """
+    lines = []
+    for page in range(pages):
+        lines += ["", f"page{page}.png", "size: 4096,4096", "format: RGBA8888", "filter: Linear,Linear",
+                  "repeat: none"]
+        for region in range(page, regions, pages):
+            lines += [f"region{region}", f"  rotate: {'true' if region % 3 == 0 else 'false'}",
+                      f"  xy: {region % 64 * 64}, {region // 64 * 64}", "  size: 60, 60", "  orig: 64, 64",
+                      "  offset: 2, 2", "  index: -1"]
+    return "\n".join(lines) + "\n"
+
+
+def bench_atlas(regions: int) -> dict[str, float]:
+    """
+    测试atlas解析的耗时和内存
+    :param regions: 区域数量
+    :return: 各项耗时，以及解析结果占用的内存峰值
+    """
+    atlas_content = synthetic_atlas(regions)
+    tracemalloc.start()
+    atlas = parse_atlas(atlas_content)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(atlas.regions) == regions
+    return {
+        "解析": timer(lambda: parse_atlas(atlas_content), repeat=5),
+        "按名称查找全部区域": timer(lambda: [atlas.find_region(f"region{i}") for i in range(regions)], repeat=5),
+        "内存峰值（MB）": peak / MB,
+    }
+
+
+def legacy_skeleton_json(content: str) -> str:
+    # 原来的处理方式：解析、修改images后缩进输出，再替换一次版本
+    data = json.loads(content)
+    data['skeleton']['images'] = "./images"
+    return json.dumps(data, ensure_ascii=False, indent=4).replace("4.0-from-", "")
+
+
+def bench_skeleton_json(bones: int) -> dict[str, float]:
+    """
+    对比骨骼JSON原来的处理方式和规范化的耗时，以及导出.skel的耗时和大小
+    :param bones: 骨骼数量
+    :return: 各项耗时
+    """
+    content = synthetic_skeleton([f"region{i}" for i in range(bones)], bones)
+    data = normalize_skeleton(content).data
+    assert json.loads(legacy_skeleton_json(content)) == data
+    skel = export_skeleton(data)
+    return {
+        "json 解析+缩进输出": timer(lambda: legacy_skeleton_json(content), repeat=5),
+        f"规范化 {JSON_BACKEND}": timer(lambda: normalize_skeleton(content), repeat=5),
+        f"规范化+紧凑输出 {JSON_BACKEND}": timer(lambda: normalize_skeleton(content, minify=True), repeat=5),
+        "导出skel": timer(lambda: export_skeleton(data), repeat=5),
+        "大小（MB）": len(content) / MB,
+        "skel大小（MB）": len(skel) / MB,
+    }
+
+
+def legacy_extract(vendors_js_content: bytes) -> dict[str, tuple[str, str, dict[str, str]]]:
+    # SpineAutoBackup.py中的提取逻辑，去掉了下载和进度条
+    vendors_js_lines = vendors_js_content.decode("utf-8").splitlines()
+    vendors_js_str = "".join(vendors_js_lines[1:len(vendors_js_lines)])
+    string_literals: list[str] = re.findall(r'["\'](.*?)["\']', vendors_js_str)
+    datas = {}
+    for string_literal in string_literals:
+        if ".png" in string_literal and not string_literal.startswith("http"):
+            spine_str = string_literal
+            lines = spine_str.split("\\n")
+            name = lines[0].replace(".png", "")
+            images = []
+            for line in lines:
+                if line.endswith(".png"):
+                    images.append(line.replace(".png", ""))
+            index = vendors_js_str.find(spine_str)
+            start_find_index = index + len(spine_str) + 36 + 1
+            json_str = None
+            for i in range(start_find_index, len(vendors_js_str)):
+                s = vendors_js_str[i]
+                if s == "'":
+                    json_str = vendors_js_str[start_find_index: i]
+                    break
+            if json_str is None:
+                continue
+            try:
+                md5s = {}
+                for i in images:
+                    md5 = re.findall(f"images/{i}.(.*?)..png", vendors_js_str)[0]
+                    md5s[i] = md5
+            except IndexError:
+                continue
+            datas[name] = (spine_str, json_str, md5s)
+    return datas
+
+
+def current_extract(vendors_js_content: bytes) -> dict[str, tuple[str, str, dict[str, str]]]:
+    # 与legacy_extract相同的输出，使用流式扫描
+    datas = {}
+    md5s = {}
+    waiting_atlas = None
+    for event in scan_vendors([vendors_js_content]):
+        if event.type is VendorsEventType.ATLAS:
+            waiting_atlas = event.value
+        elif event.type is VendorsEventType.SKELETON_JSON and waiting_atlas is not None:
+            lines = waiting_atlas.split("\\n")
+            datas[lines[0].replace(".png", "")] = (waiting_atlas, event.value,
+                                                   [line[:-4] for line in lines if line.endswith(".png")])
+            waiting_atlas = None
+        elif event.type is VendorsEventType.IMAGE_REF:
+            page_name, page_md5 = IMAGE_REF_RE.match(event.value).groups()
+            md5s.setdefault(page_name, page_md5)
+    return {name: (atlas, skeleton, {page: md5s[page] for page in pages})
+            for name, (atlas, skeleton, pages) in datas.items()}
+
+
+def bench_backup_extract(heroes: int, size: int) -> dict[str, float]:
+    """
+    对比SpineAutoBackup.py和当前实现从vendors.js中提取atlas、骨骼JSON和图片hash的耗时。
+    vendors.js较小时当前实现快几倍；用大量短字面量和除号填充到几MB时，当前实现要逐个识别字面量、注释和正则并划分模块，
+    比SpineAutoBackup的一次正则匹配慢约两成（后者会被注释和正则中的引号打乱，也不知道所在的模块），比值见输出中的“倍”
+    :param heroes: Spine项目数量
+    :param size: vendors.js的大小（字节）
+    :return: 各项耗时
+    """
+    with tempfile.TemporaryDirectory() as root:
+        fixture = generate_preview_site(root, heroes=heroes, vendors_size=size)
+        with open(fixture.vendors_path, "rb") as fp:
+            vendors_js = fp.read()
+    legacy = legacy_extract(vendors_js)
+    assert set(legacy) == set(fixture.heroes)
+    assert legacy == current_extract(vendors_js)
+    legacy_time = timer(lambda: legacy_extract(vendors_js), repeat=1)
+    current_time = timer(lambda: current_extract(vendors_js))
+    return {
+        "SpineAutoBackup": legacy_time,
+        "当前实现": current_time,
+        "当前实现/SpineAutoBackup（倍）": current_time / legacy_time,
+    }
+
+
+def bench_pipeline(heroes: int, size: int) -> dict[str, float]:
+    """
+    使用本地服务器代替act.mihoyo.com，测试parser_index_page各阶段的耗时（不包含Spine）
+    :param heroes: Spine项目数量
+    :param size: vendors.js的大小（字节）
+    :return: 各阶段的耗时
+    """
+    with tempfile.TemporaryDirectory() as root:
+        site_dir = os.path.join(root, "site")
+        generate_preview_site(site_dir, heroes=heroes, vendors_size=size)
+        metrics = Metrics()
+        # Spine不存在，只统计Spine之前的阶段
+        spine_pool = SpineWorkerPool(os.path.join(root, "spine"), native_unpack=False, metrics=metrics)
+        with serve_directory(site_dir) as base_url, contextlib.redirect_stdout(io.StringIO()):
+            result = parser_index_page(f"{base_url}index.html", os.path.join(root, "out"), force=True,
+                                       cache_dir=os.path.join(root, "cache"), spine_pool=spine_pool,
+                                       progress=Progress(disable=True), metrics=metrics)
+    assert result.projects == heroes and result.download_failures == 0
+    stages = metrics.to_dict()["stages"]
+    return {name: stages[name]["total"] for name in ("index", "vendors", "parse", "base64", "download", "write")}
+
+
+def bench_overlap(heroes: int, latency: float, page_size: int = 1024) -> dict[str, float]:
+    """
+    模拟网络延迟，测试流水线中下载、解开图片等阶段同时进行的效果：端到端耗时应接近最慢的阶段，而不是各阶段之和
+    （Spine使用fake_spine.py代替，导入这一步包含启动一个Python进程的时间）
+    :param heroes: Spine项目数量
+    :param latency: 每个请求的延迟（秒）
+    :param page_size: 页面图片的边长
+    :return: 各阶段的耗时、它们的和以及端到端耗时
+    """
+    with tempfile.TemporaryDirectory() as root:
+        site_dir = os.path.join(root, "site")
+        generate_preview_site(site_dir, heroes=heroes, page_size=page_size)
+        metrics = Metrics()
+        spine_pool = SpineWorkerPool(fake_spine(os.path.join(root, "bin")), metrics=metrics)
+        with serve_directory(site_dir, latency) as base_url, contextlib.redirect_stdout(io.StringIO()):
+            result = parser_index_page(f"{base_url}index.html", os.path.join(root, "out"), force=True,
+                                       cache_dir=os.path.join(root, "cache"), spine_pool=spine_pool,
+                                       progress=Progress(disable=True), metrics=metrics)
+    assert result.projects == heroes and result.download_failures == 0 and result.spine_failures == 0
+    stages = metrics.to_dict()["stages"]
+    result_stages = {name: stages[name]["total"] for name in ("vendors", "download", "spine") if name in stages}
+    return {**result_stages, "各阶段之和": sum(result_stages.values()), "端到端": result.elapsed}
+
+
+def bench_chunks(heroes: int, chunks: int, latency: float) -> dict[str, float]:
+    """
+    Spine项目分散在vendors.js和多个按需加载的分块中，对比逐个获取和同时获取所有脚本的耗时，
+    并检查所有项目都能按模块配对
+    :param heroes: Spine项目数量
+    :param chunks: 分块数量
+    :param latency: 每个请求的延迟（秒）
+    :return: 两种方式获取和解析脚本的耗时
+    """
+    result = {}
+    with tempfile.TemporaryDirectory() as root:
+        site_dir = os.path.join(root, "site")
+        generate_preview_site(site_dir, heroes=heroes, chunks=chunks)
+        with serve_directory(site_dir, latency) as base_url, contextlib.redirect_stdout(io.StringIO()):
+            for name, workers in (("逐个获取", 1), ("同时获取", chunks + 2)):
+                metrics = Metrics()
+                spine_pool = SpineWorkerPool(os.path.join(root, "spine"), native_unpack=False, metrics=metrics)
+                with Downloader(headers=headers, workers=workers, metrics=metrics) as downloader:
+                    event = parser_index_page(f"{base_url}index.html", os.path.join(root, name), force=True,
+                                              cache_dir=os.path.join(root, "cache"), downloader=downloader,
+                                              spine_pool=spine_pool, progress=Progress(disable=True),
+                                              metrics=metrics)
+                assert event.projects == heroes and event.download_failures == 0
+                result[name] = metrics.to_dict()["stages"]["vendors"]["total"]
+    return result
+
+
+def bench_low_memory(heroes: int, data_uris: int, data_uri_size: int = 256) -> dict[str, float]:
+    """
+    对比普通模式和低内存模式处理内联图片很多的页面时的内存峰值
+    :param heroes: Spine项目数量
+    :param data_uris: 内联图片的数量
+    :param data_uri_size: 内联图片的边长，使用随机像素，每张约data_uri_size * data_uri_size * 4字节
+    :return: 各模式的耗时和内存峰值
+    """
+    result = {}
+    with tempfile.TemporaryDirectory() as root:
+        site_dir = os.path.join(root, "site")
+        fixture = generate_preview_site(site_dir, heroes=heroes, data_uris=data_uris, data_uri_size=data_uri_size,
+                                        data_uri_noise=True)
+        with serve_directory(site_dir) as base_url, contextlib.redirect_stdout(io.StringIO()):
+            for title, low_memory in (("普通模式", False), ("低内存模式", True)):
+                metrics = Metrics()
+                spine_pool = SpineWorkerPool(os.path.join(root, "spine"), native_unpack=False, metrics=metrics)
+                tracemalloc.start()
+                start = time.perf_counter()
+                parser_index_page(f"{base_url}index.html", os.path.join(root, title), force=True,
+                                  cache_dir=os.path.join(root, "cache"), spine_pool=spine_pool,
+                                  progress=Progress(disable=True), metrics=metrics, low_memory=low_memory)
+                result[title] = time.perf_counter() - start
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                result[f"{title} 内存峰值（MB）"] = peak / MB
+                assert len(os.listdir(os.path.join(root, title, "测试活动", "base64Images"))) == data_uris
+    result["vendors.js（MB）"] = fixture.vendors_size / MB
+    # 低内存模式不保留内联图片，峰值不应随图片总量增长
+    assert result["低内存模式 内存峰值（MB）"] < result["普通模式 内存峰值（MB）"]
+    return result
+
+
+def bench_service(heroes: int, jobs: int) -> dict[str, float]:
+    """
+    同一个页面连续提取jobs次：每次启动一个SpineAuto.py进程，与常驻的SpineAutoSession对比
+    （后者不需要重新导入、建立连接和读取解析缓存）
+    :param heroes: Spine项目数量
+    :param jobs: 提取次数
+    :return: 两种方式的总耗时
+    """
+    result = {}
+    with tempfile.TemporaryDirectory() as root:
+        site_dir = os.path.join(root, "site")
+        generate_preview_site(site_dir, heroes=heroes)
+        with serve_directory(site_dir) as base_url, contextlib.redirect_stdout(io.StringIO()):
+            url = f"{base_url}index.html"
+            out_dir = os.path.join(root, "每次启动进程")
+            os.makedirs(out_dir)
+            start = time.perf_counter()
+            for _ in range(jobs):
+                subprocess.run([sys.executable, os.path.join(SCRIPT_DIR, "SpineAuto.py"), url, "--cache-dir",
+                                os.path.join(root, "cache-process")], cwd=out_dir, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL, check=True)
+            result["每次启动进程"] = time.perf_counter() - start
+            config = SpineAutoConfig(output_root=os.path.join(root, "常驻会话"),
+                                     cache_dir=os.path.join(root, "cache-session"), parsed_memory_entries=8)
+            start = time.perf_counter()
+            with SpineAutoSession(config) as session:
+                for _ in range(jobs):
+                    assert session.extract(url).projects == heroes
+            result["常驻会话"] = time.perf_counter() - start
+    return result
+
+
+def bench_watch(days: int, latency: float) -> dict[str, float]:
+    """
+    用地址模板检查days天的页面（其中两个存在），测试没有变化时一次轮询的耗时，
+    并检查只有脚本引用变化的活动才会重新提取
+    :param days: 模板展开的天数
+    :param latency: 每个请求的延迟（秒）
+    :return: 逐个检查和同时检查的耗时
+    """
+    today = datetime.date.today()
+    dates = [today + datetime.timedelta(days=offset) for offset in (-1, days // 2)]
+    result = {}
+    with tempfile.TemporaryDirectory() as root:
+        site_dir = os.path.join(root, "site")
+        for index, date in enumerate(dates):
+            generate_preview_site(os.path.join(site_dir, f"e{date:%Y%m%d}"), title=f"活动{index}", heroes=2)
+        with serve_directory(site_dir, latency) as base_url, contextlib.redirect_stdout(io.StringIO()):
+            urls = expand_patterns([base_url + "e{date:%Y%m%d}/index.html"], today, 1, days - 2)
+            config = SpineAutoConfig(output_root=os.path.join(root, "out"), cache_dir=os.path.join(root, "cache"),
+                                     native_unpack=False)
+            with SpineAutoSession(config) as session:
+                watcher = EventWatcher(session.downloader, os.path.join(root, "watch_state.json"))
+                assert len(watch_once(session, watcher, urls)) == len(dates)
+                for name, workers in (("逐个检查", 1), ("同时检查", session.downloader.workers)):
+                    watcher.workers = workers
+                    start = time.perf_counter()
+                    assert not watch_once(session, watcher, urls)
+                    result[name] = time.perf_counter() - start
+                # 只有脚本变化的活动会重新提取，index.html中其他内容的变化不会
+                generate_preview_site(os.path.join(site_dir, f"e{dates[1]:%Y%m%d}"), title="活动1", heroes=3, seed=1)
+                with open(os.path.join(site_dir, f"e{dates[0]:%Y%m%d}", "index.html"), "a", encoding="utf-8") as fp:
+                    fp.write("<!-- -->")
+                assert [event.name for event in watch_once(session, watcher, urls)] == ["活动1"]
+    result["页面数（个）"] = len(urls)
+    return result
+
+
+def bench_archive(files: int) -> dict[str, float]:
+    """
+    写入files个小文件（区域图片、atlas、JSON）：逐个写入文件夹与流式写入zip、tar对比，
+    以及从tar中找出最后一个成员：tarfile逐个扫描成员与使用索引对比
+    :param files: 文件数量
+    :return: 各种方式的耗时
+    """
+    rng = random.Random(0)
+    contents = [(f"hero{index // 50}/out/images/part{index}.png", rng.randbytes(rng.randint(512, 16 * 1024)))
+                for index in range(files)]
+    result = {}
+    with tempfile.TemporaryDirectory() as root:
+        def write_dir():
+            out_dir = os.path.join(root, "dir")
+            for name, content in contents:
+                path = os.path.join(out_dir, name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "wb") as fp:
+                    fp.write(content)
+
+        def write_archive(output_format: str):
+            with ArchiveWriter(os.path.join(root, f"out.{output_format}"), output_format) as archive:
+                for name, content in contents:
+                    archive.write(name, content)
+
+        result["文件夹"] = timer(write_dir)
+        result["zip"] = timer(lambda: write_archive("zip"))
+        result["tar"] = timer(lambda: write_archive("tar"))
+        tar_path = os.path.join(root, "out.tar")
+        last_name = contents[-1][0]
+
+        def scan_tar():
+            with tarfile.open(tar_path) as archive:
+                return archive.extractfile(last_name).read()
+
+        assert scan_tar() == read_member(tar_path, last_name) == contents[-1][1]
+        result["tar 逐个扫描查找"] = timer(scan_tar)
+        result["tar 索引查找"] = timer(lambda: read_member(tar_path, last_name, read_index(tar_path)))
+    result["文件数（个）"] = files
+    return result
+
+
+def synthetic_pma_page(size: int, seed: int = 0) -> "numpy.ndarray":
+    """
+    生成一张预乘透明度的页面：随机大小的圆形区域，边缘半透明
+    :param size: 边长
+    :param seed: 随机数种子
+    :return: RGBA数组
+    """
+    rng = numpy.random.default_rng(seed)
+    pixels = numpy.zeros((size, size, 4), numpy.uint8)
+    for _ in range(64):
+        radius = int(rng.integers(size // 32, size // 8))
+        cx, cy = rng.integers(radius, size - radius, 2)
+        # 只计算圆所在的正方形
+        y, x = numpy.ogrid[-radius:radius, -radius:radius]
+        alpha = numpy.clip((radius - numpy.sqrt(x * x + y * y)) / (radius / 4), 0, 1)
+        mask = alpha > 0
+        block = pixels[cy - radius:cy + radius, cx - radius:cx + radius]
+        block[..., 3][mask] = (alpha[mask] * 255).astype(numpy.uint8)
+        block[..., :3][mask] = rng.integers(0, 256, 3, numpy.uint8)
+    pixels[..., :3] = (pixels[..., :3].astype(numpy.uint16) * pixels[..., 3:4] // 255).astype(numpy.uint8)
+    return pixels
+
+
+def bench_page_alpha(size: int, pages: int) -> dict[str, float]:
+    """
+    预乘透明度的检查和转换：size×size的页面，单独测试NumPy计算的耗时，
+    以及包含读取、写入PNG的一个项目（pages页）逐页处理和并行处理的耗时
+    :param size: 页面边长
+    :param pages: 页数
+    :return: 各项耗时
+    """
+    if not PAGE_ALPHA_AVAILABLE:
+        return {}
+    from PIL import Image
+    pixels = synthetic_pma_page(size)
+    # 名称中不带括号，按耗时显示为毫秒，并参与性能回退的判断
+    result = {"检测 每页": timer(lambda: alpha_statistics(pixels)),
+              "转换 每页": timer(lambda: unpremultiply(pixels.copy()))}
+    samples, violations = alpha_statistics(pixels)
+    assert samples and violations == 0
+    names = [f"page{index}" for index in range(pages)]
+    atlas_text = "\n".join(f"\n{name}.png\nsize: {size},{size}\npma: true\nregion{index}\n  bounds: 0,0,1,1"
+                           for index, name in enumerate(names))
+    with tempfile.TemporaryDirectory() as root:
+        source_dir = os.path.join(root, "source")
+        os.makedirs(source_dir)
+        for index, name in enumerate(names):
+            Image.fromarray(synthetic_pma_page(size, index), "RGBA").save(os.path.join(source_dir, f"{name}.png"))
+        for title, workers in (("逐页", 1), ("并行", pages)):
+            elapsed = []
+            for _ in range(2):
+                pages_dir = os.path.join(root, "pages")
+                shutil.rmtree(pages_dir, ignore_errors=True)
+                shutil.copytree(source_dir, pages_dir)
+                atlas = parse_atlas(atlas_text)
+                start = time.perf_counter()
+                results = check_atlas(atlas, pages_dir, workers=workers)
+                elapsed.append(time.perf_counter() - start)
+                assert all(page_result.converted for page_result in results)
+            result[f"{pages}页 {title}"] = min(elapsed)
+    return result
+
+
+def bench_preflight(regions: int) -> dict[str, float]:
+    """
+    调用Spine之前的一致性检查：regions个区域、4页4096×4096的项目，检查每个项目的耗时（毫秒）
+    :param regions: 区域数量
+    :return: 各项耗时
+    """
+    from PIL import Image
+    atlas = parse_atlas(synthetic_atlas(regions))
+    data = normalize_skeleton(synthetic_skeleton([f"region{i}" for i in range(regions)], 10)).data
+    with tempfile.TemporaryDirectory() as root:
+        for page in atlas.pages:
+            page.img = f"images/{page.name}.png"
+            Image.new("RGBA", (4096, 4096)).save(os.path.join(root, f"{page.name}.png"), compress_level=1)
+        assert not validate_project(atlas, skeleton_attachments(data), root).missing_regions
+        return {
+            "骨骼区域（毫秒）": timer(lambda: skeleton_attachments(data), repeat=5) * 1000,
+            "检查（毫秒）": timer(lambda: validate_project(atlas, skeleton_attachments(data), root), repeat=5) * 1000,
+        }
+
+
+def synthetic_page(elements: int, script_in_head: bool = True) -> str:
+    """
+    生成一个body很长的页面
+    :param elements: body中的元素数量
+    :param script_in_head: vendors.js的script在head中还是body末尾
+    :return: 页面内容
+    """
+    script = '<script defer="defer" src="js/vendors.0123abcd.js"></script>'
+    body = "".join(f'<div class="item item-{index}"><img src="img/{index}.png" alt="第{index}项"><p>说明文字</p></div>'
+                   for index in range(elements))
+    head_script, body_script = (script, "") if script_in_head else ("", script)
+    return (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>测试活动</title>{head_script}</head>'
+            f'<body>{body}{body_script}</body></html>')
+
+
+def import_seconds(module: str, repeat: int = 5) -> float:
+    """
+    在新的进程中导入模块（不包含解释器本身的启动）
+    :param module: 模块名称
+    :param repeat: 运行次数
+    :return: 最短耗时（秒）
+    """
+    code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+    best = float("inf")
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", code], cwd=SCRIPT_DIR, capture_output=True, text=True,
+                                check=True).stdout
+        best = min(best, float(output))
+    return best
+
+
+def first_request_seconds(repeat: int = 3) -> float:
+    """
+    从启动SpineAuto.py到它发出第一个请求的时间，包含解释器启动、导入和初始化
+    :param repeat: 运行次数
+    :return: 最短耗时（秒）
+    """
+    best = float("inf")
+    with tempfile.TemporaryDirectory() as root, socket.socket() as listener:
+        listener.bind(("127.0.0.1", 0))
+        listener.listen()
+        listener.settimeout(30)
+        url = f"http://127.0.0.1:{listener.getsockname()[1]}/index.html"
+        for _ in range(repeat):
+            start = time.perf_counter()
+            process = subprocess.Popen([sys.executable, os.path.join(SCRIPT_DIR, "SpineAuto.py"), url, "--cache-dir",
+                                        os.path.join(root, "cache")], cwd=root, stdout=subprocess.DEVNULL,
+                                       stderr=subprocess.DEVNULL)
+            try:
+                connection, _ = listener.accept()
+                with connection:
+                    connection.recv(1)
+                    best = min(best, time.perf_counter() - start)
+            finally:
+                process.kill()
+                process.wait()
+    return best
+
+
+def bench_startup(elements: int) -> dict[str, float]:
+    """
+    测试启动速度：导入SpineAuto、batch的耗时，启动到发出第一个请求的耗时，以及解析页面找到vendors.js的耗时
+    :param elements: 页面body中的元素数量
+    :return: 各项耗时
+    """
+    head_page = synthetic_page(elements).encode("utf-8")
+    tail_page = synthetic_page(elements, script_in_head=False).encode("utf-8")
+    for page in (head_page, tail_page):
+        page_head = scan_head(page, lambda src: "vendors" in src)
+        assert page_head.title == "测试活动" and page_head.scripts == ["js/vendors.0123abcd.js"]
+    result = {
+        "导入SpineAuto": import_seconds("SpineAuto"),
+        "导入batch": import_seconds("batch"),
+        "启动到第一个请求": first_request_seconds(),
+        "scan_head": timer(lambda: scan_head(head_page, lambda src: "vendors" in src)),
+        "scan_head script在body末尾": timer(lambda: scan_head(tail_page, lambda src: "vendors" in src)),
+    }
+    try:
+        from bs4 import BeautifulSoup
+    except ImportError:  # 没有安装bs4时只测试当前实现
+        return result
+    result["BeautifulSoup"] = timer(lambda: BeautifulSoup(head_page.decode("utf-8"), features="lxml"), repeat=1)
+    return result
+
+
+def compare_baseline(results: dict[str, dict[str, float]], baseline: dict[str, dict[str, float]],
+                     threshold: float) -> list[str]:
+    """
+    与基准对比，找出变慢的项目
+    :param results: 本次结果
+    :param baseline: 基准结果
+    :param threshold: 允许变慢的比例
+    :return: 变慢的项目
+    """
+    regressions = []
+    for title, result in results.items():
+        for name, value in result.items():
+            base = baseline.get(title, {}).get(name)
+            if base is None or "（" in name or name in REFERENCE_NAMES:
+                continue
+            if value > base * (1 + threshold) and value - base > MIN_REGRESSION:
+                regressions.append(f"{title} / {name}: {base * 1000:.1f} ms -> {value * 1000:.1f} ms")
+    return regressions
+
+
+def print_result(title: str, result: dict[str, float]):
+    print(title)
+    for name, value in result.items():
+        if "（" in name:
+            # 名称中带单位的不是耗时
+            print(f"    {name}: {value:.3f}")
+        else:
+            print(f"    {name}: {value * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SpineAuto性能测试")
+    parser.add_argument("--size", type=int, default=20, help="假vendors.js的大小（MB）")
+    parser.add_argument("--regions", type=int, default=1000, help="atlas的区域数量")
+    parser.add_argument("--bones", type=int, default=20000, help="骨骼JSON的骨骼数量")
+    parser.add_argument("--heroes", type=int, default=20, help="假先行展示页的Spine项目数量")
+    parser.add_argument("--page-size", type=int, default=5, help="假先行展示页vendors.js的大小（MB）")
+    parser.add_argument("--latency", type=float, default=0.05, help="流水线重叠测试中每个请求的延迟（秒）")
+    parser.add_argument("--chunks", type=int, default=4, help="多分块测试中按需加载的分块数量")
+    parser.add_argument("--data-uris", type=int, default=64, help="低内存模式测试中内联图片的数量（每张约256 KB）")
+    parser.add_argument("--elements", type=int, default=20000, help="启动测试中页面body的元素数量")
+    parser.add_argument("--jobs", type=int, default=5, help="常驻服务测试中连续提取的次数")
+    parser.add_argument("--watch-days", type=int, default=48, help="轮询测试中地址模板展开的天数")
+    parser.add_argument("--archive-files", type=int, default=5000, help="归档测试中写入的文件数量")
+    parser.add_argument("--pma-size", type=int, default=4096, help="预乘透明度测试中页面的边长")
+    parser.add_argument("--pma-pages", type=int, default=4, help="预乘透明度测试中一个项目的页数")
+    parser.add_argument("--save-baseline", metavar="PATH", help="将本次结果保存为基准")
+    parser.add_argument("--baseline", metavar="PATH", help="与基准对比，有项目变慢时返回1")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="允许变慢的比例")
+    args = parser.parse_args()
+    # 标题中不带参数，方便不同参数的结果互相对比
+    results = {
+        "字面量切片": bench_literal_slicing(args.size * MB),
+        "atlas解析": bench_atlas(args.regions),
+        "骨骼JSON": bench_skeleton_json(args.bones),
+        "提取（对比SpineAutoBackup）": bench_backup_extract(args.heroes, args.page_size * MB),
+        "流水线": bench_pipeline(args.heroes, args.page_size * MB),
+        "流水线重叠": bench_overlap(args.heroes, args.latency),
+        "多分块": bench_chunks(args.heroes, args.chunks, args.latency),
+        "低内存模式": bench_low_memory(args.heroes, args.data_uris),
+        "启动": bench_startup(args.elements),
+        "常驻服务": bench_service(args.heroes, args.jobs),
+        "轮询": bench_watch(args.watch_days, args.latency),
+        "归档输出": bench_archive(args.archive_files),
+        "预乘透明度": bench_page_alpha(args.pma_size, args.pma_pages),
+        "预检": bench_preflight(args.regions),
+    }
+    for result_title, bench_result in results.items():
+        print_result(result_title, bench_result)
+    if args.save_baseline is not None:
+        with open(args.save_baseline, "w", encoding="utf-8") as fp:
+            json.dump(results, fp, ensure_ascii=False, indent=4)
+    if args.baseline is not None:
+        with open(args.baseline, "r", encoding="utf-8") as fp:
+            slower = compare_baseline(results, json.load(fp), args.threshold)
+        for item in slower:
+            print(f"性能回退：{item}")
+        if slower:
+            sys.exit(1)
@@ -0,0 +1,424 @@
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from typing import Iterable, Optional
+
+from archive_output import read_index, split_member_path
+from asset_cache import CACHE_DIR
+
+CATALOG_NAME = "catalog.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    url TEXT PRIMARY KEY,
+    name TEXT,
+    dir TEXT,
+    vendors_digest TEXT,
+    options TEXT,
+    projects INTEGER,
+    updated REAL
+);
+CREATE TABLE IF NOT EXISTS skeletons (
+    event_url TEXT NOT NULL,
+    name TEXT NOT NULL,
+    spine_version TEXT,
+    scale REAL,
+    spine_ok INTEGER,
+    PRIMARY KEY (event_url, name)
+);
+CREATE TABLE IF NOT EXISTS regions (
+    event_url TEXT NOT NULL,
+    skeleton TEXT NOT NULL,
+    page TEXT,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pages (
+    event_url TEXT NOT NULL,
+    skeleton TEXT NOT NULL,
+    name TEXT NOT NULL,
+    declared_pma INTEGER,
+    premultiplied INTEGER,
+    converted INTEGER,
+    PRIMARY KEY (event_url, skeleton, name)
+);
+CREATE TABLE IF NOT EXISTS assets (
+    path TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    url TEXT,
+    event_url TEXT,
+    skeleton TEXT
+);
+CREATE INDEX IF NOT EXISTS skeletons_name ON skeletons (name);
+CREATE INDEX IF NOT EXISTS skeletons_spine_version ON skeletons (spine_version);
+CREATE INDEX IF NOT EXISTS regions_name ON regions (name);
+CREATE INDEX IF NOT EXISTS regions_skeleton ON regions (event_url, skeleton);
+CREATE INDEX IF NOT EXISTS assets_digest ON assets (digest);
+CREATE INDEX IF NOT EXISTS assets_event_url ON assets (event_url);
+CREATE INDEX IF NOT EXISTS assets_skeleton ON assets (skeleton);
+CREATE INDEX IF NOT EXISTS assets_size ON assets (size);
+"""
+
+# 目录中的一个文件：路径、sha256、大小（字节）、种类、来源url、所属活动、所属骨骼
+CatalogAsset = namedtuple("CatalogAsset", ["path", "digest", "size", "kind", "url", "event_url", "skeleton"])
+# 目录中的一个骨骼，spine_ok为None时表示没有经过Spine处理
+CatalogSkeleton = namedtuple("CatalogSkeleton", ["event_url", "name", "spine_version", "scale", "spine_ok"])
+# 使用某个区域的骨骼
+CatalogRegion = namedtuple("CatalogRegion", ["event_url", "skeleton", "page", "name"])
+# 骨骼的一页图片的透明度：atlas中的pma、检测是否为预乘（None为无法判断）、是否已经转换为非预乘
+CatalogPage = namedtuple("CatalogPage", ["event_url", "skeleton", "name", "declared_pma", "premultiplied",
+                                         "converted"])
+
+
+def default_catalog_path(cache_dir: str = CACHE_DIR) -> str:
+    """
+    :param cache_dir: 缓存目录
+    :return: 缓存目录中的资源目录路径
+    """
+    return os.path.join(cache_dir, CATALOG_NAME)
+
+
+def _normalize_path(path: str) -> str:
+    # 归档成员的路径中归档已经是绝对路径，成员名使用/分隔，不能再转换
+    return path if split_member_path(path) is not None else os.path.abspath(path)
+
+
+class Catalog:
+    """
+    所有处理过的活动的资源目录（SQLite），按hash、骨骼名称、活动url、Spine版本、区域名称和大小建立索引。
+    写入先缓存在内存中，flush时在一个事务中批量插入，线程安全
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: 数据库文件路径
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._reset_events: set[str] = set()
+        self._events: list[tuple] = []
+        self._skeletons: list[tuple] = []
+        self._spine_results: list[tuple] = []
+        self._regions: list[tuple] = []
+        self._pages: list[tuple] = []
+        self._assets: list[tuple] = []
+
+    def close(self):
+        self.flush()
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def reset_event(self, event_url: str):
+        """
+        重新处理一个活动时调用，flush时先删除这个活动原有的记录
+        :param event_url: 活动url
+        """
+        with self._lock:
+            self._reset_events.add(event_url)
+
+    def discard_event(self, event_url: str):
+        """
+        丢弃一个活动还没有写入的记录，如确定活动不需要重新处理时，扫描过程中已经缓存的记录
+        :param event_url: 活动url
+        """
+        with self._lock:
+            self._take(event_url)
+
+    def add_event(self, url: str, name: str, directory: str, vendors_digest: Optional[str] = None,
+                  options: str = "", projects: int = 0):
+        """
+        :param url: 活动url
+        :param name: 活动名称（页面标题）
+        :param directory: 输出目录
+        :param vendors_digest: vendors.js的sha256
+        :param options: 影响输出的设置，设置变化后不能跳过
+        :param projects: Spine项目数量
+        """
+        with self._lock:
+            self._events.append((url, name, os.path.abspath(directory), vendors_digest, options, projects,
+                                 time.time()))
+
+    def add_skeleton(self, event_url: str, name: str, spine_version: Optional[str], scale: Optional[float],
+                     regions: Iterable[tuple[str, str]] = ()):
+        """
+        :param event_url: 所属的活动url
+        :param name: 骨骼（项目）名称
+        :param spine_version: Spine版本
+        :param scale: 导入时的缩放
+        :param regions: (页面名称, 区域名称)
+        """
+        with self._lock:
+            self._skeletons.append((event_url, name, spine_version, scale, None))
+            self._regions.extend((event_url, name, page, region) for page, region in regions)
+
+    def set_spine_result(self, event_url: str, name: str, ok: bool):
+        """
+        记录骨骼的Spine处理结果
+        :param event_url: 所属的活动url
+        :param name: 骨骼名称
+        :param ok: 是否成功
+        """
+        with self._lock:
+            self._spine_results.append((int(ok), event_url, name))
+
+    def add_page(self, event_url: str, skeleton: str, name: str, declared_pma: bool, premultiplied: Optional[bool],
+                 converted: bool):
+        """
+        记录一页图片的透明度检查结果
+        :param event_url: 所属的活动url
+        :param skeleton: 所属的骨骼名称
+        :param name: 页面名称
+        :param declared_pma: atlas中的pma
+        :param premultiplied: 检测是否为预乘透明度，无法判断时为None
+        :param converted: 是否已经转换为非预乘
+        """
+        with self._lock:
+            self._pages.append((event_url, skeleton, name, int(declared_pma),
+                                None if premultiplied is None else int(premultiplied), int(converted)))
+
+    def add_asset(self, path: str, digest: str, size: int, kind: str, url: Optional[str] = None,
+                  event_url: Optional[str] = None, skeleton: Optional[str] = None):
+        """
+        :param path: 文件路径，输出到归档时为archive_output.member_path的返回值
+        :param digest: 文件内容的sha256
+        :param size: 文件大小（字节）
+        :param kind: 种类，如page、atlas、json、skel、base64、vendors
+        :param url: 来源url
+        :param event_url: 所属的活动url
+        :param skeleton: 所属的骨骼名称
+        """
+        with self._lock:
+            self._assets.append((_normalize_path(path), digest, size, kind, url, event_url, skeleton))
+
+    def _take(self, event_url: Optional[str]) -> tuple[list, ...]:
+        """
+        取出缓存的记录，调用时需要持有self._lock
+        :param event_url: 只取出这个活动的记录，为None时取出全部
+        :return: 要删除的活动、events、skeletons、spine_results、regions、pages、assets
+        """
+        # 每种记录中活动url所在的位置
+        buffers = ((self._events, 0), (self._skeletons, 0), (self._spine_results, 1), (self._regions, 0),
+                   (self._pages, 0), (self._assets, 5))
+        taken = []
+        if event_url is None:
+            taken.append([(url,) for url in self._reset_events])
+            self._reset_events.clear()
+        else:
+            taken.append([(event_url,)] if event_url in self._reset_events else [])
+            self._reset_events.discard(event_url)
+        for rows, index in buffers:
+            if event_url is None:
+                taken.append(rows[:])
+                rows.clear()
+                continue
+            taken.append([row for row in rows if row[index] == event_url])
+            rows[:] = [row for row in rows if row[index] != event_url]
+        return tuple(taken)
+
+    def flush(self, event_url: Optional[str] = None):
+        """
+        在一个事务中写入缓存的记录。共用一个资源目录同时处理多个活动时，每个活动只写入自己的记录，
+        其他活动扫描过程中缓存的记录要等到它们确定重新处理（reset_event）之后一起写入，不会被之后的删除清掉
+        :param event_url: 只写入这个活动的记录，为None时写入全部
+        """
+        with self._lock:
+            reset_events, events, skeletons, spine_results, regions, pages, assets = self._take(event_url)
+            if not (reset_events or events or skeletons or spine_results or regions or pages or assets):
+                return
+            with self._connection:
+                for table in ("events", "regions", "skeletons", "pages", "assets"):
+                    column = "url" if table == "events" else "event_url"
+                    self._connection.executemany(f"DELETE FROM {table} WHERE {column} = ?", reset_events)
+                self._connection.executemany("INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?, ?, ?)", events)
+                self._connection.executemany("INSERT OR REPLACE INTO skeletons VALUES (?, ?, ?, ?, ?)", skeletons)
+                self._connection.executemany("UPDATE skeletons SET spine_ok = ? WHERE event_url = ? AND name = ?",
+                                             spine_results)
+                self._connection.executemany("INSERT INTO regions VALUES (?, ?, ?, ?)", regions)
+                self._connection.executemany("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)", pages)
+                self._connection.executemany("INSERT OR REPLACE INTO assets VALUES (?, ?, ?, ?, ?, ?, ?)", assets)
+
+    def _query(self, sql: str, parameters: tuple = ()) -> list[tuple]:
+        with self._lock:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def event_up_to_date(self, url: str, vendors_digest: str, options: str = "") -> bool:
+        """
+        判断活动是否已经完整地处理过：vendors.js和设置都没有变化，所有骨骼都处理成功，记录的文件都还在且大小不变
+        :param url: 活动url
+        :param vendors_digest: 本次vendors.js的sha256
+        :param options: 本次影响输出的设置
+        :return: 是否可以跳过
+        """
+        rows = self._query("SELECT dir, projects FROM events WHERE url = ? AND vendors_digest = ? AND options = ?",
+                           (url, vendors_digest, options))
+        # 活动的输出是文件夹或归档
+        if not rows or not os.path.exists(rows[0][0]):
+            return False
+        # 骨骼的记录不完整（如被删除过）时不能跳过，下面对骨骼的检查在没有记录时总是通过
+        skeletons = self._query("SELECT COUNT(*) FROM skeletons WHERE event_url = ?", (url,))[0][0]
+        if skeletons < (rows[0][1] or 0):
+            return False
+        if self._query("SELECT 1 FROM skeletons WHERE event_url = ? AND (spine_ok IS NULL OR spine_ok = 0) LIMIT 1",
+                       (url,)):
+            return False
+        archive_indexes = {}  # 归档 -> 成员的大小，每个归档只读取一次索引
+        for path, size in self._query("SELECT path, size FROM assets WHERE event_url = ?", (url,)):
+            member = split_member_path(path)
+            try:
+                if member is None:
+                    if os.path.getsize(path) != size:
+                        return False
+                    continue
+                archive, name = member
+                if archive not in archive_indexes:
+                    archive_indexes[archive] = {name: entry["size"] for name, entry in
+                                                read_index(archive)["members"].items()}
+                if archive_indexes[archive].get(name) != size:
+                    return False
+            except (OSError, ValueError, KeyError, RuntimeError):
+                return False
+        return True
+
+    def event(self, url: str) -> Optional[tuple]:
+        """
+        :param url: 活动url
+        :return: (url, name, dir, vendors_digest, options, projects, updated)，没有记录时返回None
+        """
+        rows = self._query("SELECT * FROM events WHERE url = ?", (url,))
+        return rows[0] if rows else None
+
+    def find_assets(self, digest: Optional[str] = None, event_url: Optional[str] = None,
+                    skeleton: Optional[str] = None, kind: Optional[str] = None, min_size: Optional[int] = None,
+                    max_size: Optional[int] = None) -> list[CatalogAsset]:
+        """
+        按条件查找文件，条件为None时不限制
+        :param digest: sha256，可以只写前几位
+        :param event_url: 所属的活动url
+        :param skeleton: 所属的骨骼名称
+        :param kind: 种类
+        :param min_size: 最小大小（字节）
+        :param max_size: 最大大小（字节）
+        :return: 文件
+        """
+        conditions = []
+        parameters = []
+        if digest is not None:
+            # 前缀查询也可以使用索引
+            conditions.append("digest >= ? AND digest < ?")
+            parameters += [digest, digest + "g"]
+        for column, value in (("event_url", event_url), ("skeleton", skeleton), ("kind", kind)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                parameters.append(value)
+        if min_size is not None:
+            conditions.append("size >= ?")
+            parameters.append(min_size)
+        if max_size is not None:
+            conditions.append("size <= ?")
+            parameters.append(max_size)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self._query(f"SELECT path, digest, size, kind, url, event_url, skeleton FROM assets{where} "
+                           f"ORDER BY event_url, path", tuple(parameters))
+        return [CatalogAsset(*row) for row in rows]
+
+    def asset(self, path: str) -> Optional[CatalogAsset]:
+        """
+        :param path: 文件路径
+        :return: 这个文件的记录，没有时返回None
+        """
+        rows = self._query("SELECT path, digest, size, kind, url, event_url, skeleton FROM assets WHERE path = ?",
+                           (_normalize_path(path),))
+        return CatalogAsset(*rows[0]) if rows else None
+
+    def events_using(self, digest: str) -> list[str]:
+        """
+        哪些活动用到了这个文件（如同一张atlas页面图片）
+        :param digest: sha256，可以只写前几位
+        :return: 活动url
+        """
+        return sorted({asset.event_url for asset in self.find_assets(digest) if asset.event_url is not None})
+
+    def find_skeletons(self, name: Optional[str] = None, spine_version: Optional[str] = None,
+                       event_url: Optional[str] = None) -> list[CatalogSkeleton]:
+        """
+        按名称、Spine版本或活动查找骨骼，条件为None时不限制
+        :return: 骨骼
+        """
+        conditions = []
+        parameters = []
+        for column, value in (("name", name), ("spine_version", spine_version), ("event_url", event_url)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                parameters.append(value)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self._query(f"SELECT * FROM skeletons{where} ORDER BY event_url, name", tuple(parameters))
+        return [CatalogSkeleton(*row) for row in rows]
+
+    def find_regions(self, name: str) -> list[CatalogRegion]:
+        """
+        哪些骨骼用到了这个区域
+        :param name: 区域名称
+        :return: 区域
+        """
+        rows = self._query("SELECT * FROM regions WHERE name = ? ORDER BY event_url, skeleton", (name,))
+        return [CatalogRegion(*row) for row in rows]
+
+    def find_pages(self, event_url: Optional[str] = None, premultiplied: Optional[bool] = None) -> list[CatalogPage]:
+        """
+        按活动或检测结果查找页面，条件为None时不限制
+        :return: 页面
+        """
+        conditions = []
+        parameters = []
+        for column, value in (("event_url", event_url), ("premultiplied", premultiplied)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                parameters.append(value if column == "event_url" else int(value))
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self._query(f"SELECT * FROM pages{where} ORDER BY event_url, skeleton, name", tuple(parameters))
+        return [CatalogPage(*row[:3], bool(row[3]), None if row[4] is None else bool(row[4]), bool(row[5]))
+                for row in rows]
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="查询所有处理过的活动的资源目录")
+    arg_parser.add_argument("--catalog", default=default_catalog_path(), help="资源目录的路径")
+    arg_parser.add_argument("--asset", metavar="SHA256", help="哪些活动用到了这个文件（可以只写前几位）")
+    arg_parser.add_argument("--skeleton", metavar="NAME", help="按名称查找骨骼")
+    arg_parser.add_argument("--spine-version", metavar="VERSION", help="按Spine版本查找骨骼")
+    arg_parser.add_argument("--region", metavar="NAME", help="哪些骨骼用到了这个区域")
+    arg_parser.add_argument("--event", metavar="URL", help="列出活动中的所有文件")
+    arg_parser.add_argument("--pma", action="store_true", help="列出检测为预乘透明度的页面")
+    args = arg_parser.parse_args()
+    with Catalog(args.catalog) as catalog:
+        if args.asset is not None:
+            for asset in catalog.find_assets(args.asset):
+                print(f"{asset.event_url}\t{asset.kind}\t{asset.path}")
+        if args.skeleton is not None or args.spine_version is not None:
+            for skeleton in catalog.find_skeletons(args.skeleton, args.spine_version):
+                print(f"{skeleton.event_url}\t{skeleton.name}\t{skeleton.spine_version}")
+        if args.region is not None:
+            for region in catalog.find_regions(args.region):
+                print(f"{region.event_url}\t{region.skeleton}\t{region.page}")
+        if args.event is not None:
+            for asset in catalog.find_assets(event_url=args.event):
+                print(f"{asset.kind}\t{asset.size}\t{asset.digest[:12]}\t{asset.path}")
+        if args.pma:
+            for page in catalog.find_pages(premultiplied=True):
+                print(f"{page.event_url}\t{page.skeleton}\t{page.name}\tpma={page.declared_pma}\t"
+                      f"converted={page.converted}")
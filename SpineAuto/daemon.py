@@ -0,0 +1,344 @@
+import argparse
+import itertools
+import json
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from SpineAuto import OUTPUT_FORMATS, EventResult, SpineAutoConfig, SpineAutoSession
+from asset_cache import CACHE_DIR, DEFAULT_MAX_AGE, DEFAULT_MAX_SIZE
+from downloader import DEFAULT_WORKERS
+from metrics import Metrics
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_JOB_WORKERS = 2  # 同时处理的任务数
+DEFAULT_PARSED_MEMORY_ENTRIES = 32  # 在内存中保留的脚本解析结果数
+MAX_FINISHED_JOBS = 1000  # 保留多少个已经结束的任务，更早的不能再查询
+MAX_REQUEST_BODY = 1 << 20
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class Job:
+    """
+    一个提取任务
+    """
+
+    def __init__(self, job_id: int, url: str, force: bool):
+        """
+        :param job_id: 任务id
+        :param url: 页面URL
+        :param force: 忽略缓存，清空已有的文件后重新生成
+        """
+        self.id = job_id
+        self.url = url
+        self.force = force
+        self.state = QUEUED
+        self.submitted = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.result: Optional[EventResult] = None
+        self.error: Optional[str] = None
+        self.metrics = Metrics()  # 这个任务各阶段的耗时
+
+    @property
+    def active(self) -> bool:
+        return self.state in (QUEUED, RUNNING)
+
+    def to_dict(self, detail: bool = False) -> dict:
+        """
+        :param detail: 是否包含各阶段的耗时
+        :return: 任务的状态和耗时
+        """
+        now = time.time()
+        data = {
+            "id": self.id,
+            "url": self.url,
+            "force": self.force,
+            "state": self.state,
+            "submitted": self.submitted,
+            "started": self.started,
+            "finished": self.finished,
+            # 排队和处理的时间，还没有结束时计算到现在
+            "wait": (self.started or now) - self.submitted if self.state != CANCELLED else None,
+            "elapsed": (self.finished or now) - self.started if self.started is not None else None,
+            "result": self.result._asdict() if self.result is not None else None,
+            "error": self.error,
+        }
+        if detail:
+            data["metrics"] = self.metrics.to_dict()
+        return data
+
+
+class ExtractionService:
+    """
+    常驻的提取服务：任务队列加上固定数量的工作线程，所有任务共用一个SpineAutoSession，
+    连接、解析结果和Spine进程池在任务之间一直保留
+    """
+
+    def __init__(self, session: SpineAutoSession, workers: int = DEFAULT_JOB_WORKERS,
+                 max_finished: int = MAX_FINISHED_JOBS):
+        """
+        :param session: 共用的提取会话
+        :param workers: 同时处理的任务数
+        :param max_finished: 保留多少个已经结束的任务
+        """
+        self.session = session
+        self.workers = workers
+        self.max_finished = max_finished
+        self.started = time.time()
+        self._jobs: dict[int, Job] = {}
+        self._active: dict[str, Job] = {}  # 页面URL -> 排队中或处理中的任务，同一个页面不会同时处理两次
+        self._finished: list[int] = []
+        self._ids = itertools.count(1)
+        self._queue: "queue.Queue[Optional[Job]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = [threading.Thread(target=self._work, name=f"spineauto-job-{index}", daemon=True)
+                         for index in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, url: str, force: bool = False) -> tuple[Job, bool]:
+        """
+        添加任务，同一个页面已经在排队或处理中时返回已有的任务
+        :param url: 页面URL
+        :param force: 忽略缓存，清空已有的文件后重新生成
+        :return: 任务，是否为新建的任务
+        """
+        with self._lock:
+            job = self._active.get(url)
+            if job is not None:
+                return job, False
+            job = Job(next(self._ids), url, force)
+            self._jobs[job.id] = job
+            self._active[url] = job
+        self._queue.put(job)
+        return job, True
+
+    def get(self, job_id: int) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> list[Job]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id: int) -> bool:
+        """
+        取消还在排队的任务，已经开始的任务不能取消
+        :param job_id: 任务id
+        :return: 是否取消成功
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.state != QUEUED:
+                return False
+            job.state = CANCELLED
+            job.finished = time.time()
+            self._finish(job)
+        return True
+
+    def status(self) -> dict:
+        """
+        :return: 服务的状态：各状态的任务数和共用的性能数据
+        """
+        with self._lock:
+            states = {state: 0 for state in (QUEUED, RUNNING, DONE, FAILED, CANCELLED)}
+            for job in self._jobs.values():
+                states[job.state] += 1
+        return {"uptime": time.time() - self.started, "workers": self.workers, "jobs": states,
+                "metrics": self.session.metrics.to_dict()}
+
+    def close(self):
+        """
+        等待正在处理的任务结束后停止工作线程，排队中的任务会被取消
+        """
+        with self._lock:
+            for job in self._jobs.values():
+                if job.state == QUEUED:
+                    job.state = CANCELLED
+                    job.finished = time.time()
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            with self._lock:
+                if job.state != QUEUED:
+                    continue
+                job.state = RUNNING
+                job.started = time.time()
+            try:
+                result = self.session.extract(job.url, job.force, job.metrics)
+            except Exception as e:
+                result = None
+                error = f"{type(e).__name__}: {e}"
+            else:
+                error = None
+            self.session.metrics.merge(job.metrics)
+            # 每个任务结束后保存缓存的索引，服务意外退出时不会丢失
+            self.session.save()
+            with self._lock:
+                job.result = result
+                job.error = error
+                job.state = FAILED if error is not None else DONE
+                job.finished = time.time()
+                self._finish(job)
+
+    def _finish(self, job: Job):
+        # 调用时已经持有_lock
+        if self._active.get(job.url) is job:
+            del self._active[job.url]
+        self._finished.append(job.id)
+        while len(self._finished) > self.max_finished:
+            self._jobs.pop(self._finished.pop(0), None)
+
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP/JSON接口：
+    POST /jobs {"url": ..., "force": false} 添加任务；GET /jobs 所有任务；GET /jobs/{id} 任务的状态和各阶段耗时；
+    DELETE /jobs/{id} 取消排队中的任务；GET /status 服务状态；GET /metrics Prometheus文本格式的性能数据
+    """
+    server: "ServiceServer"
+
+    def do_GET(self):
+        service = self.server.service
+        path = self.path.split("?", 1)[0].rstrip("/")
+        if path == "/jobs":
+            self._send_json(200, [job.to_dict() for job in service.jobs()])
+        elif path == "/status":
+            self._send_json(200, service.status())
+        elif path == "/metrics":
+            self._send(200, service.session.metrics.to_prometheus().encode("utf-8"), "text/plain; version=0.0.4")
+        else:
+            job = self._job(path)
+            if job is not None:
+                self._send_json(200, job.to_dict(detail=True))
+
+    def do_POST(self):
+        if self.path.split("?", 1)[0].rstrip("/") != "/jobs":
+            self._send_json(404, {"error": "not found"})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_REQUEST_BODY:
+            self._send_json(413, {"error": "request body too large"})
+            return
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": "invalid JSON"})
+            return
+        url = body.get("url") if isinstance(body, dict) else None
+        if not isinstance(url, str) or not url.startswith(("http://", "https://")):
+            self._send_json(400, {"error": "url is required"})
+            return
+        job, created = self.server.service.submit(url, bool(body.get("force", False)))
+        self._send_json(202 if created else 200, job.to_dict())
+
+    def do_DELETE(self):
+        job = self._job(self.path.split("?", 1)[0].rstrip("/"))
+        if job is None:
+            return
+        if self.server.service.cancel(job.id):
+            self._send_json(200, job.to_dict())
+        else:
+            self._send_json(409, {"error": f"job is {job.state}"})
+
+    def _job(self, path: str) -> Optional[Job]:
+        # /jobs/{id}，找不到时已经返回404
+        prefix, _, job_id = path.rpartition("/")
+        job = self.server.service.get(int(job_id)) if prefix == "/jobs" and job_id.isdigit() else None
+        if job is None:
+            self._send_json(404, {"error": "not found"})
+        return job
+
+    def _send_json(self, status: int, data):
+        self._send(status, json.dumps(data, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8")
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class ServiceServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], service: ExtractionService, verbose: bool = False):
+        """
+        :param address: 监听的主机和端口
+        :param service: 提取服务
+        :param verbose: 是否输出每个请求
+        """
+        super().__init__(address, ServiceRequestHandler)
+        self.service = service
+        self.verbose = verbose
+
+
+def serve(config: SpineAutoConfig, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+          workers: int = DEFAULT_JOB_WORKERS, verbose: bool = False):
+    """
+    启动常驻服务，直到Ctrl+C
+    :param config: 提取的设置
+    :param host: 监听的主机，默认只允许本机访问
+    :param port: 监听的端口
+    :param workers: 同时处理的任务数
+    :param verbose: 是否输出每个请求
+    """
+    with SpineAutoSession(config) as session:
+        service = ExtractionService(session, workers)
+        with ServiceServer((host, port), service, verbose) as server:
+            print(f"SpineAuto服务已启动：http://{host}:{server.server_address[1]}/")
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                ...
+            finally:
+                service.close()
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="常驻的SpineAuto提取服务（HTTP/JSON接口）")
+    arg_parser.add_argument("--host", default=DEFAULT_HOST, help="监听的主机")
+    arg_parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="监听的端口")
+    arg_parser.add_argument("--jobs", type=int, default=DEFAULT_JOB_WORKERS, help="同时处理的任务数")
+    arg_parser.add_argument("-o", "--output", default=".", help="输出目录")
+    arg_parser.add_argument("--downloads", type=int, default=DEFAULT_WORKERS, help="同时下载的文件数")
+    arg_parser.add_argument("--spine-workers", type=int, default=SpineAutoConfig().spine_workers,
+                            help="同时运行的Spine进程数")
+    arg_parser.add_argument("--low-memory", action="store_true", default=SpineAutoConfig().low_memory,
+                            help="低内存模式，内联图片边扫描边保存，适合很大的vendors.js")
+    arg_parser.add_argument("--cache-dir", default=CACHE_DIR, help="缓存目录")
+    arg_parser.add_argument("--cache-max-size", type=int, default=DEFAULT_MAX_SIZE >> 20, help="缓存的最大体积（MB）")
+    arg_parser.add_argument("--cache-max-age", type=float, default=DEFAULT_MAX_AGE / 86400,
+                            help="多久没有用到的缓存会被清理（天）")
+    arg_parser.add_argument("--parsed-cache", type=int, default=DEFAULT_PARSED_MEMORY_ENTRIES,
+                            help="在内存中保留多少个脚本的解析结果")
+    arg_parser.add_argument("--output-format", choices=OUTPUT_FORMATS, default=SpineAutoConfig().output_format,
+                            help="输出格式：dir为文件夹，zip、tar、tar.zst为每个活动一个归档")
+    arg_parser.add_argument("-v", "--verbose", action="store_true", help="输出每个请求")
+    args = arg_parser.parse_args()
+    serve(SpineAutoConfig(output_root=args.output, download_workers=args.downloads, spine_workers=args.spine_workers,
+                          low_memory=args.low_memory, cache_dir=args.cache_dir,
+                          cache_max_size=args.cache_max_size << 20, cache_max_age=args.cache_max_age * 86400,
+                          parsed_memory_entries=args.parsed_cache, output_format=args.output_format),
+          args.host, args.port, args.jobs, args.verbose)
@@ -0,0 +1,474 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterable, Optional, TYPE_CHECKING
+from urllib.parse import urlsplit
+
+from metrics import Metrics
+
+if TYPE_CHECKING:
+    # requests和rich在创建下载器、显示进度时才导入，缩短启动时间
+    import requests
+    from rich.progress import Progress, TaskID
+
+DEFAULT_WORKERS = 8  # 同时下载的文件数
+DEFAULT_TIMEOUT = (10, 60)  # 连接超时、读取超时（秒）
+DEFAULT_RETRIES = 4  # 失败后的重试次数
+DEFAULT_BACKOFF = 0.5  # 第一次重试前等待的秒数，之后每次翻倍
+DEFAULT_HOST_INTERVAL = 0.02  # 同一个域名两次请求之间的最小间隔（秒）
+CHUNK_SIZE = 1 << 16
+DOWNLOAD_STATE_NAME = "downloads.json"
+
+# 重试这些状态码，其余的4xx直接判定失败
+RETRY_STATUS = frozenset((408, 425, 429, 500, 502, 503, 504))
+
+# 文件名中的hash，如images/role.0a1b2c3d..png、role.0a1b2c.png
+EMBEDDED_HASH_RE = re.compile(r"\.([0-9a-f]{6,64})\.+[A-Za-z0-9]+$")
+
+# digest为文件内容hash的前几位（一般取自文件名），下载后用它校验，为None时不校验
+DownloadJob = namedtuple("DownloadJob", ["url", "path", "digest"], defaults=(None,))
+DownloadResult = namedtuple("DownloadResult", ["job", "ok", "size", "elapsed", "error"])
+
+
+class DownloadError(Exception):
+    def __init__(self, url: str, reason: str, status: Optional[int] = None):
+        super().__init__(f"{url}: {reason}")
+        self.url = url
+        self.reason = reason
+        self.status = status  # 服务器返回错误状态码时的状态码
+
+
+def embedded_hash(url: str) -> Optional[str]:
+    """
+    取出文件名中的hash
+    :param url: url或文件名
+    :return: hash，文件名中没有时返回None
+    """
+    match = EMBEDDED_HASH_RE.search(urlsplit(url).path)
+    return None if match is None else match.group(1)
+
+
+def _hash_available(name: str) -> bool:
+    try:
+        hashlib.new(name)
+    except ValueError:
+        return False
+    return True
+
+
+# 文件名中的hash可能使用的算法（webpack默认为md4，部分OpenSSL不提供md4）
+EMBEDDED_HASH_ALGORITHMS = tuple(name for name in ("md5", "md4", "sha1", "sha256") if _hash_available(name))
+
+
+# 完整hash的长度，文件名中的hash是这个长度时一定是上面的某种算法
+FULL_DIGEST_LENGTHS = frozenset(hashlib.new(name).digest_size * 2 for name in EMBEDDED_HASH_ALGORITHMS)
+
+
+def match_digest(path: str, digest: str) -> Optional[str]:
+    """
+    校验文件内容
+    :param path: 文件路径
+    :param digest: 文件内容hash的前几位
+    :return: hash以digest开头的算法，都对不上时返回None
+    """
+    hashes = [hashlib.new(name) for name in EMBEDDED_HASH_ALGORITHMS]
+    with open(path, "rb") as fp:
+        for chunk in iter(lambda: fp.read(CHUNK_SIZE), b""):
+            for content_hash in hashes:
+                content_hash.update(chunk)
+    digest = digest.lower()
+    return next((content_hash.name for content_hash in hashes if content_hash.hexdigest().startswith(digest)), None)
+
+
+def verify_file(path: str, digest: str) -> bool:
+    """
+    校验文件内容
+    :param path: 文件路径
+    :param digest: 文件内容hash的前几位
+    :return: 是否有一种算法的hash以digest开头
+    """
+    return match_digest(path, digest) is not None
+
+
+def _source(url: str) -> str:
+    # 同一个域名、同一个目录下的文件使用同一种hash算法
+    parts = urlsplit(url)
+    return parts.netloc + parts.path.rsplit("/", 1)[0]
+
+
+class DownloadState:
+    """
+    保存在磁盘上的校验记录：每个来源（域名+目录）校验成功过的hash算法，以及无法校验的文件。
+    来源有已知的算法、或者文件名中是完整长度的hash时，内容对不上一定是下载出错；
+    只有hash无法识别（如xxhash64）的文件才不校验，记录下来之后不会每次都重新下载
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        :param path: 记录文件的路径，为None时只保存在内存中
+        """
+        self.path = path
+        self.schemes: dict[str, str] = {}  # 来源 -> hash算法
+        # 文件名中的hash -> [大小, 修改时间(ns)]，按hash记录，改名、移动之后仍然有效
+        self.unverifiable: dict[str, list] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        if path is not None:
+            try:
+                with open(path, "r", encoding="utf-8") as fp:
+                    state = json.load(fp)
+                self.schemes = state.get("schemes", {})
+                self.unverifiable = state.get("unverifiable", {})
+            except (FileNotFoundError, json.JSONDecodeError):
+                pass
+
+    def recognised(self, url: str, digest: str) -> bool:
+        """
+        :param url: 文件的url
+        :param digest: 文件名中的hash
+        :return: 是否知道这个hash使用的算法，知道时内容对不上说明文件损坏
+        """
+        return len(digest) in FULL_DIGEST_LENGTHS or _source(url) in self.schemes
+
+    def learn(self, url: str, algorithm: str):
+        """
+        记录来源使用的hash算法
+        :param url: 校验成功的文件的url
+        :param algorithm: 校验成功的算法
+        """
+        source = _source(url)
+        with self._lock:
+            if self.schemes.get(source) != algorithm:
+                self.schemes[source] = algorithm
+                self._dirty = True
+
+    def mark_unverifiable(self, path: str, digest: str):
+        """
+        记录无法校验的文件，文件大小和修改时间不变时认为仍然完整
+        :param path: 文件路径
+        :param digest: 文件名中的hash
+        """
+        stat = os.stat(path)
+        with self._lock:
+            self.unverifiable[digest] = [stat.st_size, stat.st_mtime_ns]
+            self._dirty = True
+
+    def discard(self, digest: str):
+        """
+        删除无法校验的记录
+        :param digest: 文件名中的hash
+        """
+        with self._lock:
+            if self.unverifiable.pop(digest, None) is not None:
+                self._dirty = True
+
+    def is_unverifiable(self, path: str, digest: str) -> bool:
+        """
+        :param path: 文件路径
+        :param digest: 文件名中的hash
+        :return: 文件是否记录为无法校验，且记录之后没有变化
+        """
+        record = self.unverifiable.get(digest)
+        if record is None:
+            return False
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        return record == [stat.st_size, stat.st_mtime_ns]
+
+    def save(self):
+        """
+        有变化时写入记录文件
+        """
+        with self._lock:
+            if self.path is None or not self._dirty:
+                return
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path + ".tmp", "w", encoding="utf-8") as fp:
+                json.dump({"schemes": self.schemes, "unverifiable": self.unverifiable}, fp, ensure_ascii=False)
+            os.replace(self.path + ".tmp", self.path)
+            self._dirty = False
+
+
+class HostRateLimiter:
+    """
+    按域名限速，保证同一个域名两次请求之间至少间隔interval秒
+    """
+
+    def __init__(self, interval: float = DEFAULT_HOST_INTERVAL):
+        self.interval = interval
+        self._next_time: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url: str):
+        """
+        等待直到可以向url所在的域名发起请求
+        :param url: 请求的url
+        """
+        if self.interval <= 0:
+            return
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_time.get(host, now))
+            self._next_time[host] = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class Downloader:
+    """
+    带连接池的并发下载器，支持重试（指数退避）、按域名限速、流式写入磁盘、断点续传和hash校验
+    """
+
+    def __init__(self, headers: Optional[dict[str, str]] = None, workers: int = DEFAULT_WORKERS,
+                 timeout: tuple[float, float] = DEFAULT_TIMEOUT, retries: int = DEFAULT_RETRIES,
+                 backoff: float = DEFAULT_BACKOFF, host_interval: float = DEFAULT_HOST_INTERVAL,
+                 metrics: Optional[Metrics] = None, state_path: Optional[str] = None):
+        """
+        :param headers: 每个请求都会带上的请求头
+        :param workers: 最大并发数
+        :param timeout: 连接超时、读取超时（秒）
+        :param retries: 失败后的重试次数
+        :param backoff: 第一次重试前等待的秒数，之后每次翻倍
+        :param host_interval: 同一个域名两次请求之间的最小间隔（秒）
+        :param metrics: 记录请求耗时和下载字节数
+        :param state_path: 校验记录（见DownloadState）的保存路径，为None时不保存
+        """
+        self.workers = workers
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.rate_limiter = HostRateLimiter(host_interval)
+        self.state = DownloadState(state_path)
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if headers is not None:
+            self.session.headers.update(headers)
+        # 多个任务共用一个下载器时，总并发数仍然不超过workers
+        self._slots = threading.BoundedSemaphore(workers)
+        # 同一个url只下载一次：url -> 已下载完成的文件路径
+        self._url_locks: dict[str, threading.Lock] = {}
+        self._downloaded: dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.state.save()
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def get(self, url: str, **kwargs) -> "requests.Response":
+        """
+        带重试的GET请求
+        :param url: url
+        :param kwargs: 传给requests的其他参数
+        :return: 响应
+        """
+        return self.request("GET", url, **kwargs)
+
+    def head(self, url: str, **kwargs) -> "requests.Response":
+        """
+        带重试的HEAD请求，只获取响应头
+        :param url: url
+        :param kwargs: 传给requests的其他参数
+        :return: 响应
+        """
+        return self.request("HEAD", url, **kwargs)
+
+    def request(self, method: str, url: str, retries: Optional[int] = None, **kwargs) -> "requests.Response":
+        """
+        带重试的请求，状态码为4xx、5xx时抛出DownloadError
+        :param method: 请求方法
+        :param url: url
+        :param retries: 重试次数，不传时使用self.retries
+        :param kwargs: 传给requests的其他参数
+        :return: 响应
+        """
+        import requests
+        kwargs.setdefault("timeout", self.timeout)
+        if retries is None:
+            retries = self.retries
+        for attempt in range(retries + 1):
+            self.rate_limiter.wait(url)
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.metrics.count("http_errors")
+                if attempt == retries:
+                    raise DownloadError(url, str(e)) from e
+            else:
+                # stream=True时只包含收到响应头之前的时间
+                self.metrics.observe("http_request_seconds", time.perf_counter() - start)
+                if attempt > 0:
+                    self.metrics.count("http_retries_succeeded")
+                if response.status_code < 400:
+                    return response
+                response.close()
+                if response.status_code not in RETRY_STATUS or attempt == retries:
+                    raise DownloadError(url, f"HTTP {response.status_code}", response.status_code)
+            time.sleep(self.backoff * (2 ** attempt))
+        raise DownloadError(url, "重试次数用尽")
+
+    def is_verified(self, path: str, digest: str) -> bool:
+        """
+        已经存在的文件是否完整：内容与hash一致，或者之前记录为无法校验且没有变化
+        :param path: 文件路径
+        :param digest: 文件名中的hash
+        """
+        return os.path.isfile(path) and (self.state.is_unverifiable(path, digest) or verify_file(path, digest))
+
+    def download(self, job: DownloadJob) -> DownloadResult:
+        """
+        下载一个文件，同一个url已经下载过时直接复制；
+        任务带有digest且目标文件已经存在、校验通过时不再下载
+        :param job: 下载任务
+        :return: 下载结果
+        """
+        with self._lock:
+            url_lock = self._url_locks.setdefault(job.url, threading.Lock())
+        with url_lock:
+            if job.digest is not None and self.is_verified(job.path, job.digest):
+                self.metrics.count("download_verified_skips")
+                self._downloaded[job.url] = job.path
+                return DownloadResult(job, True, os.path.getsize(job.path), 0.0, None)
+            downloaded = self._downloaded.get(job.url)
+            if downloaded is not None and os.path.isfile(downloaded):
+                start = time.perf_counter()
+                if os.path.abspath(downloaded) != os.path.abspath(job.path):
+                    shutil.copyfile(downloaded, job.path)
+                return DownloadResult(job, True, os.path.getsize(job.path), time.perf_counter() - start, None)
+            with self._slots:
+                result = self._download(job)
+            if result.ok:
+                self._downloaded[job.url] = job.path
+            return result
+
+    def _download(self, job: DownloadJob) -> DownloadResult:
+        # 先写入.part文件，完成并校验后再替换目标文件；失败时保留.part，下次用Range请求从断开的位置继续
+        start = time.perf_counter()
+        part_path = f"{job.path}.part"
+        size = 0
+        unverifiable = False
+        try:
+            for _ in range(2):
+                transferred, resumed = self._fetch_part(job.url, part_path)
+                size += transferred
+                if job.digest is None:
+                    break
+                algorithm = match_digest(part_path, job.digest)
+                if algorithm is not None:
+                    self.state.learn(job.url, algorithm)
+                    break
+                if not resumed and not self.state.recognised(job.url, job.digest):
+                    # 一次完整下载的内容也对不上，且不知道这个来源使用的算法，说明文件名中的hash不是支持的算法
+                    # （如xxhash64），无法校验
+                    unverifiable = True
+                    self.metrics.count("download_unverified")
+                    break
+                # 内容与hash不一致（续传时服务器上的文件已经变化，或者传输出错），删除后完整地重新下载一次
+                os.remove(part_path)
+                self.metrics.count("download_corrupt")
+            else:
+                raise DownloadError(job.url, f"内容与hash {job.digest} 不一致")
+            os.replace(part_path, job.path)
+            if unverifiable:
+                self.state.mark_unverifiable(job.path, job.digest)
+            elif job.digest is not None:
+                self.state.discard(job.digest)
+            self.metrics.count("download_bytes", size)
+        except (DownloadError, OSError) as e:
+            return DownloadResult(job, False, size, time.perf_counter() - start, str(e))
+        return DownloadResult(job, True, size, time.perf_counter() - start, None)
+
+    def _fetch_part(self, url: str, part_path: str) -> tuple[int, bool]:
+        """
+        把url的内容下载到part_path，已经有一部分时用Range请求续传。
+        请求本身不重试，请求失败和传输中断都在这里重试，续传时从已经收到的位置继续
+        :param url: url
+        :param part_path: .part文件的路径
+        :return: 本次传输的字节数，以及是否使用了之前下载的部分
+        """
+        import requests
+        size = 0
+        resumed = False
+        for attempt in range(self.retries + 1):
+            offset = os.path.getsize(part_path) if os.path.isfile(part_path) else 0
+            headers = {"Range": f"bytes={offset}-"} if offset else None
+            try:
+                with self.request("GET", url, retries=0, stream=True, headers=headers) as response:
+                    mode = "wb"
+                    if offset and response.status_code == 206:
+                        if not response.headers.get("Content-Range", "").startswith(f"bytes {offset}-"):
+                            # 返回的不是请求的范围，丢弃已有的部分从头下载
+                            os.remove(part_path)
+                            continue
+                        mode = "ab"
+                        self.metrics.count("download_resumed")
+                    # 服务器不支持Range时返回200和完整内容，从头写入
+                    resumed = mode == "ab"
+                    # 压缩传输时Content-Length是压缩后的大小，无法与写入的字节数比较
+                    expected = None if "Content-Encoding" in response.headers else \
+                        response.headers.get("Content-Length")
+                    written = 0
+                    with open(part_path, mode) as fp:
+                        for chunk in response.iter_content(CHUNK_SIZE):
+                            fp.write(chunk)
+                            written += len(chunk)
+                            size += len(chunk)
+                    if expected is not None and written != int(expected):
+                        raise DownloadError(url, f"只收到{written}/{expected}字节")
+                return size, resumed
+            except DownloadError as e:
+                if offset and e.status == 416:
+                    # 请求的范围超出文件大小，.part已经是完整的内容
+                    return size, True
+                # 状态码为None时是连接失败或传输不完整
+                if e.status is not None and e.status not in RETRY_STATUS or attempt == self.retries:
+                    raise
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                # 传输过程中断开，已经收到的部分保留在.part中
+                if attempt == self.retries:
+                    raise DownloadError(url, str(e)) from e
+            time.sleep(self.backoff * (2 ** attempt))
+        raise DownloadError(url, "重试次数用尽")
+
+    def download_all(self, jobs: Iterable[DownloadJob], progress: Optional["Progress"] = None,
+                     task_id: Optional["TaskID"] = None) -> list[DownloadResult]:
+        """
+        并发下载多个文件
+        :param jobs: 下载任务
+        :param progress: 进度条，每完成一个文件前进一格
+        :param task_id: 进度条任务
+        :return: 下载结果，顺序与jobs一致
+        """
+        jobs = list(jobs)
+        if progress is not None and task_id is not None:
+            progress.update(task_id, total=len(jobs), completed=0)
+        results: list[Optional[DownloadResult]] = [None] * len(jobs)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self.download, job): index for index, job in enumerate(jobs)}
+            for future in as_completed(futures):
+                result = future.result()
+                results[futures[future]] = result
+                if progress is not None and task_id is not None:
+                    progress.update(task_id, advance=1,
+                                    description=f"下载{os.path.basename(result.job.path)}...")
+        return results
@@ -0,0 +1,64 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+from atlas import parse_atlas
+
+REGION_MARKER = b"fake-spine-region"
+
+
+def main(argv: list[str]) -> int:
+    """
+    假的Spine命令行，用于测试SpineWorkerPool和离线性能测试，不需要安装Spine。
+    用fixtures.fake_spine生成调用它的可执行文件，参数与Spine命令行一致：
+    -u 版本 -i 输入 -o 输出 -c atlas    解开图片：每个区域写入一个内容为REGION_MARKER的图片
+    -u 版本 -i 输入 -o 输出 -s 缩放 -r json    导入：写入内容为JSON的项目文件
+    --config指定的JSON中可以设置调用记录的路径（log，每次调用追加一行JSON）、
+    指定项目的某一步返回的退出码和stderr（failures，{"项目/步骤": [退出码, stderr]}）、
+    以及解开图片时不输出的区域（missing_regions，{"项目": [区域名称]}）
+    :param argv: 命令行参数
+    :return: 退出码
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--config")
+    parser.add_argument("-x")
+    parser.add_argument("-u")
+    parser.add_argument("-i")
+    parser.add_argument("-o")
+    parser.add_argument("-c")
+    parser.add_argument("-s")
+    parser.add_argument("-r")
+    args = parser.parse_args(argv)
+    config = {}
+    if args.config is not None:
+        with open(args.config, "r", encoding="utf-8") as fp:
+            config = json.load(fp)
+    step = "unpack" if args.c is not None else "import"
+    source = args.c if args.c is not None else args.r
+    project = os.path.splitext(os.path.basename(source or ""))[0]
+    if config.get("log"):
+        with open(config["log"], "a", encoding="utf-8") as fp:
+            fp.write(json.dumps({"project": project, "step": step, "version": args.u, "time": time.time()}) + "\n")
+    failure = config.get("failures", {}).get(f"{project}/{step}")
+    if failure is not None:
+        returncode, stderr = failure
+        sys.stderr.write(stderr)
+        return returncode
+    if step == "unpack":
+        with open(args.c, "r", encoding="utf-8") as fp:
+            atlas = parse_atlas(fp.read())
+        missing = set(config.get("missing_regions", {}).get(project, ()))
+        for region in atlas.iter_regions():
+            if region.name not in missing:
+                with open(os.path.join(args.o, f"{region.name}.png"), "wb") as fp:
+                    fp.write(REGION_MARKER)
+    else:
+        with open(args.o, "w", encoding="utf-8") as fp:
+            json.dump({"json": args.r, "scale": float(args.s)}, fp)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
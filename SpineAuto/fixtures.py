@@ -0,0 +1,314 @@
+import base64
+import functools
+import json
+import os
+import random
+import re
+import struct
+import sys
+import threading
+import time
+import zlib
+from collections import namedtuple
+from contextlib import contextmanager
+from hashlib import md5
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, Optional
+
+# 生成的假先行展示页
+PreviewFixture = namedtuple("PreviewFixture", ["root", "index_path", "vendors_path", "heroes", "vendors_size",
+                                               "chunk_paths"], defaults=((),))
+
+FAKE_SPINE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_spine.py")
+RANGE_RE = re.compile(r"bytes=(\d+)-")
+
+VENDORS_BANNER = "/*! For license information please see vendors.LICENSE.txt */\n"
+# webpack 4的运行时，n.u拼出按需加载的分块地址
+APP_RUNTIME = ('!function(e){{var t={{}};function n(r){{if(t[r])return t[r].exports;var o=t[r]={{exports:{{}}}};'
+               'return e[r].call(o.exports,o,o.exports,n),o.exports}}n.p="";n.u=function(e){{return"js/"+'
+               '({names}[e]||e)+"."+{hashes}[e]+".js"}};n("app-main")}}({{{modules}}});')
+
+
+def png_bytes(width: int, height: int, seed: int = 0, noise: bool = False) -> bytes:
+    """
+    生成一张RGBA的PNG，每行一种颜色，不依赖Pillow
+    :param width: 宽
+    :param height: 高
+    :param seed: 决定颜色
+    :param noise: 使用随机像素，生成的图片几乎无法压缩，体积接近width * height * 4
+    :return: PNG文件内容
+    """
+    if noise:
+        rng = random.Random(seed)
+        raw = b"".join(b"\x00" + rng.randbytes(width * 4) for _ in range(height))
+    else:
+        raw = b"".join(b"\x00" + bytes(((y * 3 + seed) & 255, (y * 5 + seed * 7) & 255, seed & 255, 255)) * width
+                       for y in range(height))
+
+    def chunk(chunk_type: bytes, data: bytes) -> bytes:
+        return (struct.pack(">I", len(data)) + chunk_type + data +
+                struct.pack(">I", zlib.crc32(chunk_type + data) & 0xffffffff))
+
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)) +
+            chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b""))
+
+
+def js_string(text: str) -> str:
+    """
+    转义为双引号js字符串的内容（不含引号）
+    :param text: 原文
+    :return: 转义后的文本
+    """
+    return text.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def synthetic_hero_atlas(name: str, page_size: int, regions: int) -> tuple[str, list[str]]:
+    """
+    生成一个单页的3.x格式atlas，区域按网格排列，每隔几个旋转一次
+    :param name: 页名称
+    :param page_size: 页的边长
+    :param regions: 区域数量
+    :return: atlas文本和所有区域名称
+    """
+    grid = 1
+    while grid * grid < regions:
+        grid += 1
+    cell = page_size // grid
+    lines = [f"{name}.png", f"size: {page_size},{page_size}", "format: RGBA8888", "filter: Linear,Linear",
+             "repeat: none", "scale: 0.5"]
+    region_names = []
+    for index in range(regions):
+        region_name = f"{name}_part{index}"
+        region_names.append(region_name)
+        lines += [region_name, f"  rotate: {'true' if index % 5 == 4 else 'false'}",
+                  f"  xy: {index % grid * cell}, {index // grid * cell}", f"  size: {cell - 2}, {cell - 2}",
+                  f"  orig: {cell}, {cell}", "  offset: 1, 1", "  index: -1"]
+    return "\n".join(lines) + "\n", region_names
+
+
+def synthetic_skeleton(region_names: list[str], bones: int) -> str:
+    """
+    生成一个引用了所有区域的骨骼JSON
+    :param region_names: 区域名称
+    :param bones: 骨骼数量
+    :return: 紧凑格式的JSON
+    """
+    skeleton = {
+        "skeleton": {"hash": "fixture", "spine": "4.0-from-3.8.99", "x": -100, "y": -100, "width": 200,
+                     "height": 200, "images": "./images/", "audio": ""},
+        "bones": [{"name": "root"}] + [{"name": f"bone{i}", "parent": "root", "x": i * 0.5, "y": -i * 0.25,
+                                        "rotation": i % 360} for i in range(bones)],
+        "slots": [{"name": name, "bone": f"bone{i % bones}" if bones else "root", "attachment": name}
+                  for i, name in enumerate(region_names)],
+        "skins": [{"name": "default", "attachments": {
+            name: {name: {"x": 0.5, "y": -0.5, "width": 30, "height": 30}} for name in region_names}}],
+        "animations": {"idle": {"bones": {f"bone{i}": {"rotate": [{"time": 0}, {"time": 1, "angle": 5}]}
+                                          for i in range(bones)}}},
+    }
+    return json.dumps(skeleton, separators=(",", ":"))
+
+
+def filler_module(rng: random.Random) -> str:
+    """
+    生成一个与Spine无关的模块，用于把vendors.js填充到指定大小
+    :param rng: 随机数生成器
+    :return: 模块代码
+    """
+    names = "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(8))
+    return (f'function(e,t,n){{"use strict";var r=n({rng.randrange(1000)}),o=r.{names};'
+            f'e.exports=function(t,a){{if(!t)throw new Error("{names} is not defined");'
+            f'for(var i=0;i<a.length;i++)o(t,a[i]/{rng.randrange(1, 9)});return t}}}}')
+
+
+def _js_object(entries: dict[int, str]) -> str:
+    return "{" + ",".join(f'{key}:"{value}"' for key, value in entries.items()) + "}"
+
+
+def generate_preview_site(root: str, title: str = "测试活动", heroes: int = 20, regions: int = 16,
+                          bones: int = 32, page_size: int = 256, data_uris: int = 8,
+                          data_uri_size: int = 64, data_uri_noise: bool = False, vendors_size: int = 0,
+                          chunks: int = 0, seed: int = 0) -> PreviewFixture:
+    """
+    生成一个离线的先行展示页：index.html、webpack打包的vendors.js和所有页面图片。
+    vendors.js的格式与线上一致，当前实现和SpineAutoBackup.py都可以解析
+    :param root: 输出目录
+    :param title: 页面标题，也是提取结果的文件夹名
+    :param heroes: Spine项目数量，每个项目一页
+    :param regions: 每个项目的区域数量
+    :param bones: 每个骨骼JSON的骨骼数量
+    :param page_size: 页面图片的边长
+    :param data_uris: 内联图片的数量
+    :param data_uri_size: 内联图片的边长
+    :param data_uri_noise: 内联图片是否使用随机像素（体积大，用于测试内存占用）
+    :param vendors_size: vendors.js的最小大小（字节），不足时用无关模块填充
+    :param chunks: 按需加载的分块数量，大于0时项目轮流放在vendors.js和各个分块中，页面还会引用带webpack运行时的app.js。
+    分块使用字符串id的模块表，atlas和骨骼JSON有相邻、JSON在前、中间隔着其他模块（由app.js中的模块同时引用）几种排列
+    :param seed: 随机数种子，相同参数和种子生成的内容完全一致
+    :return: 生成结果
+    """
+    rng = random.Random(seed)
+    os.makedirs(os.path.join(root, "images"), exist_ok=True)
+    os.makedirs(os.path.join(root, "js"), exist_ok=True)
+    modules = []
+    hero_names = []
+    chunk_modules: list[list[tuple[str, str]]] = [[] for _ in range(chunks)]  # 分块 -> (模块id, 模块代码)
+    app_modules = [("app-main", 'function(e,t,n){"use strict";e.exports=[]}')]
+    for index in range(heroes):
+        name = f"hero{index}"
+        hero_names.append(name)
+        page = png_bytes(page_size, page_size, seed + index)
+        page_hash = md5(page).hexdigest()[:8]
+        with open(os.path.join(root, "images", f"{name}.{page_hash}..png"), "wb") as fp:
+            fp.write(page)
+        atlas, region_names = synthetic_hero_atlas(name, page_size, regions)
+        atlas_module = f'function(e,t){{e.exports="{js_string(atlas)}"}}'
+        skeleton_module = f"function(e){{e.exports=JSON.parse('{synthetic_skeleton(region_names, bones)}')}}"
+        image_module = f'function(e,t,n){{e.exports=n.p+"images/{name}.{page_hash}..png"}}'
+        target = index % (chunks + 1)
+        if target == 0:
+            # 骨骼JSON紧跟在atlas之后，与线上的打包结果一致
+            modules.append(f"{atlas_module},{skeleton_module}")
+            modules.append(image_module)
+            continue
+        layout = index // (chunks + 1) % 3
+        if layout == 0:
+            chunk_modules[target - 1] += [(f"{name}-atlas", atlas_module), (f"{name}-json", skeleton_module)]
+        elif layout == 1:
+            chunk_modules[target - 1] += [(f"{name}-json", skeleton_module), (f"{name}-atlas", atlas_module)]
+        else:
+            chunk_modules[target - 1] += [(f"{name}-atlas", atlas_module), (f"{name}-util", filler_module(rng)),
+                                          (f"{name}-json", skeleton_module)]
+            app_modules.append((name, f'function(e,t,n){{var a=n("{name}-atlas"),s=n("{name}-json");'
+                                      f'e.exports={{atlas:a,skeleton:s}}}}'))
+        chunk_modules[target - 1].append((f"{name}-image", image_module))
+    for index in range(data_uris):
+        image = base64.b64encode(png_bytes(data_uri_size, data_uri_size, seed + 1000 + index, data_uri_noise)).decode("ascii")
+        modules.append(f'function(e,t){{e.exports="data:image/png;base64,{image}"}}')
+    length = len(VENDORS_BANNER) + sum(len(module) + 1 for module in modules)
+    while length < vendors_size:
+        module = filler_module(rng)
+        # 插入到随机位置，atlas和骨骼JSON之间不会插入
+        modules.insert(rng.randrange(len(modules) + 1), module)
+        length += len(module) + 1
+    vendors = (VENDORS_BANNER + "(self.webpackChunk=self.webpackChunk||[]).push([[216],[" + ",".join(modules) +
+               "]]);").encode("utf-8")
+    vendors_name = f"vendors.{md5(vendors).hexdigest()[:8]}.js"
+    vendors_path = os.path.join(root, "js", vendors_name)
+    with open(vendors_path, "wb") as fp:
+        fp.write(vendors)
+    scripts = [f"js/{vendors_name}"]
+    chunk_paths = []
+    if chunks:
+        chunk_names = {}
+        chunk_hashes = {}
+        for chunk_id, table in enumerate(chunk_modules, 1):
+            content = ("(self.webpackChunk=self.webpackChunk||[]).push([[" + str(chunk_id) + "],{" +
+                       ",".join(f'"{module_id}":{module}' for module_id, module in table) + "}]);").encode("utf-8")
+            chunk_names[chunk_id] = f"heroes-{chunk_id}"
+            chunk_hashes[chunk_id] = md5(content).hexdigest()[:8]
+            chunk_path = os.path.join(root, "js", f"heroes-{chunk_id}.{chunk_hashes[chunk_id]}.js")
+            with open(chunk_path, "wb") as fp:
+                fp.write(content)
+            chunk_paths.append(chunk_path)
+        app = APP_RUNTIME.format(names=_js_object(chunk_names), hashes=_js_object(chunk_hashes),
+                                 modules=",".join(f'"{module_id}":{module}' for module_id, module in app_modules))
+        with open(os.path.join(root, "js", "app.js"), "w", encoding="utf-8") as fp:
+            fp.write(app)
+        scripts.insert(0, "js/app.js")
+    index_path = os.path.join(root, "index.html")
+    with open(index_path, "w", encoding="utf-8") as fp:
+        fp.write(f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{title}</title>' +
+                 "".join(f'<script defer="defer" src="{script}"></script>' for script in scripts) +
+                 '</head><body><div id="app"></div></body></html>')
+    return PreviewFixture(root, index_path, vendors_path, hero_names, len(vendors), tuple(chunk_paths))
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    latency = 0.0  # 每个请求在返回响应头之前等待的秒数
+
+    def send_head(self):
+        if self.latency > 0:
+            time.sleep(self.latency)
+        path = self.translate_path(self.path)
+        # 同一秒内修改的文件Last-Modified相同，测试内容随时间变化的页面时用ETag区分
+        self._etag = None
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            self._etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+            if self._etag in self.headers.get("If-None-Match", ""):
+                self.send_response(304)
+                self.end_headers()
+                return None
+        # 支持bytes=N-形式的Range请求，用于测试断点续传
+        match = RANGE_RE.fullmatch(self.headers.get("Range", ""))
+        if match is None or not os.path.isfile(path):
+            return super().send_head()
+        size = os.path.getsize(path)
+        start = int(match.group(1))
+        if start >= size:
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return None
+        fp = open(path, "rb")
+        fp.seek(start)
+        self.send_response(206)
+        self.send_header("Content-Type", self.guess_type(path))
+        self.send_header("Content-Range", f"bytes {start}-{size - 1}/{size}")
+        self.send_header("Content-Length", str(size - start))
+        self.end_headers()
+        return fp
+
+    def end_headers(self):
+        if getattr(self, "_etag", None) is not None:
+            self.send_header("ETag", self._etag)
+        super().end_headers()
+
+    def log_message(self, format, *args):
+        ...
+
+
+@contextmanager
+def serve_directory(root: str, latency: float = 0.0) -> Iterator[str]:
+    """
+    在本地启动一个静态文件服务器，代替act.mihoyo.com，支持ETag、Last-Modified和304
+    :param root: 网站根目录
+    :param latency: 模拟网络延迟，每个请求等待的秒数
+    :return: 根目录对应的url，如http://127.0.0.1:12345/
+    """
+    handler = type("_Handler", (_QuietHandler,), {"latency": latency})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(handler, directory=root))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def fake_spine(directory: str, failures: Optional[dict[str, tuple[int, str]]] = None,
+               missing_regions: Optional[dict[str, list[str]]] = None, log: Optional[str] = None) -> str:
+    """
+    生成一个调用fake_spine.py的可执行文件，代替Spine传给SpineWorkerPool
+    :param directory: 可执行文件和配置所在的目录
+    :param failures: {"项目/步骤": (退出码, stderr)}，步骤为unpack或import
+    :param missing_regions: {"项目": [区域名称]}，解开图片时不输出这些区域
+    :param log: 调用记录的路径，每次调用追加一行JSON
+    :return: 可执行文件的路径
+    """
+    os.makedirs(directory, exist_ok=True)
+    config_path = os.path.join(directory, "fake_spine.json")
+    with open(config_path, "w", encoding="utf-8") as fp:
+        json.dump({"log": log, "failures": failures or {}, "missing_regions": missing_regions or {}}, fp)
+    if os.name == "nt":
+        path = os.path.join(directory, "spine.cmd")
+        content = f'@"{sys.executable}" "{FAKE_SPINE_SCRIPT}" --config "{config_path}" %*\r\n'
+    else:
+        path = os.path.join(directory, "spine")
+        content = f'#!/bin/sh\nexec "{sys.executable}" "{FAKE_SPINE_SCRIPT}" --config "{config_path}" "$@"\n'
+    with open(path, "w", encoding="utf-8", newline="") as fp:
+        fp.write(content)
+    os.chmod(path, 0o755)
+    return path
@@ -0,0 +1,417 @@
+# -*- coding: utf-8 -*-
+import argparse
+import json
+import mmap
+import os
+import re
+import shutil
+import sys
+from collections import namedtuple
+from typing import Iterator, Optional
+
+from archive_output import ArchiveWriter, member_path
+from asset_cache import file_digest
+from atlas import parse_atlas
+from catalog import Catalog
+from downloader import DOWNLOAD_STATE_NAME, Downloader, DownloadJob, DownloadResult, embedded_hash
+from literal_slice import literal_end, map_file
+from skeleton_json import normalize_skeleton
+
+# Author: ZeroFly 杰洛飞
+# comment: the following script can download resources automatically from genshine web server
+# First download index.js and vendor.js in the current folder
+# Second replace following url and name (or pass them on the command line)
+# Third run the script, you are good to go
+#e.g. for this url
+#https://webstatic.mihoyo.com/ys/event/e20220928review_data/index.html
+# 原来的SpineToUnity/ResourceDownloader/Get_GenShin_Resources.py，放在SpineAuto中与下载、归档、资源目录等模块一起导入，
+# 原来的路径仍然可以运行，参数原样转发到这里
+
+webURL = "https://webstatic.mihoyo.com/ys/event/e20220928review_data/"
+indexJSName = 'index_435bc0bfde917c016047.js'
+vendorJSName = 'vendors_9f54804aa85053794de9.js'
+
+MANIFEST_NAME = "resources.json"
+# e.exports=A.p+"资源路径" 与 e.exports="字符串"，一次扫描同时找出两种
+EXPORTS_RE = re.compile(rb'e\.exports=(A\.p\+)?"')
+RESOURCE_KINDS = ("png", "atlas", "json", "mp3")
+
+# 一个资源：下载地址、下载后的文件名（带hash）、整理后的文件名、种类、所属的Spine项目
+Resource = namedtuple("Resource", ["url", "basename", "name", "kind", "project"])
+
+
+def iter_exports(buffer: mmap.mmap | bytes) -> Iterator[tuple[bool, bytes]]:
+    """
+    找出所有e.exports导出的字符串
+    :param buffer: js文件内容
+    :return: (是否为A.p+"资源路径", 字符串内容)
+    """
+    for match in EXPORTS_RE.finditer(buffer):
+        end = literal_end(buffer, match.end(), ord('"'))
+        if end == -1:
+            continue
+        yield match.group(1) is not None, buffer[match.end():end]
+
+
+def resource_kind(basename: str) -> str:
+    """
+    :param basename: 文件名
+    :return: png/atlas/json/mp3，其余返回other
+    """
+    extension = basename.rsplit(".", 1)[-1].lower()
+    if extension == "txt" and basename.endswith(".atlas.txt"):
+        return "atlas"
+    return extension if extension in RESOURCE_KINDS else "other"
+
+
+def short_name(basename: str) -> str:
+    """
+    去掉文件名中的hash，如role.0a1b2c.png -> role.png
+    :param basename: 下载后的文件名
+    :return: 整理后的文件名
+    """
+    split_list = basename.split(".")
+    if len(split_list) > 2:
+        return split_list[0] + "." + split_list[-1]
+    return basename
+
+
+class ResourceManifest:
+    """
+    从index.js和vendors.js中扫描出的所有资源，整理文件时直接使用，不需要再遍历文件夹
+    """
+
+    def __init__(self, web_url: str):
+        """
+        :param web_url: 资源的根url
+        """
+        self.web_url = web_url
+        self.resources: list[Resource] = []
+        self.atlases: dict[str, str] = {}  # 项目名称 -> atlas文本
+
+    def scan_index(self, index_js_path: str):
+        """
+        扫描index.js中的所有资源路径
+        :param index_js_path: index.js的路径
+        """
+        buffer = map_file(index_js_path)
+        try:
+            for is_resource, content in iter_exports(buffer):
+                if not is_resource:
+                    continue
+                url = self.web_url + content.decode("utf-8")
+                basename = os.path.basename(url)
+                name = short_name(basename)
+                kind = resource_kind(basename)
+                project = name.rsplit(".", 1)[0] if kind in ("png", "json") else None
+                self.resources.append(Resource(url, basename, name, kind, project))
+        finally:
+            if isinstance(buffer, mmap.mmap):
+                buffer.close()
+
+    def scan_vendors(self, vendors_js_path: str):
+        """
+        扫描vendors.js中的所有atlas
+        :param vendors_js_path: vendors.js的路径
+        """
+        buffer = map_file(vendors_js_path)
+        try:
+            for is_resource, content in iter_exports(buffer):
+                if is_resource:
+                    continue
+                first_line_end = content.find(b"\\n")
+                if first_line_end == -1:
+                    continue
+                png_index = content.find(b".png", 0, first_line_end)
+                if png_index == -1:
+                    continue
+                project = content[:png_index].decode("utf-8")
+                self.atlases[project] = content.decode("utf-8").replace("\\n", "\n")
+                self.resources.append(Resource(None, f"{project}.atlas.txt", f"{project}.atlas.txt", "atlas",
+                                               project))
+        finally:
+            if isinstance(buffer, mmap.mmap):
+                buffer.close()
+
+    def by_kind(self, kind: str) -> list[Resource]:
+        return [resource for resource in self.resources if resource.kind == kind]
+
+    def to_dict(self) -> dict:
+        return {"web_url": self.web_url, "resources": [resource._asdict() for resource in self.resources],
+                "atlases": self.atlases}
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as fp:
+            json.dump(self.to_dict(), fp, ensure_ascii=False, indent=4)
+
+    @classmethod
+    def load(cls, path: str) -> "ResourceManifest":
+        with open(path, "r", encoding="utf-8") as fp:
+            data = json.load(fp)
+        manifest = cls(data["web_url"])
+        manifest.resources = [Resource(**resource) for resource in data["resources"]]
+        manifest.atlases = data["atlases"]
+        return manifest
+
+
+def resource_path(resource: Resource, folder: str = ".") -> Optional[str]:
+    """
+    资源当前所在的位置，依次查找下载后的文件名、去掉hash后的文件名和项目文件夹
+    :param resource: 资源
+    :param folder: 资源所在的文件夹
+    :return: 文件路径，不存在时返回None
+    """
+    candidates = [os.path.join(folder, resource.basename), os.path.join(folder, resource.name)]
+    if resource.project is not None:
+        candidates.append(os.path.join(folder, resource.project, resource.name))
+    for path in candidates:
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def catalogued(catalog: Optional[Catalog], path: str) -> bool:
+    """
+    文件是否已经记录在资源目录中且内容没有变化（大小和sha256都与记录一致），
+    文件名中的hash无法校验的文件也可以按记录确认完整
+    :param catalog: 资源目录，为None时总是返回False
+    :param path: 文件路径
+    """
+    if catalog is None:
+        return False
+    asset = catalog.asset(path)
+    # 内容损坏时大小可能不变，只比较大小不够
+    return asset is not None and asset.size == os.path.getsize(path) and asset.digest == file_digest(path)
+
+
+def download_resources(manifest: ResourceManifest, folder: str = ".",
+                       catalog: Optional[Catalog] = None) -> list[DownloadResult]:
+    """
+    下载缺失或损坏（内容与文件名中的hash不一致）的资源，中断的下载会从.part继续
+    :param manifest: 资源清单
+    :param folder: 资源所在的文件夹
+    :param catalog: 资源目录，内容与记录一致的文件即使无法按文件名中的hash校验也不再下载
+    :return: 每个需要下载的资源的下载结果
+    """
+    # 校验记录保存在资源文件夹中，无法校验的文件下次不会重新下载
+    with Downloader(state_path=os.path.join(folder, DOWNLOAD_STATE_NAME)) as downloader:
+        jobs = []
+        for resource in manifest.resources:
+            if resource.url is None:
+                continue
+            digest = embedded_hash(resource.basename)
+            path = resource_path(resource, folder)
+            if path is not None and (digest is None or downloader.is_verified(path, digest) or
+                                     catalogued(catalog, path)):
+                continue
+            # 损坏的文件原地替换，整理过的资源不需要再移动
+            jobs.append(DownloadJob(resource.url, path or os.path.join(folder, resource.basename), digest))
+        return downloader.download_all(jobs)
+
+
+def correct_json_version(json_path: str):
+    """
+    将骨骼JSON中的4.0-from-x.x.x改为x.x.x
+    :param json_path: JSON文件路径
+    """
+    with open(json_path, "rb") as fp:
+        content = fp.read()
+    if b"-from-" not in content:
+        # 已经修正过
+        return
+    with open(json_path, "wb") as fp:
+        fp.write(normalize_skeleton(content, images=None).content)
+
+
+def rename_resources(manifest: ResourceManifest, folder: str = "."):
+    """
+    去掉已下载文件名中的hash（mp3保持原名）
+    :param manifest: 资源清单
+    :param folder: 资源所在的文件夹
+    """
+    for resource in manifest.resources:
+        if resource.url is None or resource.kind == "mp3" or resource.basename == resource.name:
+            continue
+        path = os.path.join(folder, resource.basename)
+        if os.path.isfile(path):
+            os.replace(path, os.path.join(folder, resource.name))
+
+
+def organize_projects(manifest: ResourceManifest, folder: str = "."):
+    """
+    为每个atlas创建项目文件夹，写入atlas并把对应的png、json移动进去
+    :param manifest: 资源清单
+    :param folder: 资源所在的文件夹
+    """
+    for project, atlas in manifest.atlases.items():
+        project_dir = os.path.join(folder, project)
+        os.makedirs(project_dir, exist_ok=True)
+        with open(os.path.join(project_dir, f"{project}.atlas.txt"), "w", encoding="utf-8") as fp:
+            fp.write(atlas)
+        for extension in ("png", "json"):
+            path = os.path.join(folder, f"{project}.{extension}")
+            if os.path.isfile(path):
+                shutil.move(path, os.path.join(project_dir, f"{project}.{extension}"))
+    # 之前已经整理过的项目也需要修正版本；一个项目有png和json等多个资源，先按项目去重，每个JSON只读取一次
+    json_paths = {resource.project: os.path.join(folder, resource.project, f"{resource.project}.json")
+                  for resource in manifest.by_kind("json") + manifest.by_kind("png")}
+    for json_path in json_paths.values():
+        if os.path.isfile(json_path):
+            correct_json_version(json_path)
+
+
+def catalog_resources(manifest: ResourceManifest, catalog: Catalog, folder: str = ".",
+                      vendors_js_path: Optional[str] = None):
+    """
+    把整理后的资源和骨骼写入资源目录，在一个事务中提交
+    :param manifest: 资源清单
+    :param catalog: 资源目录
+    :param folder: 资源所在的文件夹
+    :param vendors_js_path: vendors.js的路径，用于记录活动的vendors.js
+    """
+    web_url = manifest.web_url
+    catalog.reset_event(web_url)
+    for resource in manifest.resources:
+        path = resource_path(resource, folder)
+        if path is None:
+            continue
+        known = catalog.asset(path)
+        size = os.path.getsize(path)
+        # 大小没有变化时沿用记录中的hash
+        digest = known.digest if known is not None and known.size == size else file_digest(path)
+        catalog.add_asset(path, digest, size, resource.kind, resource.url, web_url, resource.project)
+    for project, atlas in manifest.atlases.items():
+        spine_version = None
+        json_path = os.path.join(folder, project, f"{project}.json")
+        if os.path.isfile(json_path):
+            with open(json_path, "rb") as fp:
+                spine_version = json.loads(fp.read()).get("skeleton", {}).get("spine")
+        atlas_content = parse_atlas(atlas)
+        catalog.add_skeleton(web_url, project, spine_version, atlas_content.scale,
+                             [(page.name, region.name) for page in atlas_content.pages for region in page.regions])
+    vendors_digest = None
+    if vendors_js_path is not None and os.path.isfile(vendors_js_path):
+        vendors_digest = file_digest(vendors_js_path)
+        catalog.add_asset(vendors_js_path, vendors_digest, os.path.getsize(vendors_js_path), "vendors", None,
+                          web_url)
+    catalog.add_event(web_url, os.path.basename(os.path.abspath(folder)), folder, vendors_digest, "resources",
+                      len(manifest.atlases))
+    catalog.flush(web_url)
+
+
+def archive_resources(manifest: ResourceManifest, archive_file: str, folder: str = ".",
+                      catalog: Optional[Catalog] = None, vendors_js_path: Optional[str] = None):
+    """
+    把资源按整理后的结构直接写入zip、tar或tar.zst归档，不再重命名和移动文件夹中的文件：
+    项目的atlas、png和json在项目文件夹中，骨骼JSON在写入时修正版本，归档中带有索引和资源清单
+    :param manifest: 资源清单
+    :param archive_file: 归档路径，格式根据扩展名判断
+    :param folder: 下载的资源所在的文件夹
+    :param catalog: 资源目录，记录归档中的成员
+    :param vendors_js_path: vendors.js的路径，用于记录活动的vendors.js
+    """
+    web_url = manifest.web_url
+    members = []  # (成员名, 资源)
+    spine_versions: dict[str, Optional[str]] = {}
+    with ArchiveWriter(archive_file) as archive:
+        for project, atlas in manifest.atlases.items():
+            archive.write(f"{project}/{project}.atlas.txt", atlas)
+        for resource in manifest.resources:
+            if resource.url is None:
+                # vendors.js中的atlas，已经在上面写入
+                members.append((f"{resource.project}/{resource.name}", resource))
+                continue
+            path = resource_path(resource, folder)
+            if path is None:
+                continue
+            name = resource.basename if resource.kind == "mp3" else resource.name
+            if resource.project in manifest.atlases and resource.kind in ("png", "json"):
+                name = f"{resource.project}/{name}"
+            if resource.kind == "json":
+                with open(path, "rb") as fp:
+                    content = fp.read()
+                if b"-from-" in content:
+                    content = normalize_skeleton(content, images=None).content
+                if resource.project in manifest.atlases:
+                    spine_versions[resource.project] = json.loads(content).get("skeleton", {}).get("spine")
+                archive.write(name, content)
+            else:
+                archive.write_file(name, path)
+            members.append((name, resource))
+        archive.write(MANIFEST_NAME, json.dumps(manifest.to_dict(), ensure_ascii=False, indent=4))
+    if catalog is None:
+        return
+    catalog.reset_event(web_url)
+    for name, resource in members:
+        entry = archive.members[name]
+        catalog.add_asset(member_path(archive_file, name), entry["sha256"], entry["size"], resource.kind,
+                          resource.url, web_url, resource.project)
+    for project, atlas in manifest.atlases.items():
+        atlas_content = parse_atlas(atlas)
+        catalog.add_skeleton(web_url, project, spine_versions.get(project), atlas_content.scale,
+                             [(page.name, region.name) for page in atlas_content.pages for region in page.regions])
+    vendors_digest = None
+    if vendors_js_path is not None and os.path.isfile(vendors_js_path):
+        vendors_digest = file_digest(vendors_js_path)
+        catalog.add_asset(vendors_js_path, vendors_digest, os.path.getsize(vendors_js_path), "vendors", None,
+                          web_url)
+    catalog.add_event(web_url, os.path.basename(os.path.abspath(folder)), archive_file, vendors_digest,
+                      f"resources,output={archive.format}", len(manifest.atlases))
+    catalog.flush(web_url)
+
+
+def build_manifest(web_url: str, index_js_path: str, vendors_js_path: str) -> ResourceManifest:
+    """
+    扫描index.js和vendors.js，生成资源清单
+    :param web_url: 资源的根url
+    :param index_js_path: index.js的路径
+    :param vendors_js_path: vendors.js的路径
+    :return: 资源清单
+    """
+    manifest = ResourceManifest(web_url)
+    manifest.scan_index(index_js_path)
+    manifest.scan_vendors(vendors_js_path)
+    return manifest
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    命令行入口，SpineToUnity/ResourceDownloader/Get_GenShin_Resources.py也调用这里
+    :param argv: 命令行参数，默认为sys.argv[1:]
+    :return: 退出码
+    """
+    arg_parser = argparse.ArgumentParser(description="整理从原神活动页面下载的资源")
+    arg_parser.add_argument("--url", default=webURL, help="资源的根url")
+    arg_parser.add_argument("--index", default=indexJSName, help="index.js的路径")
+    arg_parser.add_argument("--vendors", default=vendorJSName, help="vendors.js的路径")
+    arg_parser.add_argument("--dir", default=".", help="资源所在的文件夹")
+    arg_parser.add_argument("--manifest", default=MANIFEST_NAME, help="资源清单的保存路径")
+    arg_parser.add_argument("--download", action="store_true", help="下载缺失或损坏（与文件名中的hash不一致）的资源")
+    arg_parser.add_argument("--catalog", help="同时写入这个资源目录（SQLite），不指定时不打开资源目录")
+    arg_parser.add_argument("--archive", help="把整理后的资源写入这个zip、tar或tar.zst归档，不再整理文件夹中的文件")
+    args = arg_parser.parse_args(argv)
+    manifest = build_manifest(args.url, args.index, args.vendors)
+    manifest.save(os.path.join(args.dir, args.manifest))
+    catalog = Catalog(args.catalog) if args.catalog else None
+    try:
+        if args.download:
+            for result in download_resources(manifest, args.dir, catalog):
+                if not result.ok:
+                    print(f"下载失败 {result.job.url}：{result.error}")
+        if args.archive:
+            archive_resources(manifest, args.archive, args.dir, catalog, args.vendors)
+        else:
+            rename_resources(manifest, args.dir)
+            organize_projects(manifest, args.dir)
+            if catalog is not None:
+                catalog_resources(manifest, catalog, args.dir, args.vendors)
+    finally:
+        if catalog is not None:
+            catalog.close()
+    for resource in manifest.by_kind("png"):
+        print(f"{resource.project}/{resource.project}.json")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+import codecs
+from collections import namedtuple
+from html.parser import HTMLParser
+from typing import Callable, Optional
+
+FEED_SIZE = 4096  # 每次交给解析器的字符数，找到需要的标签后剩下的内容不再解析
+
+# 页面中的标题和所有带src的script标签（按出现顺序）
+PageHead = namedtuple("PageHead", ["title", "scripts"])
+
+
+class _Found(Exception):
+    pass
+
+
+class HeadScanner(HTMLParser):
+    """
+    只找出<title>和<script src=...>的流式HTML扫描器，不建立文档树，找到需要的script后立即停止
+    """
+
+    def __init__(self, script_filter: Optional[Callable[[str], bool]] = None):
+        """
+        :param script_filter: 找到满足条件的script且已经读到标题后停止，为None时扫描整个页面
+        """
+        super().__init__()
+        self.script_filter = script_filter
+        self.title: Optional[str] = None
+        self.scripts: list[str] = []
+        self._title_parts: Optional[list[str]] = None
+        self._script_found = False
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, Optional[str]]]):
+        if tag == "title" and self.title is None:
+            self._title_parts = []
+        elif tag == "script":
+            src = dict(attrs).get("src")
+            if src is None:
+                return
+            self.scripts.append(src)
+            if self.script_filter is not None and self.script_filter(src):
+                self._script_found = True
+                self._check_done()
+
+    def handle_data(self, data: str):
+        if self._title_parts is not None:
+            self._title_parts.append(data)
+
+    def handle_endtag(self, tag: str):
+        if tag == "title" and self._title_parts is not None:
+            self.title = "".join(self._title_parts)
+            self._title_parts = None
+            self._check_done()
+
+    def _check_done(self):
+        if self._script_found and self.title is not None:
+            raise _Found
+
+
+def scan_head(html: bytes | str, script_filter: Optional[Callable[[str], bool]] = None,
+              encoding: str = "utf-8") -> PageHead:
+    """
+    找出页面的标题和script，找到满足script_filter的script和标题后剩下的内容不再解析
+    :param html: 页面内容
+    :param script_filter: 需要找到的script，如lambda src: "vendors" in src
+    :param encoding: html为bytes时的编码
+    :return: 标题（没有<title>时为None）和script的src
+    """
+    # bytes也分块解码，停止后剩下的内容不需要解码
+    decode = codecs.getincrementaldecoder(encoding)(errors="replace").decode if isinstance(html, bytes) else str
+    scanner = HeadScanner(script_filter)
+    try:
+        for start in range(0, len(html), FEED_SIZE):
+            scanner.feed(decode(html[start:start + FEED_SIZE]))
+        scanner.close()
+    except _Found:
+        pass
+    title = scanner.title
+    if title is None and scanner._title_parts is not None:
+        # 没有</title>时取到页面结尾
+        title = "".join(scanner._title_parts)
+    return PageHead(title, scanner.scripts)
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from typing import Any, Callable, Optional
+
+from downloader import CHUNK_SIZE, Downloader
+
+PARSED_VERSION = 4  # 解析结果的格式版本，解析逻辑变化时加一，旧的结果自动失效
+
+CachedResponse = namedtuple("CachedResponse", ["url", "path", "digest", "from_cache"])
+
+
+def _tmp_path(path: str) -> str:
+    # 每个进程、线程使用不同的临时文件，同时写入同一个文件时不会互相覆盖
+    return f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+
+
+class HttpCache:
+    """
+    以url为key的HTTP磁盘缓存，使用ETag/Last-Modified发起条件请求，304时直接使用磁盘上的内容。
+    同时按内容hash缓存解析结果，内容没有变化时不需要重新解析；常驻服务中最近用到的解析结果还会保留在内存中
+    """
+
+    def __init__(self, root: str, memory_entries: int = 0):
+        """
+        :param root: 缓存目录，一般与AssetStore使用同一个目录
+        :param memory_entries: 在内存中保留多少个解析结果，0表示每次都从磁盘读取
+        """
+        self.root = os.path.join(os.path.abspath(root), "http")
+        self.memory_entries = memory_entries
+        os.makedirs(os.path.join(self.root, "parsed"), exist_ok=True)
+        # (digest, kind) -> 解析结果，按最近使用的顺序排列
+        self._memory: OrderedDict[tuple[str, str], Any] = OrderedDict()
+        # 同一个url同时只有一个请求在读写缓存，body和meta总是成对更新
+        self._url_locks: dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _paths(self, url: str) -> tuple[str, str]:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.root, f"{key}.json"), os.path.join(self.root, f"{key}.body")
+
+    def fetch(self, downloader: Downloader, url: str, on_chunk: Optional[Callable[[bytes], Any]] = None,
+              force: bool = False) -> CachedResponse:
+        """
+        获取url的内容
+        :param downloader: 下载器
+        :param url: url
+        :param on_chunk: 下载时每收到一块数据调用一次，命中缓存时不会调用
+        :param force: 不发送条件请求，总是重新下载
+        :return: 响应，内容保存在path
+        """
+        with self._lock:
+            url_lock = self._url_locks.setdefault(url, threading.Lock())
+        with url_lock:
+            return self._fetch(downloader, url, on_chunk, force)
+
+    def _fetch(self, downloader: Downloader, url: str, on_chunk: Optional[Callable[[bytes], Any]],
+               force: bool) -> CachedResponse:
+        meta_path, body_path = self._paths(url)
+        meta = None
+        if not force and os.path.isfile(body_path):
+            try:
+                with open(meta_path, "r", encoding="utf-8") as fp:
+                    meta = json.load(fp)
+            except (FileNotFoundError, json.JSONDecodeError):
+                ...
+        conditional_headers = {}
+        if meta is not None:
+            if meta.get("etag"):
+                conditional_headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                conditional_headers["If-Modified-Since"] = meta["last_modified"]
+        with downloader.get(url, headers=conditional_headers, stream=True) as response:
+            if response.status_code == 304 and meta is not None:
+                downloader.metrics.count("http_not_modified")
+                return CachedResponse(url, body_path, meta["digest"], True)
+            sha = hashlib.sha256()
+            size = 0
+            body_tmp = _tmp_path(body_path)
+            try:
+                with open(body_tmp, "wb") as fp:
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        fp.write(chunk)
+                        sha.update(chunk)
+                        size += len(chunk)
+                        if on_chunk is not None:
+                            on_chunk(chunk)
+            except BaseException:
+                # 临时文件名每次不同，失败时不删除会一直留在缓存目录中
+                os.remove(body_tmp)
+                raise
+            meta = {
+                "url": url,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "digest": sha.hexdigest(),
+            }
+        meta_tmp = _tmp_path(meta_path)
+        with open(meta_tmp, "w", encoding="utf-8") as fp:
+            json.dump(meta, fp, ensure_ascii=False)
+        # 先删除旧的meta再替换body：中途退出时只会缺少meta（下次完整下载），不会出现meta与body不一致
+        try:
+            os.remove(meta_path)
+        except FileNotFoundError:
+            ...
+        os.replace(body_tmp, body_path)
+        os.replace(meta_tmp, meta_path)
+        downloader.metrics.count("download_bytes", size)
+        return CachedResponse(url, body_path, meta["digest"], False)
+
+    def _parsed_path(self, digest: str, kind: str) -> str:
+        return os.path.join(self.root, "parsed", f"{kind}-v{PARSED_VERSION}-{digest}.json")
+
+    def load_parsed(self, digest: str, kind: str) -> Optional[Any]:
+        """
+        读取内容对应的解析结果
+        :param digest: 内容的sha256
+        :param kind: 解析结果的种类
+        :return: 解析结果，没有则返回None；内存中的结果是共用的，调用者不能修改
+        """
+        with self._lock:
+            data = self._memory.get((digest, kind))
+            if data is not None:
+                self._memory.move_to_end((digest, kind))
+                return data
+        try:
+            with open(self._parsed_path(digest, kind), "r", encoding="utf-8") as fp:
+                data = json.load(fp)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        self._remember(digest, kind, data)
+        return data
+
+    def save_parsed(self, digest: str, kind: str, data: Any):
+        """
+        保存内容对应的解析结果
+        :param digest: 内容的sha256
+        :param kind: 解析结果的种类
+        :param data: 可以序列化为JSON的解析结果
+        """
+        path = self._parsed_path(digest, kind)
+        tmp_path = _tmp_path(path)
+        with open(tmp_path, "w", encoding="utf-8") as fp:
+            json.dump(data, fp, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        self._remember(digest, kind, data)
+
+    def _remember(self, digest: str, kind: str, data: Any):
+        if self.memory_entries <= 0:
+            return
+        with self._lock:
+            self._memory[(digest, kind)] = data
+            self._memory.move_to_end((digest, kind))
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+
+def read_body(response: CachedResponse) -> bytes:
+    """
+    :param response: fetch的返回值
+    :return: 完整的内容
+    """
+    with open(response.path, "rb") as fp:
+        return fp.read()
@@ -0,0 +1,144 @@
+import binascii
+import mmap
+import re
+from typing import Iterable, Iterator
+
+DATA_URI_PNG_PREFIX = b"data:image/png;base64,"
+BASE64_RE = re.compile(rb"[A-Za-z0-9+/=]*")
+# 字面量的结束位置（支持转义），JS中的普通字符串不能跨行，遇到换行视为失配
+LITERAL_END_RE = {
+    quote: re.compile(b"[^%s\\\\\\n]*(?:\\\\.[^%s\\\\\\n]*)*%s" % (bytes([quote]), bytes([quote]), bytes([quote])),
+                      re.DOTALL)
+    for quote in b"\"'`"
+}
+
+
+def map_file(path: str) -> mmap.mmap | bytes:
+    """
+    以只读方式映射整个文件，不需要把文件读入内存
+    :param path: 文件路径
+    :return: 可以像bytes一样查找和切片的对象
+    """
+    with open(path, "rb") as fp:
+        try:
+            return mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # 空文件无法映射
+            return b""
+
+
+def literal_end(buffer: bytes | bytearray | memoryview | mmap.mmap, start: int, quote: int) -> int:
+    """
+    查找字面量的结束引号
+    :param buffer: 字节数据
+    :param start: 字面量内容的起始位置（开引号之后）
+    :param quote: 引号字符，如ord('"')
+    :return: 结束引号的位置，找不到则返回-1
+    """
+    if isinstance(buffer, memoryview):
+        match = LITERAL_END_RE[quote].match(buffer, start)
+        if match is None:
+            return -1
+        return match.end() - 1
+    # 用find跳到下一个引号，比正则逐字符匹配快得多，很长的内联图片也不会变慢
+    quote_byte = bytes((quote,))
+    pos = start
+    while True:
+        end = buffer.find(quote_byte, pos)
+        if end == -1:
+            return -1
+        newline = buffer.find(b"\n", pos, end)
+        while newline != -1:
+            if not _escaped(buffer, start, newline):
+                return -1
+            newline = buffer.find(b"\n", newline + 1, end)
+        if not _escaped(buffer, start, end):
+            return end
+        pos = end + 1
+
+
+def _escaped(buffer: bytes | bytearray | mmap.mmap, start: int, index: int) -> bool:
+    """
+    :return: index处的字符前面是否有奇数个反斜杠
+    """
+    count = 0
+    while index - count - 1 >= start and buffer[index - count - 1] == 0x5C:  # "\\"
+        count += 1
+    return count % 2 == 1
+
+
+def slice_until(buffer: str | bytes | bytearray | memoryview, start: int, delimiter: str | bytes):
+    """
+    切出从start开始到delimiter（不含）为止的内容，找不到delimiter时切到末尾
+    :param buffer: 数据，str或字节数据
+    :param start: 起始位置
+    :param delimiter: 结束符
+    :return: str输入返回str，字节数据返回零拷贝的memoryview
+    """
+    end = buffer.find(delimiter, start)
+    if end == -1:
+        end = len(buffer)
+    if isinstance(buffer, str):
+        return buffer[start:end]
+    return memoryview(buffer)[start:end]
+
+
+def iter_data_uris(buffer: bytes | bytearray, prefix: bytes = DATA_URI_PNG_PREFIX) -> Iterator[memoryview]:
+    """
+    查找所有的data URI
+    :param buffer: 字节数据
+    :param prefix: data URI的前缀
+    :return: 每个data URI中base64部分的memoryview
+    """
+    view = memoryview(buffer)
+    index = buffer.find(prefix)
+    while index != -1:
+        start = index + len(prefix)
+        end = BASE64_RE.match(buffer, start).end()
+        yield view[start:end]
+        index = buffer.find(prefix, end)
+
+
+def decode_base64_batch(contents: Iterable[bytes | memoryview | str]) -> list[bytes]:
+    """
+    批量解码base64，把相邻的内容拼接起来只调用一次解码
+    （解码遇到=填充就会停止，所以带填充的内容只能放在每一批的末尾）
+    :param contents: base64内容
+    :return: 解码后的二进制列表
+    """
+    result = []
+    batch = []
+    sizes = []
+    for content in contents:
+        if isinstance(content, str):
+            content = content.encode("ascii")
+        length = len(content)
+        if length % 4:
+            result.extend(_decode_batch(batch, sizes))
+            batch, sizes = [], []
+            result.append(binascii.a2b_base64(content))
+            continue
+        padding = 0
+        if length:
+            padding = (content[length - 1] == 0x3D) + (content[length - 2] == 0x3D)  # "="
+        batch.append(content)
+        sizes.append(length // 4 * 3 - padding)
+        if padding:
+            result.extend(_decode_batch(batch, sizes))
+            batch, sizes = [], []
+    result.extend(_decode_batch(batch, sizes))
+    return result
+
+
+def _decode_batch(batch: list[bytes | memoryview], sizes: list[int]) -> list[bytes]:
+    if not batch:
+        return []
+    if len(batch) == 1:
+        return [binascii.a2b_base64(batch[0])]
+    decoded = memoryview(binascii.a2b_base64(b"".join(batch)))
+    result = []
+    offset = 0
+    for size in sizes:
+        result.append(bytes(decoded[offset:offset + size]))
+        offset += size
+    return result
@@ -0,0 +1,247 @@
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Iterator, Optional, TYPE_CHECKING
+
+# 请求、子进程耗时的直方图分桶（秒），与Prometheus的默认分桶一致
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROMETHEUS_PREFIX = "spineauto"
+
+if TYPE_CHECKING:
+    # pstats只在使用--profile时导入
+    import pstats
+
+
+def peak_memory() -> Optional[int]:
+    """
+    :return: 进程的内存峰值（字节），无法获取时返回None
+    """
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return None
+        return counters.PeakWorkingSetSize
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS的单位是字节，Linux是KB
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class Histogram:
+    """
+    累计分桶的直方图，格式与Prometheus一致
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 最后一个是+Inf
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def cumulative(self) -> list[tuple[str, int]]:
+        """
+        :return: (le, 小于等于le的数量)
+        """
+        result = []
+        total = 0
+        for bound, count in zip([*self.buckets, "+Inf"], self.counts):
+            total += count
+            result.append((str(bound), total))
+        return result
+
+    def to_dict(self) -> dict:
+        return {"count": self.count, "sum": self.sum, "max": self.max, "buckets": dict(self.cumulative())}
+
+
+class Metrics:
+    """
+    流水线的性能数据：每个阶段的耗时、字节数等计数器、请求和子进程耗时的直方图，以及内存峰值。
+    线程安全，批量处理时多个活动可以共用一个实例，数据会累加
+    """
+
+    def __init__(self, profile: bool = False):
+        """
+        :param profile: 是否使用cProfile分析每个阶段
+        """
+        self.profile = profile
+        self.stages: dict[str, list[float]] = {}  # 阶段 -> [次数, 总耗时, 最长耗时]
+        self.counters: dict[str, float] = {}
+        self.histograms: dict[str, Histogram] = {}
+        self.profile_stats: Optional["pstats.Stats"] = None
+        self._lock = threading.Lock()
+        # 同一时间只能有一个cProfile在运行，嵌套或并行的阶段不再重复分析
+        self._profile_lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        统计一个阶段的耗时，阶段可以嵌套，各自单独计时
+        :param name: 阶段名称
+        """
+        profiler = None
+        if self.profile and self._profile_lock.acquire(blocking=False):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # 已经有其他分析工具在运行
+                profiler = None
+                self._profile_lock.release()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if profiler is not None:
+                profiler.disable()
+                self._profile_lock.release()
+            self.add_stage(name, elapsed)
+            if profiler is not None:
+                import pstats
+                with self._lock:
+                    if self.profile_stats is None:
+                        self.profile_stats = pstats.Stats(profiler)
+                    else:
+                        self.profile_stats.add(profiler)
+
+    def add_stage(self, name: str, elapsed: float):
+        """
+        记录一次阶段的耗时，用于无法用stage包住的阶段（如流水线中与其他阶段同时运行的阶段）
+        :param name: 阶段名称
+        :param elapsed: 耗时（秒）
+        """
+        with self._lock:
+            stage = self.stages.setdefault(name, [0, 0.0, 0.0])
+            stage[0] += 1
+            stage[1] += elapsed
+            stage[2] = max(stage[2], elapsed)
+
+    def count(self, name: str, value: float = 1):
+        """
+        计数器增加value
+        :param name: 计数器名称
+        :param value: 增加的值
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float):
+        """
+        向直方图中记录一个值
+        :param name: 直方图名称
+        :param value: 值（一般为秒）
+        """
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(value)
+
+    def merge(self, other: "Metrics"):
+        """
+        把另一份性能数据累加到这里，如常驻服务中每个任务单独记录，结束后汇总
+        :param other: 另一份性能数据
+        """
+        with other._lock:
+            stages = {name: list(stage) for name, stage in other.stages.items()}
+            counters = dict(other.counters)
+            histograms = [(name, histogram.buckets, list(histogram.counts), histogram.sum, histogram.count,
+                           histogram.max) for name, histogram in other.histograms.items()]
+        with self._lock:
+            for name, (count, total, longest) in stages.items():
+                stage = self.stages.setdefault(name, [0, 0.0, 0.0])
+                stage[0] += count
+                stage[1] += total
+                stage[2] = max(stage[2], longest)
+            for name, value in counters.items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            for name, buckets, counts, total, count, longest in histograms:
+                histogram = self.histograms.get(name)
+                if histogram is None:
+                    histogram = self.histograms[name] = Histogram(buckets)
+                histogram.counts = [a + b for a, b in zip(histogram.counts, counts)]
+                histogram.sum += total
+                histogram.count += count
+                histogram.max = max(histogram.max, longest)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "stages": {name: {"count": int(count), "total": total, "max": longest}
+                           for name, (count, total, longest) in self.stages.items()},
+                "counters": dict(self.counters),
+                "histograms": {name: histogram.to_dict() for name, histogram in self.histograms.items()},
+                "peak_memory": peak_memory(),
+            }
+
+    def to_prometheus(self) -> str:
+        """
+        :return: Prometheus文本格式
+        """
+        data = self.to_dict()
+        lines = [f"# TYPE {PROMETHEUS_PREFIX}_stage_seconds_total counter"]
+        for name, stage in data["stages"].items():
+            lines.append(f'{PROMETHEUS_PREFIX}_stage_seconds_total{{stage="{name}"}} {stage["total"]}')
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_stage_runs_total counter")
+        for name, stage in data["stages"].items():
+            lines.append(f'{PROMETHEUS_PREFIX}_stage_runs_total{{stage="{name}"}} {stage["count"]}')
+        for name, value in data["counters"].items():
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{name}_total counter")
+            lines.append(f"{PROMETHEUS_PREFIX}_{name}_total {value}")
+        with self._lock:
+            histograms = list(self.histograms.items())
+        for name, histogram in histograms:
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{name} histogram")
+            for bound, count in histogram.cumulative():
+                lines.append(f'{PROMETHEUS_PREFIX}_{name}_bucket{{le="{bound}"}} {count}')
+            lines.append(f"{PROMETHEUS_PREFIX}_{name}_sum {histogram.sum}")
+            lines.append(f"{PROMETHEUS_PREFIX}_{name}_count {histogram.count}")
+        if data["peak_memory"] is not None:
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}_peak_memory_bytes gauge")
+            lines.append(f"{PROMETHEUS_PREFIX}_peak_memory_bytes {data['peak_memory']}")
+        return "\n".join(lines) + "\n"
+
+    def save(self, path: Optional[str] = None, prometheus_path: Optional[str] = None,
+             profile_path: Optional[str] = None):
+        """
+        保存性能数据
+        :param path: JSON报告的路径
+        :param prometheus_path: Prometheus文本格式的路径
+        :param profile_path: cProfile结果的路径，可以用pstats或snakeviz查看
+        """
+        for file_path, content in ((path, lambda: json.dumps(self.to_dict(), ensure_ascii=False, indent=4)),
+                                   (prometheus_path, self.to_prometheus)):
+            if file_path is None:
+                continue
+            os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+            with open(file_path, "w", encoding="utf-8") as fp:
+                fp.write(content())
+        if profile_path is not None and self.profile_stats is not None:
+            self.profile_stats.dump_stats(profile_path)
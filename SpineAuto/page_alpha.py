@@ -0,0 +1,157 @@
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from atlas import AtlasContent, AtlasPage
+
+try:
+    import numpy
+except ImportError:  # 没有安装NumPy时不检查页面的透明度
+    numpy = None
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+PAGE_ALPHA_AVAILABLE = numpy is not None and Image is not None
+DEFAULT_WORKERS = 4  # 同时处理的页数，NumPy和Pillow的解码在计算时会释放GIL
+STRIP_ROWS = 512  # 按行分块计算，4096×4096的页面临时数组不超过几MB
+MIN_SAMPLES = 64  # 半透明且有颜色的像素少于这个数时无法判断，不转换，atlas中的pma保持不变
+MAX_VIOLATIONS = 0.001  # 颜色大于透明度的像素占半透明像素的比例不超过这个值时判定为预乘
+# 转换后保存PNG的压缩等级，默认的6在4096×4096的页面上比解码和转换加起来还慢，Unity导入时会重新压缩纹理
+PNG_COMPRESS_LEVEL = 1
+
+# 一页的检查结果：页面名称、atlas中的pma、检测结果（None为无法判断）、是否转换为了非预乘、
+# 参与判断的半透明像素数、颜色大于透明度的像素数
+PageAlpha = namedtuple("PageAlpha", ["page", "declared", "premultiplied", "converted", "samples", "violations"])
+
+
+def _unpremultiply_table() -> "numpy.ndarray":
+    # (a << 8 | c) -> round(c * 255 / a)，a为0时不变，查表代替逐像素的整数除法
+    alpha = numpy.arange(256, dtype=numpy.uint32)[:, None]
+    color = numpy.arange(256, dtype=numpy.uint32)[None, :]
+    table = numpy.minimum((color * 255 + alpha // 2) // numpy.maximum(alpha, 1), 255)
+    table[0] = color[0]
+    return table.astype(numpy.uint8).ravel()
+
+
+_UNPREMULTIPLY = _unpremultiply_table() if numpy is not None else None
+
+
+def alpha_statistics(pixels: "numpy.ndarray") -> tuple[int, int]:
+    """
+    预乘透明度的图片中每个像素的颜色都不超过透明度（round(c * a / 255) <= a），
+    非预乘的图片边缘半透明的像素颜色一般大于透明度
+    :param pixels: RGBA图片，形状为(高, 宽, 4)，类型为uint8
+    :return: (半透明且有颜色的像素数, 其中颜色大于透明度的像素数)
+    """
+    samples = 0
+    violations = 0
+    for row in range(0, pixels.shape[0], STRIP_ROWS):
+        strip = pixels[row:row + STRIP_ROWS]
+        alpha = strip[..., 3]
+        # 逐元素比较比在长度为3的最后一维上max快得多
+        color = numpy.maximum(numpy.maximum(strip[..., 0], strip[..., 1]), strip[..., 2])
+        samples += int(numpy.count_nonzero((alpha < 255) & (color > 0)))
+        violations += int(numpy.count_nonzero(color > alpha))
+    return samples, violations
+
+
+def is_premultiplied(samples: int, violations: int) -> Optional[bool]:
+    """
+    :param samples: alpha_statistics返回的半透明像素数
+    :param violations: alpha_statistics返回的颜色大于透明度的像素数
+    :return: 是否为预乘透明度，样本太少时返回None
+    """
+    if samples < MIN_SAMPLES:
+        return None
+    return violations <= samples * MAX_VIOLATIONS
+
+
+def unpremultiply(pixels: "numpy.ndarray"):
+    """
+    原地把预乘透明度转换为非预乘：c = round(c * 255 / a)，完全透明的像素不变
+    :param pixels: RGBA图片，形状为(高, 宽, 4)，类型为uint8，需要可写
+    """
+    for row in range(0, pixels.shape[0], STRIP_ROWS):
+        strip = pixels[row:row + STRIP_ROWS]
+        index = strip[..., :3].astype(numpy.uint16)
+        index |= strip[..., 3:4].astype(numpy.uint16) << 8
+        strip[..., :3] = _UNPREMULTIPLY.take(index)
+
+
+def check_page(page: AtlasPage, page_file: str, convert: bool = True) -> PageAlpha:
+    """
+    检查一页是否为预乘透明度，是时转换为非预乘（Unity中的材质使用_StraightAlphaInput）并覆盖原文件
+    :param page: 页
+    :param page_file: 页面图片的路径
+    :param convert: 是否转换
+    :return: 检查结果
+    """
+    try:
+        with Image.open(page_file) as image:
+            if "A" not in image.getbands() and "transparency" not in image.info:
+                # 没有透明通道的页面不存在预乘的问题
+                return PageAlpha(page.name, page.pma, False, False, 0, 0)
+            pixels = numpy.array(image if image.mode == "RGBA" else image.convert("RGBA"))
+    except OSError:
+        return PageAlpha(page.name, page.pma, None, False, 0, 0)
+    samples, violations = alpha_statistics(pixels)
+    # 无法判断时记录为None，不转换：即使atlas声明了pma，也可能是非预乘的图片，转换会让边缘变亮
+    premultiplied = is_premultiplied(samples, violations)
+    converted = False
+    if convert and premultiplied:
+        unpremultiply(pixels)
+        # 先写入临时文件再替换，不会留下写了一半的图片
+        temp_file = page_file + ".tmp"
+        Image.fromarray(pixels, "RGBA").save(temp_file, "PNG", compress_level=PNG_COMPRESS_LEVEL)
+        os.replace(temp_file, page_file)
+        converted = True
+    return PageAlpha(page.name, page.pma, premultiplied, converted, samples, violations)
+
+
+def check_atlas(atlas: AtlasContent, pages_dir: str, convert: bool = True,
+                workers: int = DEFAULT_WORKERS) -> list[PageAlpha]:
+    """
+    检查并转换一个项目的所有页面，多页时并行处理；转换后页面的pma改为False
+    :param atlas: atlas对象
+    :param pages_dir: 页面图片所在的目录，文件名为{page.name}.png
+    :param convert: 是否转换
+    :param workers: 同时处理的页数
+    :return: 每一页的检查结果，顺序与atlas.pages一致
+    """
+    if not PAGE_ALPHA_AVAILABLE:
+        raise RuntimeError("需要安装NumPy和Pillow才能检查页面的透明度")
+    jobs = [(page, os.path.join(pages_dir, f"{page.name}.png"), convert) for page in atlas.pages]
+    if len(jobs) == 1 or workers <= 1:
+        results = [check_page(*job) for job in jobs]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(lambda job: check_page(*job), jobs))
+    for page, result in zip(atlas.pages, results):
+        if result.converted or result.premultiplied is False:
+            page.pma = False
+    return results
+
+
+def straight_atlas(content: str, results: list[PageAlpha]) -> str:
+    """
+    把atlas文本中已经是非预乘的页面的pma: true改为pma: false
+    :param content: atlas文本
+    :param results: check_atlas的返回值
+    :return: 修改后的atlas文本，没有需要修改的页面时原样返回
+    """
+    straight_pages = {f"{result.page}.png" for result in results
+                      if result.declared and (result.converted or result.premultiplied is False)}
+    if not straight_pages:
+        return content
+    lines = content.split("\n")
+    current_page = None
+    for index, line in enumerate(lines):
+        stripped = line.strip()
+        if stripped.endswith(".png") and ":" not in stripped:
+            current_page = stripped
+        elif current_page in straight_pages and stripped.replace(" ", "") == "pma:true":
+            lines[index] = line.replace("true", "false")
+    return "\n".join(lines)
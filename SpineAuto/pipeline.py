@@ -0,0 +1,149 @@
+import queue
+import threading
+import time
+from typing import Any, Callable, Optional, TYPE_CHECKING
+
+from metrics import Metrics
+
+if TYPE_CHECKING:
+    from rich.progress import Progress
+
+DEFAULT_QUEUE_SIZE = 64  # 每个阶段最多积压的任务数，上游更快时会在put处等待
+
+_STOP = object()
+
+
+class PipelineStage:
+    """
+    流水线中的一个阶段：若干工作线程从有界队列中取出任务处理，处理函数可以把结果放入下一个阶段。
+    各阶段同时运行，总耗时接近最慢的阶段，而不是所有阶段之和
+    """
+
+    def __init__(self, name: str, handler: Callable[[Any], Any], workers: int = 1,
+                 maxsize: int = DEFAULT_QUEUE_SIZE, progress: Optional["Progress"] = None,
+                 description: Optional[str] = None, metrics: Optional[Metrics] = None):
+        """
+        :param name: 阶段名称，同时是性能数据中的阶段名（记录第一个任务开始到最后一个任务结束的时间）
+        :param handler: 处理一个任务
+        :param workers: 工作线程数
+        :param maxsize: 队列的最大长度，0为不限制
+        :param progress: 进度条，每放入一个任务总数加一，每完成一个前进一格
+        :param description: 进度条的描述
+        :param metrics: 性能数据
+        """
+        self.name = name
+        self.handler = handler
+        self.progress = progress
+        self.metrics = metrics
+        self.error: Optional[BaseException] = None
+        self._queue = queue.Queue(maxsize)
+        self._lock = threading.Lock()
+        self._total = 0
+        self._closed = False
+        self._aborted = False
+        self._first_start: Optional[float] = None
+        self._last_end: Optional[float] = None
+        self._task_id = None
+        if progress is not None:
+            self._task_id = progress.add_task(description or f"{name}...", total=0)
+        self._threads = [threading.Thread(target=self._work, name=f"{name}-{index}", daemon=True)
+                         for index in range(max(1, workers))]
+        for thread in self._threads:
+            thread.start()
+
+    def put(self, item: Any):
+        """
+        放入一个任务，队列已满时等待
+        :param item: 任务
+        """
+        with self._lock:
+            if self._aborted:
+                return
+            if self._closed:
+                raise RuntimeError(f"{self.name}已经关闭")
+            self._total += 1
+            total = self._total
+        if self._task_id is not None:
+            self.progress.update(self._task_id, total=total)
+        self._queue.put(item)
+
+    def close(self):
+        """
+        不再放入新任务，队列中剩余的任务处理完后工作线程退出
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        for _ in self._threads:
+            self._queue.put(_STOP)
+
+    def abort(self):
+        """
+        丢弃还没有开始处理的任务，之后放入的任务也会被忽略
+        """
+        with self._lock:
+            self._aborted = True
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                # 关闭信号要留给工作线程
+                self._queue.put(_STOP)
+                break
+        self.close()
+
+    def join(self, raise_error: bool = True):
+        """
+        等待所有任务处理完成，处理函数抛出的第一个异常会在这里重新抛出
+        :param raise_error: 是否重新抛出处理函数的异常，中止流水线时已经有要抛出的异常，不再需要
+        """
+        self.close()
+        for thread in self._threads:
+            thread.join()
+        if self._task_id is not None:
+            self.progress.remove_task(self._task_id)
+            self._task_id = None
+        if self.metrics is not None and self._first_start is not None:
+            self.metrics.add_stage(self.name, self._last_end - self._first_start)
+            self._first_start = None
+        if self.error is not None and raise_error:
+            raise self.error
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            if self._aborted:
+                continue
+            start = time.perf_counter()
+            try:
+                self.handler(item)
+            except BaseException as e:
+                with self._lock:
+                    if self.error is None:
+                        self.error = e
+                self.abort()
+            end = time.perf_counter()
+            with self._lock:
+                if self._first_start is None or start < self._first_start:
+                    self._first_start = start
+                if self._last_end is None or end > self._last_end:
+                    self._last_end = end
+            if self._task_id is not None:
+                self.progress.update(self._task_id, advance=1)
+
+
+def abort_stages(stages: list[PipelineStage]):
+    """
+    中止整个流水线：先让所有阶段丢弃还没有开始的任务，再等待正在处理的任务结束、工作线程退出。
+    返回之后不会再有处理函数在运行，可以安全地删除或关闭它们写入的输出
+    :param stages: 流水线的所有阶段
+    """
+    for stage in stages:
+        stage.abort()
+    for stage in stages:
+        stage.join(raise_error=False)
@@ -0,0 +1,128 @@
+import json
+import os
+import struct
+import time
+from typing import Iterable, Optional
+
+from atlas import AtlasContent
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_IHDR = struct.Struct(">8sI4sII")  # 文件头、IHDR长度、b"IHDR"、宽、高
+
+
+def png_size(path: str) -> Optional[tuple[int, int]]:
+    """
+    只读取PNG的IHDR，不解码图片
+    :param path: 图片路径
+    :return: (宽, 高)，不是PNG时返回None
+    """
+    with open(path, "rb") as fp:
+        header = fp.read(_IHDR.size)
+    if len(header) < _IHDR.size:
+        return None
+    signature, _, chunk_type, width, height = _IHDR.unpack(header)
+    if signature != PNG_SIGNATURE or chunk_type != b"IHDR":
+        return None
+    return width, height
+
+
+class PreflightReport:
+    """
+    一个项目在调用Spine之前的检查结果：骨骼用到的区域、atlas中的区域和下载的页面图片互相对照，
+    有错误的项目不再启动Spine
+    """
+
+    def __init__(self, project: str):
+        self.project = project
+        self.missing_regions: list[str] = []  # 骨骼用到但atlas中没有的区域
+        self.missing_page_urls: list[str] = []  # 找不到图片地址的页面
+        self.missing_pages: list[str] = []  # 图片没有下载成功的页面
+        self.bad_pages: dict[str, str] = {}  # 页面 -> 图片无法读取或大小与atlas不一致的原因
+        self.out_of_bounds: list[str] = []  # 超出页面范围的区域
+        self.unused_regions = 0  # atlas中没有被骨骼用到的区域数，不影响生成
+        self.elapsed = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not (self.missing_regions or self.missing_page_urls or self.missing_pages or self.bad_pages or
+                    self.out_of_bounds)
+
+    def summary(self) -> str:
+        """
+        :return: 所有错误的简短说明
+        """
+        parts = []
+        for title, items in (("缺少区域", self.missing_regions), ("缺少图片地址", self.missing_page_urls),
+                             ("缺少图片", self.missing_pages), ("图片错误", list(self.bad_pages)),
+                             ("区域超出页面", self.out_of_bounds)):
+            if items:
+                more = f"等{len(items)}个" if len(items) > 3 else ""
+                parts.append(f"{title} {', '.join(items[:3])}{more}")
+        return "；".join(parts)
+
+    def to_dict(self) -> dict:
+        return {
+            "project": self.project,
+            "ok": self.ok,
+            "missing_regions": self.missing_regions,
+            "missing_page_urls": self.missing_page_urls,
+            "missing_pages": self.missing_pages,
+            "bad_pages": self.bad_pages,
+            "out_of_bounds": self.out_of_bounds,
+            "unused_regions": self.unused_regions,
+            "elapsed": self.elapsed,
+        }
+
+
+def validate_project(atlas: AtlasContent, attachments: Iterable[str], pages_dir: str) -> PreflightReport:
+    """
+    检查一个项目：骨骼用到的区域是否都在atlas中，页面图片是否都已下载、大小与atlas一致，区域是否都在页面范围内。
+    只读取图片的文件头，一个项目一般在几毫秒内完成
+    :param atlas: atlas对象，页面的img为None表示找不到图片地址
+    :param attachments: 骨骼用到的区域名称，见skeleton_json.skeleton_attachments
+    :param pages_dir: 页面图片所在的目录，文件名为{page.name}.png
+    :return: 检查结果
+    """
+    start = time.perf_counter()
+    report = PreflightReport(atlas.get_name())
+    region_names = set(atlas.regions)
+    # 旧版本的序列帧是同名区域加index，骨骼中按名称加编号引用
+    frame_names = {f"{region.name}{region.index}": region.name for region in atlas.iter_regions()
+                   if region.index != -1}
+    region_names.update(frame_names)
+    attachments = set(attachments)
+    report.missing_regions = sorted(attachments - region_names)
+    used = {frame_names.get(name, name) for name in attachments}
+    report.unused_regions = len(set(atlas.regions) - used)
+    for page in atlas.pages:
+        if page.img is None:
+            report.missing_page_urls.append(page.name)
+        page_file = os.path.join(pages_dir, f"{page.name}.png")
+        try:
+            size = png_size(page_file)
+        except OSError:
+            if page.img is not None:
+                report.missing_pages.append(page.name)
+            continue
+        if size is None:
+            report.bad_pages[page.name] = "不是PNG图片"
+            continue
+        if page.width and page.height and size != (page.width, page.height):
+            report.bad_pages[page.name] = f"图片大小{size[0]}x{size[1]}与atlas中的{page.width}x{page.height}不一致"
+            continue
+        width, height = size
+        report.out_of_bounds += [region.name for region in page.regions
+                                 if region.x < 0 or region.y < 0 or region.x + region.packed_width > width or
+                                 region.y + region.packed_height > height]
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def save_preflight_report(reports: list[PreflightReport], path: str):
+    """
+    保存所有项目的检查结果
+    :param reports: 检查结果
+    :param path: 保存路径
+    """
+    with open(path, "w", encoding="utf-8") as fp:
+        json.dump([report.to_dict() for report in reports], fp, ensure_ascii=False, indent=4)
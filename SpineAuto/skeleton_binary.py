@@ -0,0 +1,1319 @@
+import base64
+import binascii
+import re
+import struct
+from hashlib import md5
+from typing import Any, Callable, Iterable, Optional
+
+# 与SpineToUnity中的运行时（spine-csharp 4.1）的SkeletonBinary.cs对应，只能导出4.1的二进制格式
+BINARY_VERSION = "4.1.00"
+# 可以转换的骨骼JSON版本，这些版本都可以由4.1的SkeletonJson.cs读取
+SUPPORTED_JSON_VERSIONS = ("3.8", "4.0", "4.1")
+
+ATTACHMENT_TYPES = ("region", "boundingbox", "mesh", "linkedmesh", "path", "point", "clipping")
+TRANSFORM_MODES = ("normal", "onlytranslation", "norotationorreflection", "noscale", "noscaleorreflection")
+BLEND_MODES = ("normal", "additive", "multiply", "screen")
+POSITION_MODES = ("fixed", "percent")
+SPACING_MODES = ("length", "fixed", "percent", "proportional")
+ROTATE_MODES = ("tangent", "chain", "chainscale")
+SEQUENCE_MODES = ("hold", "once", "loop", "pingpong", "oncereverse", "loopreverse", "pingpongreverse")
+
+BONE_TIMELINES = {"rotate": 0, "translate": 1, "translatex": 2, "translatey": 3, "scale": 4, "scalex": 5,
+                  "scaley": 6, "shear": 7, "shearx": 8, "sheary": 9}
+SLOT_ATTACHMENT = 0
+SLOT_RGBA = 1
+SLOT_RGB = 2
+SLOT_RGBA2 = 3
+SLOT_RGB2 = 4
+SLOT_ALPHA = 5
+ATTACHMENT_DEFORM = 0
+ATTACHMENT_SEQUENCE = 1
+PATH_POSITION = 0
+PATH_SPACING = 1
+PATH_MIX = 2
+CURVE_LINEAR = 0
+CURVE_STEPPED = 1
+CURVE_BEZIER = 2
+
+WHITE = 0xFFFFFFFF
+# 3.8的约束混合值名称，SkeletonJson.GetFloat会自动使用
+_LEGACY_MIX_NAMES = {"mixRotate": "rotateMix", "mixX": "translateMix", "mixScaleX": "scaleMix",
+                     "mixShearY": "shearMix"}
+_INT = struct.Struct(">I")
+_FLOAT = struct.Struct(">f")
+_LONG = struct.Struct(">Q")
+_VERSION_RE = re.compile(r"\s*(\d+)\.(\d+)")
+
+
+class SkeletonBinaryError(Exception):
+    ...
+
+
+class SkeletonOutput:
+    """
+    与SkeletonBinary.SkeletonInput对应的写入器，所有数字都是大端序
+    """
+
+    def __init__(self, strings: Optional[dict[str, int]] = None):
+        """
+        :param strings: 字符串表（字符串 -> 序号），多个写入器共用同一个表
+        """
+        self.buffer = bytearray()
+        self.strings = {} if strings is None else strings
+
+    def write_byte(self, value: int):
+        self.buffer.append(value & 0xFF)
+
+    def write_bool(self, value: bool):
+        self.buffer.append(1 if value else 0)
+
+    def write_int(self, value: int):
+        self.buffer += _INT.pack(value & 0xFFFFFFFF)
+
+    def write_long(self, value: int):
+        self.buffer += _LONG.pack(value & 0xFFFFFFFFFFFFFFFF)
+
+    def write_varint(self, value: int, optimize_positive: bool = True):
+        """
+        变长整数，每个字节7位，最多5个字节
+        :param value: 值，负数按32位补码写入
+        :param optimize_positive: 为False时使用zigzag编码，适合可能为负数的值
+        """
+        value = int(value)
+        if not optimize_positive:
+            value = (value << 1) ^ (value >> 31)
+        value &= 0xFFFFFFFF
+        while value > 0x7F:
+            self.buffer.append((value & 0x7F) | 0x80)
+            value >>= 7
+        self.buffer.append(value)
+
+    def write_float(self, value: float):
+        self.buffer += _FLOAT.pack(value)
+
+    def write_floats(self, values: Iterable[float]):
+        values = tuple(values)
+        self.buffer += struct.pack(f">{len(values)}f", *values)
+
+    def write_shorts(self, values: list[int]):
+        """
+        长度+每个2字节的数组，用于三角形和边
+        """
+        self.write_varint(len(values))
+        self.buffer += struct.pack(f">{len(values)}H", *(int(value) for value in values))
+
+    def write_string(self, value: Optional[str]):
+        """
+        None写为0，空字符串写为1，其余为UTF-8字节数+1再加上内容
+        """
+        if value is None:
+            self.write_varint(0)
+            return
+        content = value.encode("utf-8")
+        self.write_varint(len(content) + 1)
+        self.buffer += content
+
+    def write_string_ref(self, value: Optional[str]):
+        """
+        字符串表中的序号+1，None写为0
+        """
+        if value is None:
+            self.write_varint(0)
+            return
+        index = self.strings.get(value)
+        if index is None:
+            index = self.strings[value] = len(self.strings)
+        self.write_varint(index + 1)
+
+    def write_output(self, other: "SkeletonOutput"):
+        self.buffer += other.buffer
+
+
+def _get_float(data: dict, name: str, default: float) -> float:
+    """
+    与SkeletonJson.GetFloat一致，同时支持3.8的旧名称
+    """
+    legacy = _LEGACY_MIX_NAMES.get(name)
+    if legacy is not None and legacy in data:
+        return data[legacy]
+    return data.get(name, default)
+
+
+def _enum_index(names: tuple[str, ...], value: str, what: str) -> int:
+    try:
+        return names.index(value.lower())
+    except ValueError:
+        raise SkeletonBinaryError(f"未知的{what}：{value}") from None
+
+
+def _color(value: Optional[str], length: int = 8, default: int = WHITE) -> int:
+    """
+    :param value: RRGGBBAA或RRGGBB
+    :return: 整数形式的颜色
+    """
+    if value is None:
+        return default
+    if len(value) != length:
+        raise SkeletonBinaryError(f"颜色的长度应为{length}：{value}")
+    return int(value, 16)
+
+
+def _color_bytes(value: str, length: int = 8) -> tuple[int, ...]:
+    color = _color(value, length)
+    return tuple((color >> shift) & 0xFF for shift in range((length - 2) * 4, -1, -8))
+
+
+def _hash_long(value: Optional[str]) -> int:
+    """
+    4.x的骨骼JSON中hash是8字节的base64，与二进制中的long对应；无法解码时使用内容的md5
+    """
+    if not value:
+        return 0
+    try:
+        raw = base64.b64decode(value + "=" * (-len(value) % 4), validate=True)
+    except binascii.Error:
+        raw = b""
+    if len(raw) != 8:
+        raw = md5(value.encode("utf-8")).digest()[:8]
+    return int.from_bytes(raw, "big")
+
+
+def _is_bezier(curve: Any) -> bool:
+    return curve is not None and not isinstance(curve, str)
+
+
+def _bezier_count(frames: list[dict], values: int) -> int:
+    """
+    :return: 时间轴中贝塞尔曲线的数量，最后一帧的曲线不会被使用
+    """
+    return sum(values for key_map in frames[:-1] if _is_bezier(key_map.get("curve")))
+
+
+def _curve(key_map: dict, time1: float, time2: float, values1: tuple, values2: tuple) -> Any:
+    """
+    与SkeletonJson.CalculateCurve一致，3.8的曲线（curve、c2、c3、c4为比例）转换为4.x的控制点
+    :return: None、"stepped"或控制点列表
+    """
+    curve = key_map.get("curve")
+    if curve is None or isinstance(curve, (str, list)):
+        return curve
+    c2 = key_map.get("c2", 0)
+    c3 = key_map.get("c3", 1)
+    c4 = key_map.get("c4", 1)
+    result = []
+    for value1, value2 in zip(values1, values2):
+        result += (time1 + (time2 - time1) * curve, value1 + (value2 - value1) * c2,
+                   time1 + (time2 - time1) * c3, value1 + (value2 - value1) * c4)
+    return result
+
+
+def _write_curve(output: SkeletonOutput, curve: Any, values: int):
+    if curve == "stepped":
+        output.write_byte(CURVE_STEPPED)
+    elif _is_bezier(curve):
+        if len(curve) < values * 4:
+            raise SkeletonBinaryError(f"曲线的控制点数量不足：{curve}")
+        output.write_byte(CURVE_BEZIER)
+        output.write_floats(curve[:values * 4])
+    else:
+        output.write_byte(CURVE_LINEAR)
+
+
+def _write_frames(output: SkeletonOutput, frames: list[dict], write_values: Callable[[SkeletonOutput, dict], tuple]):
+    """
+    写入曲线时间轴的所有帧：时间、值，从第二帧起在值之后写入上一帧的曲线
+    :param write_values: 写入一帧的值，返回用于计算曲线的值
+    """
+    time = _get_float(frames[0], "time", 0)
+    output.write_float(time)
+    values = write_values(output, frames[0])
+    for key_map, next_map in zip(frames, frames[1:]):
+        time2 = _get_float(next_map, "time", 0)
+        output.write_float(time2)
+        values2 = write_values(output, next_map)
+        _write_curve(output, _curve(key_map, time, time2, values, values2), len(values))
+        time = time2
+        values = values2
+
+
+def _float_values(*names_defaults: tuple[str, float]) -> Callable[[SkeletonOutput, dict], tuple]:
+    """
+    :param names_defaults: (名称, 默认值)，默认值为名称时使用同一帧中该名称的值（如mixY默认为mixX）
+    """
+
+    def write_values(output: SkeletonOutput, key_map: dict) -> tuple:
+        values = {}
+        for name, default in names_defaults:
+            values[name] = _get_float(key_map, name, values[default] if isinstance(default, str) else default)
+        result = tuple(values.values())
+        output.write_floats(result)
+        return result
+
+    return write_values
+
+
+def _color_values(*names_lengths: tuple[str, int]) -> Callable[[SkeletonOutput, dict], tuple]:
+    def write_values(output: SkeletonOutput, key_map: dict) -> tuple:
+        result = ()
+        for name, length in names_lengths:
+            result += _color_bytes(key_map[name], length)
+        output.buffer += bytes(result)
+        return tuple(value / 255 for value in result)
+
+    return write_values
+
+
+def _rotate_value(output: SkeletonOutput, key_map: dict) -> tuple:
+    # 3.8的旋转使用angle，每一帧分别判断，省略了angle的帧（如第一帧为0）不影响其他帧
+    value = key_map["angle"] if "angle" in key_map else _get_float(key_map, "value", 0)
+    output.write_float(value)
+    return (value,)
+
+
+def _alpha_value(output: SkeletonOutput, key_map: dict) -> tuple:
+    # 二进制中透明度与颜色一样是一个字节
+    value = _get_float(key_map, "value", 0)
+    output.write_byte(round(min(max(value, 0), 1) * 255))
+    return (value,)
+
+
+class _SkeletonWriter:
+    """
+    按照SkeletonBinary.ReadSkeletonData的顺序写入，默认值与SkeletonJson.cs一致
+    """
+
+    def __init__(self, data: dict, nonessential: bool):
+        self.data = data
+        self.nonessential = nonessential
+        self.strings: dict[str, int] = {}
+        self.bones = {bone["name"]: index for index, bone in enumerate(data.get("bones", []))}
+        self.slots = {slot["name"]: index for index, slot in enumerate(data.get("slots", []))}
+        self.ik = {constraint["name"]: index for index, constraint in enumerate(data.get("ik", []))}
+        self.transform = {constraint["name"]: index for index, constraint in enumerate(data.get("transform", []))}
+        self.path = {constraint["name"]: index for index, constraint in enumerate(data.get("path", []))}
+        self.path_data = data.get("path", [])
+        skins = data.get("skins", [])
+        if isinstance(skins, dict):
+            raise SkeletonBinaryError("不支持3.7及以前的skins格式")
+        # 二进制中默认皮肤总是第一个
+        self.default_skin = next((skin for skin in skins if skin["name"] == "default"), None)
+        self.skins = ([self.default_skin] if self.default_skin is not None else []) + \
+                     [skin for skin in skins if skin is not self.default_skin]
+        self.skin_index = {skin["name"]: index for index, skin in enumerate(self.skins)}
+        self.events = data.get("events", {})
+        self.event_index = {name: index for index, name in enumerate(self.events)}
+
+    def _find(self, table: dict[str, int], name: str, what: str) -> int:
+        try:
+            return table[name]
+        except KeyError:
+            raise SkeletonBinaryError(f"找不到{what}：{name}") from None
+
+    def write(self) -> bytes:
+        body = SkeletonOutput(self.strings)
+        self.write_bones(body)
+        self.write_slots(body)
+        self.write_constraints(body)
+        self.write_skins(body)
+        self.write_events(body)
+        animations = self.data.get("animations", {})
+        body.write_varint(len(animations))
+        for name, animation in animations.items():
+            try:
+                self.write_animation(body, name, animation)
+            except SkeletonBinaryError as e:
+                raise SkeletonBinaryError(f"动画 {name}：{e}") from e
+        # 字符串表在头部之后、骨骼之前，需要等所有内容写完才能确定
+        output = SkeletonOutput()
+        self.write_header(output)
+        output.write_varint(len(self.strings))
+        for string in self.strings:
+            output.write_string(string)
+        output.write_output(body)
+        return bytes(output.buffer)
+
+    def write_header(self, output: SkeletonOutput):
+        skeleton = self.data.get("skeleton", {})
+        output.write_long(_hash_long(skeleton.get("hash")))
+        output.write_string(BINARY_VERSION)
+        output.write_floats((skeleton.get("x", 0), skeleton.get("y", 0), skeleton.get("width", 0),
+                             skeleton.get("height", 0)))
+        output.write_bool(self.nonessential)
+        if self.nonessential:
+            output.write_float(skeleton.get("fps", 30))
+            output.write_string(skeleton.get("images"))
+            output.write_string(skeleton.get("audio"))
+
+    def write_bones(self, output: SkeletonOutput):
+        bones = self.data.get("bones", [])
+        output.write_varint(len(bones))
+        for index, bone in enumerate(bones):
+            output.write_string(bone["name"])
+            if index != 0:
+                output.write_varint(self._find(self.bones, bone.get("parent"), "父骨骼"))
+            output.write_floats((bone.get("rotation", 0), bone.get("x", 0), bone.get("y", 0), bone.get("scaleX", 1),
+                                 bone.get("scaleY", 1), bone.get("shearX", 0), bone.get("shearY", 0),
+                                 bone.get("length", 0)))
+            output.write_varint(_enum_index(TRANSFORM_MODES, bone.get("transform", "normal"), "transform"))
+            output.write_bool(bone.get("skin", False))
+            if self.nonessential:
+                output.write_int(_color(bone.get("color"), default=0x989898FF))
+
+    def write_slots(self, output: SkeletonOutput):
+        slots = self.data.get("slots", [])
+        output.write_varint(len(slots))
+        for slot in slots:
+            output.write_string(slot["name"])
+            output.write_varint(self._find(self.bones, slot["bone"], "插槽的骨骼"))
+            output.write_int(_color(slot.get("color")))
+            output.write_int(_color(slot.get("dark"), 6, -1))
+            output.write_string_ref(slot.get("attachment"))
+            output.write_varint(_enum_index(BLEND_MODES, slot.get("blend", "normal"), "blend"))
+
+    def _write_constraint_head(self, output: SkeletonOutput, constraint: dict):
+        output.write_string(constraint["name"])
+        output.write_varint(constraint.get("order", 0))
+        output.write_bool(constraint.get("skin", False))
+        bones = constraint.get("bones", [])
+        output.write_varint(len(bones))
+        for bone in bones:
+            output.write_varint(self._find(self.bones, bone, "约束的骨骼"))
+
+    def write_constraints(self, output: SkeletonOutput):
+        ik_constraints = self.data.get("ik", [])
+        output.write_varint(len(ik_constraints))
+        for constraint in ik_constraints:
+            self._write_constraint_head(output, constraint)
+            output.write_varint(self._find(self.bones, constraint["target"], "IK目标骨骼"))
+            output.write_floats((_get_float(constraint, "mix", 1), _get_float(constraint, "softness", 0)))
+            output.write_byte(1 if constraint.get("bendPositive", True) else -1)
+            output.write_bool(constraint.get("compress", False))
+            output.write_bool(constraint.get("stretch", False))
+            output.write_bool(constraint.get("uniform", False))
+        transform_constraints = self.data.get("transform", [])
+        output.write_varint(len(transform_constraints))
+        for constraint in transform_constraints:
+            self._write_constraint_head(output, constraint)
+            output.write_varint(self._find(self.bones, constraint["target"], "变换约束的目标骨骼"))
+            output.write_bool(constraint.get("local", False))
+            output.write_bool(constraint.get("relative", False))
+            mix_x = _get_float(constraint, "mixX", 1)
+            mix_scale_x = _get_float(constraint, "mixScaleX", 1)
+            output.write_floats((constraint.get("rotation", 0), constraint.get("x", 0), constraint.get("y", 0),
+                                 constraint.get("scaleX", 0), constraint.get("scaleY", 0),
+                                 constraint.get("shearY", 0), _get_float(constraint, "mixRotate", 1), mix_x,
+                                 _get_float(constraint, "mixY", mix_x), mix_scale_x,
+                                 _get_float(constraint, "mixScaleY", mix_scale_x),
+                                 _get_float(constraint, "mixShearY", 1)))
+        output.write_varint(len(self.path_data))
+        for constraint in self.path_data:
+            self._write_constraint_head(output, constraint)
+            output.write_varint(self._find(self.slots, constraint["target"], "路径约束的目标插槽"))
+            output.write_varint(_enum_index(POSITION_MODES, constraint.get("positionMode", "percent"), "positionMode"))
+            output.write_varint(_enum_index(SPACING_MODES, constraint.get("spacingMode", "length"), "spacingMode"))
+            output.write_varint(_enum_index(ROTATE_MODES, constraint.get("rotateMode", "tangent"), "rotateMode"))
+            mix_x = _get_float(constraint, "mixX", 1)
+            output.write_floats((constraint.get("rotation", 0), constraint.get("position", 0),
+                                 constraint.get("spacing", 0), _get_float(constraint, "mixRotate", 1), mix_x,
+                                 _get_float(constraint, "mixY", mix_x)))
+
+    def write_skins(self, output: SkeletonOutput):
+        if self.default_skin is None:
+            output.write_varint(0)
+        else:
+            self._write_skin_attachments(output, self.default_skin)
+        others = self.skins[1:] if self.default_skin is not None else self.skins
+        output.write_varint(len(others))
+        for skin in others:
+            output.write_string_ref(skin["name"])
+            for key, table, what in (("bones", self.bones, "皮肤的骨骼"), ("ik", self.ik, "皮肤的IK约束"),
+                                     ("transform", self.transform, "皮肤的变换约束"),
+                                     ("path", self.path, "皮肤的路径约束")):
+                names = skin.get(key, [])
+                output.write_varint(len(names))
+                for name in names:
+                    output.write_varint(self._find(table, name, what))
+            self._write_skin_attachments(output, skin)
+
+    def _write_skin_attachments(self, output: SkeletonOutput, skin: dict):
+        attachments = skin.get("attachments", {})
+        output.write_varint(len(attachments))
+        for slot_name, slot_attachments in attachments.items():
+            output.write_varint(self._find(self.slots, slot_name, "皮肤的插槽"))
+            output.write_varint(len(slot_attachments))
+            for key, attachment in slot_attachments.items():
+                output.write_string_ref(key)
+                try:
+                    self.write_attachment(output, key, attachment)
+                except SkeletonBinaryError as e:
+                    raise SkeletonBinaryError(f"皮肤 {skin['name']} 的附件 {key}：{e}") from e
+
+    def write_attachment(self, output: SkeletonOutput, key: str, attachment: dict):
+        name = attachment.get("name", key)
+        output.write_string_ref(None if name == key else name)
+        attachment_type = attachment.get("type", "region").lower()
+        if attachment_type in ("mesh", "linkedmesh"):
+            # SkeletonJson.cs中有parent的网格都是链接网格
+            attachment_type = "linkedmesh" if attachment.get("parent") is not None else "mesh"
+        output.write_byte(_enum_index(ATTACHMENT_TYPES, attachment_type, "附件类型"))
+        nonessential = self.nonessential
+        if attachment_type in ("region", "mesh", "linkedmesh"):
+            path = attachment.get("path", name)
+            output.write_string_ref(None if path == name else path)
+        if attachment_type == "region":
+            output.write_floats((attachment.get("rotation", 0), attachment.get("x", 0), attachment.get("y", 0),
+                                 attachment.get("scaleX", 1), attachment.get("scaleY", 1),
+                                 attachment.get("width", 32), attachment.get("height", 32)))
+            output.write_int(_color(attachment.get("color")))
+            self._write_sequence(output, attachment.get("sequence"))
+        elif attachment_type == "boundingbox":
+            vertex_count = attachment.get("vertexCount", 0)
+            output.write_varint(vertex_count)
+            self._write_vertices(output, attachment["vertices"], vertex_count)
+            if nonessential:
+                output.write_int(_color(attachment.get("color")))
+        elif attachment_type == "mesh":
+            output.write_int(_color(attachment.get("color")))
+            uvs = attachment["uvs"]
+            vertex_count = len(uvs) >> 1
+            output.write_varint(vertex_count)
+            output.write_floats(uvs)
+            output.write_shorts(attachment["triangles"])
+            self._write_vertices(output, attachment["vertices"], vertex_count)
+            output.write_varint(attachment.get("hull", 0))
+            self._write_sequence(output, attachment.get("sequence"))
+            if nonessential:
+                output.write_shorts(attachment.get("edges", []))
+                output.write_floats((attachment.get("width", 0), attachment.get("height", 0)))
+        elif attachment_type == "linkedmesh":
+            output.write_int(_color(attachment.get("color")))
+            output.write_string_ref(attachment.get("skin"))
+            output.write_string_ref(attachment["parent"])
+            output.write_bool(attachment.get("timelines", True))
+            self._write_sequence(output, attachment.get("sequence"))
+            if nonessential:
+                output.write_floats((attachment.get("width", 0), attachment.get("height", 0)))
+        elif attachment_type == "path":
+            output.write_bool(attachment.get("closed", False))
+            output.write_bool(attachment.get("constantSpeed", True))
+            vertex_count = attachment.get("vertexCount", 0)
+            output.write_varint(vertex_count)
+            self._write_vertices(output, attachment["vertices"], vertex_count)
+            lengths = attachment.get("lengths", [])
+            if len(lengths) != vertex_count // 3:
+                raise SkeletonBinaryError(f"路径长度的数量应为{vertex_count // 3}")
+            output.write_floats(lengths)
+            if nonessential:
+                output.write_int(_color(attachment.get("color")))
+        elif attachment_type == "point":
+            output.write_floats((attachment.get("rotation", 0), attachment.get("x", 0), attachment.get("y", 0)))
+            if nonessential:
+                output.write_int(_color(attachment.get("color")))
+        elif attachment_type == "clipping":
+            # 二进制格式必须有结束插槽，JSON中没有时使用第一个插槽
+            end = attachment.get("end")
+            output.write_varint(0 if end is None else self._find(self.slots, end, "裁剪的结束插槽"))
+            vertex_count = attachment.get("vertexCount", 0)
+            output.write_varint(vertex_count)
+            self._write_vertices(output, attachment["vertices"], vertex_count)
+            if nonessential:
+                output.write_int(_color(attachment.get("color")))
+
+    @staticmethod
+    def _write_sequence(output: SkeletonOutput, sequence: Optional[dict]):
+        output.write_bool(sequence is not None)
+        if sequence is None:
+            return
+        if "count" not in sequence:
+            raise SkeletonBinaryError("序列缺少count")
+        output.write_varint(sequence["count"])
+        output.write_varint(sequence.get("start", 1))
+        output.write_varint(sequence.get("digits", 0))
+        output.write_varint(sequence.get("setup", 0))
+
+    @staticmethod
+    def _write_vertices(output: SkeletonOutput, vertices: list[float], vertex_count: int):
+        """
+        与SkeletonJson.ReadVertices一致，数量为顶点数的2倍时没有权重，否则为 骨骼数, (骨骼, x, y, 权重)...
+        """
+        if len(vertices) == vertex_count << 1:
+            output.write_bool(False)
+            output.write_floats(vertices)
+            return
+        output.write_bool(True)
+        index = 0
+        for _ in range(vertex_count):
+            bone_count = int(vertices[index])
+            output.write_varint(bone_count)
+            index += 1
+            for _ in range(bone_count):
+                output.write_varint(int(vertices[index]))
+                output.write_floats(vertices[index + 1:index + 4])
+                index += 4
+        if index != len(vertices):
+            raise SkeletonBinaryError("带权重的顶点数据与顶点数量不符")
+
+    def write_events(self, output: SkeletonOutput):
+        output.write_varint(len(self.events))
+        for name, event in self.events.items():
+            output.write_string_ref(name)
+            output.write_varint(event.get("int", 0), False)
+            output.write_float(event.get("float", 0))
+            output.write_string(event.get("string", ""))
+            audio = event.get("audio")
+            output.write_string(audio)
+            if audio is not None:
+                output.write_floats((event.get("volume", 1), event.get("balance", 0)))
+
+    def write_animation(self, output: SkeletonOutput, name: str, animation: dict):
+        timelines = SkeletonOutput(self.strings)
+        count = (self._write_slot_timelines(timelines, animation.get("slots", {})) +
+                 self._write_bone_timelines(timelines, animation.get("bones", {})) +
+                 self._write_constraint_timelines(timelines, animation) +
+                 self._write_attachment_timelines(timelines, animation))
+        count += self._write_draw_order(timelines, animation.get("drawOrder", [])) + \
+                 self._write_event_timeline(timelines, animation.get("events", []))
+        output.write_string(name)
+        # 只是时间轴列表的初始容量
+        output.write_varint(count)
+        output.write_output(timelines)
+
+    def _write_slot_timelines(self, output: SkeletonOutput, slots: dict) -> int:
+        count = 0
+        output.write_varint(len(slots))
+        for slot_name, timeline_map in slots.items():
+            output.write_varint(self._find(self.slots, slot_name, "时间轴的插槽"))
+            timeline_map = {name: frames for name, frames in timeline_map.items() if frames}
+            output.write_varint(len(timeline_map))
+            for timeline_name, frames in timeline_map.items():
+                count += 1
+                if timeline_name == "attachment":
+                    output.write_byte(SLOT_ATTACHMENT)
+                    output.write_varint(len(frames))
+                    for key_map in frames:
+                        output.write_float(_get_float(key_map, "time", 0))
+                        output.write_string_ref(key_map.get("name"))
+                    continue
+                if timeline_name in ("rgba", "color"):
+                    timeline_type, write_values = SLOT_RGBA, _color_values(("color", 8))
+                elif timeline_name == "rgb":
+                    timeline_type, write_values = SLOT_RGB, _color_values(("color", 6))
+                elif timeline_name == "rgba2":
+                    timeline_type, write_values = SLOT_RGBA2, _color_values(("light", 8), ("dark", 6))
+                elif timeline_name == "rgb2":
+                    timeline_type, write_values = SLOT_RGB2, _color_values(("light", 6), ("dark", 6))
+                elif timeline_name == "alpha":
+                    timeline_type, write_values = SLOT_ALPHA, _alpha_value
+                else:
+                    raise SkeletonBinaryError(f"插槽 {slot_name} 中未知的时间轴：{timeline_name}")
+                values = {SLOT_RGBA: 4, SLOT_RGB: 3, SLOT_RGBA2: 7, SLOT_RGB2: 6, SLOT_ALPHA: 1}[timeline_type]
+                output.write_byte(timeline_type)
+                output.write_varint(len(frames))
+                output.write_varint(_bezier_count(frames, values))
+                _write_frames(output, frames, write_values)
+        return count
+
+    def _write_bone_timelines(self, output: SkeletonOutput, bones: dict) -> int:
+        count = 0
+        output.write_varint(len(bones))
+        for bone_name, timeline_map in bones.items():
+            output.write_varint(self._find(self.bones, bone_name, "时间轴的骨骼"))
+            timeline_map = {name: frames for name, frames in timeline_map.items() if frames}
+            output.write_varint(len(timeline_map))
+            for timeline_name, frames in timeline_map.items():
+                count += 1
+                try:
+                    timeline_type = BONE_TIMELINES[timeline_name]
+                except KeyError:
+                    raise SkeletonBinaryError(f"骨骼 {bone_name} 中未知的时间轴：{timeline_name}") from None
+                if timeline_name == "rotate":
+                    write_values = _rotate_value
+                elif timeline_name in ("translate", "shear"):
+                    write_values = _float_values(("x", 0), ("y", 0))
+                elif timeline_name == "scale":
+                    write_values = _float_values(("x", 1), ("y", 1))
+                else:
+                    write_values = _float_values(("value", 1 if timeline_name.startswith("scale") else 0))
+                output.write_byte(timeline_type)
+                output.write_varint(len(frames))
+                output.write_varint(_bezier_count(frames, 2 if timeline_type in (1, 4, 7) else 1))
+                _write_frames(output, frames, write_values)
+        return count
+
+    def _write_constraint_timelines(self, output: SkeletonOutput, animation: dict) -> int:
+        count = 0
+        ik_timelines = {name: frames for name, frames in animation.get("ik", {}).items() if frames}
+        output.write_varint(len(ik_timelines))
+        for constraint_name, frames in ik_timelines.items():
+            count += 1
+            output.write_varint(self._find(self.ik, constraint_name, "IK约束"))
+            output.write_varint(len(frames))
+            output.write_varint(_bezier_count(frames, 2))
+            # IK的曲线写在下一帧的时间、混合值之后，弯曲方向等之前
+            time = _get_float(frames[0], "time", 0)
+            values = (_get_float(frames[0], "mix", 1), _get_float(frames[0], "softness", 0))
+            output.write_floats((time, *values))
+            for frame, key_map in enumerate(frames):
+                output.write_byte(1 if key_map.get("bendPositive", True) else -1)
+                output.write_bool(key_map.get("compress", False))
+                output.write_bool(key_map.get("stretch", False))
+                if frame == len(frames) - 1:
+                    break
+                next_map = frames[frame + 1]
+                time2 = _get_float(next_map, "time", 0)
+                values2 = (_get_float(next_map, "mix", 1), _get_float(next_map, "softness", 0))
+                output.write_floats((time2, *values2))
+                _write_curve(output, _curve(key_map, time, time2, values, values2), 2)
+                time = time2
+                values = values2
+        transform_timelines = {name: frames for name, frames in animation.get("transform", {}).items() if frames}
+        output.write_varint(len(transform_timelines))
+        for constraint_name, frames in transform_timelines.items():
+            count += 1
+            output.write_varint(self._find(self.transform, constraint_name, "变换约束"))
+            output.write_varint(len(frames))
+            output.write_varint(_bezier_count(frames, 6))
+            _write_frames(output, frames, _float_values(("mixRotate", 1), ("mixX", 1), ("mixY", "mixX"),
+                                                        ("mixScaleX", 1), ("mixScaleY", "mixScaleX"),
+                                                        ("mixShearY", 1)))
+        path_timelines = animation.get("path", {})
+        output.write_varint(len(path_timelines))
+        for constraint_name, timeline_map in path_timelines.items():
+            output.write_varint(self._find(self.path, constraint_name, "路径约束"))
+            timeline_map = {name: frames for name, frames in timeline_map.items() if frames}
+            output.write_varint(len(timeline_map))
+            for timeline_name, frames in timeline_map.items():
+                count += 1
+                if timeline_name == "position":
+                    timeline_type, write_values = PATH_POSITION, _float_values(("value", 0))
+                elif timeline_name == "spacing":
+                    timeline_type, write_values = PATH_SPACING, _float_values(("value", 0))
+                elif timeline_name == "mix":
+                    timeline_type, write_values = PATH_MIX, _float_values(("mixRotate", 1), ("mixX", 1),
+                                                                          ("mixY", "mixX"))
+                else:
+                    raise SkeletonBinaryError(f"路径约束 {constraint_name} 中未知的时间轴：{timeline_name}")
+                output.write_byte(timeline_type)
+                output.write_varint(len(frames))
+                output.write_varint(_bezier_count(frames, 3 if timeline_type == PATH_MIX else 1))
+                _write_frames(output, frames, write_values)
+        return count
+
+    def _write_attachment_timelines(self, output: SkeletonOutput, animation: dict) -> int:
+        # 皮肤 -> 插槽 -> [(附件, 时间轴名称, 帧)]
+        skins: dict[str, dict[str, list[tuple[str, str, list[dict]]]]] = {}
+        for skin_name, slots in animation.get("attachments", {}).items():
+            for slot_name, attachments in slots.items():
+                for attachment_name, timeline_map in attachments.items():
+                    for timeline_name, frames in timeline_map.items():
+                        if frames:
+                            skins.setdefault(skin_name, {}).setdefault(slot_name, []).append(
+                                (attachment_name, timeline_name, frames))
+        # 4.0导出的JSON中变形动画在deform下，没有中间的时间轴名称
+        for skin_name, slots in animation.get("deform", {}).items():
+            for slot_name, attachments in slots.items():
+                for attachment_name, frames in attachments.items():
+                    if frames:
+                        skins.setdefault(skin_name, {}).setdefault(slot_name, []).append(
+                            (attachment_name, "deform", frames))
+        count = 0
+        output.write_varint(len(skins))
+        for skin_name, slots in skins.items():
+            output.write_varint(self._find(self.skin_index, skin_name, "时间轴的皮肤"))
+            output.write_varint(len(slots))
+            for slot_name, timelines in slots.items():
+                output.write_varint(self._find(self.slots, slot_name, "时间轴的插槽"))
+                output.write_varint(len(timelines))
+                for attachment_name, timeline_name, frames in timelines:
+                    count += 1
+                    output.write_string_ref(attachment_name)
+                    if timeline_name == "deform":
+                        self._write_deform(output, frames)
+                    elif timeline_name == "sequence":
+                        output.write_byte(ATTACHMENT_SEQUENCE)
+                        output.write_varint(len(frames))
+                        last_delay = 0
+                        for key_map in frames:
+                            delay = _get_float(key_map, "delay", last_delay)
+                            mode = _enum_index(SEQUENCE_MODES, key_map.get("mode", "hold"), "序列模式")
+                            output.write_float(_get_float(key_map, "time", 0))
+                            output.write_int(key_map.get("index", 0) << 4 | mode)
+                            output.write_float(delay)
+                            last_delay = delay
+                    else:
+                        raise SkeletonBinaryError(f"附件 {attachment_name} 中未知的时间轴：{timeline_name}")
+        return count
+
+    @staticmethod
+    def _write_deform(output: SkeletonOutput, frames: list[dict]):
+        output.write_byte(ATTACHMENT_DEFORM)
+        output.write_varint(len(frames))
+        output.write_varint(_bezier_count(frames, 1))
+        time = _get_float(frames[0], "time", 0)
+        output.write_float(time)
+        for frame, key_map in enumerate(frames):
+            vertices = key_map.get("vertices")
+            # 0表示与初始状态相同，否则为数量、起始位置和偏移量
+            if not vertices:
+                output.write_varint(0)
+            else:
+                output.write_varint(len(vertices))
+                output.write_varint(key_map.get("offset", 0))
+                output.write_floats(vertices)
+            if frame == len(frames) - 1:
+                break
+            time2 = _get_float(frames[frame + 1], "time", 0)
+            output.write_float(time2)
+            _write_curve(output, _curve(key_map, time, time2, (0,), (1,)), 1)
+            time = time2
+
+    def _write_draw_order(self, output: SkeletonOutput, draw_orders: list[dict]) -> int:
+        output.write_varint(len(draw_orders))
+        for draw_order in draw_orders:
+            output.write_float(_get_float(draw_order, "time", 0))
+            offsets = draw_order.get("offsets", [])
+            output.write_varint(len(offsets))
+            for offset in offsets:
+                output.write_varint(self._find(self.slots, offset["slot"], "绘制顺序的插槽"))
+                # 偏移量可能为负数，与Spine一样按无符号变长整数写入
+                output.write_varint(offset["offset"])
+        return 1 if draw_orders else 0
+
+    def _write_event_timeline(self, output: SkeletonOutput, events: list[dict]) -> int:
+        output.write_varint(len(events))
+        for event in events:
+            event_data = self.events.get(event["name"])
+            if event_data is None:
+                raise SkeletonBinaryError(f"找不到事件：{event['name']}")
+            output.write_float(_get_float(event, "time", 0))
+            output.write_varint(self.event_index[event["name"]])
+            output.write_varint(event.get("int", event_data.get("int", 0)), False)
+            output.write_float(event.get("float", event_data.get("float", 0)))
+            output.write_bool("string" in event)
+            if "string" in event:
+                output.write_string(event["string"])
+            if event_data.get("audio") is not None:
+                output.write_floats((event.get("volume", event_data.get("volume", 1)),
+                                     event.get("balance", event_data.get("balance", 0))))
+        return 1 if events else 0
+
+
+def detect_json_version(data: dict) -> str:
+    """
+    :param data: 骨骼JSON的解析结果
+    :return: 开头的主次版本号，如4.0；4.0-from-3.8.99是4.0导出的JSON，同样为4.0
+    """
+    match = _VERSION_RE.match(str(data.get("skeleton", {}).get("spine", "")))
+    return f"{match.group(1)}.{match.group(2)}" if match is not None else ""
+
+
+def export_skeleton(data: dict, nonessential: bool = False) -> bytes:
+    """
+    把骨骼JSON转换为Spine 4.1的二进制格式（.skel），Unity中加载更快、文件更小。
+    转换结果与用SkeletonJson.cs读取原JSON得到的数据一致，miHoYo自定义的extra等字段没有对应的二进制格式，会被忽略
+    :param data: 骨骼JSON的解析结果（如NormalizedSkeleton.data）
+    :param nonessential: 是否写入只有编辑器使用的数据（骨骼颜色、网格的边等）
+    :return: .skel文件内容
+    """
+    version = detect_json_version(data)
+    if version not in SUPPORTED_JSON_VERSIONS:
+        raise SkeletonBinaryError(f"不支持的Spine版本：{version or '未知'}，只支持{'、'.join(SUPPORTED_JSON_VERSIONS)}")
+    return _SkeletonWriter(data, nonessential).write()
+
+
+class SkeletonInput:
+    """
+    与SkeletonBinary.SkeletonInput对应的读取器，用于检查导出结果
+    """
+
+    def __init__(self, content: bytes):
+        self.content = content
+        self.pos = 0
+        self.strings: list[str] = []
+
+    def _take(self, size: int) -> bytes:
+        end = self.pos + size
+        if end > len(self.content):
+            raise SkeletonBinaryError(f"数据在{self.pos}处提前结束")
+        value = self.content[self.pos:end]
+        self.pos = end
+        return value
+
+    def read_byte(self) -> int:
+        return self._take(1)[0]
+
+    def read_bytes(self, count: int) -> bytes:
+        return self._take(count)
+
+    def read_sbyte(self) -> int:
+        value = self.read_byte()
+        return value - 256 if value > 127 else value
+
+    def read_bool(self) -> bool:
+        return self.read_byte() != 0
+
+    def read_int(self) -> int:
+        value = _INT.unpack(self._take(4))[0]
+        return value - (1 << 32) if value >= 1 << 31 else value
+
+    def read_long(self) -> int:
+        return _LONG.unpack(self._take(8))[0]
+
+    def read_varint(self, optimize_positive: bool = True) -> int:
+        """
+        与SkeletonInput.ReadInt(bool)一致，结果为32位有符号整数
+        """
+        value = 0
+        for shift in range(0, 35, 7):
+            byte = self.read_byte()
+            value |= (byte & 0x7F) << shift
+            if not byte & 0x80:
+                break
+        value &= 0xFFFFFFFF
+        if not optimize_positive:
+            value = (value >> 1) ^ -(value & 1)
+        return value - (1 << 32) if value >= 1 << 31 else value
+
+    def read_float(self) -> float:
+        return _FLOAT.unpack(self._take(4))[0]
+
+    def read_floats(self, count: int) -> list[float]:
+        return list(struct.unpack(f">{count}f", self._take(count * 4)))
+
+    def read_shorts(self) -> list[int]:
+        count = self.read_varint()
+        return list(struct.unpack(f">{count}H", self._take(count * 2)))
+
+    def read_string(self) -> Optional[str]:
+        length = self.read_varint()
+        if length == 0:
+            return None
+        return self._take(length - 1).decode("utf-8")
+
+    def read_string_ref(self) -> Optional[str]:
+        index = self.read_varint()
+        return None if index == 0 else self.strings[index - 1]
+
+
+def _color_hex(value: int, length: int = 8) -> str:
+    return f"{value & ((1 << length * 4) - 1):0{length}x}"
+
+
+class _SkeletonReader:
+    """
+    按照SkeletonBinary.ReadSkeletonData（4.1）的顺序读取，结果为4.1格式的骨骼JSON，所有字段都带上实际的值
+    """
+
+    def __init__(self, content: bytes):
+        self.input = SkeletonInput(content)
+        self.nonessential = False
+        self.bones: list[str] = []
+        self.slots: list[str] = []
+        self.ik: list[str] = []
+        self.transform: list[str] = []
+        self.path: list[str] = []
+        self.skins: list[str] = []
+        self.events: list[str] = []
+        self.event_data: list[dict] = []
+
+    def read(self) -> dict:
+        data = {"skeleton": self.read_header()}
+        data["bones"] = self.read_bones()
+        data["slots"] = self.read_slots()
+        data["ik"], data["transform"], data["path"] = self.read_constraints()
+        data["skins"] = self.read_skins()
+        data["events"] = self.read_events()
+        animations = {}
+        for _ in range(self.input.read_varint()):
+            name = self.input.read_string()
+            animations[name] = self.read_animation()
+        data["animations"] = animations
+        if self.input.pos != len(self.input.content):
+            raise SkeletonBinaryError(f"结尾还有{len(self.input.content) - self.input.pos}字节没有读取")
+        return data
+
+    def read_header(self) -> dict:
+        data = self.input
+        skeleton = {"hash": data.read_long(), "spine": data.read_string()}
+        skeleton["x"], skeleton["y"], skeleton["width"], skeleton["height"] = data.read_floats(4)
+        self.nonessential = data.read_bool()
+        if self.nonessential:
+            skeleton["fps"] = data.read_float()
+            skeleton["images"] = data.read_string()
+            skeleton["audio"] = data.read_string()
+        data.strings = [data.read_string() for _ in range(data.read_varint())]
+        return skeleton
+
+    def read_bones(self) -> list[dict]:
+        data = self.input
+        bones = []
+        for index in range(data.read_varint()):
+            bone = {"name": data.read_string()}
+            self.bones.append(bone["name"])
+            if index != 0:
+                bone["parent"] = self.bones[data.read_varint()]
+            values = data.read_floats(8)
+            for name, value in zip(("rotation", "x", "y", "scaleX", "scaleY", "shearX", "shearY", "length"), values):
+                bone[name] = value
+            bone["transform"] = TRANSFORM_MODES[data.read_varint()]
+            bone["skin"] = data.read_bool()
+            if self.nonessential:
+                bone["color"] = _color_hex(data.read_int())
+            bones.append(bone)
+        return bones
+
+    def read_slots(self) -> list[dict]:
+        data = self.input
+        slots = []
+        for _ in range(data.read_varint()):
+            slot = {"name": data.read_string(), "bone": self.bones[data.read_varint()],
+                    "color": _color_hex(data.read_int())}
+            dark = data.read_int()
+            if dark != -1:
+                slot["dark"] = _color_hex(dark, 6)
+            slot["attachment"] = data.read_string_ref()
+            slot["blend"] = BLEND_MODES[data.read_varint()]
+            self.slots.append(slot["name"])
+            slots.append(slot)
+        return slots
+
+    def _read_constraint_head(self) -> dict:
+        data = self.input
+        constraint = {"name": data.read_string(), "order": data.read_varint(), "skin": data.read_bool()}
+        constraint["bones"] = [self.bones[data.read_varint()] for _ in range(data.read_varint())]
+        return constraint
+
+    def read_constraints(self) -> tuple[list[dict], list[dict], list[dict]]:
+        data = self.input
+        ik_constraints = []
+        for _ in range(data.read_varint()):
+            constraint = self._read_constraint_head()
+            constraint["target"] = self.bones[data.read_varint()]
+            constraint["mix"], constraint["softness"] = data.read_floats(2)
+            constraint["bendPositive"] = data.read_sbyte() > 0
+            constraint["compress"] = data.read_bool()
+            constraint["stretch"] = data.read_bool()
+            constraint["uniform"] = data.read_bool()
+            self.ik.append(constraint["name"])
+            ik_constraints.append(constraint)
+        transform_constraints = []
+        for _ in range(data.read_varint()):
+            constraint = self._read_constraint_head()
+            constraint["target"] = self.bones[data.read_varint()]
+            constraint["local"] = data.read_bool()
+            constraint["relative"] = data.read_bool()
+            names = ("rotation", "x", "y", "scaleX", "scaleY", "shearY", "mixRotate", "mixX", "mixY", "mixScaleX",
+                     "mixScaleY", "mixShearY")
+            constraint.update(zip(names, data.read_floats(len(names))))
+            self.transform.append(constraint["name"])
+            transform_constraints.append(constraint)
+        path_constraints = []
+        for _ in range(data.read_varint()):
+            constraint = self._read_constraint_head()
+            constraint["target"] = self.slots[data.read_varint()]
+            constraint["positionMode"] = POSITION_MODES[data.read_varint()]
+            constraint["spacingMode"] = SPACING_MODES[data.read_varint()]
+            constraint["rotateMode"] = ROTATE_MODES[data.read_varint()]
+            names = ("rotation", "position", "spacing", "mixRotate", "mixX", "mixY")
+            constraint.update(zip(names, data.read_floats(len(names))))
+            self.path.append(constraint["name"])
+            path_constraints.append(constraint)
+        return ik_constraints, transform_constraints, path_constraints
+
+    def read_skins(self) -> list[dict]:
+        data = self.input
+        skins = []
+        # 默认皮肤没有名称和骨骼、约束列表，没有附件时不存在
+        attachments = self._read_skin_attachments()
+        if attachments is not None:
+            skins.append({"name": "default", "attachments": attachments})
+        for _ in range(data.read_varint()):
+            skin = {"name": data.read_string_ref()}
+            for key, names in (("bones", self.bones), ("ik", self.ik), ("transform", self.transform),
+                               ("path", self.path)):
+                skin[key] = [names[data.read_varint()] for _ in range(data.read_varint())]
+            skin["attachments"] = self._read_skin_attachments() or {}
+            skins.append(skin)
+        self.skins = [skin["name"] for skin in skins]
+        return skins
+
+    def _read_skin_attachments(self) -> Optional[dict]:
+        data = self.input
+        slot_count = data.read_varint()
+        if slot_count == 0:
+            return None
+        attachments = {}
+        for _ in range(slot_count):
+            slot_attachments = attachments[self.slots[data.read_varint()]] = {}
+            for _ in range(data.read_varint()):
+                key = data.read_string_ref()
+                slot_attachments[key] = self.read_attachment(key)
+        return attachments
+
+    def read_attachment(self, key: str) -> dict:
+        data = self.input
+        name = data.read_string_ref() or key
+        attachment_type = ATTACHMENT_TYPES[data.read_byte()]
+        attachment = {"name": name, "type": attachment_type}
+        if attachment_type in ("region", "mesh", "linkedmesh"):
+            attachment["path"] = data.read_string_ref() or name
+        if attachment_type == "region":
+            names = ("rotation", "x", "y", "scaleX", "scaleY", "width", "height")
+            attachment.update(zip(names, data.read_floats(len(names))))
+            attachment["color"] = _color_hex(data.read_int())
+            self._read_sequence(attachment)
+        elif attachment_type == "boundingbox":
+            attachment["vertexCount"] = data.read_varint()
+            attachment["vertices"] = self._read_vertices(attachment["vertexCount"])
+            if self.nonessential:
+                attachment["color"] = _color_hex(data.read_int())
+        elif attachment_type == "mesh":
+            attachment["color"] = _color_hex(data.read_int())
+            vertex_count = data.read_varint()
+            attachment["uvs"] = data.read_floats(vertex_count << 1)
+            attachment["triangles"] = data.read_shorts()
+            attachment["vertices"] = self._read_vertices(vertex_count)
+            attachment["hull"] = data.read_varint()
+            self._read_sequence(attachment)
+            if self.nonessential:
+                attachment["edges"] = data.read_shorts()
+                attachment["width"], attachment["height"] = data.read_floats(2)
+        elif attachment_type == "linkedmesh":
+            attachment["color"] = _color_hex(data.read_int())
+            attachment["skin"] = data.read_string_ref()
+            attachment["parent"] = data.read_string_ref()
+            attachment["timelines"] = data.read_bool()
+            self._read_sequence(attachment)
+            if self.nonessential:
+                attachment["width"], attachment["height"] = data.read_floats(2)
+        elif attachment_type == "path":
+            attachment["closed"] = data.read_bool()
+            attachment["constantSpeed"] = data.read_bool()
+            attachment["vertexCount"] = data.read_varint()
+            attachment["vertices"] = self._read_vertices(attachment["vertexCount"])
+            attachment["lengths"] = data.read_floats(attachment["vertexCount"] // 3)
+            if self.nonessential:
+                attachment["color"] = _color_hex(data.read_int())
+        elif attachment_type == "point":
+            attachment["rotation"], attachment["x"], attachment["y"] = data.read_floats(3)
+            if self.nonessential:
+                attachment["color"] = _color_hex(data.read_int())
+        elif attachment_type == "clipping":
+            attachment["end"] = self.slots[data.read_varint()]
+            attachment["vertexCount"] = data.read_varint()
+            attachment["vertices"] = self._read_vertices(attachment["vertexCount"])
+            if self.nonessential:
+                attachment["color"] = _color_hex(data.read_int())
+        return attachment
+
+    def _read_sequence(self, attachment: dict):
+        data = self.input
+        if data.read_bool():
+            attachment["sequence"] = {"count": data.read_varint(), "start": data.read_varint(),
+                                      "digits": data.read_varint(), "setup": data.read_varint()}
+
+    def _read_vertices(self, vertex_count: int) -> list[float]:
+        """
+        与SkeletonBinary.ReadVertices一致，带权重时还原为JSON中的 骨骼数, (骨骼, x, y, 权重)...
+        """
+        data = self.input
+        if not data.read_bool():
+            return data.read_floats(vertex_count << 1)
+        vertices = []
+        for _ in range(vertex_count):
+            bone_count = data.read_varint()
+            vertices.append(bone_count)
+            for _ in range(bone_count):
+                vertices.append(data.read_varint())
+                vertices += data.read_floats(3)
+        return vertices
+
+    def _read_curve(self, key_map: dict, values: int):
+        curve = self.input.read_byte()
+        if curve == CURVE_STEPPED:
+            key_map["curve"] = "stepped"
+        elif curve == CURVE_BEZIER:
+            key_map["curve"] = self.input.read_floats(values * 4)
+
+    def _read_frames(self, frame_count: int, read_values: Callable[[], dict],
+                     values: Optional[int] = None) -> list[dict]:
+        """
+        与SkeletonBinary.ReadTimeline一致：时间、值，从第二帧起在值之后读取上一帧的曲线
+        :param values: 曲线的数量，默认与每帧的值的数量相同（颜色按通道数）
+        """
+        frames = []
+        for _ in range(frame_count):
+            key_map = {"time": self.input.read_float(), **read_values()}
+            if frames:
+                self._read_curve(frames[-1], len(key_map) - 1 if values is None else values)
+            frames.append(key_map)
+        return frames
+
+    def _float_values(self, *names: str) -> Callable[[], dict]:
+        return lambda: dict(zip(names, self.input.read_floats(len(names))))
+
+    def _color_values(self, *names_lengths: tuple[str, int]) -> Callable[[], dict]:
+        def read_values() -> dict:
+            return {name: self.input.read_bytes(length // 2).hex() for name, length in names_lengths}
+
+        return read_values
+
+    def read_animation(self) -> dict:
+        data = self.input
+        data.read_varint()  # 时间轴列表的初始容量
+        animation = {}
+        slots = {}
+        for _ in range(data.read_varint()):
+            timelines = slots[self.slots[data.read_varint()]] = {}
+            for _ in range(data.read_varint()):
+                timeline_type = data.read_byte()
+                frame_count = data.read_varint()
+                if timeline_type == SLOT_ATTACHMENT:
+                    timelines["attachment"] = [{"time": data.read_float(), "name": data.read_string_ref()}
+                                               for _ in range(frame_count)]
+                    continue
+                name, read_values, values = {
+                    SLOT_RGBA: ("rgba", self._color_values(("color", 8)), 4),
+                    SLOT_RGB: ("rgb", self._color_values(("color", 6)), 3),
+                    SLOT_RGBA2: ("rgba2", self._color_values(("light", 8), ("dark", 6)), 7),
+                    SLOT_RGB2: ("rgb2", self._color_values(("light", 6), ("dark", 6)), 6),
+                    SLOT_ALPHA: ("alpha", lambda: {"value": data.read_byte() / 255}, 1),
+                }[timeline_type]
+                data.read_varint()  # 贝塞尔曲线的数量
+                timelines[name] = self._read_frames(frame_count, read_values, values)
+        animation["slots"] = slots
+        bones = {}
+        bone_timelines = {value: name for name, value in BONE_TIMELINES.items()}
+        for _ in range(data.read_varint()):
+            timelines = bones[self.bones[data.read_varint()]] = {}
+            for _ in range(data.read_varint()):
+                name = bone_timelines[data.read_byte()]
+                frame_count = data.read_varint()
+                data.read_varint()
+                names = ("x", "y") if name in ("translate", "scale", "shear") else ("value",)
+                timelines[name] = self._read_frames(frame_count, self._float_values(*names))
+        animation["bones"] = bones
+        ik = {}
+        for _ in range(data.read_varint()):
+            name = self.ik[data.read_varint()]
+            frame_count = data.read_varint()
+            data.read_varint()
+            frames = []
+            # IK的曲线在下一帧的时间、混合值之后，弯曲方向等之前
+            for frame in range(frame_count):
+                key_map = {"time": data.read_float(), "mix": data.read_float(), "softness": data.read_float()}
+                if frames:
+                    self._read_curve(frames[-1], 2)
+                key_map["bendPositive"] = data.read_sbyte() > 0
+                key_map["compress"] = data.read_bool()
+                key_map["stretch"] = data.read_bool()
+                frames.append(key_map)
+            ik[name] = frames
+        animation["ik"] = ik
+        transform = {}
+        for _ in range(data.read_varint()):
+            name = self.transform[data.read_varint()]
+            frame_count = data.read_varint()
+            data.read_varint()
+            transform[name] = self._read_frames(frame_count, self._float_values(
+                "mixRotate", "mixX", "mixY", "mixScaleX", "mixScaleY", "mixShearY"))
+        animation["transform"] = transform
+        path = {}
+        for _ in range(data.read_varint()):
+            timelines = path[self.path[data.read_varint()]] = {}
+            for _ in range(data.read_varint()):
+                timeline_type = data.read_byte()
+                frame_count = data.read_varint()
+                data.read_varint()
+                if timeline_type == PATH_MIX:
+                    timelines["mix"] = self._read_frames(frame_count, self._float_values("mixRotate", "mixX", "mixY"))
+                else:
+                    name = "position" if timeline_type == PATH_POSITION else "spacing"
+                    timelines[name] = self._read_frames(frame_count, self._float_values("value"))
+        animation["path"] = path
+        animation["attachments"] = self._read_attachment_timelines()
+        animation["drawOrder"] = self._read_draw_order()
+        animation["events"] = self._read_event_timeline()
+        return animation
+
+    def _read_attachment_timelines(self) -> dict:
+        data = self.input
+        skins = {}
+        for _ in range(data.read_varint()):
+            slots = skins[self.skins[data.read_varint()]] = {}
+            for _ in range(data.read_varint()):
+                attachments = slots[self.slots[data.read_varint()]] = {}
+                for _ in range(data.read_varint()):
+                    timelines = attachments.setdefault(data.read_string_ref(), {})
+                    timeline_type = data.read_byte()
+                    frame_count = data.read_varint()
+                    if timeline_type == ATTACHMENT_SEQUENCE:
+                        frames = []
+                        for _ in range(frame_count):
+                            time = data.read_float()
+                            mode_and_index = data.read_int()
+                            frames.append({"time": time, "mode": SEQUENCE_MODES[mode_and_index & 0xF],
+                                           "index": mode_and_index >> 4, "delay": data.read_float()})
+                        timelines["sequence"] = frames
+                        continue
+                    data.read_varint()
+                    frames = []
+                    for _ in range(frame_count):
+                        key_map = {"time": data.read_float()}
+                        if frames:
+                            self._read_curve(frames[-1], 1)
+                        end = data.read_varint()
+                        if end != 0:
+                            key_map["offset"] = data.read_varint()
+                            key_map["vertices"] = data.read_floats(end)
+                        frames.append(key_map)
+                    timelines["deform"] = frames
+        return skins
+
+    def _read_draw_order(self) -> list[dict]:
+        data = self.input
+        draw_orders = []
+        for _ in range(data.read_varint()):
+            time = data.read_float()
+            offsets = [{"slot": self.slots[data.read_varint()], "offset": data.read_varint()}
+                       for _ in range(data.read_varint())]
+            draw_orders.append({"time": time, "offsets": offsets})
+        return draw_orders
+
+    def _read_event_timeline(self) -> list[dict]:
+        data = self.input
+        events = []
+        for _ in range(data.read_varint()):
+            time = data.read_float()
+            index = data.read_varint()
+            event = {"time": time, "name": self.events[index], "int": data.read_varint(False),
+                     "float": data.read_float()}
+            event_data = self.event_data[index]
+            event["string"] = data.read_string() if data.read_bool() else event_data["string"]
+            if event_data["audio"] is not None:
+                event["volume"], event["balance"] = data.read_floats(2)
+            events.append(event)
+        return events
+
+    def read_events(self) -> dict:
+        data = self.input
+        events = {}
+        for _ in range(data.read_varint()):
+            name = data.read_string_ref()
+            event = {"int": data.read_varint(False), "float": data.read_float(), "string": data.read_string(),
+                     "audio": data.read_string()}
+            if event["audio"] is not None:
+                event["volume"], event["balance"] = data.read_floats(2)
+            self.events.append(name)
+            self.event_data.append(event)
+            events[name] = event
+        return events
+
+
+def read_skeleton(content: bytes) -> dict:
+    """
+    读取4.1的二进制格式，读取顺序与SkeletonBinary.cs一致，用于检查export_skeleton的结果
+    :param content: .skel文件内容
+    :return: 4.1格式的骨骼JSON，默认值也都写出，颜色为小写的十六进制，枚举为小写
+    """
+    return _SkeletonReader(content).read()
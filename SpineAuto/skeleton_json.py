@@ -0,0 +1,101 @@
+import json
+from collections import namedtuple
+from typing import Any, Optional
+
+try:
+    import orjson
+except ImportError:  # 没有安装orjson时使用标准库
+    orjson = None
+
+JSON_BACKEND = "json" if orjson is None else "orjson"
+
+# 规范化后的骨骼JSON：解析结果、写入文件的内容、Spine命令行使用的版本
+NormalizedSkeleton = namedtuple("NormalizedSkeleton", ["data", "content", "spine_version"])
+
+
+def loads(content: str | bytes) -> Any:
+    """
+    解析JSON，安装了orjson时使用orjson
+    :param content: JSON文本
+    :return: 解析结果
+    """
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def dumps(data: Any, minify: bool = False) -> bytes:
+    """
+    序列化为UTF-8编码的JSON，中文不转义
+    :param data: 数据
+    :param minify: 是否输出紧凑格式，否则缩进4个空格。
+                   orjson只支持2个空格的缩进，缩进输出总是使用标准库，不同环境输出的文件相同
+    :return: JSON文本
+    """
+    if not minify:
+        return json.dumps(data, ensure_ascii=False, indent=4).encode("utf-8")
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def parser_spine_version(version: str) -> str:
+    """
+    转换spine版本
+    :param version: 原始版本字符串
+    :return: 可用的一个版本（最新）
+    """
+    if "-from-" in version:
+        return version.split("-from-")[1]
+    return version
+
+
+def normalize_skeleton(content: str | bytes, images: Optional[str] = "./images", fix_version: bool = True,
+                       minify: bool = False) -> NormalizedSkeleton:
+    """
+    一次解析、一次序列化完成骨骼JSON的所有修改
+    :param content: 原始的骨骼JSON
+    :param images: skeleton.images改为这个值，None时不修改
+    :param fix_version: 是否将4.0-from-3.8.99这样的版本改为3.8.99
+    :param minify: 是否输出紧凑格式
+    :return: 规范化的结果
+    """
+    data = loads(content)
+    skeleton = data.setdefault("skeleton", {})
+    spine_version = parser_spine_version(skeleton.get("spine", ""))
+    if fix_version and "spine" in skeleton:
+        skeleton["spine"] = spine_version
+    if images is not None:
+        skeleton["images"] = images
+    return NormalizedSkeleton(data, dumps(data, minify), spine_version)
+
+
+# 在atlas中有对应区域的附件类型，没有type时默认为region
+TEXTURED_ATTACHMENTS = ("region", "mesh", "linkedmesh")
+
+
+def skeleton_attachments(data: Any) -> set[str]:
+    """
+    骨骼用到的atlas区域名称
+    :param data: 解析后的骨骼JSON，skins可以是3.8之后的列表或之前的字典
+    :return: 区域名称
+    """
+    skins = data.get("skins") or []
+    if isinstance(skins, dict):
+        skins = [{"name": name, "attachments": attachments} for name, attachments in skins.items()]
+    names = set()
+    for skin in skins:
+        for slot in (skin.get("attachments") or {}).values():
+            for key, attachment in slot.items():
+                if attachment.get("type", "region") not in TEXTURED_ATTACHMENTS:
+                    continue
+                path = attachment.get("path") or attachment.get("name") or key
+                sequence = attachment.get("sequence")
+                if sequence is None:
+                    names.add(path)
+                    continue
+                # 4.1的序列帧：每一帧是一个区域，名称后面带编号
+                start = sequence.get("start", 1)
+                for index in range(start, start + sequence.get("count", 0)):
+                    names.add(path + str(index).zfill(sequence.get("digits", 0)))
+    return names
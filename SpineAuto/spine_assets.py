@@ -0,0 +1,130 @@
+from typing import Any, Callable, Hashable, Optional
+
+# 同一个分块中不在模块表里的atlas和骨骼JSON使用这个模块id，按出现顺序配对
+NO_MODULE = None
+
+
+class _Entry:
+    __slots__ = ("is_atlas", "chunk", "module", "value", "paired")
+
+    def __init__(self, is_atlas: bool, chunk: Hashable, module: Optional[str], value: Any):
+        self.is_atlas = is_atlas
+        self.chunk = chunk
+        self.module = module
+        self.value = value
+        self.paired = False
+
+
+class SpineAssetResolver:
+    """
+    按webpack模块把atlas和骨骼JSON配对，不依赖它们在文件中的字符位置：
+    1. 同一个模块中的atlas和骨骼JSON；
+    2. 模块表中相邻的两个模块（JSON在atlas之后或之前都可以）；
+    3. 扫描完所有分块后，同一个模块（如组件）同时引用了atlas模块和骨骼JSON模块；
+    4. 最后剩下的按内容匹配（骨骼用到的附件都在atlas中），只有唯一的候选时才配对。
+    1、2在扫描的同时完成，配对的项目可以立即开始处理；每一步都要求内容匹配
+    """
+
+    def __init__(self, matches: Callable[[Any, Any], bool], on_pair: Callable[[Any, Any], None]):
+        """
+        :param matches: matches(atlas, skeleton)，骨骼是否可能使用这个atlas
+        :param on_pair: 配对成功时调用on_pair(atlas, skeleton)
+        """
+        self.matches = matches
+        self.on_pair = on_pair
+        self._atlases: list[_Entry] = []
+        self._skeletons: list[_Entry] = []
+        self._by_module: dict[tuple[Hashable, str], list[_Entry]] = {}
+        self._last_module: dict[Hashable, Optional[str]] = {}  # 分块 -> 最近结束的模块
+        self._previous: dict[tuple[Hashable, str], Optional[str]] = {}  # 模块 -> 模块表中的上一个模块
+        self._requires: dict[str, list[str]] = {}  # 模块 -> 引用的模块
+
+    def add_module(self, chunk: Hashable, module: str, requires: list[str]):
+        """
+        一个模块结束
+        :param chunk: 所在的分块
+        :param module: 模块id
+        :param requires: 引用的模块id
+        """
+        self._previous.setdefault((chunk, module), self._last_module.get(chunk))
+        self._last_module[chunk] = module
+        if requires:
+            self._requires[module] = requires
+
+    def add_atlas(self, chunk: Hashable, module: Optional[str], atlas: Any):
+        """
+        :param chunk: 所在的分块
+        :param module: 所在的模块id，不在模块表中时为None
+        :param atlas: 解析后的atlas
+        """
+        self._pair_nearby(self._add(self._atlases, True, chunk, module, atlas))
+
+    def add_skeleton(self, chunk: Hashable, module: Optional[str], skeleton: Any):
+        """
+        :param chunk: 所在的分块
+        :param module: 所在的模块id，不在模块表中时为None
+        :param skeleton: 解析后的骨骼
+        """
+        self._pair_nearby(self._add(self._skeletons, False, chunk, module, skeleton))
+
+    def finish(self) -> tuple[list[Any], list[Any]]:
+        """
+        所有分块都扫描完后，按引用关系和内容配对剩下的atlas和骨骼
+        :return: 仍然没有配对的atlas和骨骼
+        """
+        # 同时引用了atlas和骨骼JSON的模块
+        for requires in self._requires.values():
+            atlases = [entry for module in requires for entry in self._unpaired_in(self._atlases, module)]
+            if not atlases:
+                continue
+            for module in requires:
+                for skeleton in self._unpaired_in(self._skeletons, module):
+                    atlas = next((atlas for atlas in atlases if not atlas.paired and
+                                  self.matches(atlas.value, skeleton.value)), None)
+                    if atlas is not None:
+                        self._pair(atlas, skeleton)
+        # 按内容匹配，有多个候选时无法确定
+        for skeleton in self._skeletons:
+            if skeleton.paired:
+                continue
+            candidates = [atlas for atlas in self._atlases if not atlas.paired and
+                          self.matches(atlas.value, skeleton.value)]
+            if len(candidates) == 1:
+                self._pair(candidates[0], skeleton)
+        return ([entry.value for entry in self._atlases if not entry.paired],
+                [entry.value for entry in self._skeletons if not entry.paired])
+
+    def _add(self, entries: list[_Entry], is_atlas: bool, chunk: Hashable, module: Optional[str],
+             value: Any) -> _Entry:
+        entry = _Entry(is_atlas, chunk, module, value)
+        entries.append(entry)
+        self._by_module.setdefault((chunk, module), []).append(entry)
+        return entry
+
+    def _unpaired_in(self, entries: list[_Entry], module: str) -> list[_Entry]:
+        # 模块id在整个页面中唯一，引用的模块可能在任何一个分块中
+        return [entry for entry in entries if entry.module == module and not entry.paired]
+
+    def _pair_nearby(self, entry: _Entry):
+        chunk = entry.chunk
+        same = self._by_module[(chunk, entry.module)]
+        # 已经配对的不会再用到，没有模块信息的项目都在同一个列表中，不清理会越来越长
+        same[:] = [other for other in same if not other.paired]
+        # 先找同一个模块（没有模块信息时从最近的开始），然后是模块表中的上一个模块（当前模块还没有结束时就是最近结束的模块）
+        candidates = list(reversed(same))
+        if entry.module is not NO_MODULE:
+            previous = self._previous.get((chunk, entry.module), self._last_module.get(chunk))
+            if previous is not None:
+                candidates += self._by_module.get((chunk, previous), [])
+        for other in candidates:
+            if other.paired or other.is_atlas == entry.is_atlas:
+                continue
+            atlas, skeleton = (entry, other) if entry.is_atlas else (other, entry)
+            if self.matches(atlas.value, skeleton.value):
+                self._pair(atlas, skeleton)
+                return
+
+    def _pair(self, atlas: _Entry, skeleton: _Entry):
+        atlas.paired = True
+        skeleton.paired = True
+        self.on_pair(atlas.value, skeleton.value)
@@ -0,0 +1,209 @@
+import json
+import os
+import subprocess
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterable, Optional, TYPE_CHECKING
+
+from atlas import AtlasContent
+from atlas_unpacker import NATIVE_UNPACK_AVAILABLE, unpack_atlas
+from metrics import Metrics
+
+if TYPE_CHECKING:
+    from rich.progress import Progress, TaskID
+
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)  # 同时运行的Spine进程数，每个进程都是一个JVM，不宜过多
+
+SpineStepResult = namedtuple("SpineStepResult", ["step", "returncode", "stderr", "elapsed"])
+
+
+class SpineProject:
+    """
+    一个待处理的Spine项目，目录结构与parser_index_page生成的一致
+    """
+
+    def __init__(self, name: str, project_dir: str, spine_version: str, scale: float, region_names: list[str],
+                 atlas: Optional[AtlasContent] = None):
+        """
+        :param name: 项目名称
+        :param project_dir: 项目目录，包含atlas、json和页面图片
+        :param spine_version: 使用的Spine版本
+        :param scale: 导入时的缩放
+        :param region_names: atlas中所有区域的名称，解开图片后需要移动到out/images
+        :param atlas: 解析后的atlas，传入时可以不启动Spine直接解开图片
+        """
+        self.name = name
+        self.project_dir = project_dir
+        self.spine_version = spine_version
+        self.scale = scale
+        self.region_names = region_names
+        self.atlas = atlas
+
+    @property
+    def atlas_file(self) -> str:
+        return os.path.join(self.project_dir, f"{self.name}.atlas")
+
+    @property
+    def json_file(self) -> str:
+        return os.path.join(self.project_dir, f"{self.name}.json")
+
+    @property
+    def out_dir(self) -> str:
+        return os.path.join(self.project_dir, "out")
+
+    @property
+    def images_path(self) -> str:
+        return os.path.join(self.out_dir, "images")
+
+    @property
+    def spine_project_file(self) -> str:
+        return os.path.join(self.out_dir, "project.spine")
+
+
+class SpineReport:
+    """
+    一个项目的处理结果
+    """
+
+    def __init__(self, project: SpineProject):
+        self.project = project
+        self.steps: list[SpineStepResult] = []
+        self.missing_regions: list[str] = []
+
+    @property
+    def ok(self) -> bool:
+        return len(self.steps) == 2 and all(step.returncode == 0 for step in self.steps)
+
+    def to_dict(self) -> dict:
+        return {
+            "project": self.project.name,
+            "ok": self.ok,
+            "steps": [step._asdict() for step in self.steps],
+            "missing_regions": self.missing_regions,
+        }
+
+
+class SpineWorkerPool:
+    """
+    Spine命令行的进程池，不同项目并行，同一个项目内先解开图片再导入
+    """
+
+    def __init__(self, spine_com_file: str, proxy: Optional[tuple[str, int]] = None, workers: int = DEFAULT_WORKERS,
+                 native_unpack: bool = NATIVE_UNPACK_AVAILABLE, metrics: Optional[Metrics] = None):
+        """
+        :param spine_com_file: Spine软件的路径
+        :param proxy: 代理服务器的主机和端口
+        :param workers: 同时运行的Spine进程数
+        :param native_unpack: 是否不启动Spine，直接用Pillow解开图片（需要项目带有解析后的atlas）
+        :param metrics: 记录每一步的耗时
+        """
+        self.spine_com_file = spine_com_file
+        self.proxy = proxy
+        self.workers = workers
+        self.native_unpack = native_unpack and NATIVE_UNPACK_AVAILABLE
+        self.metrics = metrics if metrics is not None else Metrics()
+        # 多个活动共用一个进程池时，同时运行的Spine进程数仍然不超过workers
+        self._slots = threading.BoundedSemaphore(workers)
+
+    def command(self, project: SpineProject, *args: str) -> list[str]:
+        """
+        生成Spine命令行
+        :param project: 项目
+        :param args: 其余参数
+        :return: 命令行
+        """
+        command = [self.spine_com_file]
+        if self.proxy is not None:
+            proxy_host, proxy_port = self.proxy
+            command += ["-x", f"{proxy_host}:{proxy_port}"]
+        return command + ["-u", project.spine_version, "-i", project.project_dir, *args]
+
+    def _call(self, step: str, command: list[str]) -> SpineStepResult:
+        start = time.perf_counter()
+        try:
+            completed = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        except OSError as e:
+            return SpineStepResult(step, None, str(e), time.perf_counter() - start)
+        stderr = completed.stderr.decode("utf-8", errors="replace")
+        return SpineStepResult(step, completed.returncode, stderr, time.perf_counter() - start)
+
+    def _native_unpack(self, project: SpineProject, report: SpineReport) -> SpineStepResult:
+        # 直接写入out/images，不需要再移动文件
+        start = time.perf_counter()
+        try:
+            report.missing_regions += unpack_atlas(project.atlas, project.project_dir, project.images_path)
+        except OSError as e:
+            return SpineStepResult("unpack", None, str(e), time.perf_counter() - start)
+        return SpineStepResult("unpack", 0, "", time.perf_counter() - start)
+
+    def run_project(self, project: SpineProject, progress: Optional["Progress"] = None) -> SpineReport:
+        """
+        处理一个项目：解开图片（Pillow或Spine） -> 创建项目
+        :param project: 项目
+        :param progress: 进度条
+        :return: 处理结果
+        """
+        with self._slots:
+            return self._run_project(project, progress)
+
+    def _run_project(self, project: SpineProject, progress: Optional["Progress"]) -> SpineReport:
+        report = SpineReport(project)
+        inner_task_id = None
+        if progress is not None:
+            inner_task_id = progress.add_task(total=2, description=f"正在解开{project.name}的图片...")
+        if self.native_unpack and project.atlas is not None:
+            unpack = self._native_unpack(project, report)
+        else:
+            unpack = self._call("unpack", self.command(project, "-o", project.project_dir, "-c", project.atlas_file))
+            if unpack.returncode == 0:
+                for region_name in project.region_names:
+                    try:
+                        os.replace(os.path.join(project.project_dir, f"{region_name}.png"),
+                                   os.path.join(project.images_path, f"{region_name}.png"))
+                    except FileNotFoundError:
+                        report.missing_regions.append(region_name)
+        report.steps.append(unpack)
+        if unpack.returncode == 0:
+            if progress is not None:
+                progress.update(task_id=inner_task_id, completed=1, description=f"正在创建{project.name}项目...")
+            report.steps.append(self._call("import", self.command(
+                project, "-o", project.spine_project_file, "-s", str(project.scale), "-r", project.json_file)))
+        for step in report.steps:
+            self.metrics.observe(f"spine_{step.step}_seconds", step.elapsed)
+        if progress is not None:
+            progress.remove_task(inner_task_id)
+        return report
+
+    def run(self, projects: Iterable[SpineProject], progress: Optional["Progress"] = None,
+            task_id: Optional["TaskID"] = None) -> list[SpineReport]:
+        """
+        并行处理多个项目
+        :param projects: 项目
+        :param progress: 进度条
+        :param task_id: 总进度条任务，每完成一个项目前进一格
+        :return: 处理结果，顺序与projects一致
+        """
+        projects = list(projects)
+        if progress is not None and task_id is not None:
+            progress.update(task_id, total=len(projects), completed=0)
+        reports: list[Optional[SpineReport]] = [None] * len(projects)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self.run_project, project, progress): index
+                       for index, project in enumerate(projects)}
+            for future in as_completed(futures):
+                reports[futures[future]] = future.result()
+                if progress is not None and task_id is not None:
+                    progress.update(task_id, advance=1)
+        return reports
+
+
+def save_report(reports: list[SpineReport], path: str):
+    """
+    保存所有项目的处理结果
+    :param reports: 处理结果
+    :param path: 保存路径
+    """
+    with open(path, "w", encoding="utf-8") as fp:
+        json.dump([report.to_dict() for report in reports], fp, ensure_ascii=False, indent=4)
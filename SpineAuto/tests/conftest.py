@@ -0,0 +1,5 @@
+import os
+import sys
+
+# SpineAuto中的模块互相按文件名导入，测试时同样把SpineAuto加入搜索路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,95 @@
+import hashlib
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from archive_output import INDEX_NAME, ArchiveWriter, member_path, read_index, read_member
+from catalog import Catalog
+
+EVENT = "https://act.mihoyo.com/ys/event/a/index.html"
+FORMATS = ["zip", "tar", "tar.zst"]
+MEMBERS = {
+    "hero/hero.atlas.txt": b"hero.png\nsize: 64,64\n",
+    "hero/hero.json": b'{"skeleton": {"spine": "3.8.99"}}',
+    "hero/images/body.png": os.urandom(3000),
+    "hero/images/empty.png": b"",
+    # 超过ustar名称长度和非ASCII的成员名使用PAX头
+    "hero/images/" + "a" * 120 + ".png": os.urandom(700),
+    "角色/角色.json": "{}".encode("utf-8"),
+}
+
+
+@pytest.fixture(params=FORMATS)
+def archive(request, tmp_path) -> str:
+    if request.param == "tar.zst":
+        pytest.importorskip("zstandard")
+    path = str(tmp_path / f"event.{request.param}")
+    (tmp_path / "body.png").write_bytes(MEMBERS["hero/images/body.png"])
+    with ArchiveWriter(path) as writer:
+        for name, content in MEMBERS.items():
+            if name == "hero/images/body.png":
+                writer.write_file(name, str(tmp_path / "body.png"))
+            else:
+                writer.write(name, content)
+        # 同名的成员只写入一次
+        writer.write("hero/hero.json", b"ignored")
+    assert not os.path.exists(path + ".part")
+    return path
+
+
+def test_index_round_trip(archive):
+    index = read_index(archive)
+    assert index["format"] == archive.rsplit("event.", 1)[1]
+    members = index["members"]
+    # 索引在写入自己之前生成，不包含index.json
+    assert set(members) == set(MEMBERS)
+    for name, content in MEMBERS.items():
+        entry = members[name]
+        assert entry["size"] == len(content)
+        assert entry["sha256"] == hashlib.sha256(content).hexdigest()
+        assert read_member(archive, name, index) == content
+    if archive.endswith(".tar"):
+        # 索引中的偏移直接指向成员的数据
+        with open(archive, "rb") as fp:
+            for name, content in MEMBERS.items():
+                fp.seek(members[name]["offset"])
+                assert fp.read(len(content)) == content
+        with tarfile.open(archive) as tar:
+            for name, content in MEMBERS.items():
+                assert tar.extractfile(name).read() == content
+    elif archive.endswith(".zip"):
+        # zip的偏移是本地文件头的位置
+        with zipfile.ZipFile(archive) as zip_file:
+            assert {info.filename: info.header_offset for info in zip_file.infolist()
+                    if info.filename != INDEX_NAME} == {name: entry["offset"] for name, entry in members.items()}
+
+
+def test_abort_removes_partial_archive(tmp_path):
+    path = str(tmp_path / "event.tar")
+    with pytest.raises(RuntimeError):
+        with ArchiveWriter(path) as writer:
+            writer.write("hero/hero.json", b"{}")
+            raise RuntimeError
+    assert os.listdir(tmp_path) == []
+
+
+def test_event_up_to_date_with_archive(archive, tmp_path):
+    with Catalog(str(tmp_path / "catalog.sqlite3")) as catalog:
+        catalog.reset_event(EVENT)
+        catalog.add_skeleton(EVENT, "hero", "3.8.99", 1.0, [("hero", "body")])
+        catalog.set_spine_result(EVENT, "hero", True)
+        for name, entry in read_index(archive)["members"].items():
+            catalog.add_asset(member_path(archive, name), entry["sha256"], entry["size"], "png", None, EVENT, "hero")
+        catalog.add_event(EVENT, "A", archive, "digest", "output=archive", 1)
+        catalog.flush(EVENT)
+        assert catalog.event_up_to_date(EVENT, "digest", "output=archive")
+        assert not catalog.event_up_to_date(EVENT, "other", "output=archive")
+        # 重新写入的归档中成员的大小变化
+        with ArchiveWriter(archive) as writer:
+            for name, content in MEMBERS.items():
+                writer.write(name, content + b"!")
+        assert not catalog.event_up_to_date(EVENT, "digest", "output=archive")
+        os.remove(archive)
+        assert not catalog.event_up_to_date(EVENT, "digest", "output=archive")
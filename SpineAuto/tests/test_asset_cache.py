@@ -0,0 +1,89 @@
+import hashlib
+import os
+
+from asset_cache import MANIFEST_NAME, AssetStore
+
+CONTENT = b"spine atlas page" * 64
+
+
+def object_files(store: AssetStore) -> list[str]:
+    return sorted(name for _, _, files in os.walk(os.path.join(store.root, "objects")) for name in files)
+
+
+def test_same_content_stored_once(tmp_path):
+    store = AssetStore(str(tmp_path / "cache"))
+    (tmp_path / "a.png").write_bytes(CONTENT)
+    (tmp_path / "b.png").write_bytes(CONTENT)
+    first = store.add_file(str(tmp_path / "a.png"), "https://example.com/a.png")
+    second = store.add_file(str(tmp_path / "b.png"), "https://example.com/b.png")
+    assert first == second == hashlib.sha256(CONTENT).hexdigest()
+    assert object_files(store) == [first]
+    assert store.lookup_url("https://example.com/a.png") == store.lookup_url("https://example.com/b.png") == first
+    assert store.lookup_url("https://example.com/c.png") is None
+
+
+def test_manifest_round_trip(tmp_path):
+    store = AssetStore(str(tmp_path / "cache"))
+    out_dir = tmp_path / "out"
+    (out_dir / "images").mkdir(parents=True)
+    (out_dir / "hero.json").write_bytes(b"{}")
+    (out_dir / "images" / "body.png").write_bytes(CONTENT)
+    (tmp_path / "vendors.js").write_bytes(CONTENT)
+    digest = store.add_file(str(tmp_path / "vendors.js"), "https://example.com/vendors.js")
+    store.add_spine("key", str(out_dir))
+    store.save()
+
+    reopened = AssetStore(str(tmp_path / "cache"))
+    assert reopened.objects.keys() == store.objects.keys()
+    assert reopened.lookup_url("https://example.com/vendors.js") == digest
+    outputs = reopened.lookup_spine("key")
+    assert outputs == {"hero.json": hashlib.sha256(b"{}").hexdigest(), "images/body.png": digest}
+    # 文件没有变化时沿用记录的hash
+    assert reopened.files == store.files
+    restored = tmp_path / "restored"
+    reopened.restore_spine(outputs, str(restored))
+    assert (restored / "images" / "body.png").read_bytes() == CONTENT
+    assert (restored / "hero.json").read_bytes() == b"{}"
+
+
+def test_digest_follows_file_changes(tmp_path):
+    store = AssetStore(str(tmp_path / "cache"))
+    path = tmp_path / "hero.json"
+    path.write_bytes(b"{}")
+    assert store.digest(str(path)) == hashlib.sha256(b"{}").hexdigest()
+    path.write_bytes(b'{"skeleton": {}}')
+    assert store.digest(str(path)) == hashlib.sha256(b'{"skeleton": {}}').hexdigest()
+
+
+def test_recovers_from_partial_writes(tmp_path):
+    store = AssetStore(str(tmp_path / "cache"))
+    (tmp_path / "a.png").write_bytes(CONTENT)
+    digest = store.add_file(str(tmp_path / "a.png"), "https://example.com/a.png")
+    store.save()
+    # 复制对象时中断：manifest中有记录，对象只留下.tmp
+    object_path = store.object_path(digest)
+    os.replace(object_path, object_path + ".tmp")
+    with open(object_path + ".tmp", "r+b") as fp:
+        fp.truncate(10)
+    reopened = AssetStore(str(tmp_path / "cache"))
+    assert not reopened.has(digest)
+    assert reopened.lookup_url("https://example.com/a.png") is None
+    assert reopened.add_file(str(tmp_path / "a.png"), "https://example.com/a.png") == digest
+    with open(object_path, "rb") as fp:
+        assert fp.read() == CONTENT
+    assert not os.path.exists(object_path + ".tmp")
+    assert reopened.lookup_url("https://example.com/a.png") == digest
+
+    # 保存manifest时中断：manifest.json不完整，留下.tmp
+    manifest_path = os.path.join(store.root, MANIFEST_NAME)
+    with open(manifest_path, "r+b") as fp:
+        fp.truncate(5)
+    with open(manifest_path + ".tmp", "w", encoding="utf-8") as fp:
+        fp.write('{"objects": ')
+    empty = AssetStore(str(tmp_path / "cache"))
+    assert empty.objects == {} and empty.urls == {}
+    # 重新加入后保存，manifest恢复完整
+    assert empty.add_file(str(tmp_path / "a.png"), "https://example.com/a.png") == digest
+    empty.save()
+    assert not os.path.exists(manifest_path + ".tmp")
+    assert AssetStore(str(tmp_path / "cache")).lookup_url("https://example.com/a.png") == digest
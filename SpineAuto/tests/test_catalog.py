@@ -0,0 +1,58 @@
+from catalog import Catalog
+
+EVENT_A = "https://act.mihoyo.com/ys/event/a/index.html"
+EVENT_B = "https://act.mihoyo.com/ys/event/b/index.html"
+
+
+def add_project(catalog: Catalog, event_url: str, name: str, path: str):
+    catalog.add_skeleton(event_url, name, "3.8.99", 0.5, [("page", f"{name}_region")])
+    catalog.add_asset(path, "0" * 64, 3, "atlas", None, event_url, name)
+    catalog.set_spine_result(event_url, name, True)
+
+
+def test_interleaved_events_keep_their_rows(tmp_path):
+    output = tmp_path / "out"
+    output.mkdir()
+    for index in range(2):
+        (output / f"a{index}.atlas").write_bytes(b"abc")
+        (output / f"b{index}.atlas").write_bytes(b"abc")
+    with Catalog(str(tmp_path / "catalog.sqlite3")) as catalog:
+        # 活动A在确定需要重新处理之前，扫描中已经缓存了第一个项目的记录
+        add_project(catalog, EVENT_A, "a0", str(output / "a0.atlas"))
+        # 活动B在这期间完整地处理并写入
+        catalog.reset_event(EVENT_B)
+        for index in range(2):
+            add_project(catalog, EVENT_B, f"b{index}", str(output / f"b{index}.atlas"))
+        catalog.add_event(EVENT_B, "B", str(output), "digest-b", "", 2)
+        catalog.flush(EVENT_B)
+        # 活动A之后才重新处理，删除旧记录时不能删掉它自己已经缓存的记录
+        catalog.reset_event(EVENT_A)
+        add_project(catalog, EVENT_A, "a1", str(output / "a1.atlas"))
+        catalog.add_event(EVENT_A, "A", str(output), "digest-a", "", 2)
+        catalog.flush(EVENT_A)
+        assert sorted(skeleton.name for skeleton in catalog.find_skeletons()) == ["a0", "a1", "b0", "b1"]
+        assert len(catalog.find_assets(event_url=EVENT_A)) == 2
+        assert len(catalog.find_regions("a0_region")) == 1
+        assert catalog.event_up_to_date(EVENT_A, "digest-a")
+        assert catalog.event_up_to_date(EVENT_B, "digest-b")
+
+
+def test_discard_and_missing_skeletons(tmp_path):
+    output = tmp_path / "out"
+    output.mkdir()
+    (output / "a0.atlas").write_bytes(b"abc")
+    with Catalog(str(tmp_path / "catalog.sqlite3")) as catalog:
+        catalog.reset_event(EVENT_A)
+        add_project(catalog, EVENT_A, "a0", str(output / "a0.atlas"))
+        catalog.add_event(EVENT_A, "A", str(output), "digest-a", "", 1)
+        catalog.flush(EVENT_A)
+        # 确定不需要重新处理时，扫描中缓存的记录被丢弃，不会在关闭时重复写入区域
+        add_project(catalog, EVENT_A, "a0", str(output / "a0.atlas"))
+        catalog.discard_event(EVENT_A)
+        catalog.flush()
+        assert len(catalog.find_regions("a0_region")) == 1
+        assert catalog.event_up_to_date(EVENT_A, "digest-a")
+        # 记录的项目数多于骨骼记录时不能跳过
+        catalog.add_event(EVENT_A, "A", str(output), "digest-a", "", 2)
+        catalog.flush()
+        assert not catalog.event_up_to_date(EVENT_A, "digest-a")
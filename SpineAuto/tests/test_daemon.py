@@ -0,0 +1,75 @@
+import contextlib
+import io
+import threading
+import time
+
+import requests
+
+from SpineAuto import SpineAutoConfig, SpineAutoSession
+from daemon import DONE, QUEUED, RUNNING, ExtractionService, ServiceServer
+from fixtures import generate_preview_site, serve_directory
+
+
+@contextlib.contextmanager
+def running_service(config: SpineAutoConfig):
+    with SpineAutoSession(config) as session:
+        service = ExtractionService(session, workers=1)
+        with ServiceServer(("127.0.0.1", 0), service) as server:
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            try:
+                yield f"http://127.0.0.1:{server.server_address[1]}"
+            finally:
+                server.shutdown()
+                thread.join()
+                service.close()
+
+
+def wait_job(api: str, job_id: int, timeout: float = 30) -> dict:
+    deadline = time.monotonic() + timeout
+    while True:
+        job = requests.get(f"{api}/jobs/{job_id}").json()
+        if job["state"] not in (QUEUED, RUNNING) or time.monotonic() > deadline:
+            return job
+        time.sleep(0.05)
+
+
+def test_submit_and_query_job(tmp_path):
+    generate_preview_site(str(tmp_path / "site" / "e0"), title="活动0", heroes=2)
+    config = SpineAutoConfig(output_root=str(tmp_path / "out"), cache_dir=str(tmp_path / "cache"), native_unpack=False)
+    with serve_directory(str(tmp_path / "site")) as base_url, running_service(config) as api, \
+            contextlib.redirect_stdout(io.StringIO()):
+        response = requests.post(f"{api}/jobs", json={"url": f"{base_url}e0/index.html"})
+        assert response.status_code == 202
+        submitted = response.json()
+        assert submitted["url"] == f"{base_url}e0/index.html" and submitted["force"] is False
+
+        job = wait_job(api, submitted["id"])
+        assert job["state"] == DONE, job
+        assert job["result"]["name"] == "活动0"
+        assert job["result"]["projects"] == 2
+        assert job["elapsed"] is not None and "index" in job["metrics"]["stages"]
+        assert [item["id"] for item in requests.get(f"{api}/jobs").json()] == [submitted["id"]]
+        # 已经结束的任务不能取消，同一个页面可以再次提交
+        assert requests.delete(f"{api}/jobs/{submitted['id']}").status_code == 409
+        again = requests.post(f"{api}/jobs", json={"url": f"{base_url}e0/index.html"})
+        assert again.status_code == 202 and again.json()["id"] != submitted["id"]
+        wait_job(api, again.json()["id"])
+
+        status = requests.get(f"{api}/status").json()
+        assert status["jobs"]["done"] == 2 and status["workers"] == 1
+        metrics = requests.get(f"{api}/metrics")
+        assert metrics.headers["Content-Type"].startswith("text/plain")
+        assert 'spineauto_stage_runs_total{stage="index"} 2' in metrics.text.splitlines()
+
+
+def test_bad_requests(tmp_path):
+    config = SpineAutoConfig(output_root=str(tmp_path / "out"), cache_dir=str(tmp_path / "cache"), native_unpack=False)
+    with running_service(config) as api:
+        assert requests.post(f"{api}/jobs", data=b"{").status_code == 400
+        assert requests.post(f"{api}/jobs", json={"url": "file:///etc/passwd"}).json() == {"error": "url is required"}
+        assert requests.post(f"{api}/other", json={}).status_code == 404
+        assert requests.get(f"{api}/jobs/1").status_code == 404
+        assert requests.get(f"{api}/jobs/abc").status_code == 404
+        assert requests.delete(f"{api}/jobs/1").status_code == 404
+        assert requests.get(f"{api}/jobs").json() == []
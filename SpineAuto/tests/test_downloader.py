@@ -0,0 +1,124 @@
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from downloader import DOWNLOAD_STATE_NAME, Downloader, DownloadJob
+from fixtures import serve_directory
+
+CONTENT = b"page image content" * 100
+
+
+def md5(content: bytes) -> str:
+    return hashlib.md5(content).hexdigest()
+
+
+def write(path, content: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+
+
+def test_verified_download_learns_scheme(tmp_path):
+    digest = md5(CONTENT)[:20]
+    write(tmp_path / "site" / "images" / f"page.{digest}..png", CONTENT)
+    with serve_directory(str(tmp_path / "site")) as root, Downloader(host_interval=0) as downloader:
+        url = f"{root}images/page.{digest}..png"
+        result = downloader.download(DownloadJob(url, str(tmp_path / "page.png"), digest))
+        assert result.ok and (tmp_path / "page.png").read_bytes() == CONTENT
+        assert downloader.state.schemes == {root.split("/")[2] + "/images": "md5"}
+
+
+def test_full_length_mismatch_fails(tmp_path):
+    digest = md5(b"other content")
+    write(tmp_path / "site" / f"page.{digest}..png", CONTENT)
+    with serve_directory(str(tmp_path / "site")) as root, Downloader(host_interval=0) as downloader:
+        result = downloader.download(DownloadJob(f"{root}page.{digest}..png", str(tmp_path / "page.png"), digest))
+    assert not result.ok and "不一致" in result.error
+    assert not (tmp_path / "page.png").exists()
+    assert downloader.metrics.counters["download_corrupt"] == 2
+    assert "download_unverified" not in downloader.metrics.counters
+
+
+def test_mismatch_from_known_source_fails(tmp_path):
+    good = md5(CONTENT)[:20]
+    bad = md5(b"other content")[:20]
+    write(tmp_path / "site" / f"good.{good}..png", CONTENT)
+    write(tmp_path / "site" / f"bad.{bad}..png", CONTENT)
+    with serve_directory(str(tmp_path / "site")) as root, Downloader(host_interval=0) as downloader:
+        assert downloader.download(DownloadJob(f"{root}good.{good}..png", str(tmp_path / "good.png"), good)).ok
+        result = downloader.download(DownloadJob(f"{root}bad.{bad}..png", str(tmp_path / "bad.png"), bad))
+    assert not result.ok
+    assert not (tmp_path / "bad.png").exists()
+
+
+def test_unverifiable_is_persisted(tmp_path):
+    # 文件名中的hash不是支持的算法（如xxhash64），来源也没有校验成功过
+    digest = "0123456789abcdef"
+    write(tmp_path / "site" / f"page.{digest}..png", CONTENT)
+    state_path = str(tmp_path / "cache" / DOWNLOAD_STATE_NAME)
+    target = str(tmp_path / "page.png")
+    with serve_directory(str(tmp_path / "site")) as root:
+        job = DownloadJob(f"{root}page.{digest}..png", target, digest)
+        with Downloader(host_interval=0, state_path=state_path) as downloader:
+            result = downloader.download(job)
+            assert result.ok and downloader.metrics.counters["download_unverified"] == 1
+        with Downloader(host_interval=0, state_path=state_path) as downloader:
+            assert downloader.is_verified(target, digest)
+            result = downloader.download(job)
+            assert result.ok and result.elapsed == 0.0
+            assert downloader.metrics.counters["download_verified_skips"] == 1
+            assert "download_bytes" not in downloader.metrics.counters
+        # 文件变化之后重新下载
+        with open(target, "ab") as fp:
+            fp.write(b"x")
+        with Downloader(host_interval=0, state_path=state_path) as downloader:
+            assert not downloader.is_verified(target, digest)
+            assert downloader.download(job).ok
+            assert downloader.metrics.counters["download_bytes"] == len(CONTENT)
+
+
+def test_resumes_part_file(tmp_path):
+    digest = md5(CONTENT)[:20]
+    write(tmp_path / "site" / f"page.{digest}..png", CONTENT)
+    write(tmp_path / "page.png.part", CONTENT[:500])
+    with serve_directory(str(tmp_path / "site")) as root, Downloader(host_interval=0) as downloader:
+        result = downloader.download(DownloadJob(f"{root}page.{digest}..png", str(tmp_path / "page.png"), digest))
+    assert result.ok and result.size == len(CONTENT) - 500
+    assert (tmp_path / "page.png").read_bytes() == CONTENT
+    assert downloader.metrics.counters["download_resumed"] == 1
+
+
+class _StatusHandler(BaseHTTPRequestHandler):
+    status = 503
+    requests = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with self.lock:
+            type(self).requests += 1
+        self.send_response(self.status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        ...
+
+
+def count_requests(tmp_path, status: int, retries: int) -> int:
+    handler = type("_Handler", (_StatusHandler,), {"status": status, "requests": 0})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        with Downloader(retries=retries, backoff=0, host_interval=0) as downloader:
+            url = f"http://127.0.0.1:{server.server_address[1]}/page.png"
+            result = downloader.download(DownloadJob(url, str(tmp_path / "page.png")))
+        assert not result.ok
+    finally:
+        server.shutdown()
+        server.server_close()
+    return handler.requests
+
+
+def test_single_retry_layer(tmp_path):
+    assert count_requests(tmp_path, 503, retries=3) == 4
+    assert count_requests(tmp_path, 404, retries=3) == 1
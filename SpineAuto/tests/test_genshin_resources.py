@@ -0,0 +1,100 @@
+import hashlib
+import json
+import os
+import subprocess
+import sys
+
+import genshin_resources
+from catalog import Catalog
+from fixtures import serve_directory
+from genshin_resources import Resource, ResourceManifest, build_manifest, download_resources, short_name
+
+WEB_URL = "https://webstatic.mihoyo.com/ys/event/test/"
+ATLAS = "hero.png\\nsize: 64,64\\nformat: RGBA8888\\nfilter: Linear,Linear\\nrepeat: none\\nbody\\n  bounds: 0,0,16,16"
+INDEX_JS = ('!function(){var m={1:function(e,t,A){e.exports=A.p+"images/hero.0a1b2c3d.png"},'
+            '2:function(e,t,A){e.exports=A.p+"images/hero.4e5f6a7b.json"},'
+            '3:function(e,t,A){e.exports=A.p+"audio/bgm.8c9d0e1f.mp3"}}}();')
+VENDORS_JS = f'/* vendors */\n!function(){{var m={{9:function(e,t){{e.exports="{ATLAS}"}}}}}}();'
+ENTRY = os.path.join(os.path.dirname(__file__), "..", "..", "SpineToUnity", "ResourceDownloader",
+                     "Get_GenShin_Resources.py")
+
+
+def write_scripts(root) -> tuple[str, str]:
+    index_path, vendors_path = str(root / "index.js"), str(root / "vendors.js")
+    with open(index_path, "w", encoding="utf-8") as fp:
+        fp.write(INDEX_JS)
+    with open(vendors_path, "w", encoding="utf-8") as fp:
+        fp.write(VENDORS_JS)
+    return index_path, vendors_path
+
+
+def test_build_manifest(tmp_path):
+    manifest = build_manifest(WEB_URL, *write_scripts(tmp_path))
+    assert [(resource.basename, resource.kind, resource.project) for resource in manifest.resources] == [
+        ("hero.0a1b2c3d.png", "png", "hero"), ("hero.4e5f6a7b.json", "json", "hero"),
+        ("bgm.8c9d0e1f.mp3", "mp3", None), ("hero.atlas.txt", "atlas", "hero")]
+    assert manifest.resources[0].url == WEB_URL + "images/hero.0a1b2c3d.png"
+    assert manifest.atlases["hero"].startswith("hero.png\nsize: 64,64")
+    assert short_name("hero.0a1b2c3d.png") == "hero.png"
+
+
+def test_old_entry_point_without_catalog(tmp_path):
+    index_path, vendors_path = write_scripts(tmp_path)
+    (tmp_path / "hero.0a1b2c3d.png").write_bytes(b"png")
+    (tmp_path / "hero.4e5f6a7b.json").write_text('{"skeleton": {"spine": "4.0-from-3.8.99"}}', encoding="utf-8")
+    home = tmp_path / "home"
+    completed = subprocess.run([sys.executable, ENTRY, "--url", WEB_URL, "--index", index_path,
+                                "--vendors", vendors_path, "--dir", str(tmp_path)],
+                               cwd=str(tmp_path), capture_output=True, text=True,
+                               env={**os.environ, "HOME": str(home), "USERPROFILE": str(home)})
+    assert completed.returncode == 0, completed.stderr
+    assert (tmp_path / "hero" / "hero.png").read_bytes() == b"png"
+    with open(tmp_path / "hero" / "hero.json", "r", encoding="utf-8") as fp:
+        assert fp.read() == '{\n    "skeleton": {\n        "spine": "3.8.99"\n    }\n}'
+    assert (tmp_path / "hero" / "hero.atlas.txt").is_file()
+    assert json.loads((tmp_path / "resources.json").read_text(encoding="utf-8"))["web_url"] == WEB_URL
+    # 没有指定--catalog时不创建资源目录
+    assert not [name for _, _, files in os.walk(tmp_path) for name in files if name.endswith(".sqlite3")]
+
+
+def test_catalogued_files_need_matching_digest(tmp_path):
+    content = os.urandom(256)
+    hashed = f"hero.{hashlib.md5(content).hexdigest()[:8]}.png"
+    # 文件名中的hash对不上任何算法，只能按资源目录的记录确认
+    unverifiable = "bgm.00000000.mp3"
+    (tmp_path / "site").mkdir()
+    (tmp_path / "site" / hashed).write_bytes(content)
+    (tmp_path / "site" / unverifiable).write_bytes(content)
+    folder = tmp_path / "res"
+    folder.mkdir()
+    catalog = Catalog(str(tmp_path / "catalog.sqlite3"))
+    try:
+        for name in (hashed, unverifiable):
+            catalog.add_asset(str(folder / name), hashlib.sha256(content).hexdigest(), len(content), "png", None,
+                              WEB_URL, None)
+        catalog.flush()
+        # 大小与记录相同但内容损坏
+        (folder / hashed).write_bytes(bytes(len(content)))
+        (folder / unverifiable).write_bytes(content)
+        with serve_directory(str(tmp_path / "site")) as base_url:
+            manifest = ResourceManifest(base_url)
+            manifest.resources = [Resource(base_url + name, name, short_name(name), "png", None)
+                                  for name in (hashed, unverifiable)]
+            results = download_resources(manifest, str(folder), catalog)
+    finally:
+        catalog.close()
+    assert [(result.job.path, result.ok) for result in results] == [(str(folder / hashed), True)]
+    assert (folder / hashed).read_bytes() == content
+
+
+def test_organize_corrects_each_json_once(tmp_path, monkeypatch):
+    manifest = build_manifest(WEB_URL, *write_scripts(tmp_path))
+    (tmp_path / "hero.png").write_bytes(b"png")
+    (tmp_path / "hero.json").write_text('{"skeleton": {"spine": "4.0-from-3.8.99"}}', encoding="utf-8")
+    corrected = []
+    original = genshin_resources.correct_json_version
+    monkeypatch.setattr(genshin_resources, "correct_json_version",
+                        lambda path: (corrected.append(path), original(path)))
+    genshin_resources.organize_projects(manifest, str(tmp_path))
+    assert corrected == [os.path.join(str(tmp_path), "hero", "hero.json")]
+    assert json.loads((tmp_path / "hero" / "hero.json").read_text(encoding="utf-8"))["skeleton"]["spine"] == "3.8.99"
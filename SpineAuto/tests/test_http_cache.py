@@ -0,0 +1,48 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from downloader import Downloader
+from fixtures import serve_directory
+from http_cache import HttpCache, read_body
+
+CONTENT = os.urandom(1 << 18)
+
+
+def test_concurrent_fetches_of_same_url(tmp_path):
+    (tmp_path / "site").mkdir()
+    (tmp_path / "site" / "vendors.js").write_bytes(CONTENT)
+    cache = HttpCache(str(tmp_path / "cache"))
+    with serve_directory(str(tmp_path / "site"), latency=0.02) as root, \
+            Downloader(host_interval=0) as downloader, ThreadPoolExecutor(8) as executor:
+        responses = list(executor.map(lambda _: cache.fetch(downloader, f"{root}vendors.js"), range(8)))
+    digest = hashlib.sha256(CONTENT).hexdigest()
+    assert {response.digest for response in responses} == {digest}
+    # 第一个请求下载，之后的请求等它写完后用条件请求命中缓存
+    assert sum(not response.from_cache for response in responses) == 1
+    assert read_body(responses[0]) == CONTENT
+    files = os.listdir(cache.root)
+    assert not [name for name in files if name.endswith(".tmp")]
+    meta_name = next(name for name in files if name.endswith(".json"))
+    with open(os.path.join(cache.root, meta_name), "r", encoding="utf-8") as fp:
+        assert json.load(fp)["digest"] == digest
+
+
+def test_failed_fetch_keeps_previous_entry(tmp_path):
+    (tmp_path / "site").mkdir()
+    (tmp_path / "site" / "vendors.js").write_bytes(CONTENT)
+    cache = HttpCache(str(tmp_path / "cache"))
+
+    def fail(chunk: bytes):
+        raise RuntimeError("stop")
+
+    with serve_directory(str(tmp_path / "site")) as root, Downloader(host_interval=0) as downloader:
+        first = cache.fetch(downloader, f"{root}vendors.js")
+        try:
+            cache.fetch(downloader, f"{root}vendors.js", on_chunk=fail, force=True)
+        except RuntimeError:
+            ...
+        assert not [name for name in os.listdir(cache.root) if name.endswith(".tmp")]
+        again = cache.fetch(downloader, f"{root}vendors.js")
+    assert again.from_cache and again.digest == first.digest
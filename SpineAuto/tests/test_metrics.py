@@ -0,0 +1,86 @@
+import re
+
+from metrics import DEFAULT_BUCKETS, Metrics
+
+SAMPLE_RE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{[a-zA-Z_]+="[^"\\\n]*"\})? (\S+)$')
+
+
+def parse_prometheus(text: str) -> tuple[dict[str, str], dict[str, float]]:
+    """
+    :return: 每个指标的类型，样本（名称加标签 -> 值）
+    """
+    assert text.endswith("\n")
+    types = {}
+    samples = {}
+    for line in text.splitlines():
+        if line.startswith("# TYPE "):
+            _, _, name, kind = line.split(" ")
+            # 每个指标只声明一次类型，且在它的样本之前
+            assert name not in types
+            assert not any(sample.startswith(name) for sample in samples)
+            types[name] = kind
+            continue
+        match = SAMPLE_RE.match(line)
+        assert match is not None, line
+        name, labels, value = match.groups()
+        family = re.sub(r"_(bucket|sum|count)$", "", name) if types.get(name) is None else name
+        assert family in types, line
+        samples[name + (labels or "")] = float(value)
+    return types, samples
+
+
+def test_prometheus_text():
+    metrics = Metrics()
+    metrics.add_stage("download", 0.5)
+    metrics.add_stage("download", 1.5)
+    metrics.add_stage("spine", 2.0)
+    metrics.count("download_bytes", 1024)
+    metrics.count("spine_failures")
+    for value in (0.001, 0.02, 0.02, 3.0, 60.0):
+        metrics.observe("http_request_seconds", value)
+    types, samples = parse_prometheus(metrics.to_prometheus())
+
+    assert types["spineauto_stage_seconds_total"] == types["spineauto_stage_runs_total"] == "counter"
+    assert samples['spineauto_stage_seconds_total{stage="download"}'] == 2.0
+    assert samples['spineauto_stage_runs_total{stage="download"}'] == 2
+    assert samples['spineauto_stage_runs_total{stage="spine"}'] == 1
+    assert types["spineauto_download_bytes_total"] == "counter"
+    assert samples["spineauto_download_bytes_total"] == 1024
+    assert samples["spineauto_spine_failures_total"] == 1
+
+    # 直方图的分桶是累计的，+Inf等于总数
+    assert types["spineauto_http_request_seconds"] == "histogram"
+    buckets = [samples[f'spineauto_http_request_seconds_bucket{{le="{bound}"}}']
+               for bound in (*DEFAULT_BUCKETS, "+Inf")]
+    assert buckets == sorted(buckets)
+    assert samples['spineauto_http_request_seconds_bucket{le="0.005"}'] == 1
+    assert samples['spineauto_http_request_seconds_bucket{le="0.025"}'] == 3
+    assert samples['spineauto_http_request_seconds_bucket{le="5.0"}'] == 4
+    assert samples['spineauto_http_request_seconds_bucket{le="+Inf"}'] == \
+           samples["spineauto_http_request_seconds_count"] == 5
+    assert abs(samples["spineauto_http_request_seconds_sum"] - 63.041) < 1e-9
+
+
+def test_merged_metrics_in_prometheus_text():
+    total = Metrics()
+    for _ in range(2):
+        job = Metrics()
+        job.add_stage("index", 0.25)
+        job.count("projects", 3)
+        job.observe("spine_import_seconds", 0.2)
+        total.merge(job)
+    _, samples = parse_prometheus(total.to_prometheus())
+    assert samples['spineauto_stage_runs_total{stage="index"}'] == 2
+    assert samples['spineauto_stage_seconds_total{stage="index"}'] == 0.5
+    assert samples["spineauto_projects_total"] == 6
+    assert samples["spineauto_spine_import_seconds_count"] == 2
+    assert samples['spineauto_spine_import_seconds_bucket{le="0.1"}'] == 0
+    assert samples['spineauto_spine_import_seconds_bucket{le="0.25"}'] == 2
+
+
+def test_empty_metrics():
+    types, samples = parse_prometheus(Metrics().to_prometheus())
+    # 没有数据时只有阶段的类型声明和内存峰值
+    assert set(types) <= {"spineauto_stage_seconds_total", "spineauto_stage_runs_total",
+                          "spineauto_peak_memory_bytes"}
+    assert set(samples) <= {"spineauto_peak_memory_bytes"}
@@ -0,0 +1,44 @@
+import pytest
+
+from atlas import parse_atlas
+from page_alpha import check_atlas, straight_atlas
+
+numpy = pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+
+ATLAS = "\npage.png\nsize: 64,64\npma: true\nregion\n  bounds: 0,0,1,1\n"
+
+
+def save_page(path, pixels):
+    Image.fromarray(pixels, "RGBA").save(path)
+
+
+def premultiplied_page() -> "numpy.ndarray":
+    pixels = numpy.zeros((64, 64, 4), numpy.uint8)
+    pixels[..., 3] = numpy.arange(64, dtype=numpy.uint8)[None, :] * 4
+    pixels[..., 0] = pixels[..., 3] // 2
+    return pixels
+
+
+def test_premultiplied_page_is_converted(tmp_path):
+    save_page(tmp_path / "page.png", premultiplied_page())
+    atlas = parse_atlas(ATLAS)
+    [result] = check_atlas(atlas, str(tmp_path))
+    assert result.premultiplied and result.converted
+    assert not atlas.pages[0].pma
+    assert "pma: false" in straight_atlas(ATLAS, [result])
+
+
+def test_inconclusive_page_is_left_alone(tmp_path):
+    # 只有几个半透明像素，无法判断，即使atlas声明了pma也不转换
+    pixels = numpy.zeros((64, 64, 4), numpy.uint8)
+    pixels[:, :, 3] = 255
+    pixels[0, :8] = (40, 40, 40, 128)
+    save_page(tmp_path / "page.png", pixels)
+    before = (tmp_path / "page.png").read_bytes()
+    atlas = parse_atlas(ATLAS)
+    [result] = check_atlas(atlas, str(tmp_path))
+    assert result.premultiplied is None and not result.converted and result.declared
+    assert atlas.pages[0].pma
+    assert (tmp_path / "page.png").read_bytes() == before
+    assert straight_atlas(ATLAS, [result]) == ATLAS
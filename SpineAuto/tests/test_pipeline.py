@@ -0,0 +1,46 @@
+import threading
+import time
+
+import pytest
+
+from pipeline import PipelineStage, abort_stages
+
+
+def test_abort_stages_waits_for_running_handlers():
+    started = threading.Event()
+    finished = []
+
+    def slow(item):
+        started.set()
+        time.sleep(0.2)
+        finished.append(item)
+        downstream.put(item)
+
+    downstream = PipelineStage("write", finished.append, workers=2)
+    upstream = PipelineStage("download", slow, workers=2)
+    for item in range(10):
+        upstream.put(item)
+    started.wait()
+    abort_stages([upstream, downstream])
+    # 返回时正在处理的任务已经结束，没有开始的任务被丢弃
+    assert not any(thread.is_alive() for stage in (upstream, downstream) for thread in stage._threads)
+    count = len(finished)
+    assert 0 < count < 10
+    time.sleep(0.3)
+    assert len(finished) == count
+
+
+def test_join_raises_handler_error_unless_aborting():
+    def fail(item):
+        raise ValueError(item)
+
+    stage = PipelineStage("fail", fail)
+    stage.put(1)
+    with pytest.raises(ValueError):
+        stage.join()
+    stage = PipelineStage("fail", fail)
+    stage.put(1)
+    while stage.error is None:
+        time.sleep(0.01)
+    abort_stages([stage])
+    assert isinstance(stage.error, ValueError)
@@ -0,0 +1,71 @@
+from atlas import parse_atlas
+from fixtures import png_bytes
+from preflight import png_size, validate_project
+
+# hero使用旧版本的格式，eye是两帧序列帧；fx超出页面范围
+ATLAS = ("\nhero.png\nsize: 64,64\nformat: RGBA8888\nfilter: Linear,Linear\nrepeat: none\n"
+         "body\n  bounds: 0,0,32,32\n"
+         "eye\n  rotate: false\n  xy: 32, 0\n  size: 8, 8\n  orig: 8, 8\n  offset: 0, 0\n  index: 0\n"
+         "eye\n  rotate: false\n  xy: 40, 0\n  size: 8, 8\n  orig: 8, 8\n  offset: 0, 0\n  index: 1\n"
+         "\nhero2.png\nsize: 32,32\nfx\n  bounds: 30,30,4,4\nhand\n  bounds: 0,0,8,8\n")
+ATTACHMENTS = ["body", "eye0", "eye1", "fx"]
+
+
+def load_atlas(text: str = ATLAS):
+    atlas = parse_atlas(text)
+    for page in atlas.pages:
+        page.img = f"images/{page.name}.png"
+    return atlas
+
+
+def write_pages(directory, hero=(64, 64), hero2=(32, 32)):
+    (directory / "hero.png").write_bytes(png_bytes(*hero))
+    (directory / "hero2.png").write_bytes(png_bytes(*hero2))
+
+
+def test_valid_project(tmp_path):
+    write_pages(tmp_path)
+    report = validate_project(load_atlas(ATLAS.replace("30,30,4,4", "28,28,4,4")), ["body", "eye0", "eye1", "hand"],
+                              str(tmp_path))
+    assert report.ok, report.summary()
+    assert report.project == "hero"
+    # 序列帧按名称加编号引用，不算作没有用到；只有fx没有用到
+    assert report.unused_regions == 1
+    assert png_size(str(tmp_path / "hero.png")) == (64, 64)
+
+
+def test_missing_regions_and_frames(tmp_path):
+    write_pages(tmp_path)
+    report = validate_project(load_atlas(), ATTACHMENTS + ["arm", "eye2", "eye"], str(tmp_path))
+    # 不存在的编号不是区域，序列帧的名称本身是
+    assert report.missing_regions == ["arm", "eye2"]
+    assert not report.ok
+    assert report.summary().startswith("缺少区域 arm, eye2")
+
+
+def test_out_of_bounds(tmp_path):
+    write_pages(tmp_path)
+    report = validate_project(load_atlas(), ATTACHMENTS, str(tmp_path))
+    assert report.out_of_bounds == ["fx"]
+    assert report.missing_regions == [] and report.bad_pages == {}
+
+
+def test_page_size_mismatch(tmp_path):
+    write_pages(tmp_path, hero=(64, 32))
+    report = validate_project(load_atlas(), ATTACHMENTS, str(tmp_path))
+    assert report.bad_pages == {"hero": "图片大小64x32与atlas中的64x64不一致"}
+    # 大小不一致的页面不再检查区域范围
+    assert report.out_of_bounds == ["fx"]
+
+
+def test_missing_and_unreadable_pages(tmp_path):
+    atlas = load_atlas()
+    atlas.pages[1].img = None
+    (tmp_path / "hero.png").write_bytes(b"<html>404</html>")
+    report = validate_project(atlas, ATTACHMENTS, str(tmp_path))
+    assert report.bad_pages == {"hero": "不是PNG图片"}
+    assert report.missing_page_urls == ["hero2"]
+    # 没有图片地址的页面不会再算作下载失败
+    assert report.missing_pages == []
+    (tmp_path / "hero.png").unlink()
+    assert validate_project(load_atlas(), ATTACHMENTS, str(tmp_path)).missing_pages == ["hero", "hero2"]
@@ -0,0 +1,179 @@
+import json
+
+import pytest
+
+from fixtures import synthetic_skeleton
+from skeleton_binary import SkeletonBinaryError, detect_json_version, export_skeleton, read_skeleton
+
+# 包含所有附件类型、约束和时间轴的4.1格式骨骼JSON
+FULL_SKELETON = {
+    "skeleton": {"hash": "AAECAwQFBgc", "spine": "4.1.17", "x": -10, "y": -20, "width": 30.5, "height": 40,
+                 "fps": 24, "images": "./images/", "audio": "./audio/"},
+    "bones": [
+        {"name": "root", "color": "ff0000ff"},
+        {"name": "hip", "parent": "root", "rotation": 12.5, "x": 3, "y": -4, "scaleX": 1.5, "scaleY": 0.5,
+         "shearX": 2, "shearY": -3, "length": 40, "transform": "onlytranslation", "skin": True},
+        {"name": "arm", "parent": "hip", "x": 10},
+    ],
+    "slots": [
+        {"name": "body", "bone": "hip", "color": "ff8040c0", "dark": "102030", "attachment": "body",
+         "blend": "additive"},
+        {"name": "arm", "bone": "arm", "attachment": "arm"},
+        {"name": "clip", "bone": "root"},
+    ],
+    "ik": [{"name": "ik", "order": 1, "bones": ["hip", "arm"], "target": "root", "mix": 0.5, "softness": 2,
+            "bendPositive": False, "compress": True, "stretch": True, "uniform": True}],
+    "transform": [{"name": "tc", "order": 2, "skin": True, "bones": ["arm"], "target": "hip", "local": True,
+                   "relative": True, "rotation": 5, "x": 1, "y": 2, "scaleX": 0.1, "scaleY": 0.2, "shearY": 3,
+                   "mixRotate": 0.25, "mixX": 0.5, "mixY": 0.75, "mixScaleX": 0.125, "mixScaleY": 0.375,
+                   "mixShearY": 0.625}],
+    "path": [{"name": "pc", "order": 3, "bones": ["arm"], "target": "clip", "positionMode": "fixed",
+              "spacingMode": "proportional", "rotateMode": "chainscale", "rotation": 7, "position": 8,
+              "spacing": 9, "mixRotate": 0.5, "mixX": 0.25, "mixY": 0.125}],
+    "skins": [
+        {"name": "default", "attachments": {
+            "body": {
+                "body": {"x": 1, "y": 2, "rotation": 3, "scaleX": 1.25, "width": 64, "height": 32,
+                         "color": "80ff80ff", "sequence": {"count": 3, "start": 2, "digits": 2, "setup": 1}},
+                "body_mesh": {"type": "mesh", "path": "body", "uvs": [0, 0, 1, 0, 1, 1],
+                              "triangles": [0, 1, 2], "vertices": [0, 0, 10, 0, 10, 10], "hull": 3,
+                              "edges": [0, 2, 2, 4], "width": 10, "height": 10},
+                "weighted": {"type": "mesh", "uvs": [0, 0, 1, 1], "triangles": [0, 1, 0],
+                             "vertices": [1, 1, 1.5, 2.5, 1, 2, 0, -1, 0, 0.5, 2, 4, 4, 0.5],
+                             "hull": 2},
+                "bounds": {"type": "boundingbox", "vertexCount": 3, "vertices": [0, 0, 1, 0, 0, 1],
+                           "color": "00ff00ff"},
+            },
+            "arm": {
+                "arm": {"type": "linkedmesh", "path": "arm_image", "skin": "default", "parent": "body_mesh",
+                        "timelines": False, "width": 5, "height": 6},
+                "curve": {"type": "path", "closed": True, "constantSpeed": False, "vertexCount": 6,
+                          "vertices": [0, 0, 1, 1, 2, 2, 3, 3, 4, 4, 5, 5], "lengths": [10, 20]},
+                "tip": {"type": "point", "x": 3, "y": 4, "rotation": 45},
+            },
+            "clip": {"clip": {"type": "clipping", "end": "arm", "vertexCount": 3, "vertices": [0, 0, 5, 0, 0, 5]}},
+        }},
+        {"name": "alt", "bones": ["hip"], "ik": ["ik"], "transform": ["tc"], "path": ["pc"], "attachments": {
+            "body": {"body": {"name": "body_alt", "path": "alt/body", "width": 16, "height": 16}},
+        }},
+    ],
+    "events": {"step": {"int": -3, "float": 1.5, "string": "left", "audio": "step.mp3", "volume": 0.5,
+                        "balance": -0.25},
+               "hit": {}},
+    "animations": {
+        "walk": {
+            "slots": {
+                "body": {
+                    "attachment": [{"name": "body_mesh"}, {"time": 0.5, "name": None}],
+                    "rgba": [{"color": "ff000080", "curve": [0.1, 0, 0.2, 1, 0.1, 0, 0.2, 1, 0.1, 0, 0.2, 1,
+                                                              0.1, 0, 0.2, 1]},
+                             {"time": 1, "color": "00ff00ff", "curve": "stepped"}, {"time": 2, "color": "0000ffff"}],
+                    "rgb2": [{"light": "ff0000", "dark": "00ff00"}, {"time": 1, "light": "0000ff", "dark": "ffffff"}],
+                    "alpha": [{"value": 0.2}, {"time": 1, "value": 1}],
+                },
+                "arm": {"rgb": [{"color": "102030"}], "rgba2": [{"light": "10203040", "dark": "506070"}]},
+            },
+            "bones": {
+                "hip": {
+                    "rotate": [{"value": 10, "curve": [0.25, 10, 0.75, 20]}, {"time": 1, "value": 20}],
+                    "translate": [{"x": 1, "y": 2, "curve": "stepped"}, {"time": 0.5, "x": 3, "y": 4}],
+                    "scale": [{"x": 2}],
+                    "shear": [{"y": 5}],
+                    "translatex": [{"value": 7}],
+                    "scaley": [{"value": 0.5}],
+                },
+            },
+            "ik": {"ik": [{"mix": 0.5, "softness": 3, "bendPositive": False, "curve": [0.1, 0.2, 0.3, 0.4, 0.5,
+                                                                                       0.6, 0.7, 0.8]},
+                          {"time": 1, "compress": True, "stretch": True}]},
+            "transform": {"tc": [{"mixRotate": 0.5, "mixX": 0.25, "mixY": 0.75}, {"time": 2, "mixScaleX": 0.5}]},
+            "path": {"pc": {"position": [{"value": 3}], "spacing": [{"time": 0.25, "value": 4}],
+                            "mix": [{"mixRotate": 0.5, "mixX": 0.25, "mixY": 0.125}]}},
+            "attachments": {"default": {"body": {
+                "body_mesh": {"deform": [{"offset": 2, "vertices": [1, 1], "curve": "stepped"}, {"time": 1}]},
+                "body": {"sequence": [{"mode": "loop", "index": 2, "delay": 0.1}, {"time": 1, "mode": "pingpong"}]},
+            }}},
+            "drawOrder": [{"time": 0.5, "offsets": [{"slot": "arm", "offset": -1}]}, {"time": 1}],
+            "events": [{"time": 0.25, "name": "step"}, {"time": 0.75, "name": "step", "int": 5, "string": "right",
+                                                         "volume": 0.75}, {"time": 1, "name": "hit"}],
+        },
+        "idle": {},
+    },
+}
+
+
+def assert_subset(actual, expected, path="$"):
+    # expected中出现的字段都要与读取结果一致，读取结果中多出的默认值不检查
+    if isinstance(expected, dict):
+        assert isinstance(actual, dict), path
+        for key, value in expected.items():
+            assert key in actual, f"{path}.{key}"
+            assert_subset(actual[key], value, f"{path}.{key}")
+    elif isinstance(expected, list):
+        assert isinstance(actual, list) and len(actual) == len(expected), path
+        for index, (actual_item, expected_item) in enumerate(zip(actual, expected)):
+            assert_subset(actual_item, expected_item, f"{path}[{index}]")
+    elif isinstance(expected, float) or (isinstance(expected, int) and isinstance(actual, float)):
+        # 二进制中是32位浮点数
+        assert actual == pytest.approx(expected, rel=1e-6, abs=1e-6), path
+    else:
+        assert actual == expected, path
+
+
+def test_full_skeleton_round_trip():
+    data = read_skeleton(export_skeleton(FULL_SKELETON, nonessential=True))
+    expected = json.loads(json.dumps(FULL_SKELETON))
+    expected["skeleton"].update(hash=0x0001020304050607, spine="4.1.00")
+    # 二进制中透明度只有一个字节
+    alpha = expected["animations"]["walk"]["slots"]["body"].pop("alpha")
+    assert [frame["value"] for frame in data["animations"]["walk"]["slots"]["body"]["alpha"]] == \
+           pytest.approx([frame["value"] for frame in alpha], abs=1 / 255)
+    # 只在编辑器中使用的字段
+    assert data["skeleton"]["audio"] == "./audio/" and data["bones"][0]["color"] == "ff0000ff"
+    assert_subset(data, expected)
+    # 默认值与SkeletonJson.cs一致
+    assert data["bones"][2]["scaleX"] == 1 and data["bones"][2]["transform"] == "normal"
+    assert data["slots"][1]["color"] == "ffffffff" and "dark" not in data["slots"][1]
+    assert data["skins"][0]["attachments"]["arm"]["tip"]["name"] == "tip"
+    walk = data["animations"]["walk"]
+    assert walk["ik"]["ik"][1]["mix"] == 1 and walk["ik"]["ik"][1]["bendPositive"]
+    # mixY默认为mixX，mixScaleY默认为mixScaleX
+    assert walk["transform"]["tc"][1]["mixY"] == 1 and walk["transform"]["tc"][1]["mixScaleY"] == 0.5
+    assert walk["events"][0]["int"] == -3 and walk["events"][0]["string"] == "left"
+    assert data["animations"]["idle"]["slots"] == {} and data["animations"]["idle"]["events"] == []
+
+
+def test_essential_only():
+    data = read_skeleton(export_skeleton(FULL_SKELETON))
+    assert "fps" not in data["skeleton"] and "color" not in data["bones"][0]
+    assert "edges" not in data["skins"][0]["attachments"]["body"]["body_mesh"]
+
+
+@pytest.mark.parametrize("bones", [0, 1, 40])
+def test_fixture_skeleton_round_trip(bones):
+    regions = [f"region{index}" for index in range(12)]
+    source = json.loads(synthetic_skeleton(regions, bones))
+    data = read_skeleton(export_skeleton(source))
+    assert [bone["name"] for bone in data["bones"]] == [bone["name"] for bone in source["bones"]]
+    for bone, source_bone in zip(data["bones"][1:], source["bones"][1:]):
+        assert bone["parent"] == "root"
+        assert (bone["x"], bone["y"], bone["rotation"]) == \
+               pytest.approx((source_bone["x"], source_bone["y"], source_bone["rotation"]))
+    assert [(slot["name"], slot["bone"], slot["attachment"]) for slot in data["slots"]] == \
+           [(slot["name"], slot["bone"], slot["attachment"]) for slot in source["slots"]]
+    attachments = data["skins"][0]["attachments"]
+    assert list(attachments) == regions
+    assert all(attachments[name][name]["width"] == 30 and attachments[name][name]["path"] == name for name in regions)
+    # 3.8的angle读取为4.1的value
+    rotate = {name: timelines["rotate"] for name, timelines in data["animations"]["idle"]["bones"].items()}
+    assert len(rotate) == bones
+    assert all([frame["time"] for frame in frames] == [0, 1] and frames[1]["value"] == 5 for frames in rotate.values())
+
+
+def test_detect_json_version():
+    assert detect_json_version({"skeleton": {"spine": "4.0-from-3.8.99"}}) == "4.0"
+    assert detect_json_version({"skeleton": {"spine": "3.8.99"}}) == "3.8"
+    assert detect_json_version({"skeleton": {"spine": "4.1.17"}}) == "4.1"
+    assert detect_json_version({"skeleton": {}}) == ""
+    with pytest.raises(SkeletonBinaryError):
+        export_skeleton({"skeleton": {"spine": "3.7.94"}})
@@ -0,0 +1,34 @@
+import json
+
+import pytest
+
+import skeleton_json
+from skeleton_json import dumps, normalize_skeleton
+
+SKELETON = {"skeleton": {"spine": "4.0-from-3.8.99", "hash": "中文"},
+            "bones": [{"name": "root", "scaleX": 0.5, "y": 1e-07}], "slots": [], "skins": {}}
+
+
+@pytest.fixture(params=["orjson", "json"])
+def backend(request, monkeypatch):
+    if request.param == "json":
+        monkeypatch.setattr(skeleton_json, "orjson", None)
+    elif skeleton_json.orjson is None:
+        pytest.skip("没有安装orjson")
+    return request.param
+
+
+def test_indented_output_is_the_same_for_every_backend(backend):
+    expected = json.dumps(SKELETON, ensure_ascii=False, indent=4).encode("utf-8")
+    assert dumps(SKELETON) == expected
+
+
+def test_minified_output(backend):
+    assert json.loads(dumps(SKELETON, minify=True)) == SKELETON
+    assert b"\n" not in dumps(SKELETON, minify=True)
+
+
+def test_normalize_fixes_version(backend):
+    skeleton = normalize_skeleton(json.dumps(SKELETON), images=None)
+    assert skeleton.spine_version == "3.8.99"
+    assert skeleton.content.startswith(b'{\n    "skeleton": {\n        "spine": "3.8.99"')
@@ -0,0 +1,85 @@
+import json
+import os
+
+from fake_spine import REGION_MARKER
+from fixtures import fake_spine
+from spine_runner import SpineProject, SpineWorkerPool, save_report
+
+REGIONS = ["body", "head", "tail"]
+
+
+def make_project(root: str, name: str) -> SpineProject:
+    project_dir = os.path.join(root, name)
+    os.makedirs(os.path.join(project_dir, "out", "images"))
+    atlas = "\n".join([f"\n{name}.png", "size: 64,64", "format: RGBA8888", "filter: Linear,Linear", "repeat: none"] +
+                      [line for index, region in enumerate(REGIONS)
+                       for line in (region, "  rotate: false", f"  xy: {index * 16}, 0", "  size: 16, 16",
+                                    "  orig: 16, 16", "  offset: 0, 0", "  index: -1")])
+    with open(os.path.join(project_dir, f"{name}.atlas"), "w", encoding="utf-8") as fp:
+        fp.write(atlas)
+    with open(os.path.join(project_dir, f"{name}.json"), "w", encoding="utf-8") as fp:
+        fp.write('{"skeleton": {"spine": "3.8.99"}}')
+    return SpineProject(name, project_dir, "3.8.99", 0.5, REGIONS)
+
+
+def read_log(path: str) -> list[dict]:
+    with open(path, "r", encoding="utf-8") as fp:
+        return [json.loads(line) for line in fp]
+
+
+def test_unpack_then_import_per_project(tmp_path):
+    log = str(tmp_path / "calls.log")
+    pool = SpineWorkerPool(fake_spine(str(tmp_path / "bin"), log=log), workers=3, native_unpack=False)
+    projects = [make_project(str(tmp_path), f"hero{index}") for index in range(4)]
+    reports = pool.run(projects)
+    assert [report.project.name for report in reports] == [project.name for project in projects]
+    calls = read_log(log)
+    assert len(calls) == 8
+    for project, report in zip(projects, reports):
+        assert report.ok and report.missing_regions == []
+        assert [step.step for step in report.steps] == ["unpack", "import"]
+        assert all(step.returncode == 0 and step.stderr == "" for step in report.steps)
+        steps = [call for call in calls if call["project"] == project.name]
+        assert [call["step"] for call in steps] == ["unpack", "import"]
+        assert steps[0]["time"] <= steps[1]["time"]
+        assert all(call["version"] == "3.8.99" for call in steps)
+        # 解开的区域移动到out/images之后才导入
+        for region in REGIONS:
+            with open(os.path.join(project.images_path, f"{region}.png"), "rb") as fp:
+                assert fp.read() == REGION_MARKER
+        with open(project.spine_project_file, "r", encoding="utf-8") as fp:
+            assert json.load(fp) == {"json": project.json_file, "scale": 0.5}
+
+
+def test_exit_codes_and_stderr_in_report(tmp_path):
+    log = str(tmp_path / "calls.log")
+    spine = fake_spine(str(tmp_path / "bin"), failures={"hero1/unpack": (2, "atlas损坏"),
+                                                        "hero2/import": (3, "ERROR: 无法导入")},
+                       missing_regions={"hero3": ["head"]}, log=log)
+    pool = SpineWorkerPool(spine, workers=2, native_unpack=False)
+    projects = [make_project(str(tmp_path), f"hero{index}") for index in range(4)]
+    ok, unpack_failed, import_failed, missing = pool.run(projects)
+    assert ok.ok
+    # 解开图片失败时不再导入
+    assert not unpack_failed.ok
+    assert [(step.step, step.returncode, step.stderr) for step in unpack_failed.steps] == [("unpack", 2, "atlas损坏")]
+    assert [call["step"] for call in read_log(log) if call["project"] == "hero1"] == ["unpack"]
+    assert not import_failed.ok
+    assert [(step.step, step.returncode) for step in import_failed.steps] == [("unpack", 0), ("import", 3)]
+    assert import_failed.steps[1].stderr == "ERROR: 无法导入"
+    # 缺少的区域记录在结果中，项目照常导入
+    assert missing.ok and missing.missing_regions == ["head"]
+    report_path = str(tmp_path / "spine_report.json")
+    save_report([ok, unpack_failed, import_failed, missing], report_path)
+    with open(report_path, "r", encoding="utf-8") as fp:
+        saved = json.load(fp)
+    assert [item["ok"] for item in saved] == [True, False, False, True]
+    assert saved[2]["steps"][1]["returncode"] == 3 and saved[2]["steps"][1]["stderr"] == "ERROR: 无法导入"
+    assert saved[3]["missing_regions"] == ["head"]
+
+
+def test_missing_spine_executable(tmp_path):
+    pool = SpineWorkerPool(str(tmp_path / "missing"), native_unpack=False)
+    report = pool.run_project(make_project(str(tmp_path), "hero0"))
+    assert not report.ok
+    assert len(report.steps) == 1 and report.steps[0].returncode is None and report.steps[0].stderr
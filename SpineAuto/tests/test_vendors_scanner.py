@@ -0,0 +1,66 @@
+import pytest
+
+from vendors_scanner import VendorsEventType, VendorsScanner, scan_vendors
+
+# 注释、正则和转义引号中的引号不能打乱字面量的配对
+BUNDLE = (b'(self.webpackChunk=self.webpackChunk||[]).push([[1],{\n'
+          b'"a-atlas":function(e,t){e.exports="\\nhero.png\\nsize: 64,64\\nformat: RGBA8888\\n"},\n'
+          b'"a-json":function(e){/* it\'s "quoted" */e.exports=JSON.parse(\'{"skeleton":{"spine":"3.8.99"}}\')},\n'
+          b'b:function(e,t,n){var r=/[\'"]/g,o=1/2,s=\'don\\\'t\';// it\'s "odd\n'
+          b'e.exports=[n("a-atlas"),"images/hero.0123abcd..png",r,o,s]},\n'
+          b'c:function(e){e.exports="data:image/png;base64,iVBORw0KGgo="}}]);\n')
+
+
+def split(content: bytes, size: int) -> list[bytes]:
+    return [content[index:index + size] for index in range(0, len(content), size)]
+
+
+def test_literals_and_modules():
+    events = list(scan_vendors(BUNDLE, False))
+    assert [(event.type, event.module) for event in events] == [
+        (VendorsEventType.ATLAS, "a-atlas"), (VendorsEventType.MODULE, "a-atlas"),
+        (VendorsEventType.SKELETON_JSON, "a-json"), (VendorsEventType.MODULE, "a-json"),
+        (VendorsEventType.IMAGE_REF, "b"), (VendorsEventType.MODULE, "b"),
+        (VendorsEventType.DATA_URI, "c"), (VendorsEventType.MODULE, "c"),
+    ]
+    atlas, _, skeleton, _, image, _, data_uri, _ = events
+    assert atlas.value == "\\nhero.png\\nsize: 64,64\\nformat: RGBA8888\\n"
+    assert skeleton.value == '{"skeleton":{"spine":"3.8.99"}}'
+    assert image.value == "images/hero.0123abcd..png"
+    assert data_uri.value == b"iVBORw0KGgo="
+    # 字面量事件的偏移指向内容本身，内联图片指向data:前缀
+    for event in (atlas, skeleton, image):
+        assert BUNDLE[event.offset:event.offset + len(event.value)] == event.value.encode("utf-8")
+    assert BUNDLE.startswith(b"data:image/png;base64,iVBORw0KGgo=", data_uri.offset)
+
+
+def test_module_offsets_and_requires():
+    modules = [event for event in scan_vendors(BUNDLE, False) if event.type is VendorsEventType.MODULE]
+    assert [(event.module, event.value) for event in modules] == \
+           [("a-atlas", []), ("a-json", []), ("b", ["a-atlas"]), ("c", [])]
+    # 模块从键开始，不包含前面的逗号和换行
+    for event, head in zip(modules, (b'"a-atlas":', b'"a-json":', b"b:", b"c:")):
+        assert BUNDLE.startswith(head, event.offset)
+
+
+@pytest.mark.parametrize("size", range(1, 24))
+def test_split_at_every_boundary(size):
+    expected = list(scan_vendors(BUNDLE, False))
+    assert list(scan_vendors(split(BUNDLE, size), False)) == expected
+
+
+def test_split_at_each_position():
+    # 在每个位置切成两块，覆盖被分开的引号、转义、注释结束符和正则
+    expected = list(scan_vendors(BUNDLE, False))
+    for index in range(1, len(BUNDLE)):
+        scanner = VendorsScanner(False)
+        events = scanner.feed(BUNDLE[:index]) + scanner.feed(BUNDLE[index:]) + scanner.close()
+        assert events == expected, index
+
+
+def test_skip_first_line():
+    content = b'/*! "unterminated license */\n' + BUNDLE
+    events = list(scan_vendors(split(content, 5)))
+    expected = list(scan_vendors(BUNDLE, False))
+    shift = len(content) - len(BUNDLE)
+    assert events == [event._replace(offset=event.offset + shift) for event in expected]
@@ -0,0 +1,54 @@
+import contextlib
+import datetime
+import io
+
+from SpineAuto import SpineAutoConfig, SpineAutoSession
+from fixtures import generate_preview_site, serve_directory
+from watch import EventWatcher, expand_patterns, watch_once
+
+
+def test_expand_patterns():
+    today = datetime.date(2024, 3, 1)
+    urls = expand_patterns(["https://example.com/e{date:%Y%m%d}/index.html", "https://example.com/fixed.html"],
+                           today, days_back=1, days_ahead=1)
+    assert urls == ["https://example.com/e20240229/index.html", "https://example.com/e20240301/index.html",
+                    "https://example.com/e20240302/index.html", "https://example.com/fixed.html"]
+
+
+def test_rebuild_once_per_change(tmp_path):
+    site_dir = tmp_path / "site"
+    # 第一个活动带有不含hash的app.js，第二个活动只有带hash的vendors.js
+    generate_preview_site(str(site_dir / "e0"), title="活动0", heroes=2, chunks=1)
+    generate_preview_site(str(site_dir / "e1"), title="活动1", heroes=2)
+    config = SpineAutoConfig(output_root=str(tmp_path / "out"), cache_dir=str(tmp_path / "cache"), native_unpack=False)
+    with serve_directory(str(site_dir)) as base_url, contextlib.redirect_stdout(io.StringIO()), \
+            SpineAutoSession(config) as session:
+        urls = [f"{base_url}e0/index.html", f"{base_url}e1/index.html", f"{base_url}missing/index.html"]
+        watcher = EventWatcher(session.downloader, str(tmp_path / "watch_state.json"))
+        counters = session.metrics.counters
+
+        def rebuilt() -> list[str]:
+            return sorted(result.name for result in watch_once(session, watcher, urls))
+
+        assert rebuilt() == ["活动0", "活动1"]
+        assert watcher.state[urls[2]]["status"] == 404
+        # 没有变化时两个页面都是304，不会重新提取
+        not_modified = counters.get("watch_not_modified", 0)
+        assert rebuilt() == []
+        assert counters["watch_not_modified"] == not_modified + 2
+        # 带hash的脚本引用变化
+        generate_preview_site(str(site_dir / "e1"), title="活动1", heroes=3, seed=1)
+        assert rebuilt() == ["活动1"]
+        assert rebuilt() == []
+        # index.html中脚本以外的内容变化
+        with open(site_dir / "e0" / "index.html", "a", encoding="utf-8") as fp:
+            fp.write("<!-- -->")
+        assert rebuilt() == []
+        # 引用不变但不带hash的脚本内容变化，用它的ETag发现
+        with open(site_dir / "e0" / "js" / "app.js", "a", encoding="utf-8") as fp:
+            fp.write(";")
+        assert rebuilt() == ["活动0"]
+        assert rebuilt() == []
+        # 状态保存后，新的检查器不会重新提取已经提取过的活动
+        watcher = EventWatcher(session.downloader, str(tmp_path / "watch_state.json"))
+        assert rebuilt() == []
@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+from fixtures import generate_preview_site
+from vendors_scanner import VendorsEventType, scan_vendors
+
+CHUNK_SIZES = [1, 2, 3, 5, 7, 8, 13, 16, 64, 100, 255, 4096, 65536]
+
+
+@pytest.fixture(scope="module")
+def scripts(tmp_path_factory) -> list[tuple[bytes, bool]]:
+    # vendors.js使用数组模块表，分块使用字符串id的对象模块表，app.js是webpack运行时
+    fixture = generate_preview_site(str(tmp_path_factory.mktemp("site")), heroes=8, chunks=2, vendors_size=1 << 15)
+    paths = [fixture.vendors_path, *fixture.chunk_paths, os.path.join(fixture.root, "js", "app.js")]
+    result = []
+    for path in paths:
+        with open(path, "rb") as fp:
+            result.append((fp.read(), path == fixture.vendors_path))
+    return result
+
+
+def split(content: bytes, size: int) -> list[bytes]:
+    return [content[index:index + size] for index in range(0, len(content), size)]
+
+
+@pytest.mark.parametrize("size", CHUNK_SIZES)
+def test_module_events_independent_of_chunk_size(scripts, size):
+    for content, skip_first_line in scripts:
+        expected = list(scan_vendors(content, skip_first_line))
+        assert any(event.type is VendorsEventType.MODULE for event in expected)
+        assert list(scan_vendors(split(content, size), skip_first_line)) == expected
+
+
+def test_module_ids_and_requires(scripts):
+    vendors, chunk, _, app = [list(scan_vendors(content, skip)) for content, skip in scripts]
+    modules = [event for event in vendors if event.type is VendorsEventType.MODULE]
+    assert [event.module for event in modules] == [str(index) for index in range(len(modules))]
+    assert {event.module for event in chunk if event.type is VendorsEventType.ATLAS} <= \
+           {event.module for event in chunk if event.type is VendorsEventType.MODULE}
+    requires = {event.module: event.value for event in app if event.type is VendorsEventType.MODULE}
+    assert any(value and all(name.endswith(("-atlas", "-json")) for name in value) for value in requires.values())
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 4, 6, 9])
+def test_split_keys_headers_and_requires(size):
+    content = (b'(self.webpackChunk=self.webpackChunk||[]).push([[1],{"a-atlas":function(e,t){e.exports="x"},'
+               b'b_json:(e,t,n)=>{var a=n("a-atlas"),s=n(12);e.exports=[a,s]},"c":e=>{e.exports=1}}]);'
+               b'(self.webpackChunk=self.webpackChunk||[]).push([[2],[function(e,t,n){n(3)},,function(e){}]]);')
+    expected = [(event.module, event.value) for event in scan_vendors(content, False)]
+    assert expected == [("a-atlas", []), ("b_json", ["a-atlas", "12"]), ("c", []), ("0", ["3"]), ("2", [])]
+    assert [(event.module, event.value) for event in scan_vendors(split(content, size), False)] == expected
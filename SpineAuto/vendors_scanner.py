@@ -0,0 +1,270 @@
+import mmap
+import re
+from collections import namedtuple
+from enum import Enum
+from typing import Iterable, Iterator
+
+from literal_slice import BASE64_RE, DATA_URI_PNG_PREFIX, literal_end
+from webpack_modules import LOOKBEHIND, MAX_HEAD, ModuleTracker
+
+
+class VendorsEventType(Enum):
+    ATLAS = "atlas"  # atlas文本字面量
+    SKELETON_JSON = "skeleton_json"  # JSON.parse('...')中的骨骼JSON
+    IMAGE_REF = "image_ref"  # 带hash的图片引用，如images/{page}.{md5}..png
+    DATA_URI = "data_uri"  # 内联的base64图片
+    MODULE = "module"  # 一个webpack模块结束，value为它引用的模块id
+
+
+# offset为事件内容在vendors.js字节流中的绝对偏移（内联图片为data:前缀的偏移，模块为模块的起点），
+# module为事件所在的webpack模块id，不在模块表中时为None
+VendorsEvent = namedtuple("VendorsEvent", ["type", "offset", "value", "module"], defaults=(None,))
+
+# 不含转义和换行的短字符串整体匹配，省去逐个查找结束引号；其他情况只匹配开头的符号
+TOKEN_RE = re.compile(rb"\"[^\"\\\n]*\"|'[^'\\\n]*'|[\"'`/]")
+# 正则字面量（字符类中的/不结束正则）
+REGEX_END_RE = re.compile(rb"(?:[^/\\\[\n]|\\.|\[(?:[^\]\\\n]|\\.)*\])+/")
+# 这些符号或关键字之后的/是正则的开始，否则是除号
+REGEX_PRECEDERS = frozenset(b"(,=:[!&|?{};+-*%<>~^")
+REGEX_KEYWORDS = (b"return", b"typeof", b"case", b"do", b"else", b"in", b"of", b"new", b"delete", b"void",
+                  b"throw", b"instanceof", b"yield", b"await")
+JSON_PARSE_PREFIX = b"JSON.parse("
+KEEP_CONTEXT = max(len(JSON_PARSE_PREFIX), LOOKBEHIND, MAX_HEAD, *(len(keyword) + 1 for keyword in REGEX_KEYWORDS))
+IMAGE_REF_RE = re.compile(r"images/([^\"'\s/]+?)\.(\w+)\.\.png")
+
+
+class VendorsScanner:
+    """
+    vendors.js（以及其他webpack分块）的单遍扫描器，可以按块喂入响应体，逐个产出事件。
+    扫描的同时划分webpack模块表，每个事件都带有所在的模块id
+    """
+
+    def __init__(self, skip_first_line: bool = True):
+        """
+        :param skip_first_line: 是否跳过第一行（vendors.js的第一行是注释）
+        """
+        self._modules = ModuleTracker()
+        self._buffer = bytearray()
+        self._base = 0  # _buffer[0]在整个字节流中的偏移
+        self._pos = 0  # 下一次扫描在_buffer中的起点
+        self._skip_line = skip_first_line
+
+    def feed(self, chunk: bytes) -> list[VendorsEvent]:
+        """
+        喂入一块数据
+        :param chunk: 响应体的一部分
+        :return: 当前已经可以确定的事件
+        """
+        self._buffer += chunk
+        return list(self._scan(final=False))
+
+    def close(self) -> list[VendorsEvent]:
+        """
+        结束输入，产出剩余的事件
+        :return: 剩余的事件
+        """
+        events = list(self._scan(final=True))
+        self._buffer.clear()
+        return events
+
+    def _scan(self, final: bool) -> Iterator[VendorsEvent]:
+        buffer = self._buffer
+        base = self._base
+        pos = self._pos
+        modules = self._modules
+        if self._skip_line:
+            newline = buffer.find(b"\n", pos)
+            if newline == -1:
+                self._pos = len(buffer)
+                return
+            modules.skip(buffer, pos, newline + 1, base)
+            pos = newline + 1
+            self._skip_line = False
+        while True:
+            start = TOKEN_RE.search(buffer, pos)
+            if start is None:
+                pos = len(buffer)
+                break
+            index = start.start()
+            token = buffer[index]
+            if token == 0x2F:  # "/"
+                end = self._skip_slash(index, final)
+                if end is None:
+                    # 注释或正则还没传输完，等待下一块
+                    pos = index
+                    break
+                if end > index + 1:
+                    modules.skip(buffer, index, end, base)
+                pos = end
+                continue
+            end = start.end() - 1
+            if end == index:
+                end = literal_end(buffer, index + 1, token)
+                if end == -1:
+                    if final or buffer.find(b"\n", index + 1) != -1:
+                        # 无法闭合的引号，跳过它继续
+                        pos = index + 1
+                        continue
+                    # 字面量还没传输完，等待下一块
+                    pos = index
+                    break
+            events = self._classify(token, index + 1, end)
+            if events:
+                # 处理到字面量之前，确定事件所在的模块
+                modules.advance(buffer, index, base)
+                yield from self._module_events()
+                module = modules.current
+                for event in events:
+                    yield event._replace(module=module)
+            modules.skip(buffer, index + 1, end, base)
+            pos = end + 1
+        modules.advance(buffer, pos, base, final)
+        yield from self._module_events()
+        # 丢弃已经扫描过的部分，避免缓冲区无限增长；保留一小段用于判断JSON.parse(前缀、正则的上下文和不完整的函数头
+        keep = max(0, pos - KEEP_CONTEXT)
+        del buffer[:keep]
+        self._base += keep
+        self._pos = pos - keep
+
+    def _module_events(self) -> Iterator[VendorsEvent]:
+        closed = self._modules.closed
+        if closed:
+            for module in closed:
+                yield VendorsEvent(VendorsEventType.MODULE, module.start, list(module.requires), module.id)
+            closed.clear()
+
+    def _skip_slash(self, index: int, final: bool) -> int | None:
+        """
+        跳过注释和正则字面量，防止其中的引号打乱字面量的配对
+        :param index: /所在的位置
+        :param final: 是否已经没有后续数据
+        :return: 跳过后的位置，数据不足时返回None
+        """
+        buffer = self._buffer
+        if index + 1 >= len(buffer):
+            return len(buffer) if final else None
+        following = buffer[index + 1]
+        if following == 0x2A:  # "/*"
+            end = buffer.find(b"*/", index + 2)
+            if end == -1:
+                return len(buffer) if final else None
+            return end + 2
+        if following == 0x2F:  # "//"
+            end = buffer.find(b"\n", index + 2)
+            if end == -1:
+                return len(buffer) if final else None
+            return end + 1
+        if not self._regex_allowed(index):
+            return index + 1
+        end = REGEX_END_RE.match(buffer, index + 1)
+        if end is None:
+            if final or buffer.find(b"\n", index + 1) != -1:
+                return index + 1
+            return None
+        return end.end()
+
+    def _regex_allowed(self, index: int) -> bool:
+        """
+        根据/前面的内容判断它是正则的开始还是除号
+        :param index: /所在的位置
+        :return: 是否为正则
+        """
+        buffer = self._buffer
+        prev = index - 1
+        while prev >= 0 and buffer[prev] in b" \t\r\n":
+            prev -= 1
+        if prev < 0:
+            return True
+        if buffer[prev] in REGEX_PRECEDERS:
+            return True
+        if not 0x61 <= buffer[prev] <= 0x7A:
+            # 关键字都以小写字母结尾，)、]、数字等之后的/是除号，不需要逐个比较关键字
+            return False
+        for keyword in REGEX_KEYWORDS:
+            if buffer.endswith(keyword, 0, prev + 1):
+                before = prev - len(keyword)
+                if before < 0 or not (chr(buffer[before]).isalnum() or buffer[before] in b"_$."):
+                    return True
+        return False
+
+    def _classify(self, quote: int, start: int, end: int) -> list[VendorsEvent]:
+        buffer = self._buffer
+        offset = self._base + start
+        if quote == 0x27 and buffer.endswith(JSON_PARSE_PREFIX, 0, start - 1):  # "'"
+            return [VendorsEvent(VendorsEventType.SKELETON_JSON, offset, buffer[start:end].decode("utf-8"))]
+        if buffer.find(b"png", start, end) == -1:
+            # 大部分字面量与图片无关，内联图片和图片引用都包含png
+            return []
+        events = []
+        index = buffer.find(DATA_URI_PNG_PREFIX, start, end)
+        while index != -1:
+            content_start = index + len(DATA_URI_PNG_PREFIX)
+            content_end = BASE64_RE.match(buffer, content_start, end).end()
+            # 扫描缓冲区之后会被裁剪，这里必须复制一份
+            events.append(VendorsEvent(VendorsEventType.DATA_URI, self._base + index,
+                                       bytes(buffer[content_start:content_end])))
+            index = buffer.find(DATA_URI_PNG_PREFIX, content_end, end)
+        if buffer.find(b".png", start, end) == -1:
+            return events
+        has_data_uri = bool(events)
+        literal = buffer[start:end].decode("utf-8")
+        for match in IMAGE_REF_RE.finditer(literal):
+            events.append(VendorsEvent(VendorsEventType.IMAGE_REF, offset + match.start(), match.group(0)))
+        if quote == 0x22 and not has_data_uri and ".png" in literal and "\\n" in literal \
+                and not literal.startswith("http") and not literal.startswith("images/"):
+            events.append(VendorsEvent(VendorsEventType.ATLAS, offset, literal))
+        return events
+
+
+def scan_vendors(chunks: Iterable[bytes], skip_first_line: bool = True) -> Iterator[VendorsEvent]:
+    """
+    扫描整个vendors.js
+    :param chunks: vendors.js的字节块，可以是bytes本身（作为单个块）或响应体的iter_content
+    :param skip_first_line: 是否跳过第一行
+    :return: 事件迭代器
+    """
+    scanner = VendorsScanner(skip_first_line)
+    if isinstance(chunks, (bytes, bytearray)):
+        chunks = (chunks,)
+    for chunk in chunks:
+        yield from scanner.feed(chunk)
+    yield from scanner.close()
+
+
+def dump_events(events: Iterable[VendorsEvent]) -> list[list]:
+    """
+    将事件转换为可以序列化为JSON的列表。
+    内联图片只保存base64的长度（value已经是长度时保持不变），需要时用data_uri_content从vendors.js中读取，避免缓存体积与vendors.js相当
+    :param events: 事件
+    :return: [[类型, 偏移, 内容, 模块id], ...]
+    """
+    data = []
+    for event in events:
+        value = event.value
+        if event.type is VendorsEventType.DATA_URI and not isinstance(value, int):
+            value = len(value)
+        data.append([event.type.value, event.offset, value, event.module])
+    return data
+
+
+def load_events(data: list[list]) -> list[VendorsEvent]:
+    """
+    dump_events的逆操作，内联图片事件的value为base64的长度
+    :param data: dump_events的返回值
+    :return: 事件
+    """
+    return [VendorsEvent(VendorsEventType(event_type), offset, value, module)
+            for event_type, offset, value, module in data]
+
+
+def data_uri_content(buffer: bytes | bytearray | mmap.mmap, event: VendorsEvent) -> bytes:
+    """
+    获取内联图片事件的base64内容
+    :param buffer: vendors.js的内容，可以是map_file的返回值
+    :param event: 内联图片事件，value为base64内容或其长度
+    :return: base64内容
+    """
+    if not isinstance(event.value, int):
+        return bytes(event.value)
+    start = event.offset + len(DATA_URI_PNG_PREFIX)
+    return bytes(buffer[start:start + event.value])
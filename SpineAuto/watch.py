@@ -0,0 +1,284 @@
+import argparse
+import datetime
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha256
+from typing import Iterable, Optional
+from urllib.parse import urljoin
+
+from SpineAuto import OUTPUT_FORMATS, EventResult, SpineAutoConfig, SpineAutoSession, add_metrics_arguments
+from asset_cache import CACHE_DIR
+from batch import DEFAULT_EVENT_WORKERS, print_summary, read_url_list
+from downloader import DownloadError, Downloader, embedded_hash
+from html_head import scan_head
+from metrics import Metrics
+
+DEFAULT_INTERVAL = 300  # 两次轮询之间的间隔（秒）
+DEFAULT_DAYS_BACK = 7  # 地址模板展开到今天之前多少天
+DEFAULT_DAYS_AHEAD = 42  # 地址模板展开到今天之后多少天，先行展示页一般在版本更新前几周上线
+STATE_NAME = "watch_state.json"
+MISSING_STATUS = frozenset((403, 404, 410))  # 页面还不存在
+
+# 一次检查的结果：status为页面的状态码（请求失败时为None），changed表示脚本的引用发生了变化，需要重新提取
+WatchCheck = namedtuple("WatchCheck", ["url", "status", "changed", "title", "error"])
+
+
+def expand_patterns(patterns: Iterable[str], today: Optional[datetime.date] = None,
+                    days_back: int = DEFAULT_DAYS_BACK, days_ahead: int = DEFAULT_DAYS_AHEAD) -> list[str]:
+    """
+    展开带日期的地址模板，如https://act.mihoyo.com/ys/event/e{date:%Y%m%d}preview/index.html
+    :param patterns: 地址模板，{date}使用datetime.date的格式，不带{date的模板原样返回
+    :param today: 以哪一天为中心，默认为今天
+    :param days_back: 展开到today之前多少天
+    :param days_ahead: 展开到today之后多少天
+    :return: 去重后的地址
+    """
+    today = today or datetime.date.today()
+    urls = []
+    for pattern in patterns:
+        if "{date" not in pattern:
+            urls.append(pattern)
+            continue
+        for offset in range(-days_back, days_ahead + 1):
+            urls.append(pattern.format(date=today + datetime.timedelta(days=offset)))
+    return list(dict.fromkeys(urls))
+
+
+class EventWatcher:
+    """
+    轮询活动页面，只用条件请求获取index.html，按其中引用的脚本判断活动是否变化，不下载脚本本身。
+    webpack的脚本文件名中带有内容hash，引用不变时内容也不变；不带hash的脚本额外用HEAD请求取它的ETag等。
+    状态保存在JSON文件中，上次提取成功后脚本引用没有变化的活动不会再提取
+    """
+
+    def __init__(self, downloader: Downloader, state_path: str, workers: Optional[int] = None):
+        """
+        :param downloader: 发送请求的下载器
+        :param state_path: 状态文件的路径
+        :param workers: 同时检查的页面数，默认为下载器的并发数
+        """
+        self.downloader = downloader
+        self.state_path = state_path
+        self.workers = workers or downloader.workers
+        self._lock = threading.Lock()
+        try:
+            with open(state_path, "r", encoding="utf-8") as fp:
+                # url -> {"status", "etag", "last_modified", "digest", "scripts", "fingerprint", "extracted", ...}
+                self.state: dict[str, dict] = json.load(fp)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.state = {}
+
+    def poll(self, urls: Iterable[str]) -> list[WatchCheck]:
+        """
+        同时检查所有页面并保存状态
+        :param urls: 页面URL
+        :return: 每个页面的检查结果
+        """
+        with ThreadPoolExecutor(self.workers) as executor:
+            checks = list(executor.map(self.check, urls))
+        self.save()
+        return checks
+
+    def check(self, url: str) -> WatchCheck:
+        """
+        检查一个页面：还不存在的页面只发送HEAD请求，已经存在的页面发送条件请求，内容变化时才解析script，
+        不带hash的脚本每次都用HEAD请求检查
+        :param url: 页面URL
+        :return: 检查结果
+        """
+        metrics = self.downloader.metrics
+        metrics.count("watch_checks")
+        with self._lock:
+            entry = dict(self.state.get(url, {}))
+        entry["checked"] = time.time()
+        try:
+            if entry.get("status") != 200:
+                # 没有出现过的页面（如模板展开的地址）大多不存在，先用HEAD确认，不下载页面
+                with self.downloader.head(url, allow_redirects=True):
+                    ...
+            conditional_headers = {}
+            if entry.get("etag"):
+                conditional_headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                conditional_headers["If-Modified-Since"] = entry["last_modified"]
+            with self.downloader.get(url, headers=conditional_headers) as response:
+                if response.status_code == 304:
+                    metrics.count("watch_not_modified")
+                    body = None
+                else:
+                    body = response.content
+                    entry["etag"] = response.headers.get("ETag")
+                    entry["last_modified"] = response.headers.get("Last-Modified")
+        except DownloadError as e:
+            status = e.status
+            if status in MISSING_STATUS:
+                metrics.count("watch_missing")
+                return self._update(url, entry, status, None)
+            metrics.count("watch_errors")
+            return self._update(url, entry, entry.get("status"), str(e))
+        if body is not None:
+            digest = sha256(body).hexdigest()
+            # 服务器不支持条件请求时，内容没有变化就不再解析
+            if digest != entry.get("digest"):
+                entry["digest"] = digest
+                page_head = scan_head(body)
+                entry["title"] = page_head.title
+                entry["scripts"] = list(dict.fromkeys(urljoin(url, src_url) for src_url in page_head.scripts))
+        try:
+            # 页面没有变化时，不带hash的脚本仍然可能变化
+            entry["fingerprint"] = self._fingerprint(entry.get("scripts", []))
+        except DownloadError as e:
+            metrics.count("watch_errors")
+            return self._update(url, entry, 200, str(e))
+        return self._update(url, entry, 200, None)
+
+    def _fingerprint(self, scripts: list[str]) -> str:
+        lines = []
+        for script_url in scripts:
+            lines.append(script_url)
+            if embedded_hash(script_url) is None:
+                # 文件名中没有hash，内容变化时引用不变，用响应头代替内容
+                with self.downloader.head(script_url, allow_redirects=True) as response:
+                    lines.append(" ".join(response.headers.get(name, "") for name in
+                                          ("ETag", "Last-Modified", "Content-Length")))
+        return sha256("\n".join(lines).encode("utf-8")).hexdigest()
+
+    def _update(self, url: str, entry: dict, status: Optional[int], error: Optional[str]) -> WatchCheck:
+        entry["status"] = status
+        with self._lock:
+            self.state[url] = entry
+        changed = status == 200 and error is None and entry.get("fingerprint") != entry.get("extracted")
+        if changed:
+            self.downloader.metrics.count("watch_changed")
+        return WatchCheck(url, status, changed, entry.get("title"), error)
+
+    def mark_extracted(self, url: str):
+        """
+        记录页面已经按当前的脚本提取过，脚本再次变化前不需要重新提取
+        :param url: 页面URL
+        """
+        with self._lock:
+            entry = self.state[url]
+            entry["extracted"] = entry.get("fingerprint")
+            entry["extracted_at"] = time.time()
+
+    def save(self):
+        with self._lock:
+            data = json.dumps(self.state, ensure_ascii=False)
+        os.makedirs(os.path.dirname(os.path.abspath(self.state_path)), exist_ok=True)
+        with open(self.state_path + ".tmp", "w", encoding="utf-8") as fp:
+            fp.write(data)
+        os.replace(self.state_path + ".tmp", self.state_path)
+
+
+def watch_once(session: SpineAutoSession, watcher: EventWatcher, urls: list[str],
+               event_workers: int = DEFAULT_EVENT_WORKERS, skip_existing: bool = False) -> list[EventResult]:
+    """
+    检查一次所有页面，提取脚本发生变化的活动
+    :param session: 提取会话
+    :param watcher: 页面检查器
+    :param urls: 页面URL
+    :param event_workers: 同时提取的活动数
+    :param skip_existing: 第一次看到的页面只记录状态，不提取（已经手动提取过的活动）
+    :return: 提取的结果
+    """
+    known = set(url for url, entry in watcher.state.items() if entry.get("status") == 200)
+    changed = [check.url for check in watcher.poll(urls) if check.changed]
+    if skip_existing:
+        for url in [url for url in changed if url not in known]:
+            watcher.mark_extracted(url)
+            changed.remove(url)
+
+    def extract(url: str) -> EventResult:
+        start_time = time.perf_counter()
+        try:
+            result = session.extract(url)
+        except Exception as e:
+            # 提取失败时不记录，下次轮询时重试
+            return EventResult(url, None, 0, 0, 0, time.perf_counter() - start_time, f"{type(e).__name__}: {e}")
+        watcher.mark_extracted(url)
+        return result
+
+    with ThreadPoolExecutor(event_workers) as executor:
+        results = list(executor.map(extract, changed))
+    if results:
+        watcher.save()
+        session.save()
+    return results
+
+
+def watch(config: SpineAutoConfig, urls: list[str], patterns: list[str], interval: float = DEFAULT_INTERVAL,
+          once: bool = False, event_workers: int = DEFAULT_EVENT_WORKERS, skip_existing: bool = False,
+          state_path: Optional[str] = None, days_back: int = DEFAULT_DAYS_BACK, days_ahead: int = DEFAULT_DAYS_AHEAD,
+          metrics: Optional[Metrics] = None):
+    """
+    定时检查页面，直到Ctrl+C
+    :param config: 提取的设置
+    :param urls: 页面URL
+    :param patterns: 带日期的地址模板，每次轮询时以当天为中心展开
+    :param interval: 两次轮询之间的间隔（秒）
+    :param once: 只检查一次
+    :param event_workers: 同时提取的活动数
+    :param skip_existing: 第一次看到的页面只记录状态，不提取
+    :param state_path: 状态文件的路径，默认在缓存目录中
+    :param days_back: 地址模板展开到今天之前多少天
+    :param days_ahead: 地址模板展开到今天之后多少天
+    :param metrics: 性能数据
+    """
+    with SpineAutoSession(config, metrics) as session:
+        watcher = EventWatcher(session.downloader, state_path or os.path.join(config.cache_dir, STATE_NAME))
+        while True:
+            start = time.perf_counter()
+            poll_urls = list(dict.fromkeys(urls + expand_patterns(patterns, days_back=days_back,
+                                                                  days_ahead=days_ahead)))
+            results = watch_once(session, watcher, poll_urls, event_workers, skip_existing)
+            skip_existing = False
+            print(f"{time.strftime('%H:%M:%S')} 检查了{len(poll_urls)}个页面，"
+                  f"提取了{len(results)}个活动，耗时{time.perf_counter() - start:.1f}s")
+            if results:
+                print_summary(results)
+            if once:
+                return
+            try:
+                time.sleep(interval)
+            except KeyboardInterrupt:
+                return
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="定时检查先行展示页，脚本变化时自动提取")
+    arg_parser.add_argument("url_list", nargs="*", help="URL列表文件，如miHoYoTestUrl.md")
+    arg_parser.add_argument("--url", action="append", default=[], help="页面URL，可以重复")
+    arg_parser.add_argument("--pattern", action="append", default=[],
+                            help="带日期的地址模板，可以重复，"
+                                 "如https://act.mihoyo.com/ys/event/e{date:%%Y%%m%%d}preview/index.html")
+    arg_parser.add_argument("--days-back", type=int, default=DEFAULT_DAYS_BACK, help="地址模板展开到今天之前多少天")
+    arg_parser.add_argument("--days-ahead", type=int, default=DEFAULT_DAYS_AHEAD, help="地址模板展开到今天之后多少天")
+    arg_parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL, help="两次轮询之间的间隔（秒）")
+    arg_parser.add_argument("--once", action="store_true", help="只检查一次")
+    arg_parser.add_argument("--skip-existing", action="store_true", help="第一次看到的页面只记录状态，不提取")
+    arg_parser.add_argument("--state", help="状态文件的路径，默认在缓存目录中")
+    arg_parser.add_argument("-o", "--output", default=".", help="输出目录")
+    arg_parser.add_argument("--events", type=int, default=DEFAULT_EVENT_WORKERS, help="同时提取的活动数")
+    arg_parser.add_argument("--cache-dir", default=CACHE_DIR, help="缓存目录")
+    arg_parser.add_argument("--output-format", choices=OUTPUT_FORMATS, default=SpineAutoConfig().output_format,
+                            help="输出格式：dir为文件夹，zip、tar、tar.zst为每个活动一个归档")
+    add_metrics_arguments(arg_parser)
+    args = arg_parser.parse_args()
+    watch_urls = [url for path in args.url_list for url in read_url_list(path)] + args.url
+    if not watch_urls and not args.pattern:
+        arg_parser.error("需要URL列表文件、--url或--pattern")
+    watch_metrics = Metrics(profile=args.profile is not None)
+    try:
+        watch(SpineAutoConfig(output_root=args.output, cache_dir=args.cache_dir, output_format=args.output_format),
+              list(dict.fromkeys(watch_urls)),
+              args.pattern, args.interval, args.once, args.events, args.skip_existing, args.state, args.days_back,
+              args.days_ahead, watch_metrics)
+    except KeyboardInterrupt:
+        ...
+    finally:
+        watch_metrics.save(args.metrics, args.prometheus, args.profile)
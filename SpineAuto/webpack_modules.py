@@ -0,0 +1,351 @@
+import re
+from collections import namedtuple
+from itertools import accumulate
+from typing import Optional
+
+# 一个webpack模块：模块id、源码在文件中的起止偏移、引用的其他模块id（按出现顺序）
+WebpackModule = namedtuple("WebpackModule", ["id", "start", "end", "requires"])
+
+WHITESPACE = frozenset(b" \t\r\n")
+CLOSERS = frozenset(b")]}")
+MAX_TABLE_OPEN_DEPTH = 2  # 模块表的左括号所在的最大深度
+LOOKBEHIND = 128  # 判断模块表时向前查看的字节数
+MAX_HEAD = 256  # 模块函数头（function(e,t,n)）的最大长度，不完整的函数头最多等待这么多字节
+
+# 模块表的开始：分块的push([[分块id],[、webpack 4运行时的}({、webpack 5运行时的var e={
+# 每个分支都以字符开头，正则可以快速跳过不可能匹配的位置
+TABLE_START_RE = re.compile(rb"(?:\.push\(\[\[[^\[\]]*\],|\}\)?\(|v(?<![\w$.]v)ar\s[\w$,\s]*=|l(?<![\w$.]l)et\s[\w$,\s]*=|"
+                            rb"c(?<![\w$.]c)onst\s[\w$,\s]*=)\s*[\[{]")
+# 模块函数：function(e,t,n){、(e,t,n)=>{、e=>{，第三个参数是__webpack_require__
+MODULE_OPEN_RE = re.compile(rb"\s*(?:function\s*[\w$]*\s*\(([^()]*)\)|\(([^()]*)\)\s*=>|([\w$]+)\s*=>)\s*\{")
+OBJECT_KEY_RE = re.compile(rb"[\w$]+")
+BRACKET_RE = re.compile(rb"[()\[\]{}]")
+# 一个模块结束后紧接着的下一个模块：逗号、对象表的键和函数头
+NEXT_MODULE_RE = re.compile(rb',\s*(?:("[^"\n]*"|[\w$]+)\s*:)?' + MODULE_OPEN_RE.pattern)
+# 括号的种类：1为(，2为[和{，3为右括号；其他字符删除
+_KIND_TABLE = bytes.maketrans(b"([{)]}", b"\x01\x02\x02\x03\x03\x03")
+_NON_BRACKETS = bytes(sorted(set(range(256)) - set(b"()[]{}")))
+_DEPTH_CHANGE = (0, 1, 1, -1)
+# 跳过指定数量的括号，用于从括号的序号找到它的位置；每个数量编译一次
+_SKIP_BRACKETS = rb"[^()\[\]{}]*+(?:[()\[\]{}][^()\[\]{}]*+){%d}[()\[\]{}]"
+_SKIP_BRACKETS_RES: dict[int, re.Pattern] = {}
+MAX_SKIP_PATTERN = 4096  # 超过这个数量时分多次跳过
+
+# 按需加载的分块的文件名："js/"+({}[e]||e)+"."+{216:"7a3f0c1e"}[e]+".js"
+CHUNK_SUFFIX_RE = re.compile(rb'\]\+"[^"\n]*\.js"')
+CHUNK_SCRIPT_RE = re.compile(rb'"([^"\n]*)"\+(?:\(\{([^{}]*)\}\[[\w$]+\]\|\|[\w$]+\)|[\w$]+)\+"([^"\n]*)"\+'
+                             rb'\{([^{}]*)\}\[[\w$]+\]\+"([^"\n]*\.js)"')
+CHUNK_ENTRY_RE = re.compile(rb'([\w$]+|"[^"]*"):"([^"]*)"')
+CHUNK_MAP_WINDOW = 1 << 16  # 分块文件名映射的最大长度
+PUBLIC_PATH_RE = re.compile(rb'(?<![\w$])[\w$]+\.p="([^"\n]*)"')
+
+# ModuleTracker的状态
+_OUTSIDE = 0  # 不在模块表中
+_ENTRY = 1  # 模块表中，等待下一个模块（或对象表的键）
+_COLON = 2  # 读取完对象表的键，等待冒号
+_BODY = 3  # 模块的函数体中
+_AFTER = 4  # 一个模块结束，等待逗号或表的结束
+
+
+class ModuleTracker:
+    """
+    在扫描webpack打包文件的同时找出模块表（分块的push([[id],{...}])、webpack 4/5运行时中的模块表）中的每个模块。
+    由VendorsScanner驱动：字面量的内容、注释和正则交给skip，需要知道当前模块时调用advance处理到当前位置。
+    advance把一整段代码中跳过的部分清零后一次性统计括号深度，模块的结束位置用深度列表查找，不逐个字符处理
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.closed: list[WebpackModule] = []  # 已经结束、还没有被取走的模块
+        self._done = 0  # 已经处理到的文件偏移
+        self._skipped: list[tuple[int, int]] = []  # 还没有处理的、需要跳过的范围（文件偏移）
+        self._tail = b""  # 已经处理的代码的结尾，用于判断模块表的开始
+        self._state = _OUTSIDE
+        self._table_depth = 0  # 模块表内部的括号深度
+        self._table_kind = 0  # 模块表是数组还是对象
+        self._index = 0  # 数组表中当前的下标
+        self._key: Optional[str] = None
+        self._module: Optional[str] = None
+        self._module_start = 0
+        self._entry_start = 0  # 模块表中当前项（包括键）的起点
+        self._require_name = b""  # 当前模块中__webpack_require__的名称
+        self._require_re: Optional[re.Pattern] = None
+        self._requires: list[str] = []
+        self._require_res: dict[bytes, tuple[bytes, Optional[re.Pattern]]] = {}  # 参数列表 -> (名称, 引用的正则)
+
+    @property
+    def current(self) -> Optional[str]:
+        """
+        :return: advance处理到的位置所在的模块id，不在模块中时为None
+        """
+        return self._module if self._state == _BODY else None
+
+    def skip(self, buffer: bytes | bytearray, start: int, end: int, base: int):
+        """
+        标记不是代码的范围（字符串字面量的内容、注释、正则），其中的括号不计入深度
+        :param buffer: 缓冲区
+        :param start: 起点
+        :param end: 终点
+        :param base: buffer[0]在整个文件中的偏移
+        """
+        # 大部分字面量中没有括号，不需要清零
+        if BRACKET_RE.search(buffer, start, end) is not None:
+            self._skipped.append((base + start, base + end))
+
+    def advance(self, buffer: bytes | bytearray, end: int, base: int, final: bool = False):
+        """
+        处理到buffer[end]之前，之后current为这个位置所在的模块
+        :param buffer: 缓冲区，必须包含上次处理到的位置之后的内容
+        :param end: 处理到的位置
+        :param base: buffer[0]在整个文件中的偏移
+        :param final: 是否已经没有后续数据，为False时结尾不完整的函数头留到下次处理
+        """
+        origin = self._done
+        start = origin - base
+        if end <= start:
+            return
+        code = bytearray(buffer[start:end])
+        skipped = self._skipped
+        self._skipped = []
+        for skip_start, skip_end in skipped:
+            code[skip_start - origin:skip_end - origin] = bytes(skip_end - skip_start)
+        # depths[k]为第k个括号之前的深度
+        depths = list(accumulate(map(_DEPTH_CHANGE.__getitem__, code.translate(_KIND_TABLE, _NON_BRACKETS)),
+                                 initial=self.depth))
+        pos = 0
+        bracket = 0  # pos之前的括号数量
+        while pos < len(code):
+            state = self._state
+            if state == _BODY:
+                pos, bracket = self._body(code, pos, bracket, depths, origin, final)
+                if pos < len(code) and self._state == _BODY:
+                    # 结尾的引用还没有传输完，从这里开始留到下次处理
+                    end = start + pos
+                    self._skipped = [span for span in skipped if span[1] > origin + pos]
+                    break
+            elif state == _OUTSIDE:
+                pos, bracket = self._outside(code, pos, bracket, depths)
+            else:
+                next_pos, waiting = self._table(code, pos, origin, final)
+                bracket += len(code[pos:next_pos].translate(None, _NON_BRACKETS))
+                pos = next_pos
+                if waiting:
+                    # 键或函数头还没有传输完，从这里开始留到下次处理；之前的逗号和键已经处理过，不会再处理一次
+                    end = start + pos
+                    self._skipped = [span for span in skipped if span[1] > origin + pos]
+                    break
+        self.depth = depths[bracket]
+        # 每段代码可能很短，与之前的结尾拼接后再截取
+        self._tail = (self._tail + code[max(0, pos - LOOKBEHIND):pos])[-LOOKBEHIND:]
+        self._done = base + end
+
+    def _body(self, code: bytearray, pos: int, bracket: int, depths: list[int], origin: int,
+              final: bool) -> tuple[int, int]:
+        # 返回处理到的位置和之前的括号数量，模块没有结束且位置不在结尾时，之后的部分需要等待后续数据
+        table_depth = self._table_depth
+        while True:
+            try:
+                # 深度回到模块表内部时模块结束
+                closer = depths.index(table_depth, bracket + 1) - 1
+            except ValueError:
+                end = len(code) if final else self._complete_end(code, pos)
+                self._find_requires(code, pos, end)
+                if end == len(code):
+                    return end, len(depths) - 1
+                return end, bracket + len(code[pos:end].translate(None, _NON_BRACKETS))
+            end = _skip_brackets(code, pos, closer - bracket + 1)
+            self._find_requires(code, pos, end)
+            self.closed.append(WebpackModule(self._module, self._module_start, origin + end, tuple(self._requires)))
+            self._requires = []
+            bracket = closer + 1
+            # 紧接着的下一个模块直接开始，不需要逐个字符处理
+            match = NEXT_MODULE_RE.match(code, end)
+            if match is None or (match.group(1) is None) != (self._table_kind == 0x5B):  # "["
+                self._state = _AFTER
+                return end, bracket
+            key = match.group(1)
+            if key is None:
+                self._index += 1
+                self._key = None
+            else:
+                self._key = key.strip(b'"').decode("utf-8", errors="replace")
+            # 与逐个处理时一致，模块从逗号之后的第一个非空白字符开始
+            entry = end + 1
+            while code[entry] in WHITESPACE:
+                entry += 1
+            self._start_module(match.group(2) or match.group(3) or match.group(4) or b"", origin + entry)
+            bracket += len(match.group(0).translate(None, _NON_BRACKETS))
+            pos = match.end()
+
+    def _complete_end(self, code: bytearray, pos: int) -> int:
+        # 结尾可能是被分开的n(123)，从最后一个右括号之后的第一个名称开始等待后续数据，最多等待MAX_HEAD个字节。
+        # 不能从最后一个名称开始，n("hero-json")中的字符串也可能包含名称
+        if self._require_re is None:
+            return len(code)
+        window = max(pos, len(code) - MAX_HEAD, code.rfind(b")", pos) + 1)
+        first = code.find(self._require_name, window)
+        return len(code) if first == -1 else first
+
+    def _find_requires(self, code: bytearray, start: int, end: int):
+        # n(123)和n("56d7")形式的引用
+        if self._require_re is not None:
+            for number, name in self._require_re.findall(code, start, end):
+                self._requires.append((number or name).decode("utf-8", errors="replace"))
+
+    def _outside(self, code: bytearray, pos: int, bracket: int, depths: list[int]) -> tuple[int, int]:
+        # 上一段代码的结尾也参与匹配，模块表的前缀可能被分在两段中
+        context = self._tail + code if pos == 0 else code
+        shift = len(context) - len(code)
+        for match in TABLE_START_RE.finditer(context, max(0, pos + shift - LOOKBEHIND)):
+            opener = match.end() - 1 - shift
+            if opener < pos:
+                continue
+            bracket += len(code[pos:opener].translate(None, _NON_BRACKETS))
+            pos = opener + 1
+            if depths[bracket] <= MAX_TABLE_OPEN_DEPTH:
+                self._state = _ENTRY
+                self._table_depth = depths[bracket + 1]
+                self._table_kind = code[opener]
+                self._index = 0
+                self._key = None
+                return pos, bracket + 1
+            bracket += 1
+        return len(code), len(depths) - 1
+
+    def _table(self, code: bytearray, pos: int, origin: int, final: bool) -> tuple[int, bool]:
+        # 模块之间的部分：逗号、对象表的键和函数头，返回(处理到的位置, 是否需要等待后续数据)。
+        # 等待时返回的位置是还没有处理的键或函数头的起点，状态与处理到这个位置时一致
+        end = len(code)
+        while pos < end:
+            char = code[pos]
+            state = self._state
+            if char in WHITESPACE:
+                pos += 1
+                continue
+            if state == _COLON:
+                if char != 0x3A:  # ":"
+                    return self._abandon(pos), False
+                next_pos = self._open_module(code, pos + 1, final)
+                # 函数头不完整时从冒号重新开始，键保留在_key中
+                return (pos, True) if next_pos is None else (next_pos, False)
+            if state == _AFTER:
+                if char == 0x2C:  # ","
+                    self._state = _ENTRY
+                    self._key = None
+                    self._index += 1
+                    pos += 1
+                    continue
+                if char in CLOSERS:
+                    self._state = _OUTSIDE
+                    return pos + 1, False
+                return self._abandon(pos), False
+            # _ENTRY
+            if char in CLOSERS:
+                self._state = _OUTSIDE
+                return pos + 1, False
+            self._entry_start = origin + pos
+            if self._table_kind == 0x5B:  # "["
+                if char == 0x2C:  # 数组表中的空位
+                    self._index += 1
+                    pos += 1
+                    continue
+                next_pos = self._open_module(code, pos, final)
+                return (pos, True) if next_pos is None else (next_pos, False)
+            if char == 0x22:  # '"' 字符串键
+                key_end = code.find(b'"', pos + 1)
+                if key_end == -1:
+                    if not final and end - pos < MAX_HEAD:
+                        return pos, True
+                    return self._abandon(pos), False
+                self._key = code[pos + 1:key_end].decode("utf-8", errors="replace")
+                self._state = _COLON
+                pos = key_end + 1
+                continue
+            match = OBJECT_KEY_RE.match(code, pos)
+            if match is None:
+                return self._abandon(pos), False
+            if match.end() == end and not final:
+                # 键可能还没有传输完
+                return pos, True
+            self._key = match.group(0).decode("ascii", errors="replace")
+            self._state = _COLON
+            pos = match.end()
+        return end, False
+
+    def _open_module(self, code: bytearray, pos: int, final: bool) -> Optional[int]:
+        match = MODULE_OPEN_RE.match(code, pos)
+        if match is None:
+            if not final and len(code) - pos < MAX_HEAD and code.find(b"{", pos) == -1:
+                return None
+            return self._abandon(pos)
+        self._start_module(match.group(1) or match.group(2) or match.group(3) or b"", self._entry_start)
+        return match.end()
+
+    def _start_module(self, params: bytes, start: int):
+        # params为模块函数的参数列表，第三个参数是__webpack_require__
+        try:
+            self._require_name, self._require_re = self._require_res[params]
+        except KeyError:
+            names = params.split(b",")
+            name = names[2].strip() if len(names) > 2 else b""
+            # 先匹配名称本身再检查它前面的字符，比以后顾断言开头的正则快得多
+            self._require_name = name
+            self._require_re = re.compile(
+                re.escape(name) + rb"(?<![\w$.]" + re.escape(name) + rb')\((?:(\d+)|"([^"\n]*)")\)') if name else None
+            self._require_res[params] = name, self._require_re
+        self._module = self._key if self._key is not None else str(self._index)
+        self._module_start = start
+        self._requires = []
+        self._state = _BODY
+
+    def _abandon(self, pos: int) -> int:
+        """
+        不是模块表或格式无法识别，之后的内容不再划分模块，括号深度照常统计
+        :param pos: 无法识别的位置，从这里开始当作普通代码
+        """
+        self._state = _OUTSIDE
+        self._key = None
+        return pos
+
+
+def _skip_brackets(code: bytes | bytearray, pos: int, count: int) -> int:
+    """
+    :return: 从pos开始第count个括号之后的位置
+    """
+    if count <= MAX_SKIP_PATTERN:
+        pattern = _SKIP_BRACKETS_RES.get(count)
+        if pattern is None:
+            pattern = _SKIP_BRACKETS_RES[count] = re.compile(_SKIP_BRACKETS % (count - 1))
+        return pattern.match(code, pos).end()
+    while count > MAX_SKIP_PATTERN:
+        pos = _skip_brackets(code, pos, MAX_SKIP_PATTERN)
+        count -= MAX_SKIP_PATTERN
+    return _skip_brackets(code, pos, count)
+
+
+def _chunk_entries(content: Optional[bytes]) -> list[tuple[bytes, bytes]]:
+    return [(key.strip(b'"'), value) for key, value in CHUNK_ENTRY_RE.findall(content or b"")]
+
+
+def chunk_script_paths(buffer: bytes | bytearray) -> list[str]:
+    """
+    从webpack运行时中找出所有按需加载的分块脚本，如"js/"+({}[e]||e)+"."+{216:"7a3f0c1e"}[e]+".js"
+    :param buffer: 脚本内容，可以是map_file的返回值
+    :return: 分块脚本的路径，运行时中设置了publicPath（n.p="..."）时带上它
+    """
+    public_path_match = PUBLIC_PATH_RE.search(buffer)
+    public_path = public_path_match.group(1) if public_path_match is not None else b""
+    paths = []
+    for suffix in CHUNK_SUFFIX_RE.finditer(buffer):
+        window_start = max(0, suffix.start() - CHUNK_MAP_WINDOW)
+        for match in CHUNK_SCRIPT_RE.finditer(buffer, window_start, suffix.end()):
+            if match.end() != suffix.end():
+                continue
+            prefix, names, separator, hashes, extension = match.groups()
+            name_map = dict(_chunk_entries(names))
+            for chunk_id, chunk_hash in _chunk_entries(hashes):
+                path = (public_path + prefix + name_map.get(chunk_id, chunk_id) + separator + chunk_hash +
+                        extension).decode("utf-8")
+                if path not in paths:
+                    paths.append(path)
+    return paths
@@ -1,139 +1,16 @@
 # -*- coding: utf-8 -*-
-import re
-import requests
-import shutil
 import os
-import time
-import pathlib
+import sys
 
 # Author: ZeroFly 杰洛飞
-# comment: the following script can download resources automatically from genshine web server
-# First download index.js and vendor.js in the folder where is this script locate
-# Second replace following url and name
-# Third run the script, you are good to go
-#e.g. for this url
-#https://webstatic.mihoyo.com/ys/event/e20220928review_data/index.html
+# 实现已经移到SpineAuto/genshin_resources.py，与SpineAuto共用扫描、下载、归档和资源目录模块；
+# 这里保留原来的入口，在当前文件夹中运行，参数原样转发，如：
+# python Get_GenShin_Resources.py --url https://webstatic.mihoyo.com/ys/event/e20220928review_data/ --download
+SPINE_AUTO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "SpineAuto")
 
-webURL = "https://webstatic.mihoyo.com/ys/event/e20220928review_data/"
-indexJSName = 'index_435bc0bfde917c016047.js'
-vendorJSName = 'vendors_9f54804aa85053794de9.js'
+if __name__ == "__main__":
+    # SpineAuto中的模块互相按文件名导入
+    sys.path.insert(0, os.path.normpath(SPINE_AUTO_DIR))
+    from genshin_resources import main
 
-totalFileNameList = []
-
-#Analyze index js
-with open(indexJSName,encoding='utf-8') as f:
-    lines = f.readlines()
-
-    for line in lines:
-        indexList = [m.start() for m in re.finditer('e.exports=A.p', line)]
-        if len(indexList) > 0:
-            for start in indexList:
-                url = webURL
-                startIndex = start + 15 # find the start index of resource string
-                while line[startIndex] != "\"":
-                    url+=line[startIndex]
-                    startIndex += 1
-                fileName = os.path.basename(url)
-                totalFileNameList.append(fileName)
-
-                # r = requests.get(url, auth=('usrname', 'password'), verify=False,stream=True)
-                # r.raw.decode_content = True
-                # with open(fileName, 'wb') as f:
-                #         shutil.copyfileobj(r.raw, f)
-                # time.sleep(0.5)
-
-currentFolderFileNames = next(os.walk("."))[2]
-
-for name in currentFolderFileNames:
-    if name.endswith(".mp3") or  name.endswith(".atlas.txt"):
-        continue
-
-    splitList = name.split('.')
-    if len(splitList) > 2 :
-        newName = splitList[0] + "." + splitList[-1]
-        os.rename(name,newName)
-
-# Analyze vendors js
-with open(vendorJSName,encoding='utf-8') as f:
-    lines = f.readlines()
-
-    for line in lines:
-        indexList = [m.start() for m in re.finditer('e.exports="', line)]
-        if len(indexList) > 0:
-            for start in indexList:
-                url = ""
-                startIndex = start + 11 # find the start index of resource string
-                while line[startIndex] != "\"":
-                    url+=line[startIndex]
-                    startIndex += 1
-
-                firstN = url.find("\\n")
-
-                if firstN != -1:
-                    fileName = url[0:firstN]
-
-                    if ".png" in fileName :
-                        pngIndex = fileName.find(".png")
-                        targetName = fileName[0:pngIndex]
-                        pathlib.Path(targetName).mkdir(parents=True, exist_ok=True) 
-                        url = url.replace("\\n","\n")
-                        atlasFile = open(targetName+".atlas.txt", "w",encoding="utf-8")
-                        atlasFile.write(url)
-                        atlasFile.close()
-                        atlasName = targetName+".atlas.txt"
-                        pngName = targetName+".png"
-                        jsonName = targetName+".json"
-
-                        try:
-                            if os.path.exists(atlasName) :
-                                shutil.move(atlasName, targetName+"/")
-                            if os.path.exists(pngName) :
-                                shutil.move(pngName, targetName+"/")
-                            if os.path.exists(jsonName) :
-                                jsonVersionCorrection = []
-                                with open(jsonName,encoding='utf-8') as jsonF:
-                                    jsonLines = f.readlines()
-                                    for jsonLine in jsonLines:
-                                        jsonAfter = jsonLine.replace("4.0-from-","")
-                                        jsonVersionCorrection.append(jsonAfter)
-                                    jsonF.close()
-                                jsonFile = open(jsonName, "w",encoding="utf-8")
-                                for lineAfter in jsonVersionCorrection:
-                                    jsonFile.write(lineAfter)
-                                jsonFile.close()
-
-                                shutil.move(jsonName, targetName+"/")
-                            
-                        except Exception as e:
-                            continue
-                        #print(targetName)
-
-                # r = requests.get(url, auth=('usrname', 'password'), verify=False,stream=True)
-                # r.raw.decode_content = True
-                # with open(fileName, 'wb') as f:
-                #         shutil.copyfileobj(r.raw, f)
-                # time.sleep(0.5)
-
-for fName in totalFileNameList:
-    if ".png" in fName :
-        splitList = fName.split('.')
-        if len(splitList) > 2 :
-            fileName = splitList[0] + "." + splitList[-1]
-        pngIndex = fileName.find(".png")
-        targetName = fileName[0:pngIndex]
-        jsonName = targetName+".json"
-        print(targetName+"/"+jsonName)
-        if os.path.exists(targetName+"/"+jsonName) :
-            jsonVersionCorrection = []
-            with open(targetName+"/"+jsonName,encoding='utf-8') as jsonF:
-                jsonLines = jsonF.readlines()
-                for jsonLine in jsonLines:
-                    jsonAfter = jsonLine.replace("4.0-from-","")
-                    jsonVersionCorrection.append(jsonAfter)
-                jsonF.close()
-
-            jsonFile = open(targetName+"/"+jsonName, "w",encoding="utf-8")
-            for lineAfter in jsonVersionCorrection:
-                jsonFile.write(lineAfter)
-            jsonFile.close()
-        
\ No newline at end of file
+    sys.exit(main(sys.argv[1:]))